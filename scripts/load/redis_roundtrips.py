@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""Count Redis round trips per daily-QA / daily-turn operation, before vs after pipelining.
+
+"before" replays the historical command sequences; "after" calls the live helpers in
+ai-omni-service/app/main.py. Every awaited command or pipeline execute() is one round trip.
+
+    python scripts/load/redis_roundtrips.py                       # in-memory, counts only
+    python scripts/load/redis_roundtrips.py --redis-url redis://localhost:6379/15 --iterations 500
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+
+_APP_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "services", "ai-omni-service", "app")
+
+
+class _MemoryRedis:
+    """Just enough of redis.asyncio for the helpers under test (decode_responses=True)."""
+
+    def __init__(self):
+        self._store = {}
+
+    async def get(self, key):
+        return self._store.get(key)
+
+    async def mget(self, keys):
+        return [self._store.get(k) for k in keys]
+
+    async def set(self, key, value, ex=None, nx=False):
+        if nx and key in self._store:
+            return None
+        self._store[key] = value
+        return True
+
+    async def setex(self, key, ttl, value):
+        self._store[key] = value
+        return True
+
+    async def incr(self, key):
+        self._store[key] = str(int(self._store.get(key, 0)) + 1)
+        return int(self._store[key])
+
+    async def incrby(self, key, n):
+        self._store[key] = str(int(self._store.get(key, 0)) + n)
+        return int(self._store[key])
+
+    async def decrby(self, key, n):
+        return await self.incrby(key, -n)
+
+    async def expire(self, key, ttl):
+        return True
+
+    async def lpush(self, key, *values):
+        lst = self._store.setdefault(key, [])
+        for v in values:
+            lst.insert(0, v)
+        return len(lst)
+
+    async def ltrim(self, key, start, end):
+        self._store[key] = self._store.get(key, [])[start:end + 1]
+        return True
+
+    async def lrange(self, key, start, end):
+        return self._store.get(key, [])[start:end + 1]
+
+    async def zadd(self, key, mapping):
+        self._store.setdefault(key, {}).update(mapping)
+        return len(mapping)
+
+
+class _Pipeline:
+    def __init__(self, counter, target):
+        self._counter, self._target, self._calls = counter, target, []
+
+    def __getattr__(self, name):
+        def _queue(*args, **kwargs):
+            self._calls.append((name, args, kwargs))
+            return self
+        return _queue
+
+    async def execute(self):
+        self._counter.round_trips += 1
+        if hasattr(self._target, "pipeline"):
+            pipe = self._target.pipeline(transaction=True)
+            for name, args, kwargs in self._calls:
+                getattr(pipe, name)(*args, **kwargs)
+            return await pipe.execute()
+        return [await getattr(self._target, n)(*a, **kw) for n, a, kw in self._calls]
+
+
+class _Counting:
+    """Proxy that counts one round trip per awaited command or pipeline execute()."""
+
+    def __init__(self, target):
+        self._target = target
+        self.round_trips = 0
+
+    def pipeline(self, transaction=True):
+        return _Pipeline(self, self._target)
+
+    def __getattr__(self, name):
+        method = getattr(self._target, name)
+
+        async def _call(*args, **kwargs):
+            self.round_trips += 1
+            return await method(*args, **kwargs)
+        return _call
+
+
+# ── historical sequences ──
+
+async def _legacy_incr_daily_turns(rc, key, ttl):
+    n = await rc.incr(key)
+    await rc.expire(key, ttl)
+    return n
+
+
+async def _legacy_add_history(rc, key, texts, cap, ttl):
+    for q in reversed(texts):
+        await rc.lpush(key, q)
+    await rc.ltrim(key, 0, cap - 1)
+    await rc.expire(key, ttl)
+
+
+async def _on_fresh_counter(target, key, coro):
+    await target.set(key, "0")  # uncounted: reset so every run starts well below the Pro limit
+    return await coro
+
+
+async def _legacy_pro_turns(omni, rc, uid, key, turns):
+    for _ in range(turns):
+        await omni._get_daily_turns(rc, uid)
+        await _legacy_incr_daily_turns(rc, key, omni._DAILY_TURN_TTL_SECONDS)
+
+
+async def _leased_pro_turns(omni, rc, uid, turns):
+    lease = omni._DailyTurnLease(uid, {"subscription_status": "active"})
+    for _ in range(turns):
+        await lease.check(rc)
+        await lease.spend(rc)
+    await lease.release(rc)
+
+
+async def _legacy_read_pool_and_passed(rc, cache_key, passed_key):
+    return await rc.get(cache_key), await rc.get(passed_key)
+
+
+async def _run(redis_url, iterations):
+    os.environ.setdefault("QWEN3_OMNI_API_KEY", "bench")
+    logging.disable(logging.WARNING)
+    sys.path.insert(0, os.path.abspath(_APP_DIR))
+    import main as omni  # noqa: E402
+
+    if redis_url:
+        import redis.asyncio as redis_async
+        target = redis_async.from_url(redis_url, decode_responses=True)
+    else:
+        target = _MemoryRedis()
+
+    uid = "bench-user"
+    day = omni._today_utc_str()
+    cache_key = f"daily_qa_pool:{uid}:english:{day}"
+    passed_key = f"daily_qa_passed:{uid}:{day}"
+    history_key = f"daily_qa_history:{uid}"
+    turn_key = omni._daily_turn_key(uid)
+    pool = [{"question_text": "What did you cook last weekend?", "lang": "en"}]
+    await target.setex(cache_key, 3600, json.dumps({"pool": pool, "index": 0, "picked": pool[0]}))
+    texts = [f"question {i}" for i in range(3)]
+
+    cases = [
+        ("daily turn incr",
+         lambda rc: _legacy_incr_daily_turns(rc, turn_key, omni._DAILY_TURN_TTL_SECONDS),
+         lambda rc: omni._incr_daily_turns(rc, uid)),
+        ("turn gate check",
+         lambda rc: omni._check_daily_limit(rc, uid, {}),
+         lambda rc: omni._check_daily_limit(rc, uid, {})),
+        ("pro session, 10 turns",
+         lambda rc: _on_fresh_counter(target, turn_key, _legacy_pro_turns(omni, rc, uid, turn_key, 10)),
+         lambda rc: _on_fresh_counter(target, turn_key, _leased_pro_turns(omni, rc, uid, 10))),
+        ("history push x3",
+         lambda rc: _legacy_add_history(rc, history_key, texts, omni._DAILY_QA_HISTORY_CAP,
+                                        omni._DAILY_QA_HISTORY_TTL_SECONDS),
+         lambda rc: omni._add_daily_qa_history(rc, uid, texts)),
+        ("daily question (hit)",
+         lambda rc: _legacy_read_pool_and_passed(rc, cache_key, passed_key),
+         lambda rc: omni.handle_daily_question(rc, uid, target_language="English")),
+    ]
+
+    print(f"{'operation':22s} {'before':>8s} {'after':>8s}" + ("   before_ms  after_ms" if redis_url else ""))
+    for name, before, after in cases:
+        row = []
+        for fn in (before, after):
+            rc = _Counting(target)
+            await fn(rc)
+            trips = rc.round_trips
+            t0 = time.perf_counter()
+            for _ in range(iterations):
+                await fn(_Counting(target))
+            row.append((trips, (time.perf_counter() - t0) / iterations * 1000))
+        line = f"{name:22s} {row[0][0]:8d} {row[1][0]:8d}"
+        if redis_url:
+            line += f"   {row[0][1]:9.3f} {row[1][1]:9.3f}"
+        print(line)
+
+    if redis_url:
+        await target.delete(cache_key, passed_key, history_key, turn_key)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--redis-url", default=os.getenv("BENCH_REDIS_URL"))
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(_run(args.redis_url, args.iterations))
+
+
+if __name__ == "__main__":
+    main()
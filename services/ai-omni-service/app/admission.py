@@ -0,0 +1,144 @@
+"""Admission control for realtime /stream sessions.
+
+Every admitted session holds an upstream DashScope realtime connection, so the
+process caps how many run at once. Over the cap a client waits in a short FIFO
+queue (and is told its position); past the queue, or after ``max_wait``, it is
+rejected at once with a retry hint instead of degrading everyone's welcome.
+``snapshot()`` feeds the readiness probe so the load balancer can route new
+sessions to replicas with spare capacity. ``begin_drain()`` stops admission
+for good ahead of a shutdown.
+"""
+
+import asyncio
+import time
+from contextlib import asynccontextmanager
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, retry_after: int, reason: str = "queue_full"):
+        self.retry_after = retry_after
+        self.reason = reason
+        super().__init__(f"realtime sessions saturated ({reason}), retry after {retry_after}s")
+
+
+class _Waiter:
+    __slots__ = ("moved", "admitted", "reported")
+
+    def __init__(self):
+        self.moved = asyncio.Event()
+        self.admitted = False
+        self.reported = 0
+
+
+class SessionAdmission:
+    def __init__(self, limit: int, queue_size: int, max_wait: float = 20.0, retry_after: int = 5):
+        if limit < 1 or queue_size < 0:
+            raise ValueError(f"invalid session admission size: {limit}:{queue_size}")
+        self.limit = limit
+        self.queue_size = queue_size
+        self.max_wait = max_wait
+        self.base_retry_after = retry_after
+        self._active = 0
+        self._queue: list = []
+        self.draining = False
+        self.counters = {"admitted": 0, "queued": 0, "rejected": 0, "timeouts": 0}
+        self.peak_active = 0
+
+    def retry_after(self) -> int:
+        # Grows with the backlog so rejected clients do not all come back at once.
+        return self.base_retry_after * (1 + len(self._queue) // max(1, self.limit))
+
+    def begin_drain(self) -> None:
+        """Reject every new and queued session from now on (process is shutting down)."""
+        self.draining = True
+        self._nudge()
+
+    def _nudge(self) -> None:
+        for waiter in self._queue:
+            waiter.moved.set()
+
+    def _grant(self) -> None:
+        self._active += 1
+        self.counters["admitted"] += 1
+        self.peak_active = max(self.peak_active, self._active)
+
+    def _release(self) -> None:
+        if self._queue:
+            waiter = self._queue.pop(0)      # slot passes straight to the head of the queue
+            waiter.admitted = True
+            self.counters["admitted"] += 1
+            self._nudge()
+            waiter.moved.set()
+        else:
+            self._active -= 1
+
+    async def _acquire(self, on_position) -> None:
+        if self.draining:
+            self.counters["rejected"] += 1
+            raise AdmissionRejected(self.base_retry_after, reason="draining")
+        if self._active < self.limit and not self._queue:
+            self._grant()
+            return
+        if len(self._queue) >= self.queue_size:
+            self.counters["rejected"] += 1
+            raise AdmissionRejected(self.retry_after())
+        waiter = _Waiter()
+        self._queue.append(waiter)
+        self.counters["queued"] += 1
+        deadline = time.monotonic() + self.max_wait
+        try:
+            while not waiter.admitted:
+                waiter.moved.clear()
+                if self.draining:
+                    self.counters["rejected"] += 1
+                    raise AdmissionRejected(self.base_retry_after, reason="draining")
+                position = self._queue.index(waiter) + 1
+                if on_position and position != waiter.reported:
+                    waiter.reported = position
+                    await on_position(position, len(self._queue))
+                    continue                 # the queue may have moved while we were sending
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.counters["timeouts"] += 1
+                    raise AdmissionRejected(self.retry_after(), reason="wait_timeout")
+                try:
+                    await asyncio.wait_for(waiter.moved.wait(), timeout=remaining)
+                except asyncio.TimeoutError:
+                    pass
+        except BaseException:
+            if waiter.admitted:
+                self._release()
+            else:
+                self._queue.remove(waiter)
+                self._nudge()
+            raise
+
+    @asynccontextmanager
+    async def session(self, on_position=None):
+        """Hold one realtime slot; ``on_position(position, queue_length)`` is awaited while queued."""
+        await self._acquire(on_position)
+        try:
+            yield
+        finally:
+            self._release()
+
+    def snapshot(self) -> dict:
+        return {
+            "limit": self.limit,
+            "active": self._active,
+            "available": max(0, self.limit - self._active),
+            "waiting": len(self._queue),
+            "queue_size": self.queue_size,
+            "peak_active": self.peak_active,
+            "draining": self.draining,
+            **self.counters,
+        }
+
+
+def build_session_admission(env) -> SessionAdmission:
+    return SessionAdmission(
+        limit=int(env.get("REALTIME_MAX_SESSIONS") or 200),
+        queue_size=int(env.get("REALTIME_QUEUE_SIZE") or 20),
+        max_wait=float(env.get("REALTIME_QUEUE_WAIT_SECONDS") or 20),
+        retry_after=int(env.get("REALTIME_RETRY_AFTER_SECONDS") or 5),
+    )
@@ -0,0 +1,143 @@
+"""Per-call-class bulkheads for outbound DashScope traffic.
+
+Each class gets a concurrency limit plus a short bounded wait queue. When the
+queue is full (or a waiter outlives ``max_wait``) the call is shed at once with
+``BulkheadRejected`` so the HTTP layer can answer 429 + Retry-After instead of
+piling up connections and upstream rate limit that live voice sessions need.
+Calls made from a realtime session (``realtime_critical`` set) jump the queue
+and are never shed for a full queue; they wait up to ``critical_max_wait``
+(longer than ``max_wait``, but bounded) before they too are shed.
+"""
+
+import asyncio
+import contextvars
+import heapq
+import itertools
+import math
+import time
+from contextlib import asynccontextmanager
+
+# True inside a realtime voice session; copied into tasks it spawns.
+realtime_critical: contextvars.ContextVar = contextvars.ContextVar("realtime_critical", default=False)
+
+# class → (limit, queue_size); override with BULKHEAD_<CLASS>=limit:queue
+DEFAULT_LIMITS = {
+    "chat": (16, 32),       # scenario generation, visual prompts, daily recall
+    "daily_qa": (8, 16),    # daily-QA pool generation
+    "translate": (8, 16),
+    "tts": (6, 12),
+    "image": (4, 8),        # Wanx text-to-image jobs (held until the task finishes)
+}
+
+_CRITICAL, _NORMAL = 0, 1
+
+
+class BulkheadRejected(Exception):
+    def __init__(self, name: str, retry_after: int, reason: str = "queue_full"):
+        self.name = name
+        self.retry_after = retry_after
+        self.reason = reason
+        super().__init__(f"bulkhead '{name}' saturated ({reason}), retry after {retry_after}s")
+
+
+class Bulkhead:
+    def __init__(self, name: str, limit: int, queue_size: int, max_wait: float = 10.0,
+                 critical_max_wait: float = None):
+        if limit < 1 or queue_size < 0:
+            raise ValueError(f"invalid bulkhead size for {name!r}: {limit}:{queue_size}")
+        self.name = name
+        self.limit = limit
+        self.queue_size = queue_size
+        self.max_wait = max_wait
+        self.critical_max_wait = critical_max_wait if critical_max_wait is not None else max_wait * 3
+        self._active = 0
+        self._waiters: list = []            # heap of (priority, seq, future)
+        self._seq = itertools.count()
+        self._hold_ewma = 1.0               # seconds a call keeps its slot
+        self.counters = {"admitted": 0, "queued": 0, "critical": 0, "rejected": 0, "timeouts": 0}
+        self.peak_active = 0
+        self.peak_waiting = 0
+
+    def _waiting(self, priority=None) -> int:
+        return sum(1 for p, _, f in self._waiters if not f.done() and (priority is None or p == priority))
+
+    def retry_after(self) -> int:
+        backlog = self._waiting() + 1
+        return max(1, math.ceil(self._hold_ewma * backlog / self.limit))
+
+    def _grant(self) -> None:
+        self._active += 1
+        self.counters["admitted"] += 1
+        self.peak_active = max(self.peak_active, self._active)
+
+    async def _acquire(self, critical: bool) -> None:
+        if self._active < self.limit and not self._waiting():
+            self._grant()
+            return
+        if not critical and self._waiting(_NORMAL) >= self.queue_size:
+            self.counters["rejected"] += 1
+            raise BulkheadRejected(self.name, self.retry_after())
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (_CRITICAL if critical else _NORMAL, next(self._seq), future))
+        self.counters["queued"] += 1
+        self.peak_waiting = max(self.peak_waiting, self._waiting())
+        try:
+            await asyncio.wait_for(future, timeout=self.critical_max_wait if critical else self.max_wait)
+        except asyncio.TimeoutError:
+            if future.done() and not future.cancelled():
+                return                      # slot handed over at the deadline
+            self.counters["timeouts"] += 1
+            raise BulkheadRejected(self.name, self.retry_after(), reason="wait_timeout")
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self._release()
+            raise
+
+    def _release(self) -> None:
+        # Hand the slot straight to the best live waiter (critical first, then FIFO).
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(None)
+                self.counters["admitted"] += 1
+                return
+        self._active -= 1
+
+    @asynccontextmanager
+    async def slot(self, critical: bool = None):
+        critical = realtime_critical.get() if critical is None else critical
+        await self._acquire(critical)
+        if critical:
+            self.counters["critical"] += 1
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self._hold_ewma = 0.8 * self._hold_ewma + 0.2 * (time.monotonic() - started)
+            self._release()
+
+    def stats(self) -> dict:
+        return {
+            "limit": self.limit,
+            "queue_size": self.queue_size,
+            "active": self._active,
+            "waiting": self._waiting(),
+            "saturation": round(self._active / self.limit, 2),
+            "peak_active": self.peak_active,
+            "peak_waiting": self.peak_waiting,
+            "hold_s_ewma": round(self._hold_ewma, 3),
+            **self.counters,
+        }
+
+
+def build_bulkheads(env) -> dict:
+    max_wait = float(env.get("BULKHEAD_MAX_WAIT_SECONDS") or 10)
+    critical_max_wait = float(env.get("BULKHEAD_CRITICAL_MAX_WAIT_SECONDS") or max_wait * 3)
+    heads = {}
+    for name, (limit, queue_size) in DEFAULT_LIMITS.items():
+        override = env.get(f"BULKHEAD_{name.upper()}")
+        if override:
+            limit, _, queue = override.partition(":")
+            limit, queue_size = int(limit), int(queue or queue_size)
+        heads[name] = Bulkhead(name, limit, queue_size, max_wait, critical_max_wait)
+    return heads
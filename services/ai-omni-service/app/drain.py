@@ -0,0 +1,54 @@
+"""Tracking for fire-and-forget work that must survive a graceful drain.
+
+Audio uploads, message writes and batch evaluations are spawned with
+``asyncio.create_task`` from live sessions. Spawning them through
+``BackgroundTasks`` keeps a handle on each, so a draining process can wait for
+them (up to a deadline) and report what was flushed and what was abandoned.
+"""
+
+import asyncio
+import time
+from collections import Counter
+
+
+class BackgroundTasks:
+    def __init__(self):
+        self._tasks: dict = {}          # task → kind
+        self.completed = Counter()      # kind → tasks that ran to completion
+
+    def spawn(self, coro, kind: str) -> asyncio.Task:
+        task = asyncio.create_task(coro)
+        self._tasks[task] = kind
+        task.add_done_callback(self._on_done)
+        return task
+
+    def _on_done(self, task: asyncio.Task) -> None:
+        kind = self._tasks.pop(task, None)
+        if kind is not None and not task.cancelled():
+            self.completed[kind] += 1
+
+    def pending(self) -> dict:
+        return dict(Counter(self._tasks.values()))
+
+    async def flush(self, timeout: float) -> dict:
+        """Wait for in-flight tasks (including ones they spawn) until ``timeout``; cancel the rest."""
+        deadline = time.monotonic() + timeout
+        before = Counter(self.completed)
+        while self._tasks:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            await asyncio.wait(list(self._tasks), timeout=remaining)
+        abandoned = Counter(self._tasks.values())
+        leftover = list(self._tasks)
+        for task in leftover:
+            task.cancel()
+        if leftover:
+            await asyncio.wait(leftover, timeout=1)
+        flushed = self.completed - before
+        return {
+            "flushed": sum(flushed.values()),
+            "abandoned": sum(abandoned.values()),
+            "flushed_by_kind": dict(flushed),
+            "abandoned_by_kind": dict(abandoned),
+        }
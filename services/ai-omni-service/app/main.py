@@ -25,8 +25,32 @@ from dashscope.audio.qwen_omni import (
 import dashscope
 try:
     from .dashscope_config import classify_connection_error, connect_with_retry, resolve_dashscope_config
+    from .bulkheads import BulkheadRejected, build_bulkheads, realtime_critical
+    from .admission import AdmissionRejected, build_session_admission
+    from .drain import BackgroundTasks
+    from .prompt_budget import REQUIRED, Section, build_prompt_budgeter
+    from .message_ring import ChatMessage, MessageRing
+    from .timer_wheel import build_timer_wheel
+    from .upstream_queue import UpstreamCommandQueue, UpstreamStats
+    from .loop_monitor import build_loop_monitor
+    from .profiler import ProfilerBusy, build_profiler
+    from .memory_accounting import TracemallocSnapshots, account, deep_sizeof
+    from .tracing import build_tracer
+    from .model_calls import build_model_meter
 except ImportError:  # tests and direct `python app/main.py` load it as a module
     from dashscope_config import classify_connection_error, connect_with_retry, resolve_dashscope_config
+    from bulkheads import BulkheadRejected, build_bulkheads, realtime_critical
+    from admission import AdmissionRejected, build_session_admission
+    from drain import BackgroundTasks
+    from prompt_budget import REQUIRED, Section, build_prompt_budgeter
+    from message_ring import ChatMessage, MessageRing
+    from timer_wheel import build_timer_wheel
+    from upstream_queue import UpstreamCommandQueue, UpstreamStats
+    from loop_monitor import build_loop_monitor
+    from profiler import ProfilerBusy, build_profiler
+    from memory_accounting import TracemallocSnapshots, account, deep_sizeof
+    from tracing import build_tracer
+    from model_calls import build_model_meter
 
 # --- Configuration & Logging ---
 logging.basicConfig(level=logging.INFO)
@@ -70,6 +94,7 @@ DASHSCOPE_CHAT_BASE = DASHSCOPE_CONFIG.chat_base
 # Model names differ between China and the Singapore dedicated workspace.
 QWEN_TEXT_MODEL = os.getenv("QWEN_TEXT_MODEL", "qwen-turbo")   # intl: qwen-flash
 QWEN_IMAGE_MODEL = os.getenv("QWEN_IMAGE_MODEL", "wanx2.1-t2i-turbo")  # intl: wan2.2-t2i-flash
+QWEN_OMNI_MODEL = os.getenv("QWEN3_OMNI_MODEL", "qwen3.5-omni-flash-realtime")
 
 # Text-to-image (Wanx) base host. wan2.2-t2i-flash is a PUBLIC model served by the
 # GENERAL gateway (dashscope[-intl].aliyuncs.com), NOT the maas dedicated workspace
@@ -78,6 +103,66 @@ QWEN_IMAGE_MODEL = os.getenv("QWEN_IMAGE_MODEL", "wanx2.1-t2i-turbo")  # intl: w
 # reliable general gateway as chat-completions. Override via DASHSCOPE_IMAGE_BASE.
 DASHSCOPE_IMAGE_BASE = DASHSCOPE_CONFIG.image_base
 
+# Outbound DashScope bulkheads (see bulkheads.py). TTS runs the blocking SDK in
+# its own pool sized to its bulkhead so it never starves the default executor.
+from concurrent.futures import ThreadPoolExecutor as _ThreadPoolExecutor
+_BULKHEADS = build_bulkheads(os.environ)
+_TTS_EXECUTOR = _ThreadPoolExecutor(max_workers=_BULKHEADS["tts"].limit, thread_name_prefix="tts")
+
+# Blocking DashScope socket writes run here, one in-order writer job per session
+# (see upstream_queue.py), never on the event loop.
+_UPSTREAM_EXECUTOR = _ThreadPoolExecutor(
+    max_workers=int(os.getenv("UPSTREAM_WRITER_THREADS", "16")), thread_name_prefix="upstream")
+_UPSTREAM_STATS = UpstreamStats()
+_UPSTREAM_MAX_DEPTH = int(os.getenv("UPSTREAM_SESSION_MAX_DEPTH", "256"))
+_UPSTREAM_WRITE_TIMEOUT = float(os.getenv("UPSTREAM_WRITE_TIMEOUT_SECONDS", "5"))
+
+# Event-loop lag watchdog (see loop_monitor.py); LOOP_LAG_MONITOR=0 disables it.
+_LOOP_MONITOR = build_loop_monitor(os.environ)
+
+# On-demand sampling profiler (see profiler.py); PROFILER_MAX_CONCURRENT / PROFILER_MAX_SECONDS
+_PROFILER = build_profiler(os.environ)
+
+# Per-session memory accounting (see memory_accounting.py): the WebSocketCallback
+# fields that grow with a session. tracemalloc only runs while an operator asks.
+_SESSION_MEMORY_FIELDS = (
+    "user_audio_buffer", "ai_audio_buffer", "messages", "item_ids", "ignored_response_ids",
+    "processed_magic_transcription_ids", "turn_accumulator", "user_context", "full_response_text",
+    "_latency_stages",
+)
+_TRACEMALLOC = TracemallocSnapshots(frames=int(os.getenv("TRACEMALLOC_FRAMES", "1")))
+
+# Per-turn trace spans (see tracing.py); TRACE_EXPORT_PATH=<file> writes OTLP/JSON lines.
+_TRACER = build_tracer("ai-omni-service", os.environ)
+
+# Tokens/latency/spend per model call class and user tier (see model_calls.py).
+_MODEL_CALLS = build_model_meter(os.environ)
+
+# Per-session in-memory transcript cap (MessageRing); prompts read at most the last 10,
+# scenario review the last 50.
+_SESSION_MESSAGE_CAP = int(os.getenv("SESSION_MESSAGE_CAP", "100"))
+
+# Token budgets per LLM call class (see prompt_budget.py); PROMPT_BUDGET_<CLASS>=tokens
+_PROMPT_BUDGETS = build_prompt_budgeter(os.environ)
+
+# Per-process cap on concurrent /stream sessions (see admission.py); REALTIME_MAX_SESSIONS etc.
+_SESSION_ADMISSION = build_session_admission(os.environ)
+
+# Graceful drain (SIGTERM): sessions get until the deadline minus the flush
+# reserve to reach a turn boundary; the reserve is for in-flight uploads/writes.
+# Keep DRAIN_DEADLINE_SECONDS below the orchestrator's termination grace period.
+_DRAIN_DEADLINE_SECONDS = float(os.getenv("DRAIN_DEADLINE_SECONDS", "25"))
+_DRAIN_FLUSH_RESERVE_SECONDS = float(os.getenv("DRAIN_FLUSH_RESERVE_SECONDS", "8"))
+_BACKGROUND_TASKS = BackgroundTasks()
+_live_sessions: set = set()  # WebSocketCallback of every running /stream session
+
+# One timer wheel drives every session's heartbeat, welcome timeout and idle reaper
+# (see timer_wheel.py). SESSION_IDLE_TIMEOUT_SECONDS=0 disables idle reaping.
+_TIMER_WHEEL = build_timer_wheel(os.environ)
+_HEARTBEAT_INTERVAL_SECONDS = 15
+_WELCOME_TIMEOUT_SECONDS = 15
+_SESSION_IDLE_TIMEOUT_SECONDS = float(os.getenv("SESSION_IDLE_TIMEOUT_SECONDS", "900"))
+
 # 双阶段会话状态，key=f"{user_id}:{scenario}" — 每个场景独立维护状态
 # TTL-aware wrapper: 条目超过 72h 自动清理，最多保留 2000 个活跃 key（LRU）
 import time as _time
@@ -170,6 +255,18 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+
+@app.exception_handler(BulkheadRejected)
+async def _bulkhead_rejected_handler(request, exc: BulkheadRejected):
+    """Shed load fast: 429 + Retry-After instead of queueing on a saturated call class."""
+    from fastapi.responses import JSONResponse
+    logger.warning(f"[Bulkhead] shed {request.url.path}: {exc}")
+    return JSONResponse(
+        status_code=429,
+        content={"detail": {"code": "upstream_busy", "class": exc.name, "reason": exc.reason}},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
 # --- Service Utilities ---
 
 async def get_user_context(token: str, scenario: str = None):
@@ -255,6 +352,8 @@ async def get_user_context(token: str, scenario: str = None):
                                 }
 
                     data['active_goal'] = active_goal
+                # Model calls made later in this request/session are attributed to the user's tier
+                _MODEL_CALLS.bind("pro" if data.get("subscription_status") == "active" else "free", data.get("id"))
                 return data
             else:
                 logger.error(f"Failed to fetch user context: {resp.status_code} {resp.text}")
@@ -289,24 +388,26 @@ async def save_single_message(
         }],
     }
     headers = {"X-Guaji-Internal-Auth": internal_secret}
-    for attempt in range(3):
-        try:
-            async with httpx.AsyncClient() as client:
-                resp = await client.post(
-                    f"{conv_service_url}/internal/history/{urllib.parse.quote(session_id, safe='')}/messages",
-                    json=payload,
-                    headers=headers,
-                    timeout=5.0,
-                )
-            if resp.status_code in (200, 201):
-                logger.info("Saved %s message id=%s session=%s", role, payload["messages"][0]["id"], session_id)
-                return True
-            logger.error("History write failed: status=%s attempt=%s", resp.status_code, attempt + 1)
-        except Exception as exc:
-            logger.error("History write error: type=%s detail=%r attempt=%s", type(exc).__name__, exc, attempt + 1)
-        if attempt < 2:
-            await asyncio.sleep(0.15 * (2 ** attempt))
-    return False
+    with _TRACER.span("persist", role=role) as span:
+        for attempt in range(3):
+            try:
+                async with httpx.AsyncClient() as client:
+                    resp = await client.post(
+                        f"{conv_service_url}/internal/history/{urllib.parse.quote(session_id, safe='')}/messages",
+                        json=payload,
+                        headers=headers,
+                        timeout=5.0,
+                    )
+                if resp.status_code in (200, 201):
+                    logger.info("Saved %s message id=%s session=%s", role, payload["messages"][0]["id"], session_id)
+                    if span: span.set(attempts=attempt + 1)
+                    return True
+                logger.error("History write failed: status=%s attempt=%s", resp.status_code, attempt + 1)
+            except Exception as exc:
+                logger.error("History write error: type=%s detail=%r attempt=%s", type(exc).__name__, exc, attempt + 1)
+            if attempt < 2:
+                await asyncio.sleep(0.15 * (2 ** attempt))
+        return False
 
 async def execute_action_with_response(action_name: str, params: dict, token: str, user_id: str, session_id: str, context: dict = None):
     """Executes a system action (like updating goals) by calling the appropriate microservice."""
@@ -541,12 +642,14 @@ async def _handle_turn_with_accumulator(
 
     result = None
     try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            resp = await client.post(
-                f"{WORKFLOW_SERVICE_URL}/api/workflows/proficiency-scoring/batch-evaluate",
-                json=payload,
-                headers={"Authorization": f"Bearer {token}"} if token else None,
-            )
+        with _TRACER.span("batch_eval", turns=payload["window_size"]):
+            async with httpx.AsyncClient(timeout=30.0) as client:
+                resp = await client.post(
+                    f"{WORKFLOW_SERVICE_URL}/api/workflows/proficiency-scoring/batch-evaluate",
+                    json=payload,
+                    headers={**({"Authorization": f"Bearer {token}"} if token else {}),
+                             **_TRACER.headers(), **_MODEL_CALLS.headers()} or None,
+                )
             if resp.status_code == 200:
                 result = resp.json().get("data", {}) or {}
                 logger.info(
@@ -631,13 +734,13 @@ async def _evaluate_scene_turn_progress(
     suppress proficiency updates or task progress writes.
     """
     phase_info = session_phases.get(callback.phase_key, {})
-    user_messages = [m for m in callback.messages if m.get("role") == "user"]
-    if not goal_id or not task_id or not user_messages:
+    user_message_count = callback.messages.count("user")
+    if not goal_id or not task_id or not user_message_count:
         logger.info(
             "[BATCH_EVAL] skip: goal_id=%s task_id=%s user_messages=%s",
             goal_id,
             task_id,
-            len(user_messages),
+            user_message_count,
         )
         return None
     if phase_info.get("phase") == "magic_repetition":
@@ -669,10 +772,7 @@ async def _evaluate_scene_turn_progress(
         or active_goal.get("native_language")
         or "中文"
     )
-    latest_user = next(
-        ((m.get("content") or "") for m in reversed(user_messages)),
-        "",
-    )
+    latest_user = callback.messages.latest_content("user")
     result = await _handle_turn_with_accumulator(
         callback,
         callback.conversation,
@@ -828,13 +928,24 @@ def _today_utc_str() -> str:
     must rotate at the learner-facing day boundary rather than 08:00 in China.
     Deployments can override APP_TIMEZONE; local/default product time is China.
     """
-    from datetime import datetime, timezone
+    return _product_now().strftime("%Y-%m-%d")
+
+
+def _product_now():
+    """Current time in the product timezone (APP_TIMEZONE, default Asia/Shanghai)."""
+    from datetime import timezone
     try:
         from zoneinfo import ZoneInfo
         tz = ZoneInfo(os.getenv("APP_TIMEZONE", "Asia/Shanghai"))
     except Exception:
         tz = timezone.utc
-    return datetime.now(tz).strftime("%Y-%m-%d")
+    return datetime.now(tz)
+
+
+def _product_date_str(days_ahead: int = 0) -> str:
+    """Product calendar date ``days_ahead`` days from today (1 = tomorrow)."""
+    from datetime import timedelta
+    return (_product_now() + timedelta(days=days_ahead)).strftime("%Y-%m-%d")
 
 
 # ── 每日对话轮次上限（成本护栏） ──
@@ -864,14 +975,16 @@ async def _get_daily_turns(rc, user_id: str) -> int:
         return 0
 
 async def _incr_daily_turns(rc, user_id: str) -> int:
-    """真用户轮的 AI 语音完成后 +1，并续 48h TTL。rc=None/故障 → 静默返回 0（不阻断主流程）。"""
+    """真用户轮的 AI 语音完成后 +1，并续 48h TTL。rc=None/故障 → 静默返回 0（不阻断主流程）。
+
+    INCR + EXPIRE 放在同一个 MULTI/EXEC 管道里：一次往返，且不会留下无 TTL 的计数 key。
+    """
     if rc is None:
         return 0
     try:
         key = _daily_turn_key(user_id)
-        n = await rc.incr(key)
-        await rc.expire(key, _DAILY_TURN_TTL_SECONDS)
-        return n
+        n, _ = await rc.pipeline(transaction=True).incr(key).expire(key, _DAILY_TURN_TTL_SECONDS).execute()
+        return int(n)
     except Exception as e:
         logger.warning(f"[DailyLimit] _incr_daily_turns failed: {e}")
         return 0
@@ -888,6 +1001,82 @@ async def _check_daily_limit(rc, user_id: str, user_ctx: dict):
     return (used >= limit, {"tier": tier, "used": used, "limit": limit})
 
 
+# ── 每会话额度租约（本地近缓存） ──
+# 会话一次从 Redis 原子预留一批轮次（INCRBY，超出上限的部分当场 DECRBY 退回），
+# 之后的轮次检查/记账都在本地扣减，会话结束时把未用完的轮次还回去。
+# 租约大小取 min(DAILY_TURN_LEASE_SIZE, 上限/10)：进程崩溃未归还时最多多扣 10% 当日额度；
+# 免费档（15 轮）租约为 1，行为与逐轮记账一致。
+DAILY_TURN_LEASE_SIZE = int(os.getenv("DAILY_TURN_LEASE_SIZE", "10"))
+
+
+async def _reserve_daily_turns(rc, key: str, want: int, limit: int):
+    """原子预留至多 want 轮。返回 (granted, used_before)；并发会话各自只拿到上限内的份额。"""
+    n, _ = await rc.pipeline(transaction=True).incrby(key, want).expire(key, _DAILY_TURN_TTL_SECONDS).execute()
+    used_before = int(n) - want
+    granted = max(0, min(want, limit - used_before))
+    if granted < want:
+        await rc.decrby(key, want - granted)
+    return granted, used_before
+
+
+class _DailyTurnLease:
+    """单个 WS 会话的每日轮次租约。所有 Redis 故障均 fail-open（与 _check_daily_limit 一致）。"""
+
+    def __init__(self, user_id: str, user_ctx: dict):
+        self.user_id = user_id
+        self.limit = _daily_turn_limit(user_ctx)
+        self.tier = "pro" if (user_ctx or {}).get("subscription_status") == "active" else "free"
+        self.lease_size = max(1, min(DAILY_TURN_LEASE_SIZE, self.limit // 10))
+        self.key = None        # 租约所属日期的计数 key
+        self.available = 0     # 已预留、尚未花掉的轮次
+        self.used = 0          # 最近一次从 Redis 得知的当日已用（含本租约预留）
+
+    def _info(self) -> dict:
+        return {"tier": self.tier, "used": self.used, "limit": self.limit}
+
+    async def _roll_day(self, rc) -> None:
+        key = _daily_turn_key(self.user_id)
+        if self.key != key:
+            if self.key is not None:
+                await self.release(rc)
+            self.key = key
+
+    async def check(self, rc):
+        """轮次开始前调用。返回 (blocked, info)；本地租约有余量时不访问 Redis。"""
+        if rc is None:
+            return False, self._info()
+        try:
+            await self._roll_day(rc)
+            if self.available > 0:
+                return False, self._info()
+            granted, used_before = await _reserve_daily_turns(rc, self.key, self.lease_size, self.limit)
+            self.available += granted
+            self.used = used_before + granted
+            return granted == 0, self._info()
+        except Exception as e:
+            logger.warning(f"[DailyLimit] lease check fail-open: {e}")
+            return False, self._info()
+
+    async def spend(self, rc) -> None:
+        """真用户轮完成后记一轮；租约已空（fail-open 放行 / 跨日）时退回逐轮 INCR。"""
+        if self.available > 0 and self.key == _daily_turn_key(self.user_id):
+            self.available -= 1
+            return
+        n = await _incr_daily_turns(rc, self.user_id)
+        if n:
+            self.used = n
+
+    async def release(self, rc) -> None:
+        """归还未用完的轮次（会话结束 / 跨日）。"""
+        unspent, self.available = self.available, 0
+        if rc is None or not unspent or self.key is None:
+            return
+        try:
+            await rc.decrby(self.key, unspent)
+        except Exception as e:
+            logger.warning(f"[DailyLimit] lease release failed ({unspent} turns): {e}")
+
+
 def _strip_daily_qa_marker(text: str) -> str:
     """Remove [DAILY_QA_PASSED] marker from a string (used before TTS)."""
     if not text:
@@ -1139,50 +1328,48 @@ async def _generate_daily_question_pool(target_language: str, native_language: s
         personal_lines.append(f"- Goal detail: {goal_description}")
     if interests:
         personal_lines.append(f"- Interests: {interests}")
-    personal_block = ""
-    if personal_lines:
-        personal_block = (
+
+    # Avoid-list block — most recent first, so budget trimming drops the oldest.
+    avoid_questions = [q for q in (avoid_questions or []) if q][:_DAILY_QA_HISTORY_CAP]
+
+    # Over budget, progress goes first, then the tail of the avoid-list, then the profile.
+    prompt = _PROMPT_BUDGETS.fit("daily_qa", [
+        Section("instructions", (
+            f"Generate exactly {count} short, friendly daily speaking-practice questions "
+            f"for a learner practising {target_language}. Each question must be answerable "
+            f"in 2-4 sentences and touch everyday life (food, hobbies, goals, feelings).\n\n"
+        ), REQUIRED),
+        Section("profile", "".join(f"{line}\n" for line in personal_lines), 30, keep="start", header=(
             "Tailor the questions to THIS learner's profile — prefer topics tied to their "
-            "goal and interests over generic small talk:\n" + "\n".join(personal_lines) + "\n\n"
-        )
-    if progress_context:
-        personal_block += (
+            "goal and interests over generic small talk:\n"
+        ), footer="\n"),
+        Section("progress", f"{progress_context}\n" if progress_context else "", 10, keep="start", header=(
             "Use the learner's CURRENT practice progress to choose a useful next topic. "
             "Prefer unfinished or weak areas while varying the concrete situation:\n"
-            f"{progress_context}\n\n"
-        )
-
-    # Avoid-list block — keep it bounded so the prompt doesn't balloon.
-    avoid_block = ""
-    avoid_questions = [q for q in (avoid_questions or []) if q][:_DAILY_QA_HISTORY_CAP]
-    if avoid_questions:
-        joined = "\n".join(f"- {q}" for q in avoid_questions)
-        avoid_block = (
+        ), footer="\n"),
+        Section("avoid", "".join(f"- {q}\n" for q in avoid_questions), 20, keep="start", header=(
             "Do NOT repeat or closely paraphrase any of these questions the learner has "
-            f"already seen recently — produce fresh, different ones:\n{joined}\n\n"
-        )
-
-    prompt = (
-        f"Generate exactly {count} short, friendly daily speaking-practice questions "
-        f"for a learner practising {target_language}. Each question must be answerable "
-        f"in 2-4 sentences and touch everyday life (food, hobbies, goals, feelings).\n\n"
-        f"{personal_block}"
-        f"{avoid_block}"
-        f"For EACH question, also provide a short sample answer (2-3 sentences) written "
-        f"ENTIRELY in {native_language}. The answer must be in {native_language} only — "
-        f"do not mix in {target_language}.\n\n"
-        f"Return ONLY valid JSON (no markdown, no code fences):\n"
-        f"[{{\"question_text\": \"<question in {target_language}>\", "
-        f"\"lang\": \"<ISO 639-1>\", "
-        f"\"reference_answer\": \"<sample answer in {native_language}>\"}}]"
-    )
+            "already seen recently — produce fresh, different ones:\n"
+        ), footer="\n"),
+        Section("output_format", (
+            f"For EACH question, also provide a short sample answer (2-3 sentences) written "
+            f"ENTIRELY in {native_language}. The answer must be in {native_language} only — "
+            f"do not mix in {target_language}.\n\n"
+            f"Return ONLY valid JSON (no markdown, no code fences):\n"
+            f"[{{\"question_text\": \"<question in {target_language}>\", "
+            f"\"lang\": \"<ISO 639-1>\", "
+            f"\"reference_answer\": \"<sample answer in {native_language}>\"}}]"
+        ), REQUIRED),
+    ])
     # Use the chat-completions endpoint on the GENERAL intl gateway
     # (DASHSCOPE_CHAT_BASE), NOT the SDK global host (which points at the maas
     # dedicated workspace and 403s for text-generation). qwen-flash on intl.
     ds_api_key = DASHSCOPE_CONFIG.chat_api_key
+    model = os.getenv("DAILY_QA_MODEL", QWEN_TEXT_MODEL)
     text = None
     try:
-        async with httpx.AsyncClient(timeout=30) as _client:
+        async with _BULKHEADS["daily_qa"].slot(), _MODEL_CALLS.call("daily_qa", model) as call, \
+                httpx.AsyncClient(timeout=30) as _client:
             _resp = await _client.post(
                 f"{DASHSCOPE_CHAT_BASE}/compatible-mode/v1/chat/completions",
                 headers={
@@ -1190,20 +1377,26 @@ async def _generate_daily_question_pool(target_language: str, native_language: s
                     "Content-Type": "application/json",
                 },
                 json={
-                    "model": os.getenv("DAILY_QA_MODEL", QWEN_TEXT_MODEL),
+                    "model": model,
                     "messages": [{"role": "user", "content": prompt}],
                     "max_tokens": 2048,
                 },
             )
             _resp.raise_for_status()
-            text = _resp.json()["choices"][0]["message"]["content"]
+            body = _resp.json()
+            call.usage(body)
+            text = body["choices"][0]["message"]["content"]
+    except BulkheadRejected:
+        raise
     except Exception as e:
         logger.warning(f"[DAILY_QA] pool generation LLM call failed: {e} — using {target_language} fallback")
+        _MODEL_CALLS.fallback("daily_qa", "llm_error")
         return _fallback_by_language(target_language)
 
     parsed = _parse_daily_qa_pool_text(text or "")
     if not parsed:
         logger.warning(f"[DAILY_QA] malformed/empty LLM output — using {target_language} fallback. raw={str(text)[:200]}")
+        _MODEL_CALLS.fallback("daily_qa", "malformed_output")
         return _fallback_by_language(target_language)
     pool = parsed[:_DAILY_QA_POOL_CAP]
     with_ref = sum(1 for q in pool if q.get("reference_answer"))
@@ -1295,7 +1488,8 @@ async def _get_daily_qa_history(redis, user_id: str) -> list:
 async def _add_daily_qa_history(redis, user_id: str, question_texts) -> None:
     """Record newly-surfaced question texts so they aren't repeated on later days.
 
-    Pushes to the head, trims to ``_DAILY_QA_HISTORY_CAP``, refreshes TTL. Fail-open.
+    Pushes to the head, trims to ``_DAILY_QA_HISTORY_CAP``, refreshes TTL — all in one
+    MULTI/EXEC round trip. Fail-open.
     """
     if redis is None or not user_id:
         return
@@ -1306,20 +1500,193 @@ async def _add_daily_qa_history(redis, user_id: str, question_texts) -> None:
         return
     try:
         key = f"daily_qa_history:{user_id}"
-        # newest first; lpush in reverse so list order is newest→oldest
-        for q in reversed(texts):
-            await redis.lpush(key, q)
-        await redis.ltrim(key, 0, _DAILY_QA_HISTORY_CAP - 1)
-        await redis.expire(key, _DAILY_QA_HISTORY_TTL_SECONDS)
+        # newest first; a multi-value LPUSH pushes left to right, so pass texts reversed
+        await (redis.pipeline(transaction=True)
+               .lpush(key, *reversed(texts))
+               .ltrim(key, 0, _DAILY_QA_HISTORY_CAP - 1)
+               .expire(key, _DAILY_QA_HISTORY_TTL_SECONDS)
+               .execute())
     except Exception as e:
         logger.warning(f"[DAILY_QA] history write fail-open: {e}")
 
 
+# ---------------------------------------------------------------------------
+# Shared daily-QA question bank
+#
+# Most learners share target language, native language, goal type and level, so
+# instead of one private LLM pool per learner per day, generic questions live in
+# a content-addressed bank:
+#   daily_qa_bank:{target}:{native}:{goal_type}:{level}  — SET of question ids
+#   daily_qa_bank:q:{id}                                 — question JSON (id = sha256 of text)
+# A learner's pool is drawn from their bucket minus everything in their
+# daily_qa_history. Personalized generation is kept for learners with strong
+# interests and for buckets that have run dry for that learner; buckets below
+# the low-water mark are refilled in the background with a generic (no personal
+# data) generation call.
+# ---------------------------------------------------------------------------
+
+_DAILY_QA_BANK_ENABLED = os.getenv("DAILY_QA_BANK_ENABLED", "true").lower() == "true"
+_DAILY_QA_BANK_CAP = int(os.getenv("DAILY_QA_BANK_CAP", "300"))            # questions kept per bucket
+_DAILY_QA_BANK_LOW_WATER = int(os.getenv("DAILY_QA_BANK_LOW_WATER", "30"))  # unseen-per-learner refill mark
+_DAILY_QA_BANK_STRONG_INTERESTS = int(os.getenv("DAILY_QA_BANK_STRONG_INTERESTS", "3"))
+_DAILY_QA_BANK_TTL_SECONDS = 30 * 24 * 3600
+_DAILY_QA_BANK_REFILL_LOCK_TTL = 300
+_daily_qa_bank_stats = {"bank_pools": 0, "llm_pools": 0, "refills": 0}
+
+
+def _daily_qa_bank_key(target_language: str, native_language: str, goal_type: str = "",
+                       target_level: str = "") -> str:
+    def _slug(v: str) -> str:
+        return re.sub(r"[^a-z0-9]+", "_", (v or "").strip().lower()).strip("_") or "any"
+    return (f"daily_qa_bank:{_slug(target_language)}:{_slug(native_language)}:"
+            f"{_slug(goal_type)}:{_slug(target_level)}")
+
+
+def _daily_qa_question_id(question_text: str) -> str:
+    import hashlib
+    norm = re.sub(r"\s+", " ", (question_text or "").strip().lower())
+    return hashlib.sha256(norm.encode("utf-8")).hexdigest()[:16]
+
+
+def _has_strong_interests(interests: str) -> bool:
+    """Learners listing several interests get personalized pools instead of the bank."""
+    items = [i for i in re.split(r"[,，、;；/\n]+", interests or "") if i.strip()]
+    return len(items) >= _DAILY_QA_BANK_STRONG_INTERESTS
+
+
+async def _daily_qa_bank_add(redis, bucket_key: str, pool: list) -> int:
+    """Store questions content-addressed and add them to the bucket. Returns ids added."""
+    pipe = redis.pipeline(transaction=False)
+    queued = 0
+    for q in pool or []:
+        text = (q or {}).get("question_text")
+        if not text:
+            continue
+        qid = _daily_qa_question_id(text)
+        pipe.setex(f"daily_qa_bank:q:{qid}", _DAILY_QA_BANK_TTL_SECONDS, json.dumps(q, ensure_ascii=False))
+        pipe.sadd(bucket_key, qid)
+        queued += 1
+    if not queued:
+        return 0
+    pipe.expire(bucket_key, _DAILY_QA_BANK_TTL_SECONDS)
+    pipe.scard(bucket_key)
+    results = await pipe.execute()
+    added = sum(results[1:2 * queued:2])
+    if added:
+        overflow = results[-1] - _DAILY_QA_BANK_CAP
+        if overflow > 0:
+            await redis.spop(bucket_key, overflow)
+    return added
+
+
+async def _daily_qa_bank_draw(redis, bucket_key: str, recent: list, seed: str,
+                              count: int = _DAILY_QA_POOL_CAP) -> tuple:
+    """Draw up to ``count`` questions the learner has not seen. Returns (pool, unseen_total)."""
+    import random
+    ids = await redis.smembers(bucket_key)
+    if not ids:
+        return [], 0
+    seen = {_daily_qa_question_id(t) for t in recent or []}
+    candidates = sorted(set(ids) - seen)
+    random.Random(seed).shuffle(candidates)
+    chosen = candidates[:count]
+    raws = await redis.mget([f"daily_qa_bank:q:{qid}" for qid in chosen]) if chosen else []
+    pool, expired = [], []
+    for qid, raw in zip(chosen, raws):
+        try:
+            item = json.loads(raw) if raw else None
+        except Exception:
+            item = None
+        if isinstance(item, dict) and item.get("question_text"):
+            pool.append(item)
+        else:
+            expired.append(qid)
+    if expired:
+        await redis.srem(bucket_key, *expired)
+    return pool, len(candidates) - len(expired)
+
+
+async def _refill_daily_qa_bank(redis, bucket_key: str, target_language: str, native_language: str,
+                                goal_type: str = "", target_level: str = "") -> int:
+    """Generic (non-personal) generation into a bucket; single-flight per bucket.
+
+    The lock is kept for its TTL after a successful refill (throttles back-to-back
+    refills) but released when nothing was added, so the next low-water draw retries.
+    """
+    lock_key = f"daily_qa_bank:refill:{bucket_key}"
+    locked, added = False, 0
+    try:
+        if not await redis.set(lock_key, "1", ex=_DAILY_QA_BANK_REFILL_LOCK_TTL, nx=True):
+            return 0
+        locked = True
+        existing = [
+            json.loads(raw).get("question_text", "")
+            for raw in await redis.mget([f"daily_qa_bank:q:{qid}" for qid in
+                                         list(await redis.smembers(bucket_key))[:_DAILY_QA_HISTORY_CAP]])
+            if raw
+        ]
+        pool = await _generate_daily_question_pool(
+            target_language, native_language, count=_DAILY_QA_POOL_CAP, goal_type=goal_type,
+            avoid_questions=existing,
+            progress_context=f"Target level: {target_level}" if target_level else "",
+        )
+        if not pool or _is_fallback_pool(pool, target_language):
+            return 0
+        added = await _daily_qa_bank_add(redis, bucket_key, pool)
+        _daily_qa_bank_stats["refills"] += 1
+        logger.info(f"[DAILY_QA_BANK] refilled {bucket_key}: +{added}")
+        return added
+    except Exception as e:
+        logger.warning(f"[DAILY_QA_BANK] refill {bucket_key} failed: {e}")
+        return 0
+    finally:
+        if locked and not added:
+            try:
+                await redis.delete(lock_key)
+            except Exception as e:
+                logger.warning(f"[DAILY_QA_BANK] refill lock release failed: {e}")
+
+
+async def _build_daily_qa_pool(redis, user_id: str, date_str: str, recent: list, *,
+                               target_language: str, native_language: str,
+                               goal_type: str = "", interests: str = "",
+                               goal_description: str = "", progress_context: str = "",
+                               target_level: str = "") -> tuple:
+    """Today's pool for a learner: shared bank first, personalized LLM generation otherwise.
+
+    Returns (pool, source) with source "bank" | "llm". A bucket that is running
+    low for this learner is refilled in the background.
+    """
+    if _DAILY_QA_BANK_ENABLED and not _has_strong_interests(interests):
+        bucket_key = _daily_qa_bank_key(target_language, native_language, goal_type, target_level)
+        try:
+            pool, unseen = await _daily_qa_bank_draw(redis, bucket_key, recent, f"{user_id}|{date_str}")
+        except Exception as e:
+            logger.warning(f"[DAILY_QA_BANK] draw fail-open: {e}")
+            pool, unseen = [], _DAILY_QA_BANK_LOW_WATER
+        if unseen < _DAILY_QA_BANK_LOW_WATER:
+            _BACKGROUND_TASKS.spawn(_refill_daily_qa_bank(
+                redis, bucket_key, target_language, native_language, goal_type, target_level), "daily_qa_refill")
+        if pool:
+            _daily_qa_bank_stats["bank_pools"] += 1
+            _MODEL_CALLS.cache_hit("daily_qa")
+            return pool, "bank"
+
+    pool = await _generate_daily_question_pool(
+        target_language, native_language, count=_DAILY_QA_POOL_CAP,
+        goal_type=goal_type, interests=interests, goal_description=goal_description,
+        avoid_questions=recent, progress_context=progress_context,
+    )
+    _daily_qa_bank_stats["llm_pools"] += 1
+    return pool, "llm"
+
+
 async def handle_daily_question(redis, user_id: str, target_language: str = "English",
                                 native_language: str = "Chinese",
                                 goal_type: str = "", interests: str = "",
                                 goal_description: str = "",
-                                progress_context: str = "") -> dict:
+                                progress_context: str = "",
+                                target_level: str = "") -> dict:
     """Return today's daily question for the user, hitting Redis cache first.
 
     Redis keys:
@@ -1336,8 +1703,7 @@ async def handle_daily_question(redis, user_id: str, target_language: str = "Eng
     cache_key = f"daily_qa_pool:{user_id}:{lang_slug}:{date_str}"
     passed_key = f"daily_qa_passed:{user_id}:{date_str}"
 
-    cached_raw = await redis.get(cache_key)
-    passed_raw = await redis.get(passed_key)
+    cached_raw, passed_raw = await redis.mget([cache_key, passed_key])
     passed = bool(passed_raw)
 
     if cached_raw is not None:
@@ -1348,6 +1714,17 @@ async def handle_daily_question(redis, user_id: str, target_language: str = "Eng
         # New shape: {"pool": [...], "index": n, "picked": {...}}
         if isinstance(data, dict) and isinstance(data.get("picked"), dict) and data["picked"].get("question_text"):
             picked = data["picked"]
+            if data.pop("prefetched", False):
+                # First open of a nightly pre-generated pool: record what we surfaced and the
+                # inputs for the next prefetch, exactly as the generate-on-miss path does.
+                try:
+                    await redis.setex(cache_key, _DAILY_QA_TTL_SECONDS, json.dumps(data, ensure_ascii=False))
+                except Exception as e:
+                    logger.warning(f"[DAILY_QA] failed to clear prefetched flag: {e}")
+                await _add_daily_qa_history(redis, user_id, picked.get("question_text", ""))
+                await _record_daily_qa_profile(redis, user_id, target_language, native_language,
+                                               goal_type, interests, goal_description, progress_context,
+                                               target_level)
             return {
                 "question_text": picked.get("question_text", ""),
                 "lang": picked.get("lang", ""),
@@ -1374,13 +1751,14 @@ async def handle_daily_question(redis, user_id: str, target_language: str = "Eng
                 "passed": passed,
             }
 
-    # Miss — generate a personalized pool, avoiding recently-seen questions, take the
-    # first question, cache pool+index+picked (new shape), and record into history.
+    # Miss — draw from the shared bank (or generate a personalized pool), avoiding
+    # recently-seen questions, cache pool+index+picked (new shape), record history.
     recent = await _get_daily_qa_history(redis, user_id)
-    pool = await _generate_daily_question_pool(
-        target_language, native_language, count=_DAILY_QA_POOL_CAP,
+    pool, _source = await _build_daily_qa_pool(
+        redis, user_id, date_str, recent,
+        target_language=target_language, native_language=native_language,
         goal_type=goal_type, interests=interests, goal_description=goal_description,
-        avoid_questions=recent, progress_context=progress_context,
+        progress_context=progress_context, target_level=target_level,
     )
     if not pool:
         pool = _fallback_by_language(target_language)
@@ -1402,6 +1780,10 @@ async def handle_daily_question(redis, user_id: str, target_language: str = "Eng
         logger.warning(f"[DAILY_QA] failed to cache question: {e}")
     # Remember the question we just surfaced so future days don't repeat it.
     await _add_daily_qa_history(redis, user_id, picked.get("question_text", ""))
+    # Mark the learner active so tonight's prefetch builds tomorrow's pool ahead of time.
+    await _record_daily_qa_profile(redis, user_id, target_language, native_language,
+                                   goal_type, interests, goal_description, progress_context,
+                                   target_level)
 
     return {
         "question_text": picked.get("question_text", ""),
@@ -1547,7 +1929,8 @@ async def _advance_daily_qa_pool(redis, user_id: str, date_str: str, *,
                                  target_language: str, native_language: str,
                                  goal_type: str = "", interests: str = "",
                                  goal_description: str = "",
-                                 progress_context: str = "") -> dict:
+                                 progress_context: str = "",
+                                 target_level: str = "") -> dict:
     """Advance the user's daily-QA pool index and return the new picked question.
 
     Handles both new-shape (`{pool, index, picked}`) and legacy-shape cache values.
@@ -1588,11 +1971,14 @@ async def _advance_daily_qa_pool(redis, user_id: str, date_str: str, *,
     if len(pool) <= 1:
         try:
             _recent = await _get_daily_qa_history(redis, user_id)
-            fresh = await _generate_daily_question_pool(
-                target_language, native_language, count=_DAILY_QA_POOL_CAP,
+            fresh, _source = await _build_daily_qa_pool(
+                redis, user_id, f"{date_str}:advance:{index}", _recent,
+                target_language=target_language, native_language=native_language,
                 goal_type=goal_type, interests=interests, goal_description=goal_description,
-                avoid_questions=_recent, progress_context=progress_context,
+                progress_context=progress_context, target_level=target_level,
             )
+        except BulkheadRejected:
+            raise
         except Exception as e:
             logger.warning(f"[DAILY_QA] advance: pool regeneration failed: {e}")
             fresh = []
@@ -1715,36 +2101,44 @@ async def _generate_daily_recall_material(
     target_level: str,
     progress_context: str,
     avoid_texts: list,
+    retry: bool = False,
 ) -> dict:
-    """Generate a short coherent recall script grounded in current progress."""
+    """Generate a short coherent recall script grounded in current progress.
+
+    ``retry`` marks a re-ask after a rejected (duplicate) variant; it is counted
+    against the daily_recall call class.
+    """
     global _daily_recall_generation_backoff_until
     if time.monotonic() < _daily_recall_generation_backoff_until:
         return {}
     avoid_texts = [str(x).strip() for x in (avoid_texts or []) if str(x).strip()]
-    avoid_block = ""
-    if avoid_texts:
-        avoid_block = (
-            "Do not repeat, answer, or closely paraphrase any of these recent materials:\n"
-            + "\n".join(f"- {x}" for x in avoid_texts[:_DAILY_RECALL_HISTORY_CAP])
-            + "\n\n"
-        )
-    prompt = (
-        f"Create one fresh oral recall mini-dialogue for a {target_level or 'Intermediate'} "
-        f"learner of {target_language}. Generate exactly {_DAILY_RECALL_SENTENCE_COUNT} "
-        f"short first-person sentences the learner can say in sequence. Keep each sentence "
-        f"to at most 16 words (or 30 characters for languages without spaces). The sentences must "
-        "form one coherent real-life response, progress naturally, and practise the learner's "
-        "unfinished or weaker skills without copying their task descriptions.\n\n"
-        f"Current learning progress:\n{(progress_context or 'No progress data')[:1200]}\n\n"
-        f"{avoid_block}"
-        f"Every sentence and the topic must be written entirely in {target_language}. "
-        "Keep each sentence suitable for speaking and memorisation. "
-        "Return ONLY valid JSON:\n"
-        '{"topic":"short topic","sentences":["sentence 1","sentence 2","sentence 3"]}'
-    )
+    prompt = _PROMPT_BUDGETS.fit("daily_recall", [
+        Section("instructions", (
+            f"Create one fresh oral recall mini-dialogue for a {target_level or 'Intermediate'} "
+            f"learner of {target_language}. Generate exactly {_DAILY_RECALL_SENTENCE_COUNT} "
+            f"short first-person sentences the learner can say in sequence. Keep each sentence "
+            f"to at most 16 words (or 30 characters for languages without spaces). The sentences must "
+            "form one coherent real-life response, progress naturally, and practise the learner's "
+            "unfinished or weaker skills without copying their task descriptions.\n\n"
+        ), REQUIRED),
+        Section("progress", f"{(progress_context or 'No progress data')[:1200]}\n", 10, keep="start",
+                header="Current learning progress:\n", footer="\n"),
+        Section("avoid", "".join(f"- {x}\n" for x in avoid_texts[:_DAILY_RECALL_HISTORY_CAP]), 20, keep="start",
+                header="Do not repeat, answer, or closely paraphrase any of these recent materials:\n", footer="\n"),
+        Section("output_format", (
+            f"Every sentence and the topic must be written entirely in {target_language}. "
+            "Keep each sentence suitable for speaking and memorisation. "
+            "Return ONLY valid JSON:\n"
+            '{"topic":"short topic","sentences":["sentence 1","sentence 2","sentence 3"]}'
+        ), REQUIRED),
+    ])
     api_key = DASHSCOPE_CONFIG.chat_api_key
     try:
-        async with httpx.AsyncClient(timeout=10) as client:
+        model = os.getenv("DAILY_RECALL_MODEL", QWEN_TEXT_MODEL)
+        async with _BULKHEADS["chat"].slot(), _MODEL_CALLS.call("daily_recall", model) as call, \
+                httpx.AsyncClient(timeout=10) as client:
+            if retry:
+                call.retry()
             response = await client.post(
                 f"{DASHSCOPE_CHAT_BASE}/compatible-mode/v1/chat/completions",
                 headers={
@@ -1752,14 +2146,18 @@ async def _generate_daily_recall_material(
                     "Content-Type": "application/json",
                 },
                 json={
-                    "model": os.getenv("DAILY_RECALL_MODEL", QWEN_TEXT_MODEL),
+                    "model": model,
                     "messages": [{"role": "user", "content": prompt}],
                     "max_tokens": 768,
                     "response_format": {"type": "json_object"},
                 },
             )
             response.raise_for_status()
-            content = response.json()["choices"][0]["message"]["content"]
+            body = response.json()
+            call.usage(body)
+            content = body["choices"][0]["message"]["content"]
+    except BulkheadRejected:
+        raise
     except Exception as e:
         _daily_recall_generation_backoff_until = time.monotonic() + 60
         logger.warning(f"[DAILY_RECALL] generation failed: {type(e).__name__}: {e}")
@@ -1834,7 +2232,7 @@ async def handle_daily_recall(redis, user_context: dict, variant: int = 0) -> di
     # never cache a switched variant containing an old sentence.
     for _attempt in range(2):
         material = await _generate_daily_recall_material(
-            target_language, target_level, progress_context, avoid
+            target_language, target_level, progress_context, avoid, retry=_attempt > 0
         )
         if not material or not _daily_recall_overlaps_recent(material, recent):
             break
@@ -1893,6 +2291,187 @@ def _get_redis_client():
     return _redis_client_singleton
 
 
+# ---------------------------------------------------------------------------
+# Daily-QA nightly pre-generation
+#
+# handle_daily_question generates the pool on the learner's first open of the
+# day, blocking the WS bootstrap on a multi-second LLM call. Learners who opened
+# daily-QA in the last _DAILY_QA_PREFETCH_ACTIVE_DAYS days are tracked in the
+# ``daily_qa_active_users`` ZSET together with their last personalization inputs
+# (``daily_qa_profile:{user_id}``); every evening the scheduler builds
+# tomorrow's ``daily_qa_pool:*`` for them with bounded concurrency.
+#
+# Resume: a user whose pool key already exists is skipped, so re-running a
+# crashed or partial run only fills the gaps. The scheduler re-runs until the
+# run hash ``daily_qa_prefetch:run:{date}`` says done; a per-date lock keeps
+# replicas from running the same date concurrently.
+# ---------------------------------------------------------------------------
+
+_DAILY_QA_PREFETCH_ENABLED = os.getenv("DAILY_QA_PREFETCH_ENABLED", "true").lower() == "true"
+_DAILY_QA_PREFETCH_HOUR = int(os.getenv("DAILY_QA_PREFETCH_HOUR", "21"))  # product-local hour; builds tomorrow
+_DAILY_QA_PREFETCH_CONCURRENCY = int(os.getenv("DAILY_QA_PREFETCH_CONCURRENCY", "4"))
+_DAILY_QA_PREFETCH_ACTIVE_DAYS = int(os.getenv("DAILY_QA_PREFETCH_ACTIVE_DAYS", "3"))
+_DAILY_QA_PREFETCH_POLL_SECONDS = 600
+_DAILY_QA_PREFETCH_LOCK_TTL = 3 * 3600
+_DAILY_QA_ACTIVE_USERS_KEY = "daily_qa_active_users"
+_daily_qa_prefetch_stats: dict = {}   # date → live progress of the run in this process
+_daily_qa_prefetch_task = None
+
+
+async def _record_daily_qa_profile(redis, user_id: str, target_language: str, native_language: str,
+                                   goal_type: str = "", interests: str = "",
+                                   goal_description: str = "", progress_context: str = "",
+                                   target_level: str = "") -> None:
+    """Remember the learner's daily-QA inputs for tonight's prefetch. Fail-open."""
+    if redis is None or not user_id:
+        return
+    profile = {
+        "target_language": target_language, "native_language": native_language,
+        "goal_type": goal_type, "interests": interests,
+        "goal_description": goal_description, "progress_context": progress_context,
+        "target_level": target_level,
+    }
+    try:
+        await (redis.pipeline(transaction=False)
+               .setex(f"daily_qa_profile:{user_id}", (_DAILY_QA_PREFETCH_ACTIVE_DAYS + 1) * 86400,
+                      json.dumps(profile, ensure_ascii=False))
+               .zadd(_DAILY_QA_ACTIVE_USERS_KEY, {user_id: time.time()})
+               .execute())
+    except Exception as e:
+        logger.debug(f"[DAILY_QA_PREFETCH] profile write fail-open: {e}")
+
+
+def _is_fallback_pool(pool: list, target_language: str) -> bool:
+    """True when _generate_daily_question_pool degraded to the static fallback."""
+    fallback_texts = {q["question_text"] for q in _fallback_by_language(target_language)}
+    return bool(pool) and all(q.get("question_text") in fallback_texts for q in pool)
+
+
+async def _prefetch_daily_qa_pool(redis, user_id: str, profile: dict, date_str: str) -> str:
+    """Build one learner's pool for ``date_str``. Returns "built" | "skipped" | "failed".
+
+    Same inputs, history dedup and seeded pick as handle_daily_question; the payload
+    carries ``prefetched: true`` so the first open records history/profile. A
+    degraded (static fallback) pool is not cached — the live path retries then.
+    """
+    target_language = profile.get("target_language") or "English"
+    lang_slug = _lang_cache_slug(target_language)
+    cache_key = f"daily_qa_pool:{user_id}:{lang_slug}:{date_str}"
+    if await redis.exists(cache_key):
+        return "skipped"
+    goal_type = profile.get("goal_type") or ""
+    goal_description = profile.get("goal_description") or ""
+    recent = await _get_daily_qa_history(redis, user_id)
+    pool, source = await _build_daily_qa_pool(
+        redis, user_id, date_str, recent,
+        target_language=target_language, native_language=profile.get("native_language") or "Chinese",
+        goal_type=goal_type, interests=profile.get("interests") or "", goal_description=goal_description,
+        progress_context=profile.get("progress_context") or "", target_level=profile.get("target_level") or "",
+    )
+    if not pool or (source == "llm" and _is_fallback_pool(pool, target_language)):
+        return "failed"
+    if recent:
+        _recent_norm = {(_q or "").strip().lower() for _q in recent}
+        deduped = [q for q in pool if (q.get("question_text", "").strip().lower()) not in _recent_norm]
+        if deduped:
+            pool = deduped
+    picked_index = _daily_seeded_index(
+        user_id, date_str, f"{lang_slug}|{goal_type}|{goal_description}", len(pool)
+    )
+    payload = {"pool": pool, "index": picked_index, "picked": pool[picked_index], "prefetched": True}
+    await redis.setex(cache_key, _DAILY_QA_TTL_SECONDS, json.dumps(payload, ensure_ascii=False))
+    return "built"
+
+
+async def run_daily_qa_prefetch(redis, date_str: str = None, concurrency: int = None) -> dict:
+    """Pre-build ``date_str`` (default: tomorrow) pools for recently active learners.
+
+    Progress is mirrored to the ``daily_qa_prefetch:run:{date}`` hash every 25
+    users and at the end. Safe to call repeatedly; finished users are skipped.
+    """
+    date_str = date_str or _product_date_str(1)
+    concurrency = max(1, concurrency or _DAILY_QA_PREFETCH_CONCURRENCY)
+    lock_key = f"daily_qa_prefetch:lock:{date_str}"
+    run_key = f"daily_qa_prefetch:run:{date_str}"
+    if not await redis.set(lock_key, "1", ex=_DAILY_QA_PREFETCH_LOCK_TTL, nx=True):
+        logger.info(f"[DAILY_QA_PREFETCH] {date_str} already running elsewhere")
+        return {"date": date_str, "status": "locked"}
+
+    stats = {"date": date_str, "status": "running", "total": 0, "built": 0, "skipped": 0, "failed": 0,
+             "started_at": int(time.time())}
+    _daily_qa_prefetch_stats[date_str] = stats
+
+    async def _publish():
+        try:
+            await redis.hset(run_key, mapping={k: str(v) for k, v in stats.items()})
+            await redis.expire(run_key, 3 * 86400)
+        except Exception as e:
+            logger.warning(f"[DAILY_QA_PREFETCH] progress write failed: {e}")
+
+    try:
+        cutoff = time.time() - _DAILY_QA_PREFETCH_ACTIVE_DAYS * 86400
+        await redis.zremrangebyscore(_DAILY_QA_ACTIVE_USERS_KEY, "-inf", cutoff)
+        user_ids = await redis.zrangebyscore(_DAILY_QA_ACTIVE_USERS_KEY, cutoff, "+inf")
+        stats["total"] = len(user_ids)
+        await _publish()
+        pending = iter(user_ids)
+
+        async def _worker():
+            for uid in pending:
+                try:
+                    raw = await redis.get(f"daily_qa_profile:{uid}")
+                    status = await _prefetch_daily_qa_pool(redis, uid, json.loads(raw), date_str) if raw else "skipped"
+                except Exception as e:
+                    logger.warning(f"[DAILY_QA_PREFETCH] user={uid} failed: {e}")
+                    status = "failed"
+                stats[status] += 1
+                if (stats["built"] + stats["skipped"] + stats["failed"]) % 25 == 0:
+                    await _publish()
+
+        await asyncio.gather(*(_worker() for _ in range(concurrency)))
+        # A run with failures stays "partial" so the scheduler retries the gaps.
+        stats["status"] = "done" if stats["failed"] == 0 else "partial"
+    except Exception as e:
+        stats["status"] = "partial"
+        logger.error(f"[DAILY_QA_PREFETCH] {date_str} run aborted: {e}")
+    finally:
+        stats["finished_at"] = int(time.time())
+        await _publish()
+        try:
+            await redis.delete(lock_key)
+        except Exception:
+            pass
+    logger.info(f"[DAILY_QA_PREFETCH] {date_str}: {stats}")
+    return dict(stats)
+
+
+async def _daily_qa_prefetch_scheduler() -> None:
+    """From _DAILY_QA_PREFETCH_HOUR until midnight, (re)run tomorrow's prefetch until done."""
+    while True:
+        try:
+            await asyncio.sleep(_DAILY_QA_PREFETCH_POLL_SECONDS)
+            if _product_now().hour < _DAILY_QA_PREFETCH_HOUR:
+                continue
+            redis = _get_redis_client()
+            if redis is None:
+                continue
+            date_str = _product_date_str(1)
+            if await redis.hget(f"daily_qa_prefetch:run:{date_str}", "status") == "done":
+                continue
+            await run_daily_qa_prefetch(redis, date_str)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"[DAILY_QA_PREFETCH] scheduler tick failed: {e}")
+
+
+@app.on_event("startup")
+async def _start_daily_qa_prefetch_scheduler():
+    global _daily_qa_prefetch_task
+    if _DAILY_QA_PREFETCH_ENABLED and _daily_qa_prefetch_task is None:
+        _daily_qa_prefetch_task = asyncio.create_task(_daily_qa_prefetch_scheduler())
+
+
 _redis_client_singleton = None
 
 
@@ -2005,7 +2584,8 @@ async def call_proficiency_workflow(user_id: str, goal_id: int, task_id: int, co
         async with httpx.AsyncClient(timeout=30.0) as client:
             resp = await client.post(
                 f"{WORKFLOW_SERVICE_URL}/api/workflows/proficiency-scoring/update",
-                json=payload
+                json=payload,
+                headers=_MODEL_CALLS.headers() or None,
             )
             if resp.status_code == 200:
                 result = resp.json()
@@ -2085,7 +2665,7 @@ async def call_proficiency_workflow(user_id: str, goal_id: int, task_id: int, co
                                         "completed_tasks": [],  # 由 workflow 从数据库获取
                                         "conversation_history": recent_history  # 最近 50 轮对话
                                     },
-                                    headers={"Authorization": f"Bearer {token}"}
+                                    headers={"Authorization": f"Bearer {token}", **_MODEL_CALLS.headers()}
                                 )
                                 if review_resp.status_code == 200:
                                     review_data = review_resp.json()
@@ -2133,6 +2713,52 @@ import os
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 from prompt_manager import prompt_manager
 
+# ── Session prompt compilation ──
+# The static part of a session prompt (the formatted PromptManager template) only
+# depends on a handful of inputs, so it is compiled once per distinct input set and
+# shared across sessions; _update_session_prompt appends the per-turn tail
+# (history / task switch / directive) and skips update_session when the final
+# instructions hash is unchanged.
+_STATIC_PROMPT_CACHE = _TTLDict(ttl=6 * 3600, maxsize=512)
+_static_prompt_stats = {"hits": 0, "misses": 0}
+_PROMPT_URL_RE = re.compile(r'https?://\S+|www\.\S+', re.IGNORECASE)
+# Context fields generate_system_prompt reads; the cache key covers exactly these.
+_SYSTEM_PROMPT_FIELDS = ("target_language", "native_language", "nickname", "proficiency", "interests", "voice")
+_SYSTEM_PROMPT_GOAL_FIELDS = ("description", "id")
+_SYSTEM_PROMPT_TASK_FIELDS = ("scenario_title", "task_description")
+
+
+def _pick(d: dict, fields) -> dict:
+    return {k: d[k] for k in fields if k in d}
+
+
+def _system_prompt_inputs(full_ctx: dict) -> dict:
+    """The slice of ``full_ctx`` generate_system_prompt actually reads (absent keys stay absent)."""
+    ctx = _pick(full_ctx, _SYSTEM_PROMPT_FIELDS)
+    if "active_goal" in full_ctx:
+        goal = full_ctx["active_goal"]
+        if isinstance(goal, dict):
+            task = goal.get("current_task")
+            goal, raw_goal = _pick(goal, _SYSTEM_PROMPT_GOAL_FIELDS), goal
+            if "current_task" in raw_goal:
+                goal["current_task"] = _pick(task, _SYSTEM_PROMPT_TASK_FIELDS) if isinstance(task, dict) else task
+        ctx["active_goal"] = goal
+    return ctx
+
+
+def _compile_static_prompt(kind: str, build, **inputs) -> str:
+    """Return ``build(**inputs)``, memoized on (kind, inputs) across sessions."""
+    key = (kind, json.dumps(inputs, sort_keys=True, ensure_ascii=False, default=str))
+    cached = _STATIC_PROMPT_CACHE.get(key)
+    if cached is not None:
+        _static_prompt_stats["hits"] += 1
+        return cached
+    _static_prompt_stats["misses"] += 1
+    prompt = build(**inputs)
+    _STATIC_PROMPT_CACHE[key] = prompt
+    return prompt
+
+
 class WebSocketCallback(OmniRealtimeCallback):
     def __init__(self, websocket: WebSocket, loop: asyncio.AbstractEventLoop, user_context: dict, token: str, user_id: str, session_id: str, history_messages: list = [], scenario: str = None, mode: str = None):
         self.websocket = websocket
@@ -2147,6 +2773,8 @@ class WebSocketCallback(OmniRealtimeCallback):
         self._latency_started_at = time.monotonic()
         self._latency_stages = set()
         self.conversation = None
+        self.upstream = UpstreamCommandQueue(lambda: self.conversation, _UPSTREAM_EXECUTOR, _UPSTREAM_STATS,
+                                             max_depth=_UPSTREAM_MAX_DEPTH, write_timeout=_UPSTREAM_WRITE_TIMEOUT)
         self.full_response_text = ""
         # If scenario is provided, always use OralTutor role for practice
         self.role = "OralTutor" if scenario else self._determine_role(user_context)
@@ -2154,16 +2782,17 @@ class WebSocketCallback(OmniRealtimeCallback):
         self.interrupted_turn = False
         self.current_response_id = None
         self.ignored_response_ids = set()
-        self.messages = history_messages
+        self.messages = MessageRing(_SESSION_MESSAGE_CAP, history_messages)
         # Mark the boundary of pre-loaded history so we never inject old task context into prompts.
-        # Only messages appended AFTER this index (new turns in current session) go into system prompt.
-        self.task_history_cutoff = len(history_messages)
+        # Only messages appended AFTER this point (new turns in current session) go into system prompt.
+        self.messages.mark_task_start()
         self.user_audio_buffer = bytearray()
         self.ai_audio_buffer = bytearray()
         self.last_user_audio_url = None
         self._skip_next_magic_pass = False  # Set True after task-switch trigger to avoid false detection
         self.last_ai_audio_url = None
         self.counts_against_quota = False  # 仅真用户练习输入触发的轮才计入每日额度
+        self.turn_lease = _DailyTurnLease(user_id, user_context)
         self.welcome_sent = False
         self.welcome_muted = False  # Flag to suppress welcome message after retry
         self.session_ready = False
@@ -2191,8 +2820,39 @@ class WebSocketCallback(OmniRealtimeCallback):
         # Track DashScope server-side conversation items so we can delete them
         # on task switch (otherwise the AI keeps hearing prior-task transcripts).
         self.item_ids = []
+        self._session_prompt_digest = None  # sha1 of voice+instructions last sent on the current connection
+        self.prompt_stats = {"updates_sent": 0, "updates_skipped": 0, "bytes_sent": 0}
+        self.drain_requested = False  # process is draining: hand off at the next turn boundary
+        self.drain_notified = False
+        self.last_activity = time.monotonic()  # last client message other than ping (idle reaper)
+        self.turn_span = None        # root trace span of the learner turn in flight
+        self._turn_marks = set()     # milestones already recorded for that turn
         self._mark_latency_stage("ws_accepted")
 
+    def start_turn_trace(self, trigger: str) -> None:
+        """Open the trace for a new learner turn; a turn still open (interrupted) is closed first."""
+        if self.turn_span is not None:
+            self.turn_span.set(superseded=True)
+            self.turn_span.end()
+        self.turn_span = _TRACER.start_trace(
+            "turn", session_id=self.session_id, user_id=str(self.user_id), trigger=trigger, scenario=self.scenario or "")
+        self._turn_marks = set()
+
+    def _trace_mark(self, stage: str) -> None:
+        """Record the time from turn start to the first `stage` event of this turn."""
+        if self.turn_span is None or stage in self._turn_marks:
+            return
+        self._turn_marks.add(stage)
+        self.turn_span.mark(stage)
+
+    def memory_footprint(self) -> dict:
+        """Approximate bytes held by this session's buffers and collections."""
+        fields = {name: getattr(self, name) for name in _SESSION_MEMORY_FIELDS}
+        phase_entry = session_phases._store.get(self.phase_key)  # peek: don't refresh the TTL/LRU
+        fields["phase_entry"] = phase_entry[0] if phase_entry else None
+        fields["upstream_pending"] = [(c.args, c.kwargs) for c in list(self.upstream._pending)]
+        return account(fields)
+
     def task_completion_mode(self):
         """Return the actual learning mode at the moment a task completes."""
         if self.is_daily_qa_mode:
@@ -2223,6 +2883,25 @@ class WebSocketCallback(OmniRealtimeCallback):
         except (WebSocketDisconnect, Exception):
             pass  # Ignore errors if WebSocket is already closed
 
+    def at_turn_boundary(self) -> bool:
+        return not self.ai_responding and not self.user_audio_buffer
+
+    async def notify_drain(self):
+        """Tell the client this pod is going away and close, so it reconnects to another replica."""
+        if self.drain_notified:
+            return
+        self.drain_notified = True
+        logger.info(f"[Drain] handing off session {self.session_id}")
+        try:
+            await self.websocket.send_json({"type": "error", "payload": {
+                "code": "SERVER_DRAINING",
+                "message": "Server is restarting. Reconnecting...",
+                "retryable": True,
+            }})
+            await self.websocket.close(code=1012, reason="SERVER_DRAINING")  # 1012 = Service Restart
+        except Exception:
+            pass  # Ignore errors if WebSocket is already closed
+
     def _clear_dashscope_items(self, reason: str = "task_switch"):
         """Delete all tracked server-side DashScope conversation.items.
 
@@ -2235,16 +2914,9 @@ class WebSocketCallback(OmniRealtimeCallback):
             self.item_ids = []
             return
         _count = len(self.item_ids)
-        for _iid in list(self.item_ids):
-            try:
-                self.conversation.send_raw(json.dumps({
-                    "type": "conversation.item.delete",
-                    "item_id": _iid
-                }))
-            except Exception as _e:
-                logger.warning(f"[{reason}] delete DashScope item {_iid} failed: {_e}")
+        self.upstream.delete_items(self.item_ids)
         self.item_ids = []
-        logger.info(f"[{reason}] Deleted {_count} server-side DashScope items")
+        logger.info(f"[{reason}] Queued deletion of {_count} server-side DashScope items")
 
     def _determine_role(self, context):
         if not context or isinstance(context, str): return "InfoCollector"
@@ -2254,10 +2926,16 @@ class WebSocketCallback(OmniRealtimeCallback):
         if goal.get('current_proficiency', 0) >= 90: return "SummaryExpert"
         return "OralTutor"
 
+    def attach_conversation(self, conversation) -> None:
+        """Point the callback at a new upstream conversation (or None); it starts with no session prompt."""
+        self.conversation = conversation
+        self._session_prompt_digest = None
+
     def on_open(self) -> None:
         logger.info("DashScope Connection Open")
         self._mark_latency_stage("dashscope_open")
         self.is_connected = True
+        self._session_prompt_digest = None  # a freshly opened upstream session has no prompt yet
         self._last_open_time = time.time()
         logger.info(f"on_open called, connection_established_sent={self.connection_established_sent}")
         # Only send connection_established once per WebSocket session
@@ -2375,7 +3053,8 @@ class WebSocketCallback(OmniRealtimeCallback):
                     or (full_ctx.get('active_goal') or {}).get('target_level')
                     or 'B1'
                 )
-                system_prompt = prompt_manager.generate_daily_qa_prompt(
+                system_prompt = _compile_static_prompt(
+                    "daily_qa", prompt_manager.generate_daily_qa_prompt,
                     question=self.daily_qa_question,
                     target_language=target_lang,
                     native_language=native_lang,
@@ -2386,18 +3065,8 @@ class WebSocketCallback(OmniRealtimeCallback):
                     logger.info(f"[BATCH_EVAL] Skipping teaching directive in daily_qa mode ({len(extra_directive)} chars)")
                 selected_voice = self.user_context.get('voice') or os.getenv("QWEN3_OMNI_VOICE", "Tina")
                 logger.info(f"[DAILY_QA] Sending daily_qa system prompt (question={self.daily_qa_question[:80]!r})")
-                try:
-                    self.conversation.update_session(
-                        instructions=system_prompt,
-                        voice=selected_voice,
-                        output_modalities=[MultiModality.TEXT, MultiModality.AUDIO],
-                        enable_input_audio_transcription=True,
-                        input_audio_transcription_model="qwen3-asr-flash-realtime",
-                        enable_turn_detection=False,
-                    )
-                except Exception as e:
-                    logger.error(f"[DAILY_QA] Failed to update session prompt: {e}")
-                    logger.error(traceback.format_exc())
+                system_prompt = _PROMPT_BUDGETS.fit("realtime_session", [Section("template", system_prompt, REQUIRED)])
+                self._send_session_update(system_prompt, selected_voice, log_tag="[DAILY_QA] ")
                 return
 
             if self.scenario and phase_info.get("phase") == "magic_repetition":
@@ -2413,7 +3082,8 @@ class WebSocketCallback(OmniRealtimeCallback):
                 # Cache task texts in phase_info so magic pass handler can read them reliably
                 phase_info["_current_task_text"] = task_text
                 phase_info["_next_task_text"] = next_task_text
-                system_prompt = prompt_manager.generate_magic_repetition_prompt(
+                system_prompt = _compile_static_prompt(
+                    "magic_repetition", prompt_manager.generate_magic_repetition_prompt,
                     task_text=task_text, target_language=target_lang, native_language=native_lang,
                     next_task_text=next_task_text, memory_mode=memory_mode
                 )
@@ -2441,7 +3111,8 @@ class WebSocketCallback(OmniRealtimeCallback):
                 current_task_text = all_task_texts[current_idx] if current_idx < len(all_task_texts) else "日常对话"
                 total_tasks = len(all_task_texts) if all_task_texts else 3
 
-                system_prompt = prompt_manager.generate_scene_theater_prompt(
+                system_prompt = _compile_static_prompt(
+                    "scene_theater", prompt_manager.generate_scene_theater_prompt,
                     image_url=phase_info.get("scene_image_url", ""),
                     tasks=[current_task_text],
                     target_language=target_lang,
@@ -2453,9 +3124,14 @@ class WebSocketCallback(OmniRealtimeCallback):
                     f"[Phase] scene_theater prompt (single-task view): task #{current_idx + 1}/{total_tasks} = {current_task_text[:60]}"
                 )
             else:
-                system_prompt = prompt_manager.generate_system_prompt(full_ctx, role=self.role)
+                system_prompt = _compile_static_prompt(
+                    "system", prompt_manager.generate_system_prompt,
+                    user_context=_system_prompt_inputs(full_ctx), role=self.role,
+                )
 
             selected_voice = self.user_context.get('voice') or os.getenv("QWEN3_OMNI_VOICE", "Tina")
+            # Over budget, the oldest history lines go first, then the directive; the template and a task switch stay whole.
+            sections = [Section("template", system_prompt, REQUIRED)]
 
             if getattr(self, 'just_switched_task', False):
                 # Use next_task_text set by call_proficiency_workflow — it's already the correct next task.
@@ -2468,70 +3144,85 @@ class WebSocketCallback(OmniRealtimeCallback):
                     or 'the next task'
                 )
                 target_lang_for_switch = self.user_context.get('target_language') or full_ctx.get('target_language', 'the target language')
-                system_prompt += (
+                sections.append(Section("task_switch", (
                     f"\n\n## TASK SWITCH — OVERRIDE ALL PREVIOUS CONTEXT\n"
                     f"The previous task is FULLY COMPLETED. Do NOT mention it again under any circumstances.\n"
                     f"You are now starting a completely fresh conversation for the NEW task: \"{new_task}\".\n"
                     f"Greet the student briefly and invite them to start this new task immediately.\n"
                     f"NEVER say 'Let's finish this task first' — it is already done.\n"
                     f"REMINDER: Conduct this transition and ALL subsequent responses entirely in {target_lang_for_switch}.\n"
-                )
+                ), REQUIRED))
                 self.just_switched_task = False
                 logger.info(f"[TASK_SWITCH] Injected override directive for new task: {new_task}")
             else:
                 # Only inject messages from the current task period (after the cutoff)
-                cutoff = getattr(self, 'task_history_cutoff', 0)
-                current_task_msgs = self.messages[cutoff:][-10:]  # max 10 from current task
+                current_task_msgs = self.messages.since_task(limit=10)  # max 10 from current task
                 if current_task_msgs:
-                    import re as _re
-                    _URL_RE = _re.compile(r'https?://\S+|www\.\S+', _re.IGNORECASE)
-                    history_text = "\n\n# Current Session Context (READ-ONLY):\n"
-                    history_text += "**CRITICAL**: This is HISTORY only. Do NOT auto-complete tasks. Wait for user to speak first.\n"
-                    history_text += f"**CURRENT TASK**: {full_ctx.get('task_description', 'Practice conversation')} in scenario: {self.scenario}\n\n"
+                    history_lines = []
                     for msg in current_task_msgs:
-                        role_label = "User" if msg['role'] == 'user' else "AI"
-                        content = _URL_RE.sub('[link]', msg.get('content', ''))
-                        history_text += f"{role_label}: {content}\n"
-                    history_text += "\n**NOW**: Wait silently for user to speak. Greet briefly if needed, then listen.\n"
-                    system_prompt += history_text
+                        role_label = "User" if msg.role == 'user' else "AI"
+                        content = _PROMPT_URL_RE.sub('[link]', msg.content)
+                        history_lines.append(f"{role_label}: {content}\n")
+                    sections.append(Section("history", "".join(history_lines), 10, keep="end", header=(
+                        "\n\n# Current Session Context (READ-ONLY):\n"
+                        "**CRITICAL**: This is HISTORY only. Do NOT auto-complete tasks. Wait for user to speak first.\n"
+                        f"**CURRENT TASK**: {full_ctx.get('task_description', 'Practice conversation')} in scenario: {self.scenario}\n\n"
+                    ), footer="\n**NOW**: Wait silently for user to speak. Greet briefly if needed, then listen.\n"))
 
             # Append one-time teaching directive if provided (Feature 1)
             if extra_directive:
-                system_prompt = system_prompt + "\n\n" + extra_directive
+                sections.append(Section("directive", extra_directive, 20, keep="start", header="\n\n"))
                 logger.info(f"[BATCH_EVAL] Appending teaching directive to session prompt ({len(extra_directive)} chars)")
 
-            logger.info(f"Sending System Prompt ({self.role}) full:\n{system_prompt}")
-            try:
-                self.conversation.update_session(
-                    instructions=system_prompt,
-                    voice=selected_voice,
-                    output_modalities=[MultiModality.TEXT, MultiModality.AUDIO],
-                    enable_input_audio_transcription=True,
-                    input_audio_transcription_model="qwen3-asr-flash-realtime",
-                    enable_turn_detection=False,
-                )
-            except Exception as e:
-                logger.error(f"Failed to update session prompt: {e}")
-                logger.error(traceback.format_exc())
+            self._send_session_update(_PROMPT_BUDGETS.fit("realtime_session", sections), selected_voice)
+
+    def _send_session_update(self, instructions: str, voice: str, log_tag: str = ""):
+        """Send update_session upstream unless these exact instructions were already sent on this connection."""
+        import hashlib
+        digest = hashlib.sha1(f"{voice}\n{instructions}".encode("utf-8")).hexdigest()
+        if digest == self._session_prompt_digest:
+            self.prompt_stats["updates_skipped"] += 1
+            logger.info(f"{log_tag}Session prompt unchanged ({self.role}, {len(instructions)} chars) — skipping update_session")
+            return
+        logger.info(f"{log_tag}Sending System Prompt ({self.role}, {len(instructions)} chars, sha1={digest[:12]})")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"System Prompt full:\n{instructions}")
+        def _failed(e):
+            logger.error(f"{log_tag}Failed to update session prompt: {e}")
+            self._session_prompt_digest = None  # resend on the next update
+
+        self.upstream.update_session(
+            on_error=_failed,
+            instructions=instructions,
+            voice=voice,
+            output_modalities=[MultiModality.TEXT, MultiModality.AUDIO],
+            enable_input_audio_transcription=True,
+            input_audio_transcription_model="qwen3-asr-flash-realtime",
+            enable_turn_detection=False,
+        )
+        self._session_prompt_digest = digest
+        self.prompt_stats["updates_sent"] += 1
+        self.prompt_stats["bytes_sent"] += len(instructions.encode("utf-8"))
 
     async def upload_audio_to_cos(self, audio_data: bytes, audio_type: str) -> str:
         if not audio_data: return None
         url = os.getenv("MEDIA_SERVICE_URL", "http://localhost:3005") + "/api/media/upload"
         filename = f"{self.session_id}_{int(time.time())}.pcm"
         files = {audio_type: (filename, audio_data, 'application/octet-stream')}
-        async with httpx.AsyncClient() as client:
-            try:
-                resp = await client.post(
-                    url,
-                    files=files,
-                    headers={"X-Guaji-Internal-Auth": os.getenv("INTERNAL_AUTH_SECRET", "")},
-                    timeout=30.0,
-                )
-                if resp.status_code == 200:
-                    return resp.json().get('data', {}).get(f'{audio_type}Url')
-                logger.error(f"Failed to upload audio: {resp.status_code} {resp.text}")
-            except Exception as e:
-                logger.error(f"Error uploading audio: {e}")
+        with _TRACER.span("upload", audio_type=audio_type, bytes=len(audio_data)):
+            async with httpx.AsyncClient() as client:
+                try:
+                    resp = await client.post(
+                        url,
+                        files=files,
+                        headers={"X-Guaji-Internal-Auth": os.getenv("INTERNAL_AUTH_SECRET", "")},
+                        timeout=30.0,
+                    )
+                    if resp.status_code == 200:
+                        return resp.json().get('data', {}).get(f'{audio_type}Url')
+                    logger.error(f"Failed to upload audio: {resp.status_code} {resp.text}")
+                except Exception as e:
+                    logger.error(f"Error uploading audio: {e}")
         return None
 
     def _trigger_welcome_message(self):
@@ -2541,8 +3232,8 @@ class WebSocketCallback(OmniRealtimeCallback):
         starter_text = "Hello, I'm ready to start." if self.role == "InfoCollector" else "Hi, I want to set up my learning goals." if self.role == "GoalPlanner" else f"Hello, I'm ready to practice {target_lang}."
         logger.info(f"Sending welcome trigger: {starter_text}")
         try:
-            self.conversation.send_raw(json.dumps({"type": "conversation.item.create", "item": {"type": "message", "role": "user", "content": [{"type": "input_text", "text": starter_text}]}}))
-            self.conversation.send_raw(json.dumps({"type": "response.create", "response": {"modalities": ["text", "audio"]}}))
+            self.upstream.send_raw(json.dumps({"type": "conversation.item.create", "item": {"type": "message", "role": "user", "content": [{"type": "input_text", "text": starter_text}]}}))
+            self.upstream.send_raw(json.dumps({"type": "response.create", "response": {"modalities": ["text", "audio"]}}))
         except Exception as e: logger.error(f"Failed to send welcome message: {e}")
 
     def on_event(self, response: dict) -> None:
@@ -2574,12 +3265,23 @@ class WebSocketCallback(OmniRealtimeCallback):
             self.current_response_id = rid
 
         async def process_event():
+            _TRACER.activate(self.turn_span)  # uploads/writes spawned below join the turn's trace
+            _MODEL_CALLS.bind(self.turn_lease.tier, self.user_id)  # SDK thread → loop hop loses the session's context
             try:
                 if self.interrupted_turn and event_name in ['response.audio.delta', 'response.audio_transcript.delta', 'response.text.done', 'response.audio_transcript.done']: return
+                elif event_name == 'response.created':
+                    self._trace_mark("commit")  # DashScope accepted the turn's input and started responding
+                elif event_name == 'response.done':
+                    # Realtime usage arrives once per response; latency is the turn so far (None outside a turn)
+                    _done = response.get("response") or {}
+                    _MODEL_CALLS.record("realtime", QWEN_OMNI_MODEL, usage=_done,
+                                        latency_ms=self.turn_span.duration_ms if self.turn_span else None,
+                                        error="failed" if _done.get("status") == "failed" else None)
                 elif event_name == 'response.audio.delta':
                     audio_data = response.get('delta')
                     if audio_data:
                         self._mark_latency_stage("first_audio")
+                        self._trace_mark("first_audio")
                         try: self.ai_audio_buffer.extend(base64.b64decode(audio_data))
                         except: pass
                         await self._safe_send({"type": "audio_response", "payload": audio_data, "role": self.role, "responseId": self.current_response_id})
@@ -2587,6 +3289,7 @@ class WebSocketCallback(OmniRealtimeCallback):
                     text = response.get('delta')
                     if text:
                         self._mark_latency_stage("first_text")
+                        self._trace_mark("first_text")
                         # Accumulate text internally, don't send chunks to frontend
                         self.ai_responding = True  # Mark AI as actively responding
                         self.full_response_text += text
@@ -2606,8 +3309,7 @@ class WebSocketCallback(OmniRealtimeCallback):
                         if self.counts_against_quota:
                             self.counts_against_quota = False  # 立即清零，防系统续轮误计
                             try:
-                                _rc_incr = _get_redis_client()
-                                await _incr_daily_turns(_rc_incr, self.user_id)
+                                await self.turn_lease.spend(_get_redis_client())
                             except Exception as _e:
                                 logger.warning(f"[DailyLimit] incr on audio.done failed: {_e}")
 
@@ -2635,10 +3337,7 @@ class WebSocketCallback(OmniRealtimeCallback):
                                 self.daily_qa_ai_response_count += 1
                                 _latest_ai_for_marker = self.full_response_text or ""
                                 if not _latest_ai_for_marker:
-                                    for _m in reversed(self.messages):
-                                        if _m.get("role") == "assistant":
-                                            _latest_ai_for_marker = _m.get("content", "") or ""
-                                            break
+                                    _latest_ai_for_marker = self.messages.latest_content("assistant")
                                 # Auto-pass: AI responded >= 2 times (1st=question, 2nd=evaluation),
                                 # and response is positive (no retry/correction indicators)
                                 _auto_pass = _check_auto_pass(_latest_ai_for_marker, self.daily_qa_ai_response_count)
@@ -2652,12 +3351,7 @@ class WebSocketCallback(OmniRealtimeCallback):
                                 # paywall without ever answering. Runs BEFORE the language gate so it
                                 # catches injections regardless of script.
                                 if _auto_pass:
-                                    _latest_user_text_inj = ""
-                                    for _m in reversed(self.messages):
-                                        if _m.get("role") == "user":
-                                            _latest_user_text_inj = (_m.get("content") or "").strip()
-                                            if _latest_user_text_inj:
-                                                break
+                                    _latest_user_text_inj = self.messages.latest_content("user").strip()
                                     if _is_daily_qa_injection(_latest_user_text_inj):
                                         logger.warning(
                                             f"[DAILY_QA] Auto-pass VETOED — user transcript looks like a "
@@ -2672,12 +3366,7 @@ class WebSocketCallback(OmniRealtimeCallback):
                                 if _auto_pass:
                                     _target_lang_qa = (self.user_context.get("active_goal") or {}).get("target_language") \
                                         or self.user_context.get("target_language") or "English"
-                                    _latest_user_text = ""
-                                    for _m in reversed(self.messages):
-                                        if _m.get("role") == "user":
-                                            _latest_user_text = (_m.get("content") or "").strip()
-                                            if _latest_user_text:
-                                                break
+                                    _latest_user_text = self.messages.latest_content("user").strip()
                                     if _latest_user_text and not _user_answer_matches_target(_latest_user_text, _target_lang_qa):
                                         logger.info(
                                             f"[DAILY_QA] Language gate REJECT — user replied in wrong script "
@@ -2717,12 +3406,7 @@ class WebSocketCallback(OmniRealtimeCallback):
                                         logger.warning(f"[DAILY_QA] finalize error: {_qae}")
 
                             # Compute latest_ai_text — used by magic_pass detection and BATCH_EVAL
-                            latest_ai_text = self.full_response_text or ""
-                            if not latest_ai_text:
-                                for _m in reversed(self.messages):
-                                    if _m.get("role") == "assistant":
-                                        latest_ai_text = _m.get("content", "")
-                                        break
+                            latest_ai_text = self.full_response_text or self.messages.latest_content("assistant")
 
                             # Extract magic sentence from AI text for card display
                             _phase_info_for_card = session_phases.get(self.phase_key, {})
@@ -2751,31 +3435,26 @@ class WebSocketCallback(OmniRealtimeCallback):
                                 logger.info(f"Stored audio URL for response {r}")
 
                                 # Now save the complete message with audio URL to history
-                                # Find the message in self.messages by response ID and update it
-                                for msg in reversed(self.messages):
-                                    if msg.get('role') == 'assistant' and not msg.get('audioUrl'):
-                                        msg['audioUrl'] = url
-                                        await save_single_message(
-                                            self.session_id,
-                                            self.user_id,
-                                            "assistant",
-                                            msg.get('content', ''),
-                                            url,
-                                            message_id=msg.get("id") or msg.get("responseId"),
-                                            timestamp=msg.get("timestamp"),
-                                        )
-                                        logger.info(f"Saved AI message with audio URL to history: {msg.get('content', '')[:50]}...")
-                                        break
+                                # Attach the URL to the latest AI message (if it has none yet) and save it
+                                msg = self.messages.latest("assistant")
+                                if msg and not msg.audio_url:
+                                    msg.audio_url = url
+                                    await save_single_message(
+                                        self.session_id,
+                                        self.user_id,
+                                        "assistant",
+                                        msg.content,
+                                        url,
+                                        message_id=msg.id or msg.response_id,
+                                        timestamp=msg.timestamp,
+                                    )
+                                    logger.info(f"Saved AI message with audio URL to history: {msg.content[:50]}...")
                                 
                                 # ── Phase marker detection ──
                                 # latest_ai_text already computed at start of upload_ai_task
 
                                 # Guard: skip magic pass check for navigation words / too-short input
-                                _last_user_text = ""
-                                for _msg in reversed(self.messages):
-                                    if _msg.get("role") == "user":
-                                        _last_user_text = (_msg.get("content") or "").strip()
-                                        break
+                                _last_user_text = self.messages.latest_content("user").strip()
                                 _NAV_PHRASES = {"next", "skip", "continue", "move on", "pass", "next.", "skip.", "pass.", "continue."}
                                 # Only treat as nav if we actually have a transcript (empty = ASR not ready, not a nav command)
                                 _is_nav = bool(_last_user_text) and (
@@ -2857,20 +3536,19 @@ class WebSocketCallback(OmniRealtimeCallback):
                                                     "task_text": next_task_val,
                                                     "stop_audio": False
                                                 })
-                                                self.messages = []
-                                                self.task_history_cutoff = 0
+                                                self.messages.clear()
                                                 self._clear_dashscope_items(reason=f"MAGIC_SWITCH → task[{next_index}]")
                                                 self._update_session_prompt()
                                                 await asyncio.sleep(0.5)
                                                 self._skip_next_magic_pass = True
                                                 try:
                                                     logger.info(f"[Phase] Injecting trigger for task[{next_index}]: '{next_task_val[:50]}'")
-                                                    self.conversation.send_raw(json.dumps({
+                                                    self.upstream.send_raw(json.dumps({
                                                         "type": "conversation.item.create",
                                                         "item": {"type": "message", "role": "user",
                                                                  "content": [{"type": "input_text", "text": f"New task topic: '{next_task_val}'. Sentence card is visible."}]}
                                                     }))
-                                                    self.conversation.send_raw(json.dumps({
+                                                    self.upstream.send_raw(json.dumps({
                                                         "type": "response.create",
                                                         "response": {
                                                             "modalities": ["text", "audio"],
@@ -2892,8 +3570,7 @@ class WebSocketCallback(OmniRealtimeCallback):
                                                 phase_info["phase"] = "scene_theater"
                                                 phase_info["task_index"] = 0
                                                 phase_info["scene_image_url"] = ""  # 图片未就绪时先置空
-                                                self.messages = []
-                                                self.task_history_cutoff = 0
+                                                self.messages.clear()
                                                 self._clear_dashscope_items(reason="PHASE_SWITCH → scene_theater")
                                                 self._update_session_prompt()  # 提前到 await 之前，防止竞态条件
                                                 logger.info(f"[Phase] scene_theater prompt 已提前注入（图片生成中）")
@@ -2918,7 +3595,7 @@ class WebSocketCallback(OmniRealtimeCallback):
                                                 # 触发 AI 主动介绍情景剧场
                                                 self._skip_next_magic_pass = True
                                                 try:
-                                                    self.conversation.send_raw(json.dumps({
+                                                    self.upstream.send_raw(json.dumps({
                                                         "type": "conversation.item.create",
                                                         "item": {
                                                             "type": "message", "role": "user",
@@ -2926,7 +3603,7 @@ class WebSocketCallback(OmniRealtimeCallback):
                                                                          "text": "[PHASE_START: scene_theater] Magic Repetition is complete. Now start the Scene Theater phase."}]
                                                         }
                                                     }))
-                                                    self.conversation.send_raw(json.dumps({
+                                                    self.upstream.send_raw(json.dumps({
                                                         "type": "response.create",
                                                         "response": {
                                                             "modalities": ["text", "audio"],
@@ -2947,15 +3624,11 @@ class WebSocketCallback(OmniRealtimeCallback):
 
                                 # 调用批量评估 Agent（F1）- 只在用户有输入后才调用
                                 # Skip if this is the welcome message (no user input yet)
-                                user_message_count = sum(1 for m in self.messages if m.get("role") == "user")
+                                user_message_count = self.messages.count("user")
                                 _magic_phase_info = session_phases.get(self.phase_key, {})
                                 if goal_id and user_message_count > 0 and _magic_phase_info.get("phase") != "magic_repetition":
                                     # Extract last user message content
-                                    _last_user_content = ""
-                                    for _msg in reversed(self.messages):
-                                        if _msg.get("role") == "user":
-                                            _last_user_content = _msg.get("content", "") or ""
-                                            break
+                                    _last_user_content = self.messages.latest_content("user")
 
                                     # Build current_task context for the helper
                                     _active_goal = self.user_context.get('active_goal') or {}
@@ -3041,7 +3714,7 @@ class WebSocketCallback(OmniRealtimeCallback):
                                                     or _native_language
                                                     or 'Chinese'
                                                 )
-                                                self.conversation.send_raw(json.dumps({
+                                                self.upstream.send_raw(json.dumps({
                                                     "type": "response.create",
                                                     "response": {
                                                         "modalities": ["text", "audio"],
@@ -3065,7 +3738,12 @@ class WebSocketCallback(OmniRealtimeCallback):
                                         self, goal_id, task_id, latest_ai_text
                                     )
 
-                        asyncio.create_task(upload_ai_task(data, self.current_response_id))
+                        _BACKGROUND_TASKS.spawn(upload_ai_task(data, self.current_response_id), "ai_turn_upload")
+
+                    if self.turn_span is not None:
+                        self._trace_mark("audio.done")
+                        self.turn_span.end()  # upload / persist / batch_eval spans still attach to it
+                        self.turn_span = None
 
                     # Send response.audio.done to client so it knows AI finished speaking
                     # This should be sent regardless of whether there's audio in the buffer
@@ -3153,8 +3831,7 @@ class WebSocketCallback(OmniRealtimeCallback):
                                                     })
 
                                                     # Clear history and refresh prompt for new task
-                                                    self.messages = []
-                                                    self.task_history_cutoff = 0
+                                                    self.messages.clear()
                                                     self.just_switched_task = True
                                                     self._clear_dashscope_items(reason="TASK_SWITCH[magic_passcode]")
                                                     self._update_session_prompt()
@@ -3167,8 +3844,8 @@ class WebSocketCallback(OmniRealtimeCallback):
                                                     logger.info("Scenario completed via magic passcode, calling scenario review workflow...")
                                                     try:
                                                         # Get conversation history for review
-                                                        conv_history = self.messages[-50:] if len(self.messages) > 50 else self.messages
-                                                        logger.info(f"Scenario review: conv_history length={len(conv_history)}, messages={self.messages[:3]}...")
+                                                        conv_history = self.messages.tail(50)
+                                                        logger.info(f"Scenario review: conv_history length={len(conv_history)}, messages={conv_history[:3]}...")
 
                                                         # Guard: require at least 3 real user turns before deep evaluation
                                                         user_msg_count = sum(1 for m in conv_history if (m.get('role') == 'user') and (m.get('content') or '').strip())
@@ -3205,7 +3882,7 @@ class WebSocketCallback(OmniRealtimeCallback):
                                                                     "completed_tasks": [],
                                                                     "conversation_history": conv_history
                                                                 },
-                                                                headers={"Authorization": f"Bearer {self.token}"}
+                                                                headers={"Authorization": f"Bearer {self.token}", **_MODEL_CALLS.headers()}
                                                             )
                                                         if review_resp is not None and review_resp.status_code == 200:
                                                             review_data = review_resp.json()
@@ -3259,7 +3936,7 @@ class WebSocketCallback(OmniRealtimeCallback):
                             # This must be done AFTER sending user_transcript to frontend
                             if self.conversation and self.is_connected:
                                 try:
-                                    self.conversation.cancel_response()
+                                    self.upstream.cancel_response()
                                     logger.info("Cancelled AI response for magic passcode")
                                 except Exception as e:
                                     logger.error(f"Failed to cancel response: {e}")
@@ -3311,7 +3988,7 @@ class WebSocketCallback(OmniRealtimeCallback):
                         }
                         if self.last_ai_audio_url: msg['audioUrl'] = self.last_ai_audio_url; self.last_ai_audio_url = None
                         self.messages.append(msg)
-                        asyncio.create_task(save_single_message(
+                        _BACKGROUND_TASKS.spawn(save_single_message(
                             self.session_id,
                             self.user_id,
                             "assistant",
@@ -3319,7 +3996,7 @@ class WebSocketCallback(OmniRealtimeCallback):
                             msg.get("audioUrl"),
                             message_id=msg["id"],
                             timestamp=msg["timestamp"],
-                        ))
+                        ), "message_write")
 
                         # Send complete message to frontend with responseId
                         await self._safe_send({
@@ -3338,6 +4015,8 @@ class WebSocketCallback(OmniRealtimeCallback):
                     self.full_response_text = ""
                     self.ai_responding = False  # AI finished responding
                     if hasattr(self, '_sent_role_for_turn'): delattr(self, '_sent_role_for_turn')
+                    if self.drain_requested and self.at_turn_boundary():
+                        await self.notify_drain()
                 elif event_name == 'error':
                     _err_msg = ''
                     try:
@@ -3424,6 +4103,7 @@ _VOICE_RE      = _re.compile(r'^[a-zA-Z0-9_\-]{0,64}$')
 @app.websocket("/stream")
 async def websocket_endpoint(websocket: WebSocket, token: str = Query(None), sessionId: str = Query(None), scenario: str = Query(None), voice: str = Query(None), mode: str = Query(None)):
     await websocket.accept()
+    realtime_critical.set(True)  # DashScope calls made for this live session get bulkhead priority
     logger.info(f"New connection attempt for session {sessionId}")
     # token 优先从 query param 取（浏览器直连），其次从 Authorization header 取（comms-service 内部转发）
     if not token:
@@ -3460,6 +4140,34 @@ async def websocket_endpoint(websocket: WebSocket, token: str = Query(None), ses
         await websocket.close(); return
     user_id, session_id = str(user_id_raw), sessionId
     if voice: user_context['voice'] = voice
+
+    # 准入控制：超过本进程会话上限时先排队（推送位置），队列满/超时则快速拒绝，前端可重试
+    async def _send_queue_position(position: int, queue_length: int):
+        await websocket.send_json({"type": "queue_position", "payload": {"position": position, "queue_length": queue_length}})
+
+    try:
+        async with _SESSION_ADMISSION.session(on_position=_send_queue_position):
+            await _run_stream_session(websocket, token, user_context, user_id, session_id, scenario, mode)
+    except AdmissionRejected as e:
+        logger.warning(f"[Admission] rejected session {session_id}: {e}")
+        draining = e.reason == "draining"
+        code = "SERVER_DRAINING" if draining else "SERVER_BUSY"
+        try:
+            await websocket.send_json({"type": "error", "payload": {
+                "code": code,
+                "message": "Server is restarting. Reconnecting..." if draining else "Too many conversations right now. Please retry shortly.",
+                "retryable": True,
+                "retry_after": e.retry_after,
+            }})
+            # 1012 = Service Restart, 1013 = Try Again Later
+            await websocket.close(code=1012 if draining else 1013, reason=code)
+        except Exception:
+            pass
+    except WebSocketDisconnect:
+        logger.info(f"WebSocket disconnected while queued for session {session_id}")
+
+
+async def _run_stream_session(websocket: WebSocket, token: str, user_context: dict, user_id: str, session_id: str, scenario: str, mode: str):
     history_messages = []
     try:
         async with httpx.AsyncClient() as client:
@@ -3496,6 +4204,7 @@ async def websocket_endpoint(websocket: WebSocket, token: str = Query(None), ses
                     _rc, user_id, target_language=target_language, native_language=native_language,
                     goal_type=_gt, interests=_int, goal_description=_gd,
                     progress_context=_build_learning_progress_context(user_context),
+                    target_level=(user_context.get("active_goal") or {}).get("target_level") or "",
                 )
             except Exception as _qe:
                 logger.warning(f"[DAILY_QA] handle_daily_question failed: {_qe}")
@@ -3540,8 +4249,7 @@ async def websocket_endpoint(websocket: WebSocket, token: str = Query(None), ses
             session_phases[phase_key]["task_index"] = 0
             session_phases[phase_key]["magic_positive_streak"] = 0
             session_phases[phase_key]["memory_mode"] = False
-            callback.messages = []
-            callback.task_history_cutoff = 0
+            callback.messages.clear()
     _init_phase_info = session_phases[phase_key]
     _init_task_text = _init_phase_info.get("_current_task_text", "")
     await send_phase_event(websocket, "phase_transition", {
@@ -3556,12 +4264,12 @@ async def websocket_endpoint(websocket: WebSocket, token: str = Query(None), ses
             # url=None → SDK uses China default. Intl env value must NOT contain
             # a query string; SDK appends ?model={model} itself.
             conversation = OmniRealtimeConversation(
-                model=os.getenv("QWEN3_OMNI_MODEL", "qwen3.5-omni-flash-realtime"),
+                model=QWEN_OMNI_MODEL,
                 callback=callback,
                 url=DASHSCOPE_CONFIG.ws_url,
                 api_key=DASHSCOPE_CONFIG.ws_api_key,
             )
-            callback.conversation = conversation
+            callback.attach_conversation(conversation)
             conversation.connect()
             logger.info(f"DashScope connected call initiated for session {session_id}")
             return conversation
@@ -3572,6 +4280,7 @@ async def websocket_endpoint(websocket: WebSocket, token: str = Query(None), ses
 
     async def connect_dashscope_with_retry(attempts=3):
         def on_retry(attempt, total, delay, public_error):
+            connect_call.retry()
             logger.warning(
                 "DashScope connect retry %d/%d in %.1fs: %s",
                 attempt + 1,
@@ -3579,41 +4288,59 @@ async def websocket_endpoint(websocket: WebSocket, token: str = Query(None), ses
                 delay,
                 public_error["code"],
             )
-            failed = getattr(callback, "conversation", None)
-            if failed:
-                try:
-                    failed.close()
-                except Exception:
-                    pass
-                callback.conversation = None
+            if getattr(callback, "conversation", None):
+                callback.upstream.close()
+                callback.attach_conversation(None)
 
         callback._connection_retrying = True
         try:
-            return await connect_with_retry(
-                connect_dashscope,
-                attempts=attempts,
-                on_retry=on_retry,
-            )
+            with _MODEL_CALLS.call("realtime_connect", QWEN_OMNI_MODEL) as connect_call:
+                return await connect_with_retry(
+                    connect_dashscope,
+                    attempts=attempts,
+                    on_retry=on_retry,
+                )
         finally:
             callback._connection_retrying = False
 
 
 
     async def heartbeat():
-        while True:
+        try:
+            await websocket.send_json({"type": "ping", "payload": {"timestamp": int(time.time())}})
+        except Exception:
+            heartbeat_timer.cancel()  # client is gone; the receive loop will end the session
+            return
+        if conversation and callback and callback.is_connected:
             try:
-                await asyncio.sleep(15)
-                await websocket.send_json({"type": "ping", "payload": {"timestamp": int(time.time())}})
-                if conversation and callback and callback.is_connected:
-                    try:
-                        conversation.append_audio(base64.b64encode(b'\x00'*320).decode('utf-8'))
-                    except Exception as e:
-                        logger.error(f"Heartbeat audio append failed: {e}")
-            except: break
+                callback.upstream.append_audio(base64.b64encode(b'\x00'*320).decode('utf-8'))
+            except Exception as e:
+                logger.error(f"Heartbeat audio append failed: {e}")
+
+    async def reap_if_idle():
+        nonlocal idle_timer
+        idle_for = time.monotonic() - callback.last_activity
+        if idle_for < _SESSION_IDLE_TIMEOUT_SECONDS:
+            # activity since scheduling: push the check out instead of rescheduling on every message
+            idle_timer = _TIMER_WHEEL.call_later(_SESSION_IDLE_TIMEOUT_SECONDS - idle_for, reap_if_idle)
+            return
+        logger.info(f"[IdleReaper] closing session {session_id} after {idle_for:.0f}s without client activity")
+        try:
+            await websocket.send_json({"type": "error", "payload": {
+                "code": "SESSION_IDLE",
+                "message": "Session closed after inactivity.",
+                "retryable": False,
+            }})
+            await websocket.close(code=1000, reason="SESSION_IDLE")  # normal close: no auto-reconnect
+        except Exception:
+            pass  # Ignore errors if WebSocket is already closed
 
-    heartbeat_task = None
-    welcome_readiness_task = None
+    heartbeat_timer = None
+    welcome_timer = None
+    idle_timer = None
     conversation = None
+    _live_sessions.add(callback)
+    callback.drain_requested = _SESSION_ADMISSION.draining
     try:
         try:
             conversation = await connect_dashscope_with_retry()
@@ -3626,11 +4353,12 @@ async def websocket_endpoint(websocket: WebSocket, token: str = Query(None), ses
             )
             return
 
-        heartbeat_task = asyncio.create_task(heartbeat())
+        heartbeat_timer = _TIMER_WHEEL.call_every(_HEARTBEAT_INTERVAL_SECONDS, heartbeat)
+        if _SESSION_IDLE_TIMEOUT_SECONDS > 0:
+            idle_timer = _TIMER_WHEEL.call_later(_SESSION_IDLE_TIMEOUT_SECONDS, reap_if_idle)
         expects_welcome = not history_messages
 
         async def welcome_readiness_timeout():
-            await asyncio.sleep(15)
             if (
                 expects_welcome
                 and not callback.welcome_muted
@@ -3650,7 +4378,7 @@ async def websocket_endpoint(websocket: WebSocket, token: str = Query(None), ses
                     },
                 })
 
-        welcome_readiness_task = asyncio.create_task(welcome_readiness_timeout())
+        welcome_timer = _TIMER_WHEEL.call_later(_WELCOME_TIMEOUT_SECONDS, welcome_readiness_timeout)
 
         while True:
             try:
@@ -3660,6 +4388,7 @@ async def websocket_endpoint(websocket: WebSocket, token: str = Query(None), ses
 
                 # Log messages except ping (which is too frequent)
                 if msg_type != 'ping':
+                    callback.last_activity = time.monotonic()
                     logger.info(f"Received message: {message[:200]}..." if len(message) > 200 else f"Received message: {message}")
 
                 if msg_type == 'session_start':
@@ -3694,7 +4423,7 @@ async def websocket_endpoint(websocket: WebSocket, token: str = Query(None), ses
                     _backoff = min(2 ** _failures, 30)
                     logger.warning(f"Attempting to reconnect DashScope (failure #{_failures}, backoff={_backoff}s)")
                     if conversation:
-                        try: conversation.close()
+                        try: callback.upstream.close()
                         except: pass
                     if _backoff > 1:
                         await asyncio.sleep(_backoff)
@@ -3723,7 +4452,7 @@ async def websocket_endpoint(websocket: WebSocket, token: str = Query(None), ses
                                 try:
                                     # Append audio to DashScope conversation
                                     # The SDK expects base64-encoded PCM data
-                                    conversation.append_audio(audio_b64)
+                                    callback.upstream.append_audio(audio_b64)
                                 except Exception as e:
                                     logger.error(f"Error appending audio to DashScope: {e}")
                                     logger.error(traceback.format_exc())
@@ -3731,14 +4460,14 @@ async def websocket_endpoint(websocket: WebSocket, token: str = Query(None), ses
                         except Exception as e:
                             logger.error(f"Error decoding audio data: {e}")
                 elif msg_type == 'user_audio_ended':
-                    _rc = _get_redis_client()
-                    _blocked, _info = await _check_daily_limit(_rc, callback.user_id, callback.user_context)
+                    _blocked, _info = await callback.turn_lease.check(_get_redis_client())
                     if _blocked:
                         callback.user_audio_buffer = bytearray()  # 丢弃未提交的本地音频
                         await websocket.send_json({"type": "daily_limit_reached", **_info})
                         logger.info(f"[DailyLimit] blocked(audio) user={callback.user_id} {_info}")
                         continue
                     callback.counts_against_quota = True  # 本轮是真用户练习输入 → 记入额度
+                    callback.start_turn_trace("user_audio_ended")
                     # New user turn: the previous turn's interruption is over —
                     # without this reset the delta gate at on-event drops ALL
                     # audio/text deltas of every response after the first interrupt.
@@ -3746,7 +4475,7 @@ async def websocket_endpoint(websocket: WebSocket, token: str = Query(None), ses
                     if callback.user_audio_buffer:
                         if callback.is_connected:
                             try:
-                                conversation.commit()
+                                callback.upstream.commit()
                             except Exception as e:
                                 logger.error(f"Error committing audio: {e}")
                         audio_data = bytes(callback.user_audio_buffer)
@@ -3754,10 +4483,11 @@ async def websocket_endpoint(websocket: WebSocket, token: str = Query(None), ses
                         async def upload_user_task(d):
                             url = await callback.upload_audio_to_cos(d, 'user_audio')
                             if url: callback.last_user_audio_url = url
-                        asyncio.create_task(upload_user_task(audio_data))
+                        with _TRACER.use(callback.turn_span):
+                            _BACKGROUND_TASKS.spawn(upload_user_task(audio_data), "user_audio_upload")
                     if callback.is_connected:
                         try:
-                            conversation.create_response()
+                            callback.upstream.create_response()
                         except Exception as e:
                             logger.error(f"Error creating response for audio: {e}")
                 elif msg_type == 'user_audio_cancelled':
@@ -3766,14 +4496,14 @@ async def websocket_endpoint(websocket: WebSocket, token: str = Query(None), ses
                 elif msg_type in ['text_message', 'input_text']:
                     text = payload.get('text')
                     if text:
-                        _rc = _get_redis_client()
-                        _blocked, _info = await _check_daily_limit(_rc, callback.user_id, callback.user_context)
+                        _blocked, _info = await callback.turn_lease.check(_get_redis_client())
                         if _blocked:
                             await websocket.send_json({"type": "daily_limit_reached", **_info})
                             logger.info(f"[DailyLimit] blocked(text) user={callback.user_id} {_info}")
                             continue
                         callback.counts_against_quota = True
                         callback.interrupted_turn = False  # new user turn ends the interruption
+                        callback.start_turn_trace(msg_type)
                         text_message = {
                             "id": str(uuid.uuid4()),
                             "role": "user",
@@ -3781,18 +4511,19 @@ async def websocket_endpoint(websocket: WebSocket, token: str = Query(None), ses
                             "timestamp": datetime.utcnow().isoformat(),
                         }
                         callback.messages.append(text_message)
-                        asyncio.create_task(save_single_message(
-                            callback.session_id,
-                            callback.user_id,
-                            "user",
-                            text,
-                            message_id=text_message["id"],
-                            timestamp=text_message["timestamp"],
-                        ))
+                        with _TRACER.use(callback.turn_span):
+                            _BACKGROUND_TASKS.spawn(save_single_message(
+                                callback.session_id,
+                                callback.user_id,
+                                "user",
+                                text,
+                                message_id=text_message["id"],
+                                timestamp=text_message["timestamp"],
+                            ), "message_write")
                         if callback.is_connected:
                             try:
-                                conversation.send_raw(json.dumps({"type": "conversation.item.create", "item": {"type": "message", "role": "user", "content": [{"type": "input_text", "text": text}]}}))
-                                conversation.create_response()
+                                callback.upstream.send_raw(json.dumps({"type": "conversation.item.create", "item": {"type": "message", "role": "user", "content": [{"type": "input_text", "text": text}]}}))
+                                callback.upstream.create_response()
                             except Exception as e:
                                 logger.error(f"Error creating response for text: {e}")
                 elif msg_type == 'resend_magic_sentence':
@@ -3810,7 +4541,7 @@ async def websocket_endpoint(websocket: WebSocket, token: str = Query(None), ses
                                         _resend_tasks = [t.get('text', '') if isinstance(t, dict) else str(t) for t in _rsc.get('tasks', [])]
                                         break
                             _resend_task_text = _resend_tasks[_ri] if _ri < len(_resend_tasks) else 'the current task'
-                            callback.conversation.send_raw(json.dumps({
+                            callback.upstream.send_raw(json.dumps({
                                 "type": "response.create",
                                 "response": {
                                     "modalities": ["text", "audio"],
@@ -3833,8 +4564,7 @@ async def websocket_endpoint(websocket: WebSocket, token: str = Query(None), ses
                         "magic_positive_streak": 0,
                         "memory_mode": False,
                     }
-                    callback.messages = []
-                    callback.task_history_cutoff = 0
+                    callback.messages.clear()
                     callback._update_session_prompt()
                     _reset_task_text = session_phases[phase_key].get("_current_task_text", "")
                     await send_phase_event(websocket, "phase_transition", {
@@ -3866,16 +4596,14 @@ async def websocket_endpoint(websocket: WebSocket, token: str = Query(None), ses
                             await send_phase_event(websocket, "phase_transition", {
                                 "phase": "magic_repetition", "task_index": next_index, "task_text": next_task_val
                             })
-                            callback.messages = []
-                            callback.task_history_cutoff = 0
+                            callback.messages.clear()
                             callback._update_session_prompt()
                             logger.info(f"[Phase] force_advance_magic → task[{next_index}], text='{next_task_val[:40]}'")
                         else:
                             phase_info["phase"] = "scene_theater"
                             phase_info["task_index"] = 0
                             await send_phase_event(websocket, "phase_transition", {"phase": "scene_theater", "task_index": 0})
-                            callback.messages = []
-                            callback.task_history_cutoff = 0
+                            callback.messages.clear()
                             callback._update_session_prompt()
                             logger.info("[Phase] force_advance_magic → all done, scene_theater")
                 elif msg_type == 'interrupt':
@@ -3887,7 +4615,7 @@ async def websocket_endpoint(websocket: WebSocket, token: str = Query(None), ses
                     # frontend surfaces as a fatal Server Error.
                     if callback.is_connected and callback.ai_responding:
                         try:
-                            conversation.cancel_response()
+                            callback.upstream.cancel_response()
                         except Exception as e:
                             logger.error(f"Error cancelling response: {e}")
 
@@ -3953,8 +4681,7 @@ async def websocket_endpoint(websocket: WebSocket, token: str = Query(None), ses
                             callback.user_context['current_task'] = None
 
                         # 清理服务端 history + items，刷新 session prompt
-                        callback.messages = []
-                        callback.task_history_cutoff = 0
+                        callback.messages.clear()
                         callback.just_switched_task = True
                         callback._clear_dashscope_items(reason="TASK_SWITCH[user_confirmed]")
                         callback._update_session_prompt()
@@ -3968,7 +4695,7 @@ async def websocket_endpoint(websocket: WebSocket, token: str = Query(None), ses
                                 or 'the target language'
                             )
                             if _next_task_for_directive:
-                                conversation.send_raw(json.dumps({
+                                callback.upstream.send_raw(json.dumps({
                                     "type": "response.create",
                                     "response": {
                                         "modalities": ["text", "audio"],
@@ -3997,11 +4724,14 @@ async def websocket_endpoint(websocket: WebSocket, token: str = Query(None), ses
                 logger.error(traceback.format_exc())
                 break
     finally:
-        if heartbeat_task: heartbeat_task.cancel()
-        if welcome_readiness_task: welcome_readiness_task.cancel()
+        for timer in (heartbeat_timer, welcome_timer, idle_timer):
+            if timer: timer.cancel()
         if conversation:
-            try: conversation.close()
+            try: callback.upstream.close()
             except: pass
+        await callback.turn_lease.release(_get_redis_client())  # 归还未用完的额度租约
+        logger.info(f"[PromptStats] session={session_id} {callback.prompt_stats}")
+        _live_sessions.discard(callback)
 
 async def send_phase_event(websocket, event_type: str, data: dict):
     """Unified helper to push phase-related WS events to the frontend."""
@@ -4016,6 +4746,20 @@ async def health_check():
     return {"status": "ok"}
 
 
+@app.get("/ready")
+async def readiness_check():
+    """Readiness for the load balancer: 503 once every realtime slot is taken or while draining."""
+    from fastapi.responses import JSONResponse
+    sessions = _SESSION_ADMISSION.snapshot()
+    ready = sessions["available"] > 0 and not sessions["draining"]
+    status = "ready" if ready else "draining" if sessions["draining"] else "full"
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"status": status, "sessions": sessions},
+        headers={"X-Session-Capacity": str(sessions["available"])},
+    )
+
+
 # ---------------------------------------------------------------------------
 # GET /daily-question - Feature 2: 今日问答
 # ---------------------------------------------------------------------------
@@ -4041,6 +4785,8 @@ async def daily_recall_endpoint(request: _FastAPIRequest, variant: int = 0):
         return {"data": {"sentences": [], "source": "fallback"}}
     try:
         payload = await handle_daily_recall(redis_client, user_ctx, variant=variant)
+    except BulkheadRejected:
+        raise
     except Exception as e:
         logger.error(f"[DAILY_RECALL] endpoint error: {e}")
         return {"data": {"sentences": [], "source": "fallback"}}
@@ -4092,7 +4838,10 @@ async def daily_question_endpoint(request: _FastAPIRequest):
             native_language=native_language,
             goal_type=_gt, interests=_int, goal_description=_gd,
             progress_context=_build_learning_progress_context(user_ctx),
+            target_level=(user_ctx.get("active_goal") or {}).get("target_level") or "",
         )
+    except BulkheadRejected:
+        raise
     except Exception as e:
         logger.error(f"[DAILY_QA] /daily-question handler error: {e}")
         raise HTTPException(status_code=500, detail="Failed to get daily question")
@@ -4138,7 +4887,10 @@ async def daily_question_re_answer(request: _FastAPIRequest):
             native_language=native_language,
             goal_type=_gt, interests=_int, goal_description=_gd,
             progress_context=_build_learning_progress_context(user_ctx),
+            target_level=(user_ctx.get("active_goal") or {}).get("target_level") or "",
         )
+    except BulkheadRejected:
+        raise
     except Exception as e:
         logger.error(f"[DAILY_QA] re-answer: handle_daily_question error: {e}")
         raise HTTPException(status_code=500, detail="Failed to get daily question")
@@ -4189,7 +4941,10 @@ async def daily_question_change_question(request: _FastAPIRequest):
             native_language=native_language,
             goal_type=_gt, interests=_int, goal_description=_gd,
             progress_context=_build_learning_progress_context(user_ctx),
+            target_level=(user_ctx.get("active_goal") or {}).get("target_level") or "",
         )
+    except BulkheadRejected:
+        raise
     except Exception as e:
         logger.error(f"[DAILY_QA] change-question: advance failed: {e}")
         raise HTTPException(status_code=500, detail="Failed to change daily question")
@@ -4240,6 +4995,8 @@ async def daily_question_pool_endpoint(request: _FastAPIRequest):
             count=3,
             progress_context=_build_learning_progress_context(user_ctx),
         )
+    except BulkheadRejected:
+        raise
     except Exception as e:
         logger.error(f"[DAILY_QA] /daily-question/pool error: {e}")
         raise HTTPException(status_code=500, detail="Failed to get question pool")
@@ -4330,6 +5087,168 @@ async def daily_question_select_endpoint(request: _FastAPIRequest):
     }
 
 
+# ---------------------------------------------------------------------------
+# Internal: daily-QA nightly prefetch — manual trigger + progress
+# (X-Guaji-Internal-Auth must match INTERNAL_AUTH_SECRET)
+# ---------------------------------------------------------------------------
+def _require_internal_auth(request: _FastAPIRequest) -> None:
+    import hmac
+    secret = os.getenv("INTERNAL_AUTH_SECRET", "")
+    supplied = request.headers.get("X-Guaji-Internal-Auth", "")
+    if not secret or not hmac.compare_digest(secret, supplied):
+        raise HTTPException(status_code=403, detail="forbidden")
+
+
+@app.post("/internal/daily-qa/prefetch")
+async def daily_qa_prefetch_trigger(request: _FastAPIRequest, date: str = None):
+    _require_internal_auth(request)
+    if date is not None and not re.fullmatch(r"\d{4}-\d{2}-\d{2}", date):
+        raise HTTPException(status_code=400, detail="date must be YYYY-MM-DD")
+    redis_client = _get_redis_client()
+    if redis_client is None:
+        raise HTTPException(status_code=503, detail="redis_unavailable")
+    date_str = date or _product_date_str(1)
+    asyncio.create_task(run_daily_qa_prefetch(redis_client, date_str))
+    return {"data": {"date": date_str, "status": "started"}}
+
+
+@app.get("/internal/daily-qa/prefetch")
+async def daily_qa_prefetch_status(request: _FastAPIRequest, date: str = None):
+    _require_internal_auth(request)
+    date_str = date or _product_date_str(1)
+    stats = _daily_qa_prefetch_stats.get(date_str)
+    if stats is None:
+        redis_client = _get_redis_client()
+        if redis_client is not None:
+            try:
+                stats = await redis_client.hgetall(f"daily_qa_prefetch:run:{date_str}") or None
+            except Exception as e:
+                logger.warning(f"[DAILY_QA_PREFETCH] status read failed: {e}")
+    return {"data": stats or {"date": date_str, "status": "not_started"}}
+
+
+@app.get("/internal/bulkheads")
+async def bulkhead_metrics(request: _FastAPIRequest):
+    _require_internal_auth(request)
+    return {"data": {name: head.stats() for name, head in _BULKHEADS.items()}}
+
+
+@app.get("/internal/sessions/prompt-stats")
+async def session_prompt_stats(request: _FastAPIRequest):
+    _require_internal_auth(request)
+    sessions = {cb.session_id: cb.prompt_stats for cb in list(_live_sessions)}
+    totals = {k: sum(st[k] for st in sessions.values()) for k in ("updates_sent", "updates_skipped", "bytes_sent")}
+    return {"data": {
+        "sessions": sessions,
+        "totals": totals,
+        "static_prompt_cache": {**_static_prompt_stats, "size": len(_STATIC_PROMPT_CACHE._store)},
+    }}
+
+
+@app.get("/internal/upstream")
+async def upstream_command_metrics(request: _FastAPIRequest):
+    _require_internal_auth(request)
+    depths = {cb.session_id: cb.upstream.depth() for cb in list(_live_sessions)}
+    return {"data": {**_UPSTREAM_STATS.snapshot(), "queue_depth": depths}}
+
+
+@app.get("/internal/loop-lag")
+async def loop_lag_report(request: _FastAPIRequest):
+    _require_internal_auth(request)
+    return {"data": _LOOP_MONITOR.report()}
+
+
+@app.post("/internal/profile")
+async def sample_profile(request: _FastAPIRequest, seconds: float = 10, interval_ms: float = 10, thread: str = None):
+    """Sample all thread stacks for `seconds`; `data.collapsed` feeds flamegraph.pl / speedscope."""
+    _require_internal_auth(request)
+    try:
+        return {"data": await _PROFILER.capture(seconds, interval_ms / 1000, thread)}
+    except ProfilerBusy as e:
+        raise HTTPException(status_code=429, detail=str(e))
+
+
+def _session_memory_walk(callbacks: list) -> dict:
+    """deep_sizeof over every live session and shared cache; slow, so it runs in a worker thread."""
+    import threading
+    sessions = {cb.session_id: cb.memory_footprint() for cb in callbacks}
+    field_totals = {}
+    for footprint in sessions.values():
+        for name, entry in footprint["fields"].items():
+            field_totals[name] = field_totals.get(name, 0) + entry["bytes"]
+    try:
+        with open("/proc/self/statm") as f:
+            rss_bytes = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        rss_bytes = None
+    return {
+        "sessions": dict(sorted(sessions.items(), key=lambda kv: kv[1]["total_bytes"], reverse=True)),
+        "session_count": len(sessions),
+        "session_bytes_total": sum(fp["total_bytes"] for fp in sessions.values()),
+        "field_totals": dict(sorted(field_totals.items(), key=lambda kv: kv[1], reverse=True)),
+        "session_phases": {"entries": len(session_phases._store), "bytes": deep_sizeof(session_phases._store)},
+        "static_prompt_cache": {"entries": len(_STATIC_PROMPT_CACHE._store),
+                                "bytes": deep_sizeof(_STATIC_PROMPT_CACHE._store)},
+        "threads": threading.active_count(),
+        "rss_bytes": rss_bytes,
+    }
+
+
+@app.get("/internal/memory/sessions")
+async def session_memory_report(request: _FastAPIRequest):
+    _require_internal_auth(request)
+    return {"data": await asyncio.to_thread(_session_memory_walk, list(_live_sessions))}
+
+
+@app.post("/internal/memory/tracemalloc")
+async def tracemalloc_control(request: _FastAPIRequest, action: str = "diff", limit: int = 25):
+    """`start` begins tracing and takes a baseline; `diff` reports growth by file:line since the last snapshot."""
+    _require_internal_auth(request)
+    # Snapshots walk every traced block: keep them off the event loop.
+    if action == "start":
+        return {"data": await asyncio.to_thread(_TRACEMALLOC.start)}
+    if action == "stop":
+        return {"data": _TRACEMALLOC.stop()}
+    if action == "diff":
+        try:
+            return {"data": await asyncio.to_thread(_TRACEMALLOC.diff, limit)}
+        except RuntimeError as e:
+            raise HTTPException(status_code=409, detail=str(e))
+    raise HTTPException(status_code=400, detail="action must be start, diff or stop")
+
+
+@app.get("/internal/traces")
+async def trace_report(request: _FastAPIRequest, limit: int = 50):
+    """Span latency percentiles by stage, plus the most recent spans."""
+    _require_internal_auth(request)
+    return {"data": {**_TRACER.stats(), "recent": _TRACER.recent(limit)}}
+
+
+@app.get("/internal/model-calls")
+async def model_call_metrics(request: _FastAPIRequest):
+    """Tokens, latency, retries, fallbacks and cache hits per model call class and user tier."""
+    _require_internal_auth(request)
+    return {"data": _MODEL_CALLS.stats()}
+
+
+@app.get("/internal/timers")
+async def timer_wheel_metrics(request: _FastAPIRequest):
+    _require_internal_auth(request)
+    return {"data": {**_TIMER_WHEEL.stats(), "live_sessions": len(_live_sessions)}}
+
+
+@app.get("/internal/prompt-budget")
+async def prompt_budget_metrics(request: _FastAPIRequest):
+    _require_internal_auth(request)
+    return {"data": _PROMPT_BUDGETS.stats()}
+
+
+@app.get("/internal/scenario-images/metrics")
+async def scenario_image_metrics(request: _FastAPIRequest):
+    _require_internal_auth(request)
+    return {"data": {**_scenario_image_stats(), "dashscope_tasks": _dashscope_tasks.stats()}}
+
+
 # ---------------------------------------------------------------------------
 # POST /reset-phase - 重置用户会话阶段状态
 # ---------------------------------------------------------------------------
@@ -4461,6 +5380,123 @@ def _scenario_to_unsplash_keyword(scenario_title: str) -> str:
     # Fallback: use the title itself (URL-encoded)
     return urllib.parse.quote(scenario_title)
 
+class _DashScopeTaskTracker:
+    """One shared poller for every outstanding DashScope async task.
+
+    Callers submit a task themselves and ``await tracker.wait(task_id)``. The
+    poller checks all due tasks in one tick over a shared keep-alive client and
+    resolves waiters as soon as a status is final. The first poll lands just
+    before the observed median time-to-result; after that the interval grows
+    with the task's age, so slow tasks cost fewer polls.
+    """
+
+    _TTR_BUCKETS = (1, 2, 3, 5, 8, 13, 20)
+
+    def __init__(self, first_delay: float = 2.0, min_interval: float = 0.5, max_interval: float = 3.0):
+        self.first_delay = first_delay          # used until time-to-result samples exist
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self._tasks: dict = {}                  # task_id → {"submitted", "next", "polls", "waiters"}
+        self._runner = None
+        self._wakeup = None
+        self._ttr: list = []                    # recent time-to-result seconds (bounded)
+        self.counters = {"polls": 0, "succeeded": 0, "failed": 0, "abandoned": 0}
+
+    def _first_poll_delay(self) -> float:
+        if not self._ttr:
+            return self.first_delay
+        median = sorted(self._ttr)[len(self._ttr) // 2]
+        return min(max(median * 0.7, self.min_interval), self.max_interval * 3)
+
+    def _interval(self, age: float) -> float:
+        return min(max(age * 0.2, self.min_interval), self.max_interval)
+
+    async def wait(self, task_id: str) -> dict | None:
+        """Final ``output`` dict when the task SUCCEEDED; None if it FAILED/CANCELED."""
+        loop = asyncio.get_running_loop()
+        entry = self._tasks.get(task_id)
+        if entry is None:
+            now = time.monotonic()
+            entry = {"submitted": now, "next": now + self._first_poll_delay(), "polls": 0, "waiters": set()}
+            self._tasks[task_id] = entry
+        future = loop.create_future()
+        entry["waiters"].add(future)
+        if self._runner is None or self._runner.done():
+            self._wakeup = asyncio.Event()
+            self._runner = asyncio.create_task(self._run())
+        self._wakeup.set()
+        try:
+            return await future
+        finally:
+            entry["waiters"].discard(future)
+            if not entry["waiters"] and self._tasks.get(task_id) is entry:
+                self._tasks.pop(task_id)
+                self.counters["abandoned"] += 1
+
+    async def _fetch_status(self, client, task_id: str) -> dict | None:
+        resp = await client.get(
+            f"{DASHSCOPE_IMAGE_BASE}/api/v1/tasks/{task_id}",
+            headers={"Authorization": f"Bearer {DASHSCOPE_CONFIG.image_api_key}"},
+        )
+        return resp.json().get("output", {}) if resp.status_code == 200 else None
+
+    async def _poll(self, client, task_id: str, entry: dict) -> None:
+        self.counters["polls"] += 1
+        entry["polls"] += 1
+        try:
+            output = await self._fetch_status(client, task_id)
+        except Exception as e:
+            logger.warning(f"[DashScopeTasks] poll {task_id} failed: {e}")
+            output = None
+        now = time.monotonic()
+        status = (output or {}).get("task_status")
+        if status not in ("SUCCEEDED", "FAILED", "CANCELED"):
+            entry["next"] = now + self._interval(now - entry["submitted"])
+            return
+        if self._tasks.get(task_id) is entry:
+            self._tasks.pop(task_id)
+        self._ttr.append(now - entry["submitted"])
+        del self._ttr[:-500]
+        self.counters["succeeded" if status == "SUCCEEDED" else "failed"] += 1
+        if status != "SUCCEEDED":
+            logger.warning(f"[DashScopeTasks] task {task_id} ended with status={status}")
+        for future in list(entry["waiters"]):
+            if not future.done():
+                future.set_result(output if status == "SUCCEEDED" else None)
+
+    async def _run(self) -> None:
+        # Outer loop: a task registered while the client was closing is still picked up.
+        while self._tasks:
+            async with httpx.AsyncClient(timeout=10) as client:
+                while self._tasks:
+                    now = time.monotonic()
+                    due = [(tid, e) for tid, e in list(self._tasks.items()) if e["next"] <= now]
+                    if due:
+                        await asyncio.gather(*(self._poll(client, tid, e) for tid, e in due))
+                        continue
+                    self._wakeup.clear()
+                    sleep_for = min(e["next"] for e in self._tasks.values()) - now
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), timeout=max(sleep_for, 0))
+                    except asyncio.TimeoutError:
+                        pass
+
+    def stats(self) -> dict:
+        ttr = sorted(self._ttr)
+        pct = lambda q: round(ttr[min(len(ttr) - 1, int(q * len(ttr)))], 2) if ttr else None
+        buckets = {f"le_{b}s": sum(1 for t in ttr if t <= b) for b in self._TTR_BUCKETS}
+        finished = self.counters["succeeded"] + self.counters["failed"]
+        return {
+            **self.counters,
+            "outstanding": len(self._tasks),
+            "polls_per_task": round(self.counters["polls"] / finished, 2) if finished else None,
+            "time_to_result_s": {"p50": pct(0.5), "p95": pct(0.95), "samples": len(ttr), "buckets": buckets},
+        }
+
+
+_dashscope_tasks = _DashScopeTaskTracker()
+
+
 async def _try_wanx_image(scenario_title: str, prompt_en: str, size: str = "768*512", timeout: float = 15) -> str | None:
     """
     Attempt to generate an image via DashScope Wanx T2I.
@@ -4475,47 +5511,39 @@ async def _try_wanx_image(scenario_title: str, prompt_en: str, size: str = "768*
 
     async def _call_wanx() -> str | None:
         try:
-            async with httpx.AsyncClient(timeout=20) as client:
-                # DashScope image synthesis — submit task
-                submit_resp = await client.post(
-                    f"{DASHSCOPE_IMAGE_BASE}/api/v1/services/aigc/text2image/image-synthesis",
-                    headers={
-                        "Authorization": f"Bearer {dashscope_key}",
-                        "X-DashScope-Async": "enable",
-                        "Content-Type": "application/json",
-                    },
-                    json={
-                        "model": QWEN_IMAGE_MODEL,
-                        "input": {"prompt": prompt_en},
-                        "parameters": {"size": size, "n": 1},
-                    },
-                )
-                if submit_resp.status_code != 200:
-                    logger.warning(f"[Wanx] Submit failed: {submit_resp.status_code} {submit_resp.text[:200]}")
-                    return None
-                task_id = submit_resp.json().get("output", {}).get("task_id")
-                if not task_id:
-                    return None
-
-                # Poll for result (up to ~12 s)
-                for _ in range(6):
-                    await asyncio.sleep(2)
-                    poll_resp = await client.get(
-                        f"{DASHSCOPE_IMAGE_BASE}/api/v1/tasks/{task_id}",
-                        headers={"Authorization": f"Bearer {dashscope_key}"},
+            # The image slot is held until the task resolves: it bounds concurrent Wanx jobs.
+            async with _BULKHEADS["image"].slot(), _MODEL_CALLS.call("image", QWEN_IMAGE_MODEL) as call:
+                async with httpx.AsyncClient(timeout=20) as client:
+                    # DashScope image synthesis — submit task
+                    submit_resp = await client.post(
+                        f"{DASHSCOPE_IMAGE_BASE}/api/v1/services/aigc/text2image/image-synthesis",
+                        headers={
+                            "Authorization": f"Bearer {dashscope_key}",
+                            "X-DashScope-Async": "enable",
+                            "Content-Type": "application/json",
+                        },
+                        json={
+                            "model": QWEN_IMAGE_MODEL,
+                            "input": {"prompt": prompt_en},
+                            "parameters": {"size": size, "n": 1},
+                        },
                     )
-                    if poll_resp.status_code != 200:
-                        continue
-                    poll_data = poll_resp.json().get("output", {})
-                    status = poll_data.get("task_status")
-                    if status == "SUCCEEDED":
-                        results = poll_data.get("results", [])
-                        if results:
-                            return results[0].get("url")
-                    elif status in ("FAILED", "CANCELED"):
-                        logger.warning(f"[Wanx] Task {task_id} ended with status={status}")
+                    if submit_resp.status_code != 200:
+                        logger.warning(f"[Wanx] Submit failed: {submit_resp.status_code} {submit_resp.text[:200]}")
+                        call.error = f"http_{submit_resp.status_code}"
                         return None
-                return None  # Timed out polling
+                    task_id = submit_resp.json().get("output", {}).get("task_id")
+                    if not task_id:
+                        call.error = "no_task_id"
+                        return None
+
+                # Result comes from the shared poller; `timeout` bounds the wait.
+                output = await _dashscope_tasks.wait(task_id)
+                results = (output or {}).get("results", [])
+                call.usage({"image_count": len(results)})
+                return results[0].get("url") if results else None
+        except BulkheadRejected:
+            raise
         except Exception as e:
             logger.warning(f"[Wanx] Error: {e}")
             return None
@@ -4527,6 +5555,125 @@ async def _try_wanx_image(scenario_title: str, prompt_en: str, size: str = "768*
         return None
 
 
+# ---------------------------------------------------------------------------
+# Scene image cache
+#
+# Scene Theater images depend only on the scene subject, so renders are shared:
+# content id = sha256(normalized subject | size | model), re-hosted to COS once,
+# and the permanent URL indexed under ``scene_image:{content_id}`` with a TTL so
+# one-off subjects age out. The subject is the _SCENE_KEYWORD_MAP keyword when
+# the title matches one ("咖啡", "coffee" and "cafe" share an image), else the
+# prompt itself. The most common keywords are pre-rendered at startup so their
+# first transition is instant too.
+# ---------------------------------------------------------------------------
+
+_SCENE_IMAGE_KEY = "scene_image:{}"
+_SCENE_IMAGE_TTL = 30 * 86400    # COS URLs are permanent; unused subjects still expire
+_SCENE_IMAGE_PREWARM_TOP = int(os.getenv("SCENE_IMAGE_PREWARM_TOP", "8"))  # 0 disables
+_SCENE_IMAGE_SIZE = "768*512"
+_scene_image_inflight: dict = {}   # content id → asyncio.Task (per-process single-flight)
+
+
+def _scene_image_content_id(subject: str, size: str = _SCENE_IMAGE_SIZE, model: str = "") -> str:
+    import hashlib
+    norm = re.sub(r"[\s+]+", " ", (subject or "").strip().lower())
+    return hashlib.sha256(f"{norm}|{size}|{model or QWEN_IMAGE_MODEL}".encode("utf-8")).hexdigest()[:24]
+
+
+def _scene_image_prompt(keyword: str) -> str:
+    return f"Realistic photo of a {keyword.replace('+', ' ')} scene, natural lighting, no text"
+
+
+def _scene_image_subject(scenario_title: str) -> tuple:
+    """(cache subject, Wanx prompt) for a scenario title."""
+    keyword = _scenario_to_unsplash_keyword(scenario_title)
+    prompt_en = _scene_image_prompt(keyword)
+    mapped = keyword in _SCENE_KEYWORD_MAP.values()
+    return (keyword if mapped else prompt_en), prompt_en
+
+
+async def _get_cached_scene_image(content_id: str) -> str | None:
+    rc = _get_redis_client()
+    if rc is None:
+        return None
+    try:
+        return await rc.get(_SCENE_IMAGE_KEY.format(content_id))
+    except Exception as e:
+        logger.warning(f"[SceneImage] cache read fail-open: {e}")
+        return None
+
+
+async def _render_scene_image(content_id: str, scenario_title: str, prompt_en: str) -> tuple:
+    """Wanx render → COS re-host → index. Returns (url, source) or (None, None)."""
+    temp_url = await _try_wanx_image(scenario_title, prompt_en, size=_SCENE_IMAGE_SIZE)
+    if not temp_url:
+        return None, None
+    cos_url = await _rehost_image_to_cos(temp_url)
+    if not cos_url:
+        return temp_url, "wanx"   # temp URL (~24h) is never indexed
+    rc = _get_redis_client()
+    if rc is not None:
+        try:
+            await rc.setex(_SCENE_IMAGE_KEY.format(content_id), _SCENE_IMAGE_TTL, cos_url)
+        except Exception as e:
+            logger.warning(f"[SceneImage] cache write failed: {e}")
+    return cos_url, "wanx_cos"
+
+
+async def _scene_image(scenario_title: str) -> tuple:
+    """Cached scene image for a title: (url, source) with source "cache" on a hit."""
+    subject, prompt_en = _scene_image_subject(scenario_title)
+    content_id = _scene_image_content_id(subject)
+    cached = await _get_cached_scene_image(content_id)
+    if cached:
+        _MODEL_CALLS.cache_hit("image")
+        return cached, "cache"
+    task = _scene_image_inflight.get(content_id)
+    if task is None:
+        task = asyncio.create_task(_render_scene_image(content_id, scenario_title, prompt_en))
+        _scene_image_inflight[content_id] = task
+        task.add_done_callback(lambda _t: _scene_image_inflight.pop(content_id, None))
+    return await asyncio.shield(task)
+
+
+async def _prewarm_scene_images() -> None:
+    """Pre-render the top _SCENE_KEYWORD_MAP keywords that are not cached yet (once per deploy fleet)."""
+    keywords = list(dict.fromkeys(_SCENE_KEYWORD_MAP.values()))[:_SCENE_IMAGE_PREWARM_TOP]
+    rc = _get_redis_client()
+    if rc is None or not keywords:
+        return
+    rendered = 0
+    for keyword in keywords:
+        content_id = _scene_image_content_id(keyword)
+        try:
+            if await rc.get(_SCENE_IMAGE_KEY.format(content_id)):
+                continue
+            if not await rc.set(f"scene_image:prewarm:{content_id}", "1", ex=600, nx=True):
+                continue   # another replica is rendering it
+        except Exception as e:
+            logger.warning(f"[SceneImage] prewarm skipped: {e}")
+            return
+        try:
+            _url, source = await _render_scene_image(content_id, keyword, _scene_image_prompt(keyword))
+        except BulkheadRejected:
+            logger.info("[SceneImage] prewarm paused: image bulkhead saturated")
+            return
+        rendered += source == "wanx_cos"
+    logger.info(f"[SceneImage] prewarm done: {rendered} rendered, {len(keywords)} keywords")
+
+
+@app.on_event("startup")
+async def _start_loop_monitor():
+    if os.getenv("LOOP_LAG_MONITOR", "1") != "0":
+        _LOOP_MONITOR.start()
+
+
+@app.on_event("startup")
+async def _start_scene_image_prewarm():
+    if _SCENE_IMAGE_PREWARM_TOP > 0:
+        asyncio.create_task(_prewarm_scene_images())
+
+
 # ---------------------------------------------------------------------------
 # POST /generate-scene-image  (proxied from /api/ai/generate-scene-image via Nginx)
 # ---------------------------------------------------------------------------
@@ -4535,7 +5682,8 @@ async def _try_wanx_image(scenario_title: str, prompt_en: str, size: str = "768*
 async def generate_scene_image(payload: dict = Body(...)):
     """
     Fetch a scene image for the Scene Theater phase.
-    Strategy: try Wanx T2I (DashScope) with 15 s timeout → fallback to Unsplash.
+    Strategy: shared scene image cache → Wanx T2I (DashScope, 15 s timeout,
+    re-hosted to COS and indexed) → fallback to Unsplash.
     """
     from fastapi import HTTPException
 
@@ -4543,14 +5691,12 @@ async def generate_scene_image(payload: dict = Body(...)):
     if not scenario_title:
         raise HTTPException(status_code=400, detail="Missing scenario_title")
 
-    # Build English prompt for Wanx from scenario title
-    keyword = _scenario_to_unsplash_keyword(scenario_title)
-    prompt_en = f"Realistic photo of a {keyword.replace('+', ' ')} scene, natural lighting, no text"
+    image_url, source = await _scene_image(scenario_title)
+    if image_url:
+        logger.info(f"[SceneImage] {source} for '{scenario_title}'")
+        return {"image_url": image_url, "source": source}
 
-    wanx_url = await _try_wanx_image(scenario_title, prompt_en)
-    if wanx_url:
-        logger.info(f"[SceneImage] Wanx succeeded for '{scenario_title}'")
-        return {"image_url": wanx_url, "source": "wanx"}
+    keyword = _scenario_to_unsplash_keyword(scenario_title)
 
     # Unsplash fallback
     unsplash_url = f"https://source.unsplash.com/800x400/?{keyword}"
@@ -4598,7 +5744,8 @@ async def generate_scenarios(payload: dict = Body(...)):
 
     try:
         import httpx as _httpx
-        async with _httpx.AsyncClient(timeout=30) as client:
+        async with _BULKHEADS["chat"].slot(), _MODEL_CALLS.call("scenarios", QWEN_TEXT_MODEL) as call, \
+                _httpx.AsyncClient(timeout=30) as client:
             resp = await client.post(
                 f"{DASHSCOPE_CHAT_BASE}/compatible-mode/v1/chat/completions",
                 headers={
@@ -4613,18 +5760,41 @@ async def generate_scenarios(payload: dict = Body(...)):
                 }
             )
             resp.raise_for_status()
-            content = resp.json()["choices"][0]["message"]["content"]
+            body = resp.json()
+            call.usage(body)
+            content = body["choices"][0]["message"]["content"]
             parsed = json.loads(content)
             scenarios = parsed.get("scenarios", [])
             if not scenarios:
                 raise ValueError("Empty scenarios list")
+            _BACKGROUND_TASKS.spawn(_precompute_scenario_keywords(scenarios, target_language), "keyword_precompute")
+            for sc in scenarios[:_SCENARIO_IMAGE_PRERENDER]:
+                if isinstance(sc, dict) and sc.get("title"):
+                    _enqueue_scenario_image(str(sc["title"]).strip()[:120])
             return {"code": 200, "message": "Success", "data": {"scenarios": scenarios}}
+    except BulkheadRejected:
+        raise
     except Exception as e:
         logger.error(f"[generate_scenarios] LLM call failed: {e}")
         from fastapi import HTTPException
         raise HTTPException(status_code=500, detail="场景生成失败，请重试")
 
 
+async def _precompute_scenario_keywords(scenarios: list, target_language: str) -> None:
+    """Warm workflow-service's scoring-keyword cache for freshly generated
+    scenarios so the first scored turn of every task skips keyword generation.
+    Fire-and-forget — never raises; a miss just means keywords are built lazily.
+    """
+    try:
+        async with httpx.AsyncClient(timeout=60.0) as client:
+            await client.post(
+                f"{WORKFLOW_SERVICE_URL}/api/workflows/proficiency-scoring/precompute-keywords",
+                json={"target_language": target_language, "scenarios": scenarios},
+            )
+    except Exception as e:
+        logger.warning(f"[generate_scenarios] keyword precompute failed: {e}")
+
+
 # ---------------------------------------------------------------------------
 # POST /generate-scenario-image  (proxied from /api/ai/generate-scenario-image)
 # ---------------------------------------------------------------------------
@@ -4648,7 +5818,8 @@ async def _scenario_visual_prompt(scenario_title: str) -> str:
     ds_api_key = DASHSCOPE_CONFIG.chat_api_key
     try:
         import httpx as _httpx
-        async with _httpx.AsyncClient(timeout=12) as client:
+        async with _BULKHEADS["chat"].slot(), _MODEL_CALLS.call("scene_prompt", QWEN_TEXT_MODEL) as call, \
+                _httpx.AsyncClient(timeout=12) as client:
             resp = await client.post(
                 f"{DASHSCOPE_CHAT_BASE}/compatible-mode/v1/chat/completions",
                 headers={"Authorization": f"Bearer {ds_api_key}", "Content-Type": "application/json"},
@@ -4667,10 +5838,13 @@ async def _scenario_visual_prompt(scenario_title: str) -> str:
                 },
             )
             resp.raise_for_status()
-            txt = (resp.json()["choices"][0]["message"]["content"] or "").strip()
+            body = resp.json()
+            call.usage(body)
+            txt = (body["choices"][0]["message"]["content"] or "").strip()
             return txt[:300] if txt else fallback
     except Exception as e:
         logger.warning(f"[ScenarioImage] prompt build failed, using fallback: {e}")
+        _MODEL_CALLS.fallback("scene_prompt", "llm_error")
         return fallback
 
 
@@ -4719,14 +5893,156 @@ async def _persist_scenario_image(goal_id, scenario_title: str, image_url: str)
         logger.warning(f"[ScenarioImage] DB write-back failed (goal={goal_id}): {e}")
 
 
+# ---------------------------------------------------------------------------
+# Scenario cover render queue
+#
+# Covers are rendered by a small pool of background workers instead of on the
+# request path. /generate-scenarios enqueues the first cards (the ones a free
+# learner has unlocked), /generate-scenario-image joins or enqueues the job and
+# waits a bounded time. Jobs are deduplicated by title — a cover depends only on
+# the title — and every goal that asked for it gets the permanent URL written
+# back via _persist_scenario_image. Results are indexed in Redis
+# (scenario_image:{job_id}) so any replica can serve a finished cover at once.
+# ---------------------------------------------------------------------------
+
+_SCENARIO_IMAGE_CONCURRENCY = int(os.getenv("SCENARIO_IMAGE_CONCURRENCY", "3"))   # parallel Wanx jobs
+_SCENARIO_IMAGE_PRERENDER = int(os.getenv("SCENARIO_IMAGE_PRERENDER", "3"))       # = frontend FREE_INITIAL_UNLOCK
+_SCENARIO_IMAGE_WAIT_SECONDS = float(os.getenv("SCENARIO_IMAGE_WAIT_SECONDS", "20"))
+_SCENARIO_IMAGE_QUEUE_MAX = 500
+_SCENARIO_IMAGE_DONE_TTL = 30 * 86400      # COS URLs are permanent
+_SCENARIO_IMAGE_TEMP_TTL = 12 * 3600       # DashScope temp URLs live ~24h
+_SCENARIO_IMAGE_FAILED_TTL = 600           # don't hammer Wanx for a title that just failed
+
+_scenario_image_queue = None               # asyncio.Queue, created with the workers on first use
+_scenario_image_workers: list = []
+_scenario_image_jobs: dict = {}            # job id → {"title", "goals", "future", "enqueued_at"}
+_scenario_image_metrics = {"enqueued": 0, "deduped": 0, "done": 0, "failed": 0, "dropped": 0}
+_scenario_image_latencies: list = []       # recent enqueue→result seconds (bounded)
+
+
+def _scenario_image_job_id(scenario_title: str) -> str:
+    import hashlib
+    norm = re.sub(r"\s+", " ", (scenario_title or "").strip().lower())
+    return hashlib.sha256(norm.encode("utf-8")).hexdigest()[:24]
+
+
+async def _get_scenario_image_state(job_id: str) -> dict | None:
+    rc = _get_redis_client()
+    if rc is None:
+        return None
+    try:
+        raw = await rc.get(f"scenario_image:{job_id}")
+        return json.loads(raw) if raw else None
+    except Exception as e:
+        logger.warning(f"[ScenarioImage] state read fail-open: {e}")
+        return None
+
+
+async def _set_scenario_image_state(job_id: str, url: str | None, source: str) -> None:
+    rc = _get_redis_client()
+    if rc is None:
+        return
+    ttl = (_SCENARIO_IMAGE_DONE_TTL if source == "wanx_cos"
+           else _SCENARIO_IMAGE_TEMP_TTL if url else _SCENARIO_IMAGE_FAILED_TTL)
+    state = {"status": "done" if url else "failed", "url": url or "", "source": source}
+    try:
+        await rc.setex(f"scenario_image:{job_id}", ttl, json.dumps(state))
+    except Exception as e:
+        logger.warning(f"[ScenarioImage] state write failed: {e}")
+
+
+async def _render_scenario_cover(scenario_title: str) -> tuple:
+    """Visual prompt → Wanx → COS. Returns (url, source) with source wanx_cos | wanx | none."""
+    prompt_en = await _scenario_visual_prompt(scenario_title)
+    # Square-ish card thumbnail; wan2.2-t2i-flash supports 512*512.
+    temp_url = await _try_wanx_image(scenario_title, prompt_en, size="512*512", timeout=20)
+    if not temp_url:
+        return None, "none"
+    # Re-host the temp URL to COS for permanence; fall back to temp URL if
+    # re-hosting fails (still better than emoji, just expires in ~24h).
+    cos_url = await _rehost_image_to_cos(temp_url)
+    if cos_url:
+        return cos_url, "wanx_cos"
+    logger.info(f"[ScenarioImage] COS re-host failed for '{scenario_title}' → temp URL")
+    return temp_url, "wanx"
+
+
+async def _scenario_image_worker() -> None:
+    while True:
+        job_id = await _scenario_image_queue.get()
+        job = _scenario_image_jobs.get(job_id)
+        url, source = None, "none"
+        try:
+            url, source = await _render_scenario_cover(job["title"])
+            await _set_scenario_image_state(job_id, url, source)
+            if source == "wanx_cos":
+                for goal_id in job["goals"]:
+                    await _persist_scenario_image(goal_id, job["title"], url)
+        except Exception as e:
+            logger.warning(f"[ScenarioImage] render job failed: {e}")
+        finally:
+            _scenario_image_metrics["done" if url else "failed"] += 1
+            _scenario_image_latencies.append(time.monotonic() - job["enqueued_at"])
+            del _scenario_image_latencies[:-500]
+            _scenario_image_jobs.pop(job_id, None)
+            if not job["future"].done():
+                job["future"].set_result((url, source))
+            _scenario_image_queue.task_done()
+
+
+def _enqueue_scenario_image(scenario_title: str, goal_id=None) -> asyncio.Future:
+    """Join the pending job for this title or enqueue a new one. Never blocks."""
+    global _scenario_image_queue
+    job_id = _scenario_image_job_id(scenario_title)
+    job = _scenario_image_jobs.get(job_id)
+    if job is not None:
+        if goal_id:
+            job["goals"].add(goal_id)
+        _scenario_image_metrics["deduped"] += 1
+        return job["future"]
+    if _scenario_image_queue is None:
+        _scenario_image_queue = asyncio.Queue(maxsize=_SCENARIO_IMAGE_QUEUE_MAX)
+    while len(_scenario_image_workers) < _SCENARIO_IMAGE_CONCURRENCY:
+        _scenario_image_workers.append(asyncio.create_task(_scenario_image_worker()))
+    future = asyncio.get_running_loop().create_future()
+    try:
+        _scenario_image_queue.put_nowait(job_id)
+    except asyncio.QueueFull:
+        _scenario_image_metrics["dropped"] += 1
+        future.set_result((None, "none"))
+        return future
+    _scenario_image_jobs[job_id] = {
+        "title": scenario_title, "goals": {goal_id} if goal_id else set(),
+        "future": future, "enqueued_at": time.monotonic(),
+    }
+    _scenario_image_metrics["enqueued"] += 1
+    return future
+
+
+def _scenario_image_stats() -> dict:
+    lat = sorted(_scenario_image_latencies)
+    pct = lambda q: round(lat[min(len(lat) - 1, int(q * len(lat)))], 2) if lat else None
+    return {
+        **_scenario_image_metrics,
+        "queue_depth": _scenario_image_queue.qsize() if _scenario_image_queue else 0,
+        "in_flight": len(_scenario_image_jobs),
+        "workers": len(_scenario_image_workers),
+        "latency_s": {"p50": pct(0.5), "p95": pct(0.95), "samples": len(lat)},
+    }
+
+
 @app.post("/generate-scenario-image")
 async def generate_scenario_image(payload: dict = Body(...)):
     """Generate a square cover image for a single Discovery scenario card.
 
-    Plan B (persistence): generate via Wanx → re-host the temp URL to COS →
-    return the permanent COS URL. If goal_id is supplied, also write the COS URL
-    back into user_goals.scenarios[i].image_url so the cover is generated/billed
-    only once and survives across sessions.
+    Plan B (persistence): rendered by the cover queue via Wanx → re-hosted to
+    COS. If goal_id is supplied, the COS URL is also written back into
+    user_goals.scenarios[i].image_url so the cover is generated/billed only once
+    and survives across sessions.
+
+    A finished cover returns at once. Otherwise the request joins (or enqueues)
+    the render job and waits up to SCENARIO_IMAGE_WAIT_SECONDS; ``"wait": false``
+    returns ``{"status": "pending"}`` immediately instead.
     """
     from fastapi import HTTPException
 
@@ -4735,19 +6051,26 @@ async def generate_scenario_image(payload: dict = Body(...)):
         raise HTTPException(status_code=400, detail="Missing scenario_title")
     goal_id = payload.get("goal_id")
 
-    prompt_en = await _scenario_visual_prompt(scenario_title)
-    # Square-ish card thumbnail; wan2.2-t2i-flash supports 512*512.
-    temp_url = await _try_wanx_image(scenario_title, prompt_en, size="512*512", timeout=20)
-    if temp_url:
-        logger.info(f"[ScenarioImage] Wanx succeeded for '{scenario_title}'")
-        # Re-host the temp URL to COS for permanence; fall back to temp URL if
-        # re-hosting fails (still better than emoji, just expires in ~24h).
-        cos_url = await _rehost_image_to_cos(temp_url)
-        if cos_url:
-            await _persist_scenario_image(goal_id, scenario_title, cos_url)
-            return {"image_url": cos_url, "source": "wanx_cos"}
-        logger.info(f"[ScenarioImage] COS re-host failed for '{scenario_title}' → return temp URL")
-        return {"image_url": temp_url, "source": "wanx"}
+    state = await _get_scenario_image_state(_scenario_image_job_id(scenario_title))
+    if state and state.get("status") == "done":
+        _MODEL_CALLS.cache_hit("image")
+        if state.get("source") == "wanx_cos":
+            await _persist_scenario_image(goal_id, scenario_title, state["url"])
+        return {"image_url": state["url"], "source": state.get("source", "wanx_cos")}
+    if state and state.get("status") == "failed":
+        return {"image_url": "", "source": "none"}
+
+    future = _enqueue_scenario_image(scenario_title, goal_id)
+    pending = {"image_url": "", "source": "pending", "status": "pending"}
+    if payload.get("wait") is False:
+        return pending
+    try:
+        url, source = await asyncio.wait_for(asyncio.shield(future), timeout=_SCENARIO_IMAGE_WAIT_SECONDS)
+    except asyncio.TimeoutError:
+        return pending
+    if url:
+        logger.info(f"[ScenarioImage] {source} for '{scenario_title}'")
+        return {"image_url": url, "source": source}
 
     # No reliable photo fallback (source.unsplash.com was shut down) → let the
     # frontend keep its emoji placeholder.
@@ -4828,13 +6151,14 @@ async def text_to_speech(payload: dict = Body(...)):
         raise HTTPException(status_code=400, detail="Invalid voice")
 
     try:
-        def _synth():
+        def _synth(call):
             response = dashscope.MultiModalConversation.call(
                 api_key=DASHSCOPE_CONFIG.http_api_key,
                 model="qwen3-tts-flash",
                 text=text,
                 voice=voice,
             )
+            call.usage(response)
             if not response or response.status_code != 200:
                 raise RuntimeError(f"TTS API error: {getattr(response, 'status_code', 'unknown')}")
             audio_url = response.output.get("audio", {}).get("url")
@@ -4843,8 +6167,11 @@ async def text_to_speech(payload: dict = Body(...)):
             return _validated_urlopen(audio_url, timeout=15, include_content_type=True)
 
         loop = asyncio.get_event_loop()
-        audio_bytes, content_type = await loop.run_in_executor(None, _synth)
+        async with _BULKHEADS["tts"].slot(), _MODEL_CALLS.call("tts", "qwen3-tts-flash") as call:
+            audio_bytes, content_type = await loop.run_in_executor(_TTS_EXECUTOR, _synth, call)
         return FastAPIResponse(content=audio_bytes, media_type=content_type)
+    except BulkheadRejected:
+        raise
     except Exception as e:
         public_error = classify_connection_error(e)
         logger.error("[tts] synthesis failed: %s", public_error["code"])
@@ -4882,7 +6209,8 @@ async def translate_text(req: TranslateRequest):
     # 403s for text-generation). qwen-flash on intl.
     ds_api_key = DASHSCOPE_CONFIG.chat_api_key
     try:
-        async with httpx.AsyncClient(timeout=20) as client:
+        async with _BULKHEADS["translate"].slot(), _MODEL_CALLS.call("translate", QWEN_TEXT_MODEL) as call, \
+                httpx.AsyncClient(timeout=20) as client:
             resp = await client.post(
                 f"{DASHSCOPE_CHAT_BASE}/compatible-mode/v1/chat/completions",
                 headers={
@@ -4898,16 +6226,71 @@ async def translate_text(req: TranslateRequest):
                 },
             )
             resp.raise_for_status()
-            translation = resp.json()["choices"][0]["message"]["content"].strip()
+            body = resp.json()
+            call.usage(body)
+            translation = body["choices"][0]["message"]["content"].strip()
             return {"translation": translation}
+    except BulkheadRejected:
+        raise
     except Exception as e:
         logger.error(f"[translate] DashScope error: {e}")
         raise HTTPException(status_code=500, detail="Translation failed")
 
 
+async def _drain_realtime_sessions(deadline: float = None) -> dict:
+    """SIGTERM drain: stop admitting, hand sessions off at turn boundaries, flush background work."""
+    deadline = _DRAIN_DEADLINE_SECONDS if deadline is None else deadline
+    started = time.monotonic()
+    _SESSION_ADMISSION.begin_drain()
+    sessions_at_start = len(_live_sessions)
+    completed_at_start = sum(_BACKGROUND_TASKS.completed.values())
+    logger.info(f"[Drain] started: sessions={sessions_at_start} background={_BACKGROUND_TASKS.pending()}")
+
+    for cb in list(_live_sessions):
+        cb.drain_requested = True
+        if cb.at_turn_boundary():
+            await cb.notify_drain()
+    session_deadline = started + max(0.0, deadline - _DRAIN_FLUSH_RESERVE_SECONDS)
+    while _live_sessions and time.monotonic() < session_deadline:
+        await asyncio.sleep(0.2)
+    forced = [cb for cb in _live_sessions if not cb.drain_notified]
+    for cb in list(_live_sessions):
+        await cb.notify_drain()  # out of time: hand off mid-turn
+    await asyncio.sleep(0)
+
+    flushed = await _BACKGROUND_TASKS.flush(timeout=max(0.5, deadline - (time.monotonic() - started)))
+    _TRACER.flush()
+    report = {
+        "sessions": sessions_at_start,
+        "sessions_forced": len(forced),
+        "tasks_flushed": sum(_BACKGROUND_TASKS.completed.values()) - completed_at_start,
+        "tasks_abandoned": flushed["abandoned"],
+        "abandoned_by_kind": flushed["abandoned_by_kind"],
+        "elapsed_s": round(time.monotonic() - started, 2),
+    }
+    log = logger.warning if report["tasks_abandoned"] else logger.info
+    log(f"[Drain] finished: {report}")
+    return report
+
+
 if __name__ == "__main__":
     import uvicorn
 
+    class _DrainingServer(uvicorn.Server):
+        """On the first SIGTERM/SIGINT, drain realtime sessions before uvicorn's own shutdown."""
+
+        _drain_task = None
+
+        def handle_exit(self, sig, frame):
+            if self._drain_task is not None:
+                return super().handle_exit(sig, frame)  # second signal: stop now
+            async def _drain_then_exit():
+                try:
+                    await _drain_realtime_sessions()
+                finally:
+                    super(_DrainingServer, self).handle_exit(sig, frame)
+            self._drain_task = asyncio.get_event_loop().create_task(_drain_then_exit())
+
     # Get port configuration
     main_port = int(os.getenv("AI_SERVICE_PORT", "8082"))
 
@@ -4916,4 +6299,4 @@ if __name__ == "__main__":
     print("Health check endpoint available at /health")
 
     # Run single server that handles both WebSocket and health check endpoints
-    uvicorn.run(app, host="0.0.0.0", port=main_port)
+    _DrainingServer(uvicorn.Config(app, host="0.0.0.0", port=main_port)).run()
@@ -0,0 +1,118 @@
+"""Approximate memory accounting for realtime sessions, plus tracemalloc diffs.
+
+``deep_sizeof`` walks containers, ``__dict__`` and ``__slots__`` and sums
+``sys.getsizeof``; shared objects are counted once per walk and the walk is
+depth-bounded, so numbers are estimates good for sizing pods and spotting
+growth, not exact heap accounting. ``account`` does this per named field so a
+session's audio buffers, history and id sets show up separately.
+
+``TracemallocSnapshots`` starts tracing on demand (tracing costs CPU and
+memory, so it is off until asked), and each ``diff`` compares a fresh snapshot
+with the previous one grouped by file and line.
+
+Both are slow on a large heap, so callers run them in a worker thread. The walk
+copies each container before descending into it, so it tolerates the loop
+mutating sessions meanwhile; snapshot/diff calls are serialized by a lock.
+"""
+
+import sys
+import threading
+import tracemalloc
+import types
+from collections import deque
+
+_LEAF_TYPES = (str, bytes, bytearray, int, float, bool, complex, type(None))
+_SKIP_TYPES = (type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType, types.MethodType)
+
+
+def deep_sizeof(obj, max_depth: int = 8, _seen: set = None, _depth: int = 0) -> int:
+    seen = set() if _seen is None else _seen
+    if id(obj) in seen or _depth > max_depth or isinstance(obj, _SKIP_TYPES):
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, _LEAF_TYPES):
+        return size
+    if isinstance(obj, dict):
+        children = [*obj.keys(), *obj.values()]
+    elif isinstance(obj, (list, tuple, set, frozenset, deque)):
+        children = list(obj)            # a copy: the loop may mutate it while a thread walks
+    else:
+        children = []
+        if hasattr(obj, "__dict__"):
+            children.append(vars(obj))
+        for cls in type(obj).__mro__:
+            for name in getattr(cls, "__slots__", ()):
+                if hasattr(obj, name):
+                    children.append(getattr(obj, name))
+    for child in children:
+        size += deep_sizeof(child, max_depth, seen, _depth + 1)
+    return size
+
+
+def account(fields: dict) -> dict:
+    """Bytes (and length, for collections) per named field, plus the total."""
+    seen = set()
+    out = {}
+    for name, value in fields.items():
+        entry = {"bytes": deep_sizeof(value, _seen=seen)}
+        if hasattr(value, "__len__"):
+            entry["len"] = len(value)
+        out[name] = entry
+    return {"total_bytes": sum(e["bytes"] for e in out.values()), "fields": out}
+
+
+class TracemallocSnapshots:
+    def __init__(self, frames: int = 1):
+        self.frames = frames
+        self._baseline = None
+        self.started_here = False
+        self._lock = threading.Lock()
+
+    def start(self) -> dict:
+        with self._lock:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(self.frames)
+                self.started_here = True
+            self._baseline = self._take()
+        return self.status()
+
+    def stop(self) -> dict:
+        with self._lock:
+            if self.started_here and tracemalloc.is_tracing():
+                tracemalloc.stop()
+            self.started_here = False
+            self._baseline = None
+        return self.status()
+
+    def _take(self):
+        return tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+            tracemalloc.Filter(False, "<unknown>"),
+        ))
+
+    def diff(self, limit: int = 25) -> dict:
+        """Growth by file:line since the previous snapshot; the new snapshot becomes the baseline."""
+        with self._lock:
+            if not tracemalloc.is_tracing() or self._baseline is None:
+                raise RuntimeError("tracemalloc is not running; start it first")
+            current = self._take()
+            stats = current.compare_to(self._baseline, "lineno")
+            self._baseline = current
+        top = []
+        for stat in stats[:limit]:
+            frame = stat.traceback[0]
+            top.append({
+                "site": f"{frame.filename}:{frame.lineno}",
+                "size_diff_bytes": stat.size_diff,
+                "size_bytes": stat.size,
+                "count_diff": stat.count_diff,
+                "count": stat.count,
+            })
+        return {**self.status(), "total_diff_bytes": sum(s.size_diff for s in stats), "top": top}
+
+    def status(self) -> dict:
+        traced, peak = tracemalloc.get_traced_memory() if tracemalloc.is_tracing() else (0, 0)
+        return {"tracing": tracemalloc.is_tracing(), "traced_bytes": traced, "peak_traced_bytes": peak}
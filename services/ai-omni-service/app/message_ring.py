@@ -0,0 +1,125 @@
+"""Bounded, compact per-session message history for realtime sessions.
+
+A session used to keep every transcript as a dict for its whole life and scan
+the list backwards on every turn. ``MessageRing`` keeps at most ``cap`` slotted
+``ChatMessage`` records, tracks the latest message and the count per role as
+messages come and go (O(1) lookups), and keeps the task-history cutoff as a
+cursor into the append sequence, so eviction never shifts it.
+"""
+
+from collections import deque
+
+
+class ChatMessage:
+    __slots__ = ("id", "role", "content", "timestamp", "audio_url", "response_id")
+
+    def __init__(self, role: str, content: str, id: str = None, timestamp: str = None,
+                 audio_url: str = None, response_id: str = None):
+        self.id = id
+        self.role = role
+        self.content = content or ""
+        self.timestamp = timestamp
+        self.audio_url = audio_url
+        self.response_id = response_id
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "ChatMessage":
+        """Accept conversation-service history rows and the legacy in-session dict shape."""
+        return cls(
+            role=d.get("role"),
+            content=d.get("content"),
+            id=d.get("id") or d.get("message_id"),
+            timestamp=d.get("timestamp") or d.get("created_at"),
+            audio_url=d.get("audioUrl") or d.get("audio_url"),
+            response_id=d.get("responseId"),
+        )
+
+    def to_dict(self) -> dict:
+        d = {"id": self.id, "role": self.role, "content": self.content, "timestamp": self.timestamp}
+        if self.audio_url:
+            d["audioUrl"] = self.audio_url
+        if self.response_id:
+            d["responseId"] = self.response_id
+        return d
+
+    def __repr__(self):
+        return f"ChatMessage({self.role!r}, {self.content[:40]!r})"
+
+
+class MessageRing:
+    def __init__(self, cap: int, messages=()):
+        if cap < 1:
+            raise ValueError(f"message ring cap must be >= 1, got {cap}")
+        self.cap = cap
+        self._items: deque = deque()
+        self._seq = 0                 # messages ever appended
+        self._task_start = 0          # _seq value when the current task began
+        self._latest: dict = {}       # role → newest retained message of that role
+        self._counts: dict = {}       # role → retained messages of that role
+        self.extend(messages)
+
+    def append(self, message) -> ChatMessage:
+        if not isinstance(message, ChatMessage):
+            message = ChatMessage.from_dict(message)
+        if len(self._items) == self.cap:
+            self._evict()
+        self._items.append(message)
+        self._seq += 1
+        self._latest[message.role] = message
+        self._counts[message.role] = self._counts.get(message.role, 0) + 1
+        return message
+
+    def extend(self, messages) -> None:
+        for message in messages:
+            self.append(message)
+
+    def _evict(self) -> None:
+        old = self._items.popleft()
+        self._counts[old.role] -= 1
+        if self._latest.get(old.role) is old:     # it was the only one of its role left
+            del self._latest[old.role]
+
+    def clear(self) -> None:
+        """Drop all history; the next message starts a fresh task period."""
+        self._items.clear()
+        self._latest.clear()
+        self._counts.clear()
+        self._task_start = self._seq
+
+    def mark_task_start(self) -> None:
+        """Everything appended so far belongs to earlier tasks (kept for context, hidden from since_task)."""
+        self._task_start = self._seq
+
+    def since_task(self, limit: int = None) -> list:
+        """Messages appended since the current task began, newest last (at most ``limit``)."""
+        n = min(self._seq - self._task_start, len(self._items))
+        if limit is not None:
+            n = min(n, limit)
+        return list(self._items)[len(self._items) - n:] if n else []
+
+    def latest(self, role: str):
+        return self._latest.get(role)
+
+    def latest_content(self, role: str) -> str:
+        message = self._latest.get(role)
+        return message.content if message else ""
+
+    def count(self, role: str) -> int:
+        return self._counts.get(role, 0)
+
+    def tail(self, n: int) -> list:
+        """The newest ``n`` messages as wire-format dicts (for workflow payloads)."""
+        items = list(self._items)[-n:] if n else []
+        return [m.to_dict() for m in items]
+
+    def __len__(self):
+        return len(self._items)
+
+    def __bool__(self):
+        return bool(self._items)
+
+    def __iter__(self):
+        return iter(self._items)
+
+    def __reversed__(self):
+        return reversed(self._items)
@@ -0,0 +1,216 @@
+"""Token, latency and spend accounting for outbound model calls.
+
+Each DashScope request (chat completions, embeddings, TTS, Wanx, realtime
+responses) runs inside ``meter.call(call_class, model)``. That is a sync or async
+context manager yielding a handle which takes the response's usage block
+(``usage``) and counts retries. On exit the meter records latency and error
+status. Fallbacks taken and answers served from a cache are counted with
+``fallback`` and ``cache_hit``, so hit rates sit next to spend.
+
+Totals are kept per (call class, user tier). The tier, plus the user id for
+sampled logs, lives in a ContextVar bound once per request or session with
+``bind``. Helpers deep in the call stack therefore need not pass it, and
+``headers()`` forwards it to workflow-service. ``MODEL_PRICES_JSON`` holds a price
+per 1K prompt/completion tokens, or per unit for images and TTS characters. When
+it is set, ``stats()`` estimates spend and ranks classes by it.
+``MODEL_CALL_LOG_SAMPLE`` logs that fraction of calls as one JSON line each.
+"""
+
+import json
+import logging
+import random
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+
+logger = logging.getLogger(__name__)
+
+TIER_HEADER = "X-Guaji-User-Tier"
+_SAMPLES = 512
+_caller: ContextVar = ContextVar("model_caller", default=("unknown", None))
+
+
+def parse_usage(payload) -> tuple:
+    """(prompt_tokens, completion_tokens, units) from a response body, SDK response or usage dict.
+
+    Understands OpenAI-compatible ``prompt_tokens``/``completion_tokens``, DashScope
+    ``input_tokens``/``output_tokens``, embedding ``total_tokens`` and the unit counts
+    TTS (``characters``) and image synthesis (``image_count``) report.
+    """
+    if payload is None:
+        return 0, 0, 0
+    usage = payload.get("usage") if isinstance(payload, dict) else getattr(payload, "usage", None)
+    if usage is None and isinstance(payload, dict):
+        usage = payload                   # already a usage block (e.g. realtime response.done)
+    if not usage:
+        return 0, 0, 0
+    get = usage.get if hasattr(usage, "get") else (lambda key: getattr(usage, key, None))
+    prompt = get("prompt_tokens") or get("input_tokens") or 0
+    completion = get("completion_tokens") or get("output_tokens") or 0
+    if not prompt and not completion:
+        prompt = get("total_tokens") or 0     # embeddings report only a total
+    units = get("characters") or get("image_count") or 0
+    return int(prompt), int(completion), int(units)
+
+
+class ModelCall:
+    """One outbound call; filled in by the caller, recorded by the meter on exit."""
+
+    __slots__ = ("meter", "call_class", "model", "tier", "user_id",
+                 "prompt_tokens", "completion_tokens", "units", "retries", "error", "_start")
+
+    def __init__(self, meter, call_class: str, model: str, tier: str, user_id):
+        self.meter = meter
+        self.call_class = call_class
+        self.model = model
+        self.tier = tier
+        self.user_id = user_id
+        self.prompt_tokens = self.completion_tokens = self.units = self.retries = 0
+        self.error = None
+        self._start = None
+
+    def usage(self, payload) -> None:
+        """Add the usage a response reports (called once per attempt, so retries add up)."""
+        prompt, completion, units = parse_usage(payload)
+        self.prompt_tokens += prompt
+        self.completion_tokens += completion
+        self.units += units
+
+    def retry(self) -> None:
+        self.retries += 1
+
+    def __enter__(self) -> "ModelCall":
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        if exc_type is not None and self.error is None:
+            self.error = exc_type.__name__
+        self.meter._record(self, (time.perf_counter() - self._start) * 1000)
+        return False
+
+    async def __aenter__(self) -> "ModelCall":
+        return self.__enter__()
+
+    async def __aexit__(self, exc_type, exc, tb) -> bool:
+        return self.__exit__(exc_type, exc, tb)
+
+
+def _new_bucket() -> dict:
+    return {"calls": 0, "errors": 0, "retries": 0, "fallbacks": 0, "cache_hits": 0,
+            "prompt_tokens": 0, "completion_tokens": 0, "units": 0, "est_cost": 0.0,
+            "latencies": deque(maxlen=_SAMPLES), "models": {}}
+
+
+class ModelCallMeter:
+    def __init__(self, prices: dict = None, log_sample: float = 0.0):
+        self.prices = prices or {}            # model → {"input": per 1K, "output": per 1K, "unit": per unit}
+        self.log_sample = log_sample
+        self._lock = threading.Lock()
+        self._buckets = {}                    # (call_class, tier) → totals
+
+    # ── caller context ──
+    @staticmethod
+    def bind(tier: str = None, user_id=None) -> None:
+        """Attribute calls made later in this task (and tasks it spawns) to ``tier``/``user_id``."""
+        _caller.set((tier or "unknown", user_id))
+
+    @staticmethod
+    def tier() -> str:
+        return _caller.get()[0]
+
+    @staticmethod
+    def headers() -> dict:
+        tier = _caller.get()[0]
+        return {TIER_HEADER: tier} if tier != "unknown" else {}
+
+    # ── recording ──
+    def call(self, call_class: str, model: str = "", tier: str = None) -> ModelCall:
+        bound_tier, user_id = _caller.get()
+        return ModelCall(self, call_class, model, tier or bound_tier, user_id)
+
+    def record(self, call_class: str, model: str = "", usage=None, latency_ms: float = None,
+               error: str = None, tier: str = None) -> None:
+        """Record a call timed elsewhere (e.g. a realtime response whose usage arrives as an event)."""
+        call = self.call(call_class, model, tier)
+        call.usage(usage)
+        call.error = error
+        self._record(call, latency_ms)
+
+    def fallback(self, call_class: str, reason: str = "", tier: str = None) -> None:
+        """A model answer was replaced by a fallback (static pool, heuristic, default text)."""
+        self._count(call_class, tier, "fallbacks")
+        self._maybe_log({"class": call_class, "tier": tier or self.tier(), "fallback": reason or True})
+
+    def cache_hit(self, call_class: str, tier: str = None) -> None:
+        """A request for this class was answered without calling a model."""
+        self._count(call_class, tier, "cache_hits")
+
+    def _count(self, call_class: str, tier: str, field: str) -> None:
+        with self._lock:
+            self._buckets.setdefault((call_class, tier or self.tier()), _new_bucket())[field] += 1
+
+    def _price(self, model: str, prompt: int, completion: int, units: int) -> float:
+        price = self.prices.get(model)
+        if not price:
+            return 0.0
+        return (prompt * price.get("input", 0) + completion * price.get("output", 0)) / 1000 \
+            + units * price.get("unit", 0)
+
+    def _record(self, call: ModelCall, latency_ms: float) -> None:
+        cost = self._price(call.model, call.prompt_tokens, call.completion_tokens, call.units)
+        with self._lock:
+            b = self._buckets.setdefault((call.call_class, call.tier), _new_bucket())
+            b["calls"] += 1
+            b["errors"] += call.error is not None
+            b["retries"] += call.retries
+            b["prompt_tokens"] += call.prompt_tokens
+            b["completion_tokens"] += call.completion_tokens
+            b["units"] += call.units
+            b["est_cost"] += cost
+            if latency_ms is not None:
+                b["latencies"].append(latency_ms)
+            if call.model:
+                b["models"][call.model] = b["models"].get(call.model, 0) + 1
+        self._maybe_log({
+            "class": call.call_class, "model": call.model, "tier": call.tier, "user_id": call.user_id,
+            "latency_ms": None if latency_ms is None else round(latency_ms, 1), "prompt_tokens": call.prompt_tokens,
+            "completion_tokens": call.completion_tokens, "units": call.units,
+            "retries": call.retries, "error": call.error, "est_cost": round(cost, 6),
+        })
+
+    def _maybe_log(self, entry: dict) -> None:
+        if self.log_sample and random.random() < self.log_sample:
+            logger.info("[ModelCall] %s", json.dumps(entry, ensure_ascii=False))
+
+    def stats(self) -> dict:
+        """Totals per (class, tier), highest estimated spend (then tokens) first."""
+        rows = []
+        with self._lock:
+            for (call_class, tier), b in self._buckets.items():
+                ordered = sorted(b["latencies"])
+                pick = lambda q: round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 1) if ordered else None  # noqa: E731
+                rows.append({
+                    "call_class": call_class, "tier": tier,
+                    **{k: v for k, v in b.items() if k not in ("latencies", "est_cost", "models")},
+                    "est_cost": round(b["est_cost"], 6), "models": dict(b["models"]),
+                    "p50_ms": pick(0.5), "p95_ms": pick(0.95), "p99_ms": pick(0.99),
+                })
+        rows.sort(key=lambda r: (r["est_cost"], r["prompt_tokens"] + r["completion_tokens"]), reverse=True)
+        return {
+            "calls": sum(r["calls"] for r in rows),
+            "est_cost": round(sum(r["est_cost"] for r in rows), 6),
+            "priced_models": sorted(self.prices),
+            "log_sample": self.log_sample,
+            "classes": rows,
+        }
+
+
+def build_model_meter(env) -> ModelCallMeter:
+    try:
+        prices = json.loads(env.get("MODEL_PRICES_JSON") or "{}")
+    except ValueError:
+        logger.warning("[ModelCall] MODEL_PRICES_JSON is not valid JSON; spend estimates disabled")
+        prices = {}
+    return ModelCallMeter(prices=prices, log_sample=float(env.get("MODEL_CALL_LOG_SAMPLE") or 0))
@@ -0,0 +1,153 @@
+"""Process-wide hashed timer wheel for per-session housekeeping.
+
+Heartbeats, keepalive audio, welcome timeouts and idle reaping used to be one
+sleeping asyncio task (and timer-heap entry) per session each. Here they are
+small slotted ``Timer`` records hashed into ``slots`` buckets by their tick; a
+single task advances the wheel every ``tick`` seconds and fires what is due.
+A tick's batch is sent in chunks of ``burst`` spread across the tick, so a
+thousand heartbeats that happen to land on one tick do not all write at once;
+periodic timers also get a random first delay so sessions spread over the wheel.
+Coroutine callbacks run as their own tasks: a send stuck on one client's full
+socket buffer must not hold up every other session's timers.
+"""
+
+import asyncio
+import inspect
+import logging
+import math
+import random
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class Timer:
+    __slots__ = ("due_tick", "interval", "callback", "args", "cancelled")
+
+    def __init__(self, callback, args, interval):
+        self.callback = callback
+        self.args = args
+        self.interval = interval
+        self.due_tick = 0
+        self.cancelled = False
+
+    def cancel(self) -> None:
+        self.cancelled = True
+
+
+class TimerWheel:
+    def __init__(self, tick: float = 0.5, slots: int = 256, burst: int = 200):
+        self.tick = tick
+        self.burst = burst
+        self._slots = [[] for _ in range(slots)]
+        self._current_tick = 0
+        self._origin = None
+        self._task = None
+        self._pending = 0
+        self._inflight = set()            # coroutine callbacks still running
+        self.counters = {"scheduled": 0, "fired": 0, "cancelled": 0, "errors": 0, "ticks": 0}
+        self.max_batch = 0
+        self.max_lag_ms = 0
+
+    # ── scheduling ──
+    def call_later(self, delay: float, callback, *args) -> Timer:
+        """Run ``callback(*args)`` once after ~``delay`` s (rounded up to the tick). Coroutines are awaited."""
+        return self._insert(Timer(callback, args, None), delay)
+
+    def call_every(self, interval: float, callback, *args, first_delay: float = None) -> Timer:
+        """Run ``callback(*args)`` every ``interval`` s; the first run is jittered unless ``first_delay`` is given."""
+        if first_delay is None:
+            first_delay = random.uniform(self.tick, interval)
+        return self._insert(Timer(callback, args, interval), first_delay)
+
+    def _insert(self, timer: Timer, delay: float) -> Timer:
+        self._ensure_running()
+        elapsed = time.monotonic() - self._origin
+        timer.due_tick = max(self._current_tick + 1, math.ceil((elapsed + max(0.0, delay)) / self.tick))
+        self._slots[timer.due_tick % len(self._slots)].append(timer)
+        self._pending += 1
+        self.counters["scheduled"] += 1
+        return timer
+
+    def _ensure_running(self) -> None:
+        if self._task is None or self._task.done():
+            self._origin = time.monotonic() - self._current_tick * self.tick
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    # ── driving ──
+    def _collect(self, tick: int) -> list:
+        slot = self._slots[tick % len(self._slots)]
+        due, keep = [], []
+        for timer in slot:
+            if timer.cancelled:
+                self.counters["cancelled"] += 1
+            elif timer.due_tick <= tick:
+                due.append(timer)
+            else:
+                keep.append(timer)
+        self._pending -= len(slot) - len(keep)
+        slot[:] = keep
+        return due
+
+    async def _run(self) -> None:
+        while True:
+            next_at = self._origin + (self._current_tick + 1) * self.tick
+            await asyncio.sleep(max(0.0, next_at - time.monotonic()))
+            now = time.monotonic()
+            due = []
+            while self._origin + (self._current_tick + 1) * self.tick <= now:   # catch up if we fell behind
+                self._current_tick += 1
+                self.counters["ticks"] += 1
+                due.extend(self._collect(self._current_tick))
+            self.max_lag_ms = max(self.max_lag_ms, round((now - next_at) * 1000))
+            if due:
+                self.max_batch = max(self.max_batch, len(due))
+                await self._fire(due)
+
+    async def _fire(self, due: list) -> None:
+        chunks = [due[i:i + self.burst] for i in range(0, len(due), self.burst)]
+        spacing = self.tick / len(chunks)
+        for n, chunk in enumerate(chunks):
+            if n:
+                await asyncio.sleep(spacing)
+            for timer in chunk:
+                if timer.cancelled:
+                    continue
+                if timer.interval is not None:
+                    self._insert(timer, timer.interval)
+                    self.counters["scheduled"] -= 1          # a reschedule, not a new timer
+                self.counters["fired"] += 1
+                try:
+                    result = timer.callback(*timer.args)
+                except Exception:
+                    self.counters["errors"] += 1
+                    logger.exception("[TimerWheel] callback %r failed", timer.callback)
+                    continue
+                if inspect.isawaitable(result):
+                    task = asyncio.ensure_future(result)
+                    self._inflight.add(task)
+                    task.add_done_callback(self._async_done)
+
+    def _async_done(self, task: asyncio.Task) -> None:
+        self._inflight.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            self.counters["errors"] += 1
+            logger.warning("[TimerWheel] async callback failed: %r", task.exception())
+
+    def stats(self) -> dict:
+        return {
+            "tick_s": self.tick,
+            "slots": len(self._slots),
+            "pending": self._pending,
+            "inflight": len(self._inflight),
+            "max_batch": self.max_batch,
+            "max_lag_ms": self.max_lag_ms,
+            **self.counters,
+        }
+
+
+def build_timer_wheel(env) -> TimerWheel:
+    return TimerWheel(
+        tick=float(env.get("TIMER_WHEEL_TICK_SECONDS") or 0.5),
+        burst=int(env.get("TIMER_WHEEL_BURST") or 200),
+    )
@@ -0,0 +1,249 @@
+"""Per-session outbound command queue for the DashScope realtime connection.
+
+The SDK's ``update_session`` / ``send_raw`` / ``append_audio`` / ``commit`` /
+``create_response`` / ``cancel_response`` / ``close`` are blocking socket writes.
+Called from the event loop, one stalled write stalls every session in the
+process. Each session instead enqueues commands here and returns at once; a
+writer job on a shared thread pool drains the session's queue in order (at most
+one job per session, so commands never reorder). Redundant commands are merged
+while still queued: a pending ``update_session`` is replaced by the next one and
+back-to-back item deletes collapse into one batch. ``UpstreamStats`` records
+per-kind command latency (enqueue to write done) and queue depth process-wide.
+
+Writers are shared, so a session whose socket stops draining must not keep one
+forever. Each connection's socket gets ``write_timeout``; a write that times
+out fails the session upstream: the connection is closed and its queued
+commands are dropped. A session's queue is also capped at ``max_depth``. Past
+it the oldest queued ``append_audio`` is dropped (stale audio is worth less than
+fresh), and with no audio left to shed the session is failed the same way.
+"""
+
+import json
+import logging
+import threading
+import time
+from collections import Counter, deque
+
+try:
+    from websocket import WebSocketTimeoutException
+except ImportError:  # pragma: no cover - the DashScope SDK depends on websocket-client
+    WebSocketTimeoutException = TimeoutError
+
+logger = logging.getLogger(__name__)
+
+_WRITE_TIMEOUTS = (TimeoutError, WebSocketTimeoutException)
+
+_SAMPLES = 512
+
+
+class UpstreamStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.sent = Counter()
+        self.merged = Counter()
+        self.dropped = Counter()
+        self.errors = Counter()
+        self.peak_depth = 0
+        self._latency = {}          # kind → recent latencies (ms)
+
+    def observe_depth(self, depth: int) -> None:
+        if depth > self.peak_depth:
+            self.peak_depth = depth
+
+    def count(self, counter: Counter, kind: str) -> None:
+        with self._lock:
+            counter[kind] += 1
+
+    def record(self, kind: str, latency_ms: float, ok: bool) -> None:
+        with self._lock:
+            (self.sent if ok else self.errors)[kind] += 1
+            self._latency.setdefault(kind, deque(maxlen=_SAMPLES)).append(latency_ms)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            latency = {}
+            for kind, samples in self._latency.items():
+                ordered = sorted(samples)
+                latency[kind] = {
+                    "p50_ms": round(ordered[len(ordered) // 2], 1),
+                    "p95_ms": round(ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))], 1),
+                    "max_ms": round(ordered[-1], 1),
+                }
+            return {
+                "sent": dict(self.sent),
+                "merged": dict(self.merged),
+                "dropped": dict(self.dropped),
+                "errors": dict(self.errors),
+                "peak_depth": self.peak_depth,
+                "latency": latency,
+            }
+
+
+class _Command:
+    __slots__ = ("kind", "target", "args", "kwargs", "enqueued_at", "on_error")
+
+    def __init__(self, kind, target, args, kwargs, on_error):
+        self.kind = kind
+        self.target = target
+        self.args = args
+        self.kwargs = kwargs
+        self.enqueued_at = time.monotonic()
+        self.on_error = on_error
+
+
+def _delete_items(conversation, item_ids) -> None:
+    for item_id in item_ids:
+        conversation.send_raw(json.dumps({"type": "conversation.item.delete", "item_id": item_id}))
+
+
+def _bound_writes(conversation, timeout) -> None:
+    """Give the SDK's websocket a send timeout so a stalled peer cannot pin a writer thread."""
+    sock = getattr(getattr(conversation, "ws", None), "sock", None)
+    if timeout and sock is not None and hasattr(sock, "settimeout"):
+        sock.settimeout(timeout)
+
+
+def _close_quietly(conversation) -> None:
+    try:
+        conversation.close()
+    except Exception as e:
+        logger.warning(f"[Upstream] close after failure failed: {e}")
+
+
+class UpstreamCommandQueue:
+    def __init__(self, get_conversation, executor, stats: UpstreamStats,
+                 max_depth: int = 256, write_timeout: float = None):
+        self._get_conversation = get_conversation
+        self._executor = executor
+        self.stats = stats
+        self.max_depth = max_depth
+        self.write_timeout = write_timeout
+        self._bounded_target = None
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._pending: deque = deque()
+        self._scheduled = False
+        self._closed_target = None
+
+    # ── SDK-shaped API (all non-blocking) ──
+    def update_session(self, on_error=None, **kwargs) -> None:
+        self._submit("update_session", (), kwargs, on_error=on_error, merge=_replace)
+
+    def send_raw(self, payload: str) -> None:
+        self._submit("send_raw", (payload,), {})
+
+    def append_audio(self, audio_b64: str) -> None:
+        self._submit("append_audio", (audio_b64,), {})
+
+    def commit(self) -> None:
+        self._submit("commit", (), {})
+
+    def create_response(self) -> None:
+        self._submit("create_response", (), {})
+
+    def cancel_response(self) -> None:
+        self._submit("cancel_response", (), {})
+
+    def delete_items(self, item_ids) -> None:
+        if item_ids:
+            self._submit("delete_items", (list(item_ids),), {}, merge=_extend_ids)
+
+    def close(self) -> None:
+        """Close the current connection after everything already queued for it.
+
+        Later commands for that connection are dropped; a reconnect gets a fresh target.
+        """
+        target = self._get_conversation()
+        self._submit("close", (), {})
+        with self._lock:
+            self._closed_target = target
+
+    # ── queue mechanics ──
+    def depth(self) -> int:
+        return len(self._pending)
+
+    def _submit(self, kind, args, kwargs, on_error=None, merge=None) -> None:
+        target = self._get_conversation()
+        with self._lock:
+            if target is None or target is self._closed_target:
+                self.stats.count(self.stats.dropped, kind)
+                return
+            tail = self._pending[-1] if self._pending else None
+            if merge and tail is not None and tail.kind == kind and tail.target is target:
+                merge(tail, args, kwargs, on_error)
+                self.stats.count(self.stats.merged, kind)
+                return
+            if len(self._pending) >= self.max_depth and not self._shed_stale_audio():
+                logger.warning(f"[Upstream] queue over {self.max_depth} with no audio to shed; failing session")
+                self.stats.count(self.stats.dropped, kind)
+                self._fail_locked(target)
+                self._executor.submit(_close_quietly, target)
+                return
+            self._pending.append(_Command(kind, target, args, kwargs, on_error))
+            self.stats.observe_depth(len(self._pending))
+            if not self._scheduled:
+                self._scheduled = True
+                self._executor.submit(self._drain)
+
+    def _shed_stale_audio(self) -> bool:
+        for i, cmd in enumerate(self._pending):
+            if cmd.kind == "append_audio":
+                del self._pending[i]
+                self.stats.count(self.stats.dropped, "append_audio")
+                return True
+        return False
+
+    def _fail_locked(self, target) -> None:
+        """Drop everything queued for ``target`` and refuse later commands for it."""
+        self._closed_target = target
+        kept = deque()
+        for cmd in self._pending:
+            if cmd.target is target:
+                self.stats.count(self.stats.dropped, cmd.kind)
+            else:
+                kept.append(cmd)
+        self._pending = kept
+
+    def _drain(self) -> None:
+        while True:
+            with self._lock:
+                if not self._pending:
+                    self._scheduled = False
+                    self._idle.notify_all()
+                    return
+                cmd = self._pending.popleft()
+            if cmd.target is not self._bounded_target:
+                _bound_writes(cmd.target, self.write_timeout)
+                self._bounded_target = cmd.target
+            ok = True
+            try:
+                if cmd.kind == "delete_items":
+                    _delete_items(cmd.target, *cmd.args)
+                else:
+                    getattr(cmd.target, cmd.kind)(*cmd.args, **cmd.kwargs)
+            except Exception as e:
+                ok = False
+                logger.warning(f"[Upstream] {cmd.kind} failed: {e}")
+                if cmd.on_error:
+                    cmd.on_error(e)
+                if isinstance(e, _WRITE_TIMEOUTS):
+                    # A timed-out frame may be half written: the connection is unusable.
+                    with self._lock:
+                        self._fail_locked(cmd.target)
+                    if cmd.kind != "close":
+                        _close_quietly(cmd.target)
+            self.stats.record(cmd.kind, (time.monotonic() - cmd.enqueued_at) * 1000, ok)
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Block until every queued command has been written (or ``timeout``); True if idle."""
+        with self._idle:
+            return self._idle.wait_for(lambda: not self._scheduled, timeout=timeout)
+
+
+def _replace(tail: _Command, args, kwargs, on_error) -> None:
+    tail.args, tail.kwargs, tail.on_error = args, kwargs, on_error
+
+
+def _extend_ids(tail: _Command, args, kwargs, on_error) -> None:
+    seen = set(tail.args[0])
+    tail.args[0].extend(i for i in args[0] if i not in seen)
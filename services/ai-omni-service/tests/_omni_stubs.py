@@ -56,7 +56,7 @@ def _make_stubs() -> dict:
                 return fn
             return _wrap
 
-        get = post = put = delete = patch = websocket = middleware = _decorator
+        get = post = put = delete = patch = websocket = middleware = on_event = exception_handler = _decorator
 
     _fastapi.FastAPI = _FastAPI
     _fastapi.WebSocket = type("WebSocket", (), {})
@@ -73,6 +73,7 @@ def _make_stubs() -> dict:
 
     _fastapi_resp = types.ModuleType("fastapi.responses")
     _fastapi_resp.Response = type("Response", (), {"__init__": lambda self, *a, **kw: None})
+    _fastapi_resp.JSONResponse = _fastapi_resp.Response
 
     mods["fastapi"] = _fastapi
     mods["fastapi.middleware"] = _fastapi_mw
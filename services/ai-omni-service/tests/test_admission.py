@@ -0,0 +1,112 @@
+"""Tests for realtime session admission control (app/admission.py).
+
+  * sessions beyond the limit queue FIFO and are told their position
+  * a full queue rejects at once with a retry hint
+  * a queued session that outlives max_wait is rejected and leaves the queue
+  * a client that drops while queued frees its place for the next one
+  * snapshot() reports remaining capacity for the readiness probe
+"""
+import asyncio
+
+import pytest
+
+from app.admission import AdmissionRejected, SessionAdmission, build_session_admission
+
+
+async def _session(admission, order, tag, release, positions=None):
+    async def _on_position(position, queue_length):
+        positions.append((tag, position))
+
+    async with admission.session(on_position=_on_position if positions is not None else None):
+        order.append(tag)
+        await release.wait()
+
+
+@pytest.mark.asyncio
+async def test_queue_is_fifo_and_reports_positions():
+    admission = SessionAdmission(limit=1, queue_size=3)
+    release, order, positions = asyncio.Event(), [], []
+    tasks = [asyncio.create_task(_session(admission, order, i, release, positions)) for i in range(3)]
+    await asyncio.sleep(0.01)
+    assert order == [0]
+    assert positions == [(1, 1), (2, 2)]
+    assert admission.snapshot()["available"] == 0 and admission.snapshot()["waiting"] == 2
+    release.set()
+    await asyncio.gather(*tasks)
+    assert order == [0, 1, 2]
+    assert (2, 1) in positions                  # moved up when session 1 was admitted
+    snapshot = admission.snapshot()
+    assert snapshot["active"] == 0 and snapshot["available"] == 1 and snapshot["admitted"] == 3
+
+
+@pytest.mark.asyncio
+async def test_full_queue_rejects_with_retry_hint():
+    admission = SessionAdmission(limit=1, queue_size=1, retry_after=3)
+    release = asyncio.Event()
+    tasks = [asyncio.create_task(_session(admission, [], i, release)) for i in range(2)]
+    await asyncio.sleep(0.01)
+    with pytest.raises(AdmissionRejected) as exc:
+        async with admission.session():
+            pass
+    assert exc.value.reason == "queue_full" and exc.value.retry_after >= 3
+    assert admission.snapshot()["rejected"] == 1
+    release.set()
+    await asyncio.gather(*tasks)
+
+
+@pytest.mark.asyncio
+async def test_wait_timeout_rejects_and_leaves_queue():
+    admission = SessionAdmission(limit=1, queue_size=2, max_wait=0.02)
+    release = asyncio.Event()
+    holder = asyncio.create_task(_session(admission, [], 0, release))
+    await asyncio.sleep(0)
+    with pytest.raises(AdmissionRejected) as exc:
+        async with admission.session():
+            pass
+    assert exc.value.reason == "wait_timeout"
+    assert admission.snapshot()["waiting"] == 0 and admission.snapshot()["timeouts"] == 1
+    release.set()
+    await holder
+    assert admission.snapshot()["active"] == 0
+
+
+@pytest.mark.asyncio
+async def test_disconnect_while_queued_frees_place():
+    admission = SessionAdmission(limit=1, queue_size=2)
+    release, order = asyncio.Event(), []
+    holder = asyncio.create_task(_session(admission, order, "a", release))
+    dropped = asyncio.create_task(_session(admission, order, "b", release))
+    later = asyncio.create_task(_session(admission, order, "c", release))
+    await asyncio.sleep(0.01)
+    dropped.cancel()
+    await asyncio.sleep(0.01)
+    assert admission.snapshot()["waiting"] == 1
+    release.set()
+    await asyncio.gather(holder, later)
+    assert order == ["a", "c"]
+    assert admission.snapshot()["active"] == 0
+
+
+def test_env_configuration():
+    admission = build_session_admission({"REALTIME_MAX_SESSIONS": "50", "REALTIME_QUEUE_SIZE": "5"})
+    assert (admission.limit, admission.queue_size) == (50, 5)
+    assert build_session_admission({}).limit == 200
+
+
+@pytest.mark.asyncio
+async def test_drain_rejects_new_and_queued_sessions():
+    admission = SessionAdmission(limit=1, queue_size=2)
+    release = asyncio.Event()
+    holder = asyncio.create_task(_session(admission, [], 0, release))
+    queued = asyncio.create_task(_session(admission, [], 1, release))
+    await asyncio.sleep(0.01)
+    admission.begin_drain()
+    with pytest.raises(AdmissionRejected) as exc:
+        await queued
+    assert exc.value.reason == "draining"
+    with pytest.raises(AdmissionRejected):
+        async with admission.session():
+            pass
+    assert admission.snapshot()["draining"] and admission.snapshot()["waiting"] == 0
+    release.set()
+    await holder                                 # the admitted session runs to completion
@@ -0,0 +1,113 @@
+"""Tests for the per-call-class bulkheads (app/bulkheads.py).
+
+  * no more than ``limit`` holders at once; extra callers queue
+  * a full queue sheds at once with a positive Retry-After
+  * realtime (critical) callers jump the queue and are not shed
+  * a queued waiter that outlives max_wait is shed; critical waiters get a longer, bounded wait
+  * BULKHEAD_<CLASS> env overrides
+"""
+import asyncio
+
+import pytest
+
+from app.bulkheads import Bulkhead, BulkheadRejected, build_bulkheads, realtime_critical
+
+
+async def _hold(head, order, tag, release, critical=None):
+    async with head.slot(critical=critical):
+        order.append(tag)
+        await release.wait()
+
+
+@pytest.mark.asyncio
+async def test_limit_is_enforced():
+    head = Bulkhead("t", limit=2, queue_size=4)
+    release, order = asyncio.Event(), []
+    tasks = [asyncio.create_task(_hold(head, order, i, release)) for i in range(4)]
+    await asyncio.sleep(0.01)
+    assert order == [0, 1]
+    assert head.stats()["active"] == 2 and head.stats()["waiting"] == 2
+    release.set()
+    await asyncio.gather(*tasks)
+    assert order == [0, 1, 2, 3]
+    stats = head.stats()
+    assert stats["active"] == 0 and stats["admitted"] == 4 and stats["peak_active"] == 2
+
+
+@pytest.mark.asyncio
+async def test_full_queue_rejects_with_retry_after():
+    head = Bulkhead("t", limit=1, queue_size=1)
+    release, order = asyncio.Event(), []
+    tasks = [asyncio.create_task(_hold(head, order, i, release)) for i in range(2)]
+    await asyncio.sleep(0.01)
+    with pytest.raises(BulkheadRejected) as exc:
+        async with head.slot():
+            pass
+    assert exc.value.name == "t" and exc.value.reason == "queue_full"
+    assert exc.value.retry_after >= 1
+    assert head.stats()["rejected"] == 1
+    release.set()
+    await asyncio.gather(*tasks)
+
+
+@pytest.mark.asyncio
+async def test_critical_waiter_jumps_queue_and_is_not_shed():
+    head = Bulkhead("t", limit=1, queue_size=1)
+    release, order = asyncio.Event(), []
+    tasks = [asyncio.create_task(_hold(head, order, "bulk0", release)),
+             asyncio.create_task(_hold(head, order, "bulk1", release))]
+    await asyncio.sleep(0.01)
+
+    async def _realtime():
+        realtime_critical.set(True)
+        await _hold(head, order, "voice", release)
+
+    tasks.append(asyncio.create_task(_realtime()))
+    await asyncio.sleep(0.01)
+    release.set()
+    await asyncio.gather(*tasks)
+    assert order == ["bulk0", "voice", "bulk1"]
+    assert head.stats()["critical"] == 1 and head.stats()["rejected"] == 0
+
+
+@pytest.mark.asyncio
+async def test_wait_timeout_sheds_waiter():
+    head = Bulkhead("t", limit=1, queue_size=4, max_wait=0.02)
+    release = asyncio.Event()
+    holder = asyncio.create_task(_hold(head, [], 0, release))
+    await asyncio.sleep(0)
+    with pytest.raises(BulkheadRejected) as exc:
+        async with head.slot():
+            pass
+    assert exc.value.reason == "wait_timeout"
+    assert head.stats()["timeouts"] == 1 and head.stats()["waiting"] == 0
+    release.set()
+    await holder
+    assert head.stats()["active"] == 0
+
+
+@pytest.mark.asyncio
+async def test_critical_wait_is_bounded():
+    head = Bulkhead("t", limit=1, queue_size=0, max_wait=0.01, critical_max_wait=0.05)
+    release = asyncio.Event()
+    holder = asyncio.create_task(_hold(head, [], 0, release))
+    await asyncio.sleep(0)
+    started = asyncio.get_running_loop().time()
+    with pytest.raises(BulkheadRejected) as exc:
+        async with head.slot(critical=True):
+            pass
+    assert exc.value.reason == "wait_timeout"
+    assert asyncio.get_running_loop().time() - started >= 0.04
+    release.set()
+    await holder
+    assert head.stats()["active"] == 0 and head.stats()["timeouts"] == 1
+
+
+def test_env_overrides():
+    heads = build_bulkheads({"BULKHEAD_IMAGE": "2:3", "BULKHEAD_TTS": "9", "BULKHEAD_MAX_WAIT_SECONDS": "4"})
+    assert (heads["image"].limit, heads["image"].queue_size) == (2, 3)
+    assert (heads["tts"].limit, heads["tts"].queue_size) == (9, 12)
+    assert heads["chat"].max_wait == 4.0 and heads["chat"].critical_max_wait == 12.0
+    assert build_bulkheads({"BULKHEAD_CRITICAL_MAX_WAIT_SECONDS": "30"})["tts"].critical_max_wait == 30.0
+    with pytest.raises(ValueError):
+        build_bulkheads({"BULKHEAD_CHAT": "0:1"})
@@ -75,17 +75,42 @@ _redis_mod = types.ModuleType("redis")
 _redis_async = types.ModuleType("redis.asyncio")
 
 
+class _FakePipeline:
+    """Queues commands and replays them against the fake on execute() — one round trip."""
+
+    def __init__(self, redis):
+        self._redis = redis
+        self._calls = []
+
+    def __getattr__(self, name):
+        def _queue(*args, **kwargs):
+            self._calls.append((name, args, kwargs))
+            return self
+        return _queue
+
+    async def execute(self):
+        calls, self._calls = self._calls, []
+        self._redis.pipelines.append([name for name, _, _ in calls])
+        return [await getattr(self._redis, name)(*args, **kwargs) for name, args, kwargs in calls]
+
+
 class _FakeRedis:
     """Minimal in-memory Redis stand-in used by daily material tests."""
 
-    def __init__(self):
+    def __init__(self, **_connection_kwargs):
         self._store = {}
         self._ttl = {}
+        self.pipelines = []   # command names of each executed pipeline
+
+    def pipeline(self, transaction=True):
+        return _FakePipeline(self)
 
     async def get(self, key):
         return self._store.get(key)
 
-    async def set(self, key, value, ex=None):
+    async def set(self, key, value, ex=None, nx=False):
+        if nx and key in self._store:
+            return None
         self._store[key] = value
         if ex is not None:
             self._ttl[key] = ex
@@ -113,9 +138,10 @@ class _FakeRedis:
         stop = None if end == -1 else end + 1
         return list(values[start:stop])
 
-    async def lpush(self, key, value):
+    async def lpush(self, key, *new_values):
         values = self._store.setdefault(key, [])
-        values.insert(0, value)
+        for value in new_values:
+            values.insert(0, value)
         return len(values)
 
     async def ltrim(self, key, start, end):
@@ -128,6 +154,59 @@ class _FakeRedis:
         self._ttl[key] = ttl
         return True
 
+    async def zadd(self, key, mapping):
+        self._store.setdefault(key, {}).update(mapping)
+        return len(mapping)
+
+    async def zrangebyscore(self, key, lo, hi):
+        lo = float("-inf") if lo == "-inf" else float(lo)
+        hi = float("inf") if hi == "+inf" else float(hi)
+        members = self._store.get(key, {})
+        return [m for m, sc in sorted(members.items(), key=lambda kv: kv[1]) if lo <= sc <= hi]
+
+    async def zremrangebyscore(self, key, lo, hi):
+        doomed = await self.zrangebyscore(key, lo, hi)
+        for m in doomed:
+            self._store[key].pop(m, None)
+        return len(doomed)
+
+    async def hset(self, key, mapping=None, **kwargs):
+        self._store.setdefault(key, {}).update(mapping or {})
+        return len(mapping or {})
+
+    async def hget(self, key, field):
+        return self._store.get(key, {}).get(field)
+
+    async def hgetall(self, key):
+        return dict(self._store.get(key, {}))
+
+    async def sadd(self, key, *members):
+        values = self._store.setdefault(key, set())
+        before = len(values)
+        values.update(members)
+        return len(values) - before
+
+    async def smembers(self, key):
+        return set(self._store.get(key, set()))
+
+    async def srem(self, key, *members):
+        values = self._store.get(key, set())
+        removed = len(values & set(members))
+        values.difference_update(members)
+        return removed
+
+    async def scard(self, key):
+        return len(self._store.get(key, set()))
+
+    async def spop(self, key, count=None):
+        values = self._store.get(key, set())
+        popped = [values.pop() for _ in range(min(count or 1, len(values)))]
+        return popped if count is not None else (popped[0] if popped else None)
+
+    async def mget(self, keys, *more):
+        keys = [keys, *more] if isinstance(keys, str) else keys
+        return [self._store.get(k) for k in keys]
+
 
 _redis_async.Redis = _FakeRedis
 _redis_async.from_url = lambda *a, **kw: _FakeRedis()
@@ -270,6 +349,17 @@ class TestGenerateDailyQuestionPool:
         assert isinstance(result, list)
         assert len(result) >= 1
 
+    @pytest.mark.asyncio
+    async def test_saturated_bulkhead_is_not_swallowed_by_fallback(self, monkeypatch):
+        # Shedding must reach the app handler (429 + Retry-After), not turn into
+        # a silently degraded static pool.
+        head = type(_main_module._BULKHEADS["daily_qa"])("daily_qa", limit=1, queue_size=0)
+        monkeypatch.setitem(_main_module._BULKHEADS, "daily_qa", head)
+        async with head.slot():
+            with _mock_llm(json.dumps([{"question_text": "Q1"}])), \
+                    pytest.raises(_main_module.BulkheadRejected):
+                await _generate_pool(target_language="English", native_language="Chinese", count=1)
+
 
 # =========================================================================
 # 2. Redis cache lifecycle — GET /daily-question
@@ -545,7 +635,7 @@ class TestSceneProgressWithoutMedia:
     async def test_uses_authoritative_current_task_context(self):
         callback = MagicMock()
         callback.phase_key = "user-1:Restaurant"
-        callback.messages = [{"role": "user", "content": "この料理はいくらですか。"}]
+        callback.messages = _main_module.MessageRing(10, [{"role": "user", "content": "この料理はいくらですか。"}])
         callback.user_context = {
             "native_language": "Chinese",
             "active_goal": {
@@ -583,7 +673,7 @@ class TestSceneProgressWithoutMedia:
     async def test_emits_ready_event_without_media_url(self):
         callback = MagicMock()
         callback.phase_key = "user-1:Restaurant"
-        callback.messages = [{"role": "user", "content": "この料理はいくらですか。"}]
+        callback.messages = _main_module.MessageRing(10, [{"role": "user", "content": "この料理はいくらですか。"}])
         callback.user_context = {
             "active_goal": {"current_task": {"scenario_title": "Restaurant"}}
         }
@@ -1070,3 +1160,197 @@ class TestDailyQaInjectionGuard:
             pytest.skip("_is_daily_qa_injection() not yet exposed")
         assert fn("") is False
         assert fn(None) is False
+
+
+# =========================================================================
+# Nightly pre-generation of tomorrow's pools
+# =========================================================================
+
+
+@skip_if_no_impl
+class TestDailyQaPrefetch:
+    PROFILE = dict(target_language="English", native_language="Chinese", goal_type="travel",
+                   interests="food", goal_description="Trip to London", progress_context="")
+
+    async def _activate(self, redis, uid):
+        await _main_module._record_daily_qa_profile(redis, uid, **self.PROFILE)
+
+    @pytest.mark.asyncio
+    async def test_builds_pool_for_active_users_and_resumes(self, fake_redis):
+        await self._activate(fake_redis, "u1")
+        await self._activate(fake_redis, "u2")
+        date_str = _main_module._product_date_str(1)
+        pool = [{"question_text": f"Q{i}", "lang": "en", "reference_answer": ""} for i in range(5)]
+
+        with _mock_llm(json.dumps(pool)):
+            stats = await _main_module.run_daily_qa_prefetch(fake_redis, date_str, concurrency=2)
+        assert stats["status"] == "done"
+        assert (stats["total"], stats["built"], stats["failed"]) == (2, 2, 0)
+        cached = json.loads(fake_redis._store[f"daily_qa_pool:u1:english:{date_str}"])
+        assert cached["prefetched"] is True and cached["picked"] in cached["pool"]
+        assert fake_redis._store[f"daily_qa_prefetch:run:{date_str}"]["status"] == "done"
+
+        # Re-run (e.g. after a crash) skips users whose pool already exists.
+        with _mock_llm(error=AssertionError("LLM must not be called for finished users")):
+            again = await _main_module.run_daily_qa_prefetch(fake_redis, date_str)
+        assert again["skipped"] == 2 and again["built"] == 0
+
+    @pytest.mark.asyncio
+    async def test_fallback_pool_is_not_cached(self, fake_redis):
+        await self._activate(fake_redis, "u1")
+        date_str = _main_module._product_date_str(1)
+        with _mock_llm(error=RuntimeError("llm down")):
+            stats = await _main_module.run_daily_qa_prefetch(fake_redis, date_str)
+        assert stats["failed"] == 1 and stats["status"] == "partial"
+        assert f"daily_qa_pool:u1:english:{date_str}" not in fake_redis._store
+
+    @pytest.mark.asyncio
+    async def test_lock_prevents_concurrent_run(self, fake_redis):
+        date_str = _main_module._product_date_str(1)
+        await fake_redis.set(f"daily_qa_prefetch:lock:{date_str}", "1")
+        stats = await _main_module.run_daily_qa_prefetch(fake_redis, date_str)
+        assert stats["status"] == "locked"
+
+    @pytest.mark.asyncio
+    async def test_first_open_of_prefetched_pool_records_history(self, fake_redis, user_id, today_iso):
+        pool = [{"question_text": "Prefetched Q", "lang": "en", "reference_answer": ""}]
+        key = f"daily_qa_pool:{user_id}:english:{today_iso}"
+        await fake_redis.setex(key, 48 * 3600, json.dumps(
+            {"pool": pool, "index": 0, "picked": pool[0], "prefetched": True}))
+
+        with _mock_llm(error=AssertionError("LLM must NOT be called for a prefetched pool")):
+            result = await _main_module.handle_daily_question(fake_redis, user_id, target_language="English")
+        assert result["question_text"] == "Prefetched Q"
+        assert fake_redis._store[f"daily_qa_history:{user_id}"] == ["Prefetched Q"]
+        assert "prefetched" not in json.loads(fake_redis._store[key])
+
+
+# =========================================================================
+# Shared question bank
+# =========================================================================
+
+
+@skip_if_no_impl
+class TestDailyQaBank:
+    BUCKET_ARGS = ("English", "Chinese", "travel", "B1")
+
+    async def _seed(self, redis, n):
+        bucket = _main_module._daily_qa_bank_key(*self.BUCKET_ARGS)
+        pool = [{"question_text": f"Bank Q{i}", "lang": "en", "reference_answer": ""} for i in range(n)]
+        await _main_module._daily_qa_bank_add(redis, bucket, pool)
+        return bucket
+
+    @pytest.mark.asyncio
+    async def test_draw_serves_unseen_questions_without_llm(self, fake_redis, user_id, monkeypatch):
+        monkeypatch.setattr(_main_module, "_DAILY_QA_BANK_LOW_WATER", 0)
+        await self._seed(fake_redis, 8)
+        await _main_module._add_daily_qa_history(fake_redis, user_id, "Bank Q0")
+
+        with _mock_llm(error=AssertionError("LLM must NOT be called when the bank can serve")):
+            result = await _main_module.handle_daily_question(
+                fake_redis, user_id, target_language="English", native_language="Chinese",
+                goal_type="travel", interests="food", target_level="B1")
+        assert result["question_text"].startswith("Bank Q")
+        assert result["question_text"] != "Bank Q0"
+
+    @pytest.mark.asyncio
+    async def test_draw_is_deterministic_per_user_and_day(self, fake_redis):
+        bucket = await self._seed(fake_redis, 20)
+        a, unseen = await _main_module._daily_qa_bank_draw(fake_redis, bucket, [], "u1|2026-01-01", count=5)
+        b, _ = await _main_module._daily_qa_bank_draw(fake_redis, bucket, [], "u1|2026-01-01", count=5)
+        assert a == b and len(a) == 5 and unseen == 20
+
+    @pytest.mark.asyncio
+    async def test_strong_interests_get_personalized_pool(self, fake_redis, user_id, monkeypatch):
+        monkeypatch.setattr(_main_module, "_DAILY_QA_BANK_LOW_WATER", 0)
+        await self._seed(fake_redis, 8)
+        personal = [{"question_text": "What jazz album do you love?", "lang": "en"}]
+        with _mock_llm(json.dumps(personal)):
+            pool, source = await _main_module._build_daily_qa_pool(
+                fake_redis, user_id, "2026-01-01", [], target_language="English",
+                native_language="Chinese", goal_type="travel", interests="jazz, hiking, chess",
+                target_level="B1")
+        assert source == "llm"
+        assert pool[0]["question_text"] == "What jazz album do you love?"
+
+    @pytest.mark.asyncio
+    async def test_refill_is_single_flight_and_skips_fallback(self, fake_redis):
+        bucket = _main_module._daily_qa_bank_key(*self.BUCKET_ARGS)
+        generic = [{"question_text": f"Generic Q{i}", "lang": "en"} for i in range(4)]
+        with _mock_llm(json.dumps(generic)):
+            added = await _main_module._refill_daily_qa_bank(fake_redis, bucket, *self.BUCKET_ARGS)
+            again = await _main_module._refill_daily_qa_bank(fake_redis, bucket, *self.BUCKET_ARGS)
+        assert (added, again) == (4, 0)
+        assert await fake_redis.scard(bucket) == 4
+
+        await fake_redis.delete(f"daily_qa_bank:refill:{bucket}")
+        with _mock_llm(error=RuntimeError("llm down")):
+            assert await _main_module._refill_daily_qa_bank(fake_redis, bucket, *self.BUCKET_ARGS) == 0
+        assert await fake_redis.scard(bucket) == 4
+
+    @pytest.mark.asyncio
+    async def test_failed_refill_releases_its_lock(self, fake_redis):
+        bucket = _main_module._daily_qa_bank_key(*self.BUCKET_ARGS)
+        lock_key = f"daily_qa_bank:refill:{bucket}"
+        with _mock_llm(error=RuntimeError("llm down")):
+            assert await _main_module._refill_daily_qa_bank(fake_redis, bucket, *self.BUCKET_ARGS) == 0
+        assert await fake_redis.get(lock_key) is None          # next low-water draw may retry
+        with _mock_llm("<<not json>>"):                         # static fallback pool is not banked
+            assert await _main_module._refill_daily_qa_bank(fake_redis, bucket, *self.BUCKET_ARGS) == 0
+        assert await fake_redis.get(lock_key) is None
+        generic = [{"question_text": f"Generic Q{i}", "lang": "en"} for i in range(4)]
+        with _mock_llm(json.dumps(generic)):
+            assert await _main_module._refill_daily_qa_bank(fake_redis, bucket, *self.BUCKET_ARGS) == 4
+        assert await fake_redis.get(lock_key) is not None      # kept: throttles back-to-back refills
+
+    @pytest.mark.asyncio
+    async def test_low_water_refill_is_tracked_for_drain(self, fake_redis, user_id, monkeypatch):
+        monkeypatch.setattr(_main_module, "_DAILY_QA_BANK_LOW_WATER", 100)
+        await self._seed(fake_redis, 8)
+        refill = AsyncMock(return_value=0)
+        monkeypatch.setattr(_main_module, "_refill_daily_qa_bank", refill)
+        tracker = _main_module.BackgroundTasks()
+        monkeypatch.setattr(_main_module, "_BACKGROUND_TASKS", tracker)
+        pool, source = await _main_module._build_daily_qa_pool(
+            fake_redis, user_id, "2026-01-01", [], target_language="English",
+            native_language="Chinese", goal_type="travel", target_level="B1")
+        assert source == "bank" and tracker.pending() == {"daily_qa_refill": 1}
+        await tracker.flush(timeout=1)
+        refill.assert_awaited_once()
+
+
+# =========================================================================
+# Redis round trips
+# =========================================================================
+
+
+@skip_if_no_impl
+class TestDailyQaRoundTrips:
+    @pytest.mark.asyncio
+    async def test_history_write_is_one_pipeline(self, fake_redis, user_id):
+        await fake_redis.lpush(f"daily_qa_history:{user_id}", "old")
+        await _main_module._add_daily_qa_history(fake_redis, user_id, ["newest", "second"])
+        assert fake_redis.pipelines == [["lpush", "ltrim", "expire"]]
+        assert fake_redis._store[f"daily_qa_history:{user_id}"] == ["newest", "second", "old"]
+
+    @pytest.mark.asyncio
+    async def test_cache_hit_reads_pool_and_passed_in_one_mget(self, fake_redis, user_id, today_iso):
+        pool = [{"question_text": "Cached Q", "lang": "en"}]
+        await fake_redis.setex(f"daily_qa_pool:{user_id}:english:{today_iso}", 3600,
+                               json.dumps({"pool": pool, "index": 0, "picked": pool[0]}))
+        await fake_redis.set(f"daily_qa_passed:{user_id}:{today_iso}", "1")
+        with patch.object(fake_redis, "get", side_effect=AssertionError("use MGET")):
+            result = await _main_module.handle_daily_question(fake_redis, user_id, target_language="English")
+        assert result["question_text"] == "Cached Q" and result["passed"] is True
+
+    def test_first_redis_client_call_returns_the_client(self, monkeypatch):
+        # Fresh process state: no client built yet. The first caller (quota gate,
+        # daily-QA, scene-image prewarm) must get the client, not None.
+        redis_pkg = types.ModuleType("redis")
+        redis_pkg.asyncio = types.SimpleNamespace(Redis=_FakeRedis)
+        monkeypatch.setitem(sys.modules, "redis", redis_pkg)
+        monkeypatch.setitem(sys.modules, "redis.asyncio", redis_pkg.asyncio)
+        monkeypatch.setattr(_main_module, "_redis_client_singleton", None)
+        client = _main_module._get_redis_client()
+        assert client is not None
+        assert _main_module._get_redis_client() is client
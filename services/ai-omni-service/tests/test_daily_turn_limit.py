@@ -32,13 +32,28 @@ _install_stub("dashscope.audio", _ds_audio)
 _install_stub("dashscope.audio.qwen_omni", _ds_qwen_omni)
 os.environ.setdefault("QWEN3_OMNI_API_KEY", "test-key")
 
-# --- stub redis / redis.asyncio （FakeRedis 加 incr/expire） ---
+# --- stub redis / redis.asyncio （FakeRedis 加 incr/expire/pipeline） ---
 _redis_mod = types.ModuleType("redis")
 _redis_async = types.ModuleType("redis.asyncio")
+class _FakePipeline:
+    """排队命令，execute() 时按序回放 —— 计为一次往返"""
+    def __init__(self, redis):
+        self._redis = redis; self._calls = []
+    def __getattr__(self, name):
+        def _queue(*args, **kwargs):
+            self._calls.append((name, args, kwargs)); return self
+        return _queue
+    async def execute(self):
+        calls, self._calls = self._calls, []
+        self._redis.round_trips += 1
+        return [await getattr(self._redis, n)(*a, **kw) for n, a, kw in calls]
 class _FakeRedis:
     def __init__(self):
         self._store = {}
         self._ttl = {}
+        self.round_trips = 0
+    def pipeline(self, transaction=True):
+        return _FakePipeline(self)
     async def get(self, key):
         return self._store.get(key)
     async def setex(self, key, ttl, value):
@@ -46,6 +61,11 @@ class _FakeRedis:
     async def incr(self, key):
         self._store[key] = str(int(self._store.get(key, 0)) + 1)
         return int(self._store[key])
+    async def incrby(self, key, n):
+        self._store[key] = str(int(self._store.get(key, 0)) + n)
+        return int(self._store[key])
+    async def decrby(self, key, n):
+        return await self.incrby(key, -n)
     async def expire(self, key, ttl):
         self._ttl[key] = ttl; return True
     async def ttl(self, key):
@@ -104,6 +124,12 @@ async def test_incr_called_n_times(fake_redis):
         await omni._incr_daily_turns(fake_redis, "u9")
     assert await omni._get_daily_turns(fake_redis, "u9") == 3
 
+@pytest.mark.asyncio
+async def test_incr_sets_ttl_in_one_round_trip(fake_redis):
+    assert await omni._incr_daily_turns(fake_redis, "uR") == 1
+    assert fake_redis.round_trips == 1
+    assert await fake_redis.ttl(omni._daily_turn_key("uR")) == 48 * 3600
+
 @pytest.mark.asyncio
 async def test_check_daily_limit_blocks_at_limit(fake_redis):
     for _ in range(omni.FREE_DAILY_TURNS):
@@ -126,3 +152,55 @@ async def test_check_daily_limit_fail_open_none_client():
     blocked, info = await omni._check_daily_limit(None, "uX", {"subscription_status": "free"})
     assert blocked is False  # used=0 < limit
     assert info["used"] == 0
+
+
+# --- 每会话额度租约 ---
+
+PRO = {"subscription_status": "active"}
+FREE = {"subscription_status": "free"}
+
+@pytest.mark.asyncio
+async def test_lease_spends_locally_and_returns_unspent(fake_redis):
+    lease = omni._DailyTurnLease("uL", PRO)
+    assert lease.lease_size == min(omni.DAILY_TURN_LEASE_SIZE, omni.PRO_DAILY_TURNS // 10)
+    for _ in range(lease.lease_size):
+        blocked, _ = await lease.check(fake_redis)
+        assert blocked is False
+        await lease.spend(fake_redis)
+    assert fake_redis.round_trips == 1  # 一次预留覆盖整批轮次
+    await lease.check(fake_redis)       # 第二批
+    await lease.spend(fake_redis)
+    await lease.release(fake_redis)
+    assert await omni._get_daily_turns(fake_redis, "uL") == lease.lease_size + 1
+
+@pytest.mark.asyncio
+async def test_concurrent_leases_never_exceed_limit(fake_redis):
+    key = omni._daily_turn_key("uC")
+    fake_redis._store[key] = str(omni.PRO_DAILY_TURNS - 3)
+    a, b = omni._DailyTurnLease("uC", PRO), omni._DailyTurnLease("uC", PRO)
+    assert (await a.check(fake_redis))[0] is False
+    assert a.available == 3
+    blocked, info = await b.check(fake_redis)
+    assert blocked is True
+    assert info == {"tier": "pro", "used": omni.PRO_DAILY_TURNS, "limit": omni.PRO_DAILY_TURNS}
+    assert int(fake_redis._store[key]) == omni.PRO_DAILY_TURNS
+
+@pytest.mark.asyncio
+async def test_free_tier_lease_is_per_turn(fake_redis):
+    lease = omni._DailyTurnLease("uF2", FREE)
+    assert lease.lease_size == 1
+    for _ in range(omni.FREE_DAILY_TURNS):
+        assert (await lease.check(fake_redis))[0] is False
+        await lease.spend(fake_redis)
+    assert (await lease.check(fake_redis))[0] is True
+
+@pytest.mark.asyncio
+async def test_lease_fail_open(fake_redis):
+    lease = omni._DailyTurnLease("uX", PRO)
+    assert (await lease.check(None))[0] is False
+    class _Boom:
+        def pipeline(self, *a, **k): raise RuntimeError("redis down")
+    assert (await lease.check(_Boom()))[0] is False
+    # 租约为空时花费退回逐轮 INCR，不漏记
+    await lease.spend(fake_redis)
+    assert await omni._get_daily_turns(fake_redis, "uX") == 1
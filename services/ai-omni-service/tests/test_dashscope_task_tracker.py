@@ -0,0 +1,101 @@
+"""Tests for the shared DashScope async-task poller (_DashScopeTaskTracker).
+
+Timings are scaled down (1 "second" = 20 ms) via the tracker's constructor.
+
+  * waiters resolve as soon as the task's status is final
+  * FAILED tasks resolve to None; abandoned waits drop the task
+  * learned time-to-result moves the first poll, so a batch of renders costs
+    fewer polls than the historical fixed 2 s schedule
+  * _try_wanx_image submits, then gets its result from the shared poller
+"""
+import asyncio
+import math
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(__file__))
+import _omni_stubs  # noqa: E402
+
+_main = _omni_stubs.load_main()
+
+UNIT = 0.02
+
+
+def _tracker(durations: dict, fail=()):
+    tracker = _main._DashScopeTaskTracker(first_delay=2 * UNIT, min_interval=0.5 * UNIT, max_interval=3 * UNIT)
+    started = {}
+
+    async def _fake_fetch(client, task_id):
+        age = time.monotonic() - started.setdefault(task_id, tracker._tasks[task_id]["submitted"])
+        if age < durations[task_id]:
+            return {"task_status": "RUNNING"}
+        if task_id in fail:
+            return {"task_status": "FAILED"}
+        return {"task_status": "SUCCEEDED", "results": [{"url": f"https://oss/{task_id}.png"}]}
+
+    tracker._fetch_status = _fake_fetch
+    return tracker
+
+
+@pytest.mark.asyncio
+async def test_resolves_success_and_failure():
+    tracker = _tracker({"ok": 1 * UNIT, "bad": 1 * UNIT}, fail={"bad"})
+    ok, bad = await asyncio.gather(tracker.wait("ok"), tracker.wait("bad"))
+    assert ok["results"][0]["url"] == "https://oss/ok.png"
+    assert bad is None
+    stats = tracker.stats()
+    assert (stats["succeeded"], stats["failed"], stats["outstanding"]) == (1, 1, 0)
+    assert stats["time_to_result_s"]["samples"] == 2
+
+
+@pytest.mark.asyncio
+async def test_abandoned_wait_drops_task():
+    tracker = _tracker({"slow": 100 * UNIT})
+    with pytest.raises(asyncio.TimeoutError):
+        await asyncio.wait_for(tracker.wait("slow"), timeout=3 * UNIT)
+    assert tracker.stats()["outstanding"] == 0 and tracker.counters["abandoned"] == 1
+
+
+@pytest.mark.asyncio
+async def test_fewer_polls_than_fixed_schedule_once_warm():
+    durations = {f"t{i}": (3 + 2 * (i % 4)) * UNIT for i in range(12)}
+    tracker = _tracker(durations)
+    await asyncio.gather(*(tracker.wait(t) for t in list(durations)[:4]))    # warm-up: learn time-to-result
+    warm_polls = tracker.counters["polls"]
+    await asyncio.gather(*(tracker.wait(t) for t in list(durations)[4:]))
+    adaptive = tracker.counters["polls"] - warm_polls
+    fixed = sum(math.ceil(d / (2 * UNIT)) for d in list(durations.values())[4:])   # legacy: poll every 2 s
+    assert adaptive < fixed
+
+
+@pytest.mark.asyncio
+async def test_try_wanx_image_uses_shared_tracker(monkeypatch):
+    class _Resp:
+        status_code = 200
+        text = ""
+
+        def json(self):
+            return {"output": {"task_id": "job-1"}}
+
+    class _Client:
+        def __init__(self, *a, **kw):
+            pass
+
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *exc):
+            return False
+
+        async def post(self, *a, **kw):
+            return _Resp()
+
+    monkeypatch.setattr(_main.httpx, "AsyncClient", _Client)
+    tracker = _tracker({"job-1": 1 * UNIT})
+    monkeypatch.setattr(_main, "_dashscope_tasks", tracker)
+    url = await _main._try_wanx_image("Cafe", "a cafe", timeout=2)
+    assert url == "https://oss/job-1.png"
+    assert tracker.counters["succeeded"] == 1
@@ -0,0 +1,112 @@
+"""Tests for the graceful drain (app/drain.py and _drain_realtime_sessions).
+
+  * flush waits for in-flight background work and reports it by kind
+  * work still running at the deadline is cancelled and reported abandoned
+  * idle sessions are handed off at once; a session mid-response is handed
+    off at its turn boundary, or forced once the session deadline passes
+"""
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(__file__))
+import _omni_stubs  # noqa: E402
+
+from app.drain import BackgroundTasks  # noqa: E402
+
+_main = _omni_stubs.load_main()
+
+
+@pytest.mark.asyncio
+async def test_flush_reports_flushed_and_abandoned():
+    tasks = BackgroundTasks()
+    done = []
+
+    async def _work(delay, tag):
+        await asyncio.sleep(delay)
+        done.append(tag)
+
+    tasks.spawn(_work(0.01, "upload"), "ai_turn_upload")
+    tasks.spawn(_work(0.01, "write"), "message_write")
+    tasks.spawn(_work(5, "stuck"), "message_write")
+    assert tasks.pending() == {"ai_turn_upload": 1, "message_write": 2}
+    report = await tasks.flush(timeout=0.1)
+    assert sorted(done) == ["upload", "write"]
+    assert report["flushed"] == 2 and report["abandoned"] == 1
+    assert report["abandoned_by_kind"] == {"message_write": 1}
+    await asyncio.sleep(0)
+    assert tasks.pending() == {}
+
+
+@pytest.mark.asyncio
+async def test_flush_waits_for_work_spawned_during_flush():
+    tasks = BackgroundTasks()
+
+    async def _parent():
+        await asyncio.sleep(0.01)
+        tasks.spawn(asyncio.sleep(0.01), "message_write")
+
+    tasks.spawn(_parent(), "ai_turn_upload")
+    report = await tasks.flush(timeout=1)
+    assert report == {"flushed": 2, "abandoned": 0,
+                      "flushed_by_kind": {"ai_turn_upload": 1, "message_write": 1},
+                      "abandoned_by_kind": {}}
+
+
+class _FakeSession:
+    def __init__(self, name, responding=False):
+        self.session_id = name
+        self.ai_responding = responding
+        self.user_audio_buffer = bytearray()
+        self.drain_requested = False
+        self.drain_notified = False
+        self.handed_off_mid_turn = None
+
+    def at_turn_boundary(self):
+        return not self.ai_responding and not self.user_audio_buffer
+
+    async def notify_drain(self):
+        if self.drain_notified:
+            return
+        self.drain_notified = True
+        self.handed_off_mid_turn = not self.at_turn_boundary()
+        _main._live_sessions.discard(self)
+
+
+@pytest.fixture
+def drain_env(monkeypatch):
+    monkeypatch.setattr(_main, "_live_sessions", set())
+    monkeypatch.setattr(_main, "_BACKGROUND_TASKS", BackgroundTasks())
+    monkeypatch.setattr(_main, "_SESSION_ADMISSION", _main.build_session_admission({}))
+    monkeypatch.setattr(_main, "_DRAIN_FLUSH_RESERVE_SECONDS", 0.2)
+
+
+@pytest.mark.asyncio
+async def test_drain_hands_off_at_turn_boundaries(drain_env):
+    idle, busy = _FakeSession("idle"), _FakeSession("busy", responding=True)
+    _main._live_sessions.update({idle, busy})
+    _main._BACKGROUND_TASKS.spawn(asyncio.sleep(0.01), "user_audio_upload")
+
+    async def _finish_turn():
+        await asyncio.sleep(0.05)
+        busy.ai_responding = False
+        if busy.drain_requested:
+            await busy.notify_drain()
+
+    asyncio.create_task(_finish_turn())
+    report = await _main._drain_realtime_sessions(deadline=2)
+    assert idle.handed_off_mid_turn is False and busy.handed_off_mid_turn is False
+    assert report["sessions"] == 2 and report["sessions_forced"] == 0
+    assert report["tasks_flushed"] == 1 and report["tasks_abandoned"] == 0
+    assert _main._SESSION_ADMISSION.snapshot()["draining"]
+
+
+@pytest.mark.asyncio
+async def test_drain_forces_handoff_after_deadline(drain_env):
+    stuck = _FakeSession("stuck", responding=True)
+    _main._live_sessions.add(stuck)
+    report = await _main._drain_realtime_sessions(deadline=0.4)
+    assert stuck.handed_off_mid_turn is True
+    assert report["sessions_forced"] == 1
@@ -0,0 +1,118 @@
+"""Tests for per-session memory accounting and tracemalloc diffs (app/memory_accounting.py).
+
+  * deep_sizeof follows containers, __dict__ and __slots__, counting shared objects once
+  * a session's footprint reports audio buffers and growing id sets per field
+  * a tracemalloc diff names the allocating line
+  * the report and snapshot endpoints do their walking in a worker thread
+"""
+import asyncio
+import os
+import sys
+import threading
+import types
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(__file__))
+import _omni_stubs  # noqa: E402
+
+from app.memory_accounting import TracemallocSnapshots, account, deep_sizeof  # noqa: E402
+
+_main = _omni_stubs.load_main()
+
+
+def test_deep_sizeof_follows_containers_and_slots():
+    blob = b"x" * 10_000
+    assert deep_sizeof([blob]) > 10_000
+    assert deep_sizeof({"a": blob, "b": blob}) < 2 * 10_000        # shared value counted once
+    message = _main.ChatMessage("user", "y" * 5_000)
+    assert deep_sizeof(message) > 5_000
+    ring = _main.MessageRing(10, [{"role": "user", "content": "z" * 3_000}])
+    assert deep_sizeof(ring) > 3_000
+
+
+def test_account_reports_bytes_and_len_per_field():
+    report = account({"buf": bytearray(4096), "ids": {"r1", "r2"}, "none": None})
+    assert report["fields"]["buf"]["len"] == 4096 and report["fields"]["buf"]["bytes"] >= 4096
+    assert report["fields"]["ids"]["len"] == 2
+    assert report["total_bytes"] == sum(f["bytes"] for f in report["fields"].values())
+
+
+def test_session_footprint_shows_growth(monkeypatch):
+    monkeypatch.setattr(_main, "session_phases", _main._TTLDict(ttl=60, maxsize=16))
+    ctx = {"id": 1, "target_language": "English", "native_language": "Chinese", "active_goal": {}}
+    cb = _main.WebSocketCallback(None, None, ctx, "tok", "1", "s-1", [], scenario="Coffee shop")
+    _main.session_phases[cb.phase_key] = {"phase": "oral_practice", "task_index": 0}
+    before = cb.memory_footprint()
+    cb.user_audio_buffer.extend(b"\x00" * 64_000)
+    cb.ignored_response_ids.update(f"resp_{i:06d}" for i in range(500))
+    after = cb.memory_footprint()
+    assert after["fields"]["user_audio_buffer"]["bytes"] >= 64_000
+    assert after["fields"]["ignored_response_ids"]["len"] == 500
+    assert after["fields"]["ignored_response_ids"]["bytes"] > before["fields"]["ignored_response_ids"]["bytes"] + 20_000
+    assert after["fields"]["phase_entry"]["bytes"] > 0
+    assert after["total_bytes"] > before["total_bytes"] + 80_000
+
+
+def test_tracemalloc_diff_names_allocating_line():
+    snapshots = TracemallocSnapshots()
+    with pytest.raises(RuntimeError):
+        snapshots.diff()
+    snapshots.start()
+    try:
+        hoard = [bytes(1000) + bytes([i % 256]) for i in range(2000)]   # the growth to find
+        report = snapshots.diff(limit=5)
+    finally:
+        snapshots.stop()
+    assert hoard
+    top = report["top"][0]
+    assert "test_memory_accounting.py:" in top["site"]
+    assert top["size_diff_bytes"] >= 2_000_000 and top["count_diff"] >= 2000
+    assert snapshots.status()["tracing"] is False
+
+
+@pytest.mark.asyncio
+async def test_memory_endpoints_walk_off_the_event_loop(monkeypatch):
+    loop_thread = threading.get_ident()
+    walked_on = []
+
+    class _Session:
+        session_id = "s-1"
+
+        def memory_footprint(self):
+            walked_on.append(threading.get_ident())
+            return account({"buf": bytearray(16)})
+
+    class _Snapshots:
+        def diff(self, limit=25):
+            walked_on.append(threading.get_ident())
+            return {"top": []}
+
+    monkeypatch.setattr(_main, "_require_internal_auth", lambda request: None)
+    monkeypatch.setattr(_main, "_live_sessions", [_Session()])
+    monkeypatch.setattr(_main, "_TRACEMALLOC", _Snapshots())
+    report = await _main.session_memory_report(types.SimpleNamespace())
+    await _main.tracemalloc_control(types.SimpleNamespace(), action="diff")
+    assert report["data"]["session_count"] == 1
+    assert len(walked_on) == 2 and loop_thread not in walked_on
+
+
+def test_deep_sizeof_tolerates_concurrent_mutation():
+    ids = set(range(20_000))
+    stop = threading.Event()
+
+    def _mutate():
+        i = 20_000
+        while not stop.is_set():
+            ids.add(i)
+            ids.discard(i - 20_000)
+            i += 1
+
+    writer = threading.Thread(target=_mutate)
+    writer.start()
+    try:
+        for _ in range(5):
+            assert deep_sizeof({"ids": ids}) > 0
+    finally:
+        stop.set()
+        writer.join()
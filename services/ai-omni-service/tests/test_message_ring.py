@@ -0,0 +1,70 @@
+"""Tests for the per-session message ring (app/message_ring.py).
+
+  * the ring never holds more than ``cap`` messages
+  * latest-per-role and per-role counts stay right across eviction
+  * the task cursor hides pre-loaded / earlier-task history from since_task
+  * clear() starts a fresh task period; tail() yields wire-format dicts
+"""
+import pytest
+
+from app.message_ring import ChatMessage, MessageRing
+
+
+def _msg(role, i):
+    return {"id": f"{role}-{i}", "role": role, "content": f"{role} {i}", "timestamp": f"t{i}"}
+
+
+def test_cap_bounds_memory():
+    ring = MessageRing(5)
+    for i in range(50):
+        ring.append(_msg("user" if i % 2 else "assistant", i))
+    assert len(ring) == 5
+    assert [m.content for m in ring] == [f"{'user' if i % 2 else 'assistant'} {i}" for i in range(45, 50)]
+
+
+def test_latest_and_counts_survive_eviction():
+    ring = MessageRing(3)
+    ring.append(_msg("assistant", 0))
+    for i in range(1, 4):
+        ring.append(_msg("user", i))
+    assert ring.latest("assistant") is None          # evicted, no newer AI message
+    assert ring.latest_content("assistant") == ""
+    assert ring.latest("user").id == "user-3"
+    assert ring.count("user") == 3 and ring.count("assistant") == 0
+    ring.append(_msg("assistant", 4))
+    assert ring.latest_content("assistant") == "assistant 4"
+    assert ring.count("user") == 2
+
+
+def test_task_cursor_and_clear():
+    ring = MessageRing(20, [_msg("user", 0), _msg("assistant", 1)])
+    ring.mark_task_start()
+    assert ring.since_task() == []
+    for i in range(2, 6):
+        ring.append(_msg("user", i))
+    assert [m.id for m in ring.since_task(limit=2)] == ["user-4", "user-5"]
+    assert len(ring.since_task()) == 4
+
+    ring.clear()
+    assert not ring and ring.latest("user") is None
+    ring.append(_msg("assistant", 6))
+    assert [m.id for m in ring.since_task()] == ["assistant-6"]
+
+
+def test_cursor_stays_valid_when_history_is_evicted():
+    ring = MessageRing(4, [_msg("user", i) for i in range(3)])
+    ring.mark_task_start()
+    for i in range(3, 9):
+        ring.append(_msg("assistant", i))
+    assert [m.id for m in ring.since_task()] == [f"assistant-{i}" for i in range(5, 9)]
+
+
+def test_records_round_trip_and_tail():
+    ring = MessageRing(10, [{"role": "assistant", "content": "hi", "id": "r1", "timestamp": "t",
+                             "responseId": "r1", "audioUrl": "https://cos/a.pcm"}])
+    ring.append(ChatMessage("user", "hello", id="u1", timestamp="t2"))
+    assert ring.tail(1) == [{"id": "u1", "role": "user", "content": "hello", "timestamp": "t2"}]
+    assert ring.tail(5)[0]["audioUrl"] == "https://cos/a.pcm"
+    assert not hasattr(ring.latest("user"), "__dict__")
+    with pytest.raises(ValueError):
+        MessageRing(0)
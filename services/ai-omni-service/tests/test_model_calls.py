@@ -0,0 +1,146 @@
+"""Tests for model call accounting (app/model_calls.py).
+
+  * usage is read from OpenAI-compatible, DashScope, embedding, TTS and image shapes
+  * calls aggregate per (class, tier) with latency, errors, retries, fallbacks, cache hits
+  * the bound tier follows spawned tasks and is forwarded as a header
+  * prices turn tokens into spend, and classes are ranked by it
+  * daily-QA generation records usage, and its static fallback is counted
+  * a re-asked daily-recall variant is counted as a retry
+"""
+import asyncio
+import os
+import sys
+import types
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(__file__))
+import _omni_stubs  # noqa: E402
+
+from app.model_calls import TIER_HEADER, ModelCallMeter, build_model_meter, parse_usage  # noqa: E402
+
+_main = _omni_stubs.load_main()
+
+
+def _row(meter, call_class, tier="unknown"):
+    return next(r for r in meter.stats()["classes"] if r["call_class"] == call_class and r["tier"] == tier)
+
+
+def test_parse_usage_shapes():
+    assert parse_usage({"usage": {"prompt_tokens": 12, "completion_tokens": 30}}) == (12, 30, 0)
+    sdk_response = types.SimpleNamespace(usage={"input_tokens": 7, "output_tokens": 3})
+    assert parse_usage(sdk_response) == (7, 3, 0)
+    assert parse_usage({"usage": {"total_tokens": 9}}) == (9, 0, 0)
+    assert parse_usage({"usage": {"characters": 42}}) == (0, 0, 42)
+    assert parse_usage({"image_count": 1}) == (0, 0, 1)
+    assert parse_usage(None) == (0, 0, 0) and parse_usage({"choices": []}) == (0, 0, 0)
+
+
+@pytest.mark.asyncio
+async def test_calls_aggregate_per_class_and_tier():
+    meter = ModelCallMeter()
+    async with meter.call("translate", "qwen-turbo", tier="pro") as call:
+        call.usage({"usage": {"prompt_tokens": 10, "completion_tokens": 5}})
+    with pytest.raises(RuntimeError):
+        with meter.call("translate", "qwen-turbo", tier="pro") as call:
+            call.retry()
+            raise RuntimeError("429")
+    meter.fallback("translate", "llm_error", tier="pro")
+    meter.cache_hit("translate", tier="free")
+    meter.record("realtime", "omni", usage={"usage": {"input_tokens": 100, "output_tokens": 40}})
+
+    pro = _row(meter, "translate", "pro")
+    assert pro["calls"] == 2 and pro["errors"] == 1 and pro["retries"] == 1 and pro["fallbacks"] == 1
+    assert pro["prompt_tokens"] == 10 and pro["completion_tokens"] == 5
+    assert pro["models"] == {"qwen-turbo": 2} and pro["p50_ms"] is not None
+    assert _row(meter, "translate", "free")["cache_hits"] == 1
+    realtime = _row(meter, "realtime")
+    assert realtime["prompt_tokens"] == 100 and realtime["p50_ms"] is None   # timed elsewhere, no latency given
+    assert meter.stats()["calls"] == 3
+
+
+@pytest.mark.asyncio
+async def test_bound_tier_follows_tasks_and_headers():
+    meter = ModelCallMeter()
+
+    async def generate():
+        with meter.call("daily_qa", "qwen-turbo"):
+            pass
+        return meter.headers()
+
+    async def session():
+        meter.bind("pro", "u-1")
+        return await asyncio.create_task(generate())
+
+    assert await asyncio.create_task(session()) == {TIER_HEADER: "pro"}
+    assert _row(meter, "daily_qa", "pro")["calls"] == 1
+    assert meter.headers() == {}          # the binding stayed inside the session's task
+
+
+def test_prices_estimate_spend_and_rank_classes():
+    meter = ModelCallMeter(prices={"qwen-turbo": {"input": 0.3, "output": 0.6}, "wanx": {"unit": 0.02}})
+    with meter.call("daily_qa", "qwen-turbo") as call:
+        call.usage({"usage": {"prompt_tokens": 1000, "completion_tokens": 500}})
+    with meter.call("image", "wanx") as call:
+        call.usage({"image_count": 1})
+    stats = meter.stats()
+    assert [r["call_class"] for r in stats["classes"]] == ["daily_qa", "image"]
+    assert stats["classes"][0]["est_cost"] == pytest.approx(0.6)
+    assert stats["est_cost"] == pytest.approx(0.62)
+
+
+def test_sampled_log(caplog):
+    meter = ModelCallMeter(log_sample=1.0)
+    with caplog.at_level("INFO", logger="app.model_calls"):
+        with meter.call("tts", "qwen3-tts-flash") as call:
+            call.usage({"usage": {"characters": 12}})
+    assert '"class": "tts"' in caplog.text and '"units": 12' in caplog.text
+
+
+def test_build_model_meter_reads_env():
+    meter = build_model_meter({"MODEL_PRICES_JSON": '{"qwen-flash": {"input": 0.05}}', "MODEL_CALL_LOG_SAMPLE": "0.1"})
+    assert meter.prices == {"qwen-flash": {"input": 0.05}} and meter.log_sample == 0.1
+    assert build_model_meter({"MODEL_PRICES_JSON": "not json"}).prices == {}
+
+
+class _UsageClient:
+    def __init__(self, *args, **kwargs):
+        pass
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def post(self, url, headers=None, json=None):
+        return types.SimpleNamespace(
+            raise_for_status=lambda: None,
+            json=lambda: {"choices": [{"message": {"content": "not json"}}],
+                          "usage": {"prompt_tokens": 321, "completion_tokens": 45}},
+        )
+
+
+@pytest.mark.asyncio
+async def test_daily_qa_generation_records_usage_and_fallback(monkeypatch):
+    meter = ModelCallMeter()
+    monkeypatch.setattr(_main, "_MODEL_CALLS", meter)
+    monkeypatch.setattr(_main.httpx, "AsyncClient", _UsageClient)
+    meter.bind("free", "u-2")
+    pool = await _main._generate_daily_question_pool("English", "Chinese", count=3)
+    assert pool == _main._fallback_by_language("English")     # malformed output → static pool
+    row = _row(meter, "daily_qa", "free")
+    assert row["calls"] == 1 and row["errors"] == 0 and row["fallbacks"] == 1
+    assert row["prompt_tokens"] == 321 and row["completion_tokens"] == 45
+
+
+@pytest.mark.asyncio
+async def test_daily_recall_reask_counts_retry(monkeypatch):
+    meter = ModelCallMeter()
+    monkeypatch.setattr(_main, "_MODEL_CALLS", meter)
+    monkeypatch.setattr(_main.httpx, "AsyncClient", _UsageClient)
+    monkeypatch.setattr(_main, "_daily_recall_generation_backoff_until", 0.0)
+    await _main._generate_daily_recall_material("English", "Beginner", "", [])
+    await _main._generate_daily_recall_material("English", "Beginner", "", ["A1"], retry=True)
+    row = _row(meter, "daily_recall")
+    assert row["calls"] == 2 and row["retries"] == 1
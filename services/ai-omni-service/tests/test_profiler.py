@@ -0,0 +1,64 @@
+"""Tests for the on-demand sampling profiler (app/profiler.py).
+
+  * a busy thread's hot function shows up in the collapsed stacks and top_self
+  * the thread filter restricts sampling to matching thread names
+  * captures beyond max_concurrent are rejected; durations are capped
+"""
+import asyncio
+import threading
+
+import pytest
+
+from app.profiler import ProfilerBusy, SamplingProfiler, build_profiler
+
+
+def _hot_loop(stop):
+    n = 0
+    while not stop.is_set():
+        n += 1
+
+
+@pytest.fixture
+def busy_thread():
+    stop = threading.Event()
+    worker = threading.Thread(target=_hot_loop, args=(stop,), name="busy-worker", daemon=True)
+    worker.start()
+    yield worker
+    stop.set()
+    worker.join()
+
+
+@pytest.mark.asyncio
+async def test_capture_finds_hot_function(busy_thread):
+    result = await SamplingProfiler().capture(0.3, interval=0.005)
+    assert result["samples"] >= 20
+    lines = result["collapsed"].splitlines()
+    hot = [line for line in lines if line.startswith("busy-worker;")]
+    assert hot and all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+    assert any(line.rsplit(" ", 1)[0].endswith("test_profiler.py:_hot_loop") for line in hot)
+    assert any(f["frame"] == "test_profiler.py:_hot_loop" for f in result["top_self"])
+    assert result["overhead_pct"] >= 0 and "sampler_cpu_ms" in result
+
+
+@pytest.mark.asyncio
+async def test_thread_filter(busy_thread):
+    result = await SamplingProfiler().capture(0.1, interval=0.005, thread="busy-worker")
+    assert all(line.startswith("busy-worker;") for line in result["collapsed"].splitlines())
+
+
+@pytest.mark.asyncio
+async def test_concurrent_captures_limited_and_duration_capped():
+    profiler = SamplingProfiler(max_concurrent=1, max_seconds=0.2)
+    first = asyncio.ensure_future(profiler.capture(30, interval=0.01))
+    await asyncio.sleep(0.01)
+    with pytest.raises(ProfilerBusy):
+        await profiler.capture(0.1)
+    result = await first
+    assert result["seconds"] < 1
+    assert profiler.stats()["captures"] == 1 and profiler.stats()["rejected"] == 1
+    assert profiler.stats()["active"] == 0
+
+
+def test_build_profiler_reads_env():
+    profiler = build_profiler({"PROFILER_MAX_CONCURRENT": "2", "PROFILER_MAX_SECONDS": "15"})
+    assert profiler.max_concurrent == 2 and profiler.max_seconds == 15
@@ -0,0 +1,125 @@
+"""Tests for prompt budgeting (app/prompt_budget.py) and its call sites in app/main.py.
+
+  * under budget the assembled prompt is byte-identical to the plain layout
+  * over budget, lower-priority sections shrink first and required ones stay
+  * the daily-QA generator drops the oldest avoid-list entries to fit
+  * realtime session prompts keep the newest history turns
+  * per-class size distribution and budget env overrides
+"""
+import json
+import os
+import sys
+import types
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(__file__))
+import _omni_stubs  # noqa: E402
+
+from app.prompt_budget import REQUIRED, PromptBudgeter, Section, build_prompt_budgeter, estimate_tokens  # noqa: E402
+
+_main = _omni_stubs.load_main()
+
+
+def test_estimate_tokens():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("abcd" * 25) == 25
+    assert estimate_tokens("今日问答") == 4
+
+
+def test_under_budget_layout_is_unchanged():
+    budgeter = PromptBudgeter({"c": 500})
+    out = budgeter.fit("c", [
+        Section("head", "Intro.\n\n", REQUIRED),
+        Section("empty", "", 10, header="never shown\n"),
+        Section("avoid", "- a\n- b\n", 20, header="Avoid:\n", footer="\n"),
+    ])
+    assert out == "Intro.\n\nAvoid:\n- a\n- b\n\n"
+
+
+def test_lowest_priority_shrinks_first():
+    budgeter = PromptBudgeter({"c": 40})
+    keep_end = Section("history", "".join(f"line {i} " + "x" * 20 + "\n" for i in range(8)), 10)
+    keep_start = Section("avoid", "".join(f"- q{i}\n" for i in range(4)), 20, keep="start")
+    out = budgeter.fit("c", [Section("head", "H" * 40, REQUIRED), keep_end, keep_start])
+    assert out.startswith("H" * 40)
+    assert "line 7" in out and "line 0" not in out
+    assert keep_start.body == "".join(f"- q{i}\n" for i in range(4))   # freed enough before reaching it
+    assert budgeter.stats()["c"]["sections_trimmed"] == {"history": 1}
+
+
+class _CaptureClient:
+    prompts = []
+
+    def __init__(self, *a, **kw):
+        pass
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def post(self, url, headers=None, json=None):
+        _CaptureClient.prompts.append(json["messages"][0]["content"])
+        return types.SimpleNamespace(
+            raise_for_status=lambda: None,
+            json=lambda: {"choices": [{"message": {"content": '[{"question_text": "Q?", "lang": "en"}]'}}]},
+        )
+
+
+@pytest.fixture
+def budgets(monkeypatch):
+    budgeter = build_prompt_budgeter({})
+    monkeypatch.setattr(_main, "_PROMPT_BUDGETS", budgeter)
+    monkeypatch.setattr(_main.httpx, "AsyncClient", _CaptureClient)
+    _CaptureClient.prompts = []
+    return budgeter
+
+
+@pytest.mark.asyncio
+async def test_daily_qa_prompt_drops_oldest_avoid_entries(budgets):
+    budgets.budgets["daily_qa"] = 450
+    avoid = [f"Recent question number {i} about weekend plans and favourite food?" for i in range(20)]
+    await _main._generate_daily_question_pool("English", "Chinese", count=5, interests="cooking",
+                                              avoid_questions=avoid)
+    prompt = _CaptureClient.prompts[0]
+    assert "Recent question number 0 " in prompt and "Recent question number 19 " not in prompt
+    assert "more lines omitted" in prompt
+    assert "- Interests: cooking" in prompt and "Return ONLY valid JSON" in prompt
+    assert budgets.stats()["daily_qa"]["tokens_max"] <= 450
+
+
+class _FakeConversation:
+    def __init__(self):
+        self.updates = []
+
+    def update_session(self, **kwargs):
+        self.updates.append(kwargs)
+
+
+def test_realtime_prompt_keeps_newest_history(budgets, monkeypatch):
+    monkeypatch.setattr(_main, "MultiModality", types.SimpleNamespace(TEXT="text", AUDIO="audio"))
+    ctx = {"id": 1, "target_language": "English", "native_language": "Chinese", "active_goal": {}}
+    cb = _main.WebSocketCallback(None, None, ctx, "tok", "1", "s-1", [], scenario="Coffee shop")
+    cb.conversation = _FakeConversation()
+    cb.messages.extend({"role": "user" if i % 2 == 0 else "assistant", "content": f"msg{i} " + "words " * 60}
+                       for i in range(10))
+    template_tokens = estimate_tokens(_main.prompt_manager.generate_system_prompt(
+        {**ctx, "custom_topic": "Coffee shop"}, role=cb.role))
+    budgets.budgets["realtime_session"] = template_tokens + 250
+
+    cb._update_session_prompt()
+    assert cb.upstream.flush()
+    sent = cb.conversation.updates[0]["instructions"]
+    assert "msg9 " in sent and "msg0 " not in sent
+    assert "**NOW**: Wait silently" in sent
+    stats = budgets.stats()["realtime_session"]
+    assert stats["calls"] == 1 and stats["tokens_max"] <= template_tokens + 250
+
+
+def test_budget_env_override():
+    budgeter = build_prompt_budgeter({"PROMPT_BUDGET_DAILY_QA": "1500"})
+    assert budgeter.budgets["daily_qa"] == 1500
+    assert budgeter.budgets["realtime_session"] == 2200
+    assert json.dumps(budgeter.stats()) == "{}"
@@ -0,0 +1,137 @@
+"""Tests for the scenario cover render queue in app/main.py.
+
+  * concurrent requests for one title share one render, and every goal that
+    asked gets the permanent URL written back
+  * a finished cover is served from the Redis index without enqueuing
+  * ``wait: false`` returns pending immediately; the job still completes
+  * no more than SCENARIO_IMAGE_CONCURRENCY renders run at once
+  * /generate-scenarios pre-renders the initially unlocked cards
+"""
+import asyncio
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(__file__))
+import _omni_stubs  # noqa: E402
+
+_main = _omni_stubs.load_main()
+
+
+class _KVRedis:
+    def __init__(self):
+        self.store = {}
+
+    async def get(self, key):
+        return self.store.get(key)
+
+    async def setex(self, key, ttl, value):
+        self.store[key] = value
+        return True
+
+
+@pytest.fixture
+def queue(monkeypatch):
+    rc = _KVRedis()
+    monkeypatch.setattr(_main, "_get_redis_client", lambda: rc)
+    monkeypatch.setattr(_main, "_scenario_image_queue", None)
+    monkeypatch.setattr(_main, "_scenario_image_workers", [])
+    monkeypatch.setattr(_main, "_scenario_image_jobs", {})
+    monkeypatch.setattr(_main, "_scenario_image_latencies", [])
+    monkeypatch.setattr(_main, "_scenario_image_metrics", dict.fromkeys(_main._scenario_image_metrics, 0))
+
+    state = {"renders": [], "running": 0, "peak": 0, "persisted": []}
+
+    async def _fake_render(title):
+        state["renders"].append(title)
+        state["running"] += 1
+        state["peak"] = max(state["peak"], state["running"])
+        await asyncio.sleep(0.01)
+        state["running"] -= 1
+        return f"https://cos.example/{len(state['renders'])}.png", "wanx_cos"
+
+    async def _fake_persist(goal_id, title, url):
+        if goal_id:
+            state["persisted"].append((goal_id, title, url))
+
+    monkeypatch.setattr(_main, "_render_scenario_cover", _fake_render)
+    monkeypatch.setattr(_main, "_persist_scenario_image", _fake_persist)
+    state["redis"] = rc
+    yield state
+    for task in _main._scenario_image_workers:
+        task.cancel()
+
+
+@pytest.mark.asyncio
+async def test_concurrent_requests_share_one_render(queue):
+    results = await asyncio.gather(
+        _main.generate_scenario_image({"scenario_title": "在咖啡店点单", "goal_id": 1}),
+        _main.generate_scenario_image({"scenario_title": "在咖啡店点单", "goal_id": 2}),
+    )
+    assert queue["renders"] == ["在咖啡店点单"]
+    assert results[0] == results[1] == {"image_url": "https://cos.example/1.png", "source": "wanx_cos"}
+    assert sorted(g for g, _, _ in queue["persisted"]) == [1, 2]
+    assert _main._scenario_image_stats()["deduped"] == 1
+
+
+@pytest.mark.asyncio
+async def test_finished_cover_served_from_index(queue):
+    job_id = _main._scenario_image_job_id("Hotel check-in")
+    await queue["redis"].setex(f"scenario_image:{job_id}", 60, json.dumps(
+        {"status": "done", "url": "https://cos.example/h.png", "source": "wanx_cos"}))
+    result = await _main.generate_scenario_image({"scenario_title": "Hotel check-in", "goal_id": 9})
+    assert result == {"image_url": "https://cos.example/h.png", "source": "wanx_cos"}
+    assert queue["renders"] == []
+    assert queue["persisted"] == [(9, "Hotel check-in", "https://cos.example/h.png")]
+
+
+@pytest.mark.asyncio
+async def test_no_wait_returns_pending_then_completes(queue):
+    result = await _main.generate_scenario_image({"scenario_title": "Airport", "wait": False})
+    assert result["status"] == "pending"
+    await _main._scenario_image_queue.join()
+    state = await _main._get_scenario_image_state(_main._scenario_image_job_id("Airport"))
+    assert state["status"] == "done"
+    stats = _main._scenario_image_stats()
+    assert stats["done"] == 1 and stats["queue_depth"] == 0 and stats["latency_s"]["samples"] == 1
+
+
+@pytest.mark.asyncio
+async def test_concurrency_is_bounded(queue, monkeypatch):
+    monkeypatch.setattr(_main, "_SCENARIO_IMAGE_CONCURRENCY", 2)
+    futures = [_main._enqueue_scenario_image(f"Scene {i}") for i in range(5)]
+    await asyncio.gather(*futures)
+    assert len(queue["renders"]) == 5
+    assert queue["peak"] == 2
+
+
+@pytest.mark.asyncio
+async def test_generate_scenarios_prerenders_unlocked_cards(queue, monkeypatch):
+    scenarios = [{"title": f"Scene {i}", "tasks": ["a", "b", "c"]} for i in range(10)]
+
+    class _Resp:
+        def raise_for_status(self):
+            pass
+
+        def json(self):
+            return {"choices": [{"message": {"content": json.dumps({"scenarios": scenarios})}}]}
+
+    class _Client:
+        def __init__(self, *a, **kw):
+            pass
+
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *exc):
+            return False
+
+        async def post(self, *a, **kw):
+            return _Resp()
+
+    monkeypatch.setattr(_main.httpx, "AsyncClient", _Client)
+    await _main.generate_scenarios({"target_language": "English"})
+    await _main._scenario_image_queue.join()
+    assert queue["renders"] == ["Scene 0", "Scene 1", "Scene 2"]
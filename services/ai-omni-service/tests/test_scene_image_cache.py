@@ -0,0 +1,110 @@
+"""Tests for the Scene Theater image cache in app/main.py.
+
+  * synonymous titles ("咖啡" / "coffee") share one content id
+  * a miss renders once, re-hosts to COS and indexes the permanent URL; the
+    next call is served from the index without touching Wanx
+  * concurrent misses for the same subject share one render
+  * temp (non re-hosted) URLs are never indexed; indexed URLs expire
+  * startup prewarm renders the top keywords that are not cached yet
+"""
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(__file__))
+import _omni_stubs  # noqa: E402
+
+_main = _omni_stubs.load_main()
+
+
+class _KeyRedis:
+    def __init__(self):
+        self.keys = {}
+        self.ttls = {}
+
+    async def get(self, key):
+        return self.keys.get(key)
+
+    async def setex(self, key, ttl, value):
+        self.keys[key] = value
+        self.ttls[key] = ttl
+        return True
+
+    async def set(self, key, value, ex=None, nx=False):
+        if nx and key in self.keys:
+            return None
+        self.keys[key] = value
+        return True
+
+
+def _indexed(rc):
+    return {k: v for k, v in rc.keys.items() if not k.startswith("scene_image:prewarm:")}
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    rc = _KeyRedis()
+    monkeypatch.setattr(_main, "_get_redis_client", lambda: rc)
+    return rc
+
+
+@pytest.fixture
+def wanx(monkeypatch):
+    calls = []
+
+    async def _fake_wanx(title, prompt_en, size="768*512", timeout=15):
+        calls.append(prompt_en)
+        await asyncio.sleep(0)
+        return f"https://dashscope-result.oss/tmp/{len(calls)}.png"
+
+    async def _fake_rehost(temp_url):
+        return temp_url.replace("dashscope-result.oss/tmp", "cos.example/scene")
+
+    monkeypatch.setattr(_main, "_try_wanx_image", _fake_wanx)
+    monkeypatch.setattr(_main, "_rehost_image_to_cos", _fake_rehost)
+    return calls
+
+
+def test_synonyms_share_content_id():
+    ids = {_main._scene_image_content_id(_main._scene_image_subject(t)[0])
+           for t in ("咖啡店点单", "Ordering at a coffee shop", "Cafe small talk")}
+    assert len(ids) == 1
+    assert _main._scene_image_content_id("cafe+coffee", size="512*512") not in ids
+
+
+@pytest.mark.asyncio
+async def test_miss_renders_then_hits_cache(redis, wanx):
+    url, source = await _main._scene_image("Hotel check-in")
+    assert source == "wanx_cos" and url.startswith("https://cos.example/")
+    again = await _main.generate_scene_image({"scenario_title": "酒店入住"})
+    assert again == {"image_url": url, "source": "cache"}
+    assert len(wanx) == 1
+    assert set(redis.ttls.values()) == {_main._SCENE_IMAGE_TTL}
+
+
+@pytest.mark.asyncio
+async def test_concurrent_misses_share_one_render(redis, wanx):
+    results = await asyncio.gather(*[_main._scene_image("Airport security") for _ in range(5)])
+    assert len(wanx) == 1
+    assert len({url for url, _ in results}) == 1
+
+
+@pytest.mark.asyncio
+async def test_temp_url_is_not_indexed(redis, wanx, monkeypatch):
+    async def _rehost_fails(temp_url):
+        return None
+    monkeypatch.setattr(_main, "_rehost_image_to_cos", _rehost_fails)
+    url, source = await _main._scene_image("Library study group")
+    assert source == "wanx" and "tmp" in url
+    assert not _indexed(redis)
+
+
+@pytest.mark.asyncio
+async def test_prewarm_renders_uncached_top_keywords(redis, wanx, monkeypatch):
+    monkeypatch.setattr(_main, "_SCENE_IMAGE_PREWARM_TOP", 3)
+    await _main._scene_image("Kitchen cooking")   # already cached → skipped by prewarm
+    await _main._prewarm_scene_images()
+    assert len(wanx) == 3
+    assert len(_indexed(redis)) == 3
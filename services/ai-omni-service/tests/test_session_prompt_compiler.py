@@ -0,0 +1,103 @@
+"""Tests for session prompt compilation in WebSocketCallback._update_session_prompt.
+
+  * the memoized static prompt is identical to PromptManager's direct output
+  * sessions with the same role/phase/persona/languages/task share one compile
+  * an unchanged prompt skips update_session; a new tail or a new upstream
+    connection sends again, and sent updates/bytes are counted per session
+"""
+import os
+import sys
+import types
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(__file__))
+import _omni_stubs  # noqa: E402
+
+_main = _omni_stubs.load_main()
+
+
+class _FakeConversation:
+    def __init__(self):
+        self.updates = []
+
+    def update_session(self, **kwargs):
+        self.updates.append(kwargs)
+
+
+def _user_context():
+    return {
+        "id": 7, "nickname": "Lin", "target_language": "English", "native_language": "Chinese",
+        "voice": "Tina",
+        "active_goal": {"id": 3, "description": "Travel", "target_language": "English", "scenarios": [
+            {"title": "Coffee shop", "tasks": [{"id": 11, "text": "Order a latte", "status": "pending"},
+                                                 {"id": 12, "text": "Ask for the wifi", "status": "pending"}]},
+        ]},
+    }
+
+
+@pytest.fixture
+def session(monkeypatch):
+    monkeypatch.setattr(_main, "MultiModality", types.SimpleNamespace(TEXT="text", AUDIO="audio"))
+    monkeypatch.setattr(_main, "_STATIC_PROMPT_CACHE", _main._TTLDict(ttl=60, maxsize=16))
+    monkeypatch.setattr(_main, "_static_prompt_stats", {"hits": 0, "misses": 0})
+    monkeypatch.setattr(_main, "session_phases", _main._TTLDict(ttl=60, maxsize=16))
+
+    def _make(user_id="7"):
+        cb = _main.WebSocketCallback(None, None, _user_context(), "tok", user_id, f"s-{user_id}",
+                                     [], scenario="Coffee shop", mode=None)
+        _main.session_phases[cb.phase_key] = {"phase": "oral_practice", "task_index": 0}
+        cb.conversation = _FakeConversation()
+        return cb
+    return _make
+
+
+def test_static_prompt_matches_prompt_manager(session):
+    cb = session()
+    cb._update_session_prompt()
+    assert cb.upstream.flush()
+    sent = cb.conversation.updates[0]["instructions"]
+    ctx = {**cb.user_context, **cb.user_context["active_goal"]}
+    assert sent == _main.prompt_manager.generate_system_prompt(ctx, role=cb.role)
+    assert "Order a latte" in sent
+
+
+def test_sessions_share_compiled_static_prompt(session):
+    session("7")._update_session_prompt()
+    session("8")._update_session_prompt()
+    assert _main._static_prompt_stats == {"hits": 1, "misses": 1}
+
+
+def test_unchanged_prompt_skips_update_session(session):
+    cb = session()
+    cb._update_session_prompt()
+    cb._update_session_prompt()
+    assert cb.upstream.flush()
+    assert len(cb.conversation.updates) == 1
+    assert cb.prompt_stats["updates_skipped"] == 1
+
+    cb._update_session_prompt(extra_directive="Focus on past tense.")
+    assert cb.upstream.flush()
+    assert len(cb.conversation.updates) == 2
+    assert cb.conversation.updates[1]["instructions"].endswith("\n\nFocus on past tense.")
+
+    cb.attach_conversation(_FakeConversation())    # reconnect: new upstream session
+    cb._update_session_prompt()
+    assert cb.upstream.flush()
+    assert len(cb.conversation.updates) == 1
+    stats = cb.prompt_stats
+    assert stats["updates_sent"] == 3 and stats["updates_skipped"] == 1
+    assert stats["bytes_sent"] > 3 * 1000
+
+
+def test_reconnect_resends_even_if_conversation_id_is_reused(session):
+    # CPython may hand a retried connection the same id(); the digest must not survive it
+    cb = session()
+    conversation = cb.conversation
+    cb._update_session_prompt()
+    cb.attach_conversation(None)
+    cb.attach_conversation(conversation)
+    cb._update_session_prompt()
+    assert cb.upstream.flush()
+    assert len(conversation.updates) == 2
+    assert cb.prompt_stats["updates_skipped"] == 0
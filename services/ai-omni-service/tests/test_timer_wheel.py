@@ -0,0 +1,135 @@
+"""Tests for the process-wide timer wheel (app/timer_wheel.py).
+
+  * one-shot timers fire once, after their delay, and not when cancelled
+  * periodic timers keep firing on their interval until cancelled
+  * a tick's batch is fired in ``burst``-sized chunks spread over the tick
+  * a failing callback is counted and does not stop the wheel
+  * a slow coroutine callback does not delay other timers
+"""
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from app.timer_wheel import TimerWheel, build_timer_wheel  # noqa: E402
+
+
+@pytest.mark.asyncio
+async def test_call_later_fires_once_after_delay():
+    wheel = TimerWheel(tick=0.01, slots=8)
+    fired = []
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    wheel.call_later(0.05, lambda: fired.append(loop.time() - start))
+    await asyncio.sleep(0.15)
+    assert len(fired) == 1
+    assert fired[0] >= 0.04
+    assert wheel.stats()["pending"] == 0
+
+
+@pytest.mark.asyncio
+async def test_delay_longer_than_one_revolution():
+    wheel = TimerWheel(tick=0.01, slots=4)     # one revolution = 0.04s
+    fired = []
+    wheel.call_later(0.1, fired.append, "late")
+    await asyncio.sleep(0.06)
+    assert fired == []
+    await asyncio.sleep(0.1)
+    assert fired == ["late"]
+
+
+@pytest.mark.asyncio
+async def test_cancelled_timer_does_not_fire():
+    wheel = TimerWheel(tick=0.01, slots=8)
+    fired = []
+    timer = wheel.call_later(0.03, fired.append, "x")
+    timer.cancel()
+    await asyncio.sleep(0.08)
+    assert fired == []
+    assert wheel.stats()["cancelled"] == 1 and wheel.stats()["pending"] == 0
+
+
+@pytest.mark.asyncio
+async def test_call_every_repeats_until_cancelled_and_awaits_coroutines():
+    wheel = TimerWheel(tick=0.01, slots=8)
+    beats = []
+
+    async def beat():
+        beats.append(1)
+
+    timer = wheel.call_every(0.02, beat, first_delay=0.01)
+    await asyncio.sleep(0.13)
+    timer.cancel()
+    count = len(beats)
+    assert count >= 4
+    await asyncio.sleep(0.06)
+    assert len(beats) == count
+
+
+@pytest.mark.asyncio
+async def test_periodic_first_run_is_jittered_within_interval():
+    wheel = TimerWheel(tick=0.01, slots=64)
+    ticks = {wheel.call_every(0.5, lambda: None).due_tick for _ in range(50)}
+    assert len(ticks) > 5                      # spread, not all on one slot
+    assert max(ticks) <= 51
+
+
+@pytest.mark.asyncio
+async def test_batch_is_paced_in_bursts():
+    wheel = TimerWheel(tick=0.05, slots=8, burst=10)
+    loop = asyncio.get_running_loop()
+    times = []
+    for _ in range(30):
+        wheel.call_later(0.05, lambda: times.append(loop.time()))
+    await asyncio.sleep(0.25)
+    assert len(times) == 30
+    assert wheel.stats()["max_batch"] == 30
+    assert times[-1] - times[0] >= 0.02         # three chunks ~tick/3 apart, not one burst
+
+
+@pytest.mark.asyncio
+async def test_failing_callback_is_counted_and_wheel_keeps_running():
+    wheel = TimerWheel(tick=0.01, slots=8)
+    fired = []
+
+    def boom():
+        raise RuntimeError("boom")
+
+    async def aboom():
+        raise RuntimeError("async boom")
+
+    wheel.call_later(0.01, boom)
+    wheel.call_later(0.01, aboom)
+    wheel.call_later(0.03, fired.append, "ok")
+    await asyncio.sleep(0.1)
+    assert fired == ["ok"]
+    assert wheel.stats()["errors"] == 2
+
+
+@pytest.mark.asyncio
+async def test_slow_coroutine_does_not_block_other_timers():
+    wheel = TimerWheel(tick=0.01, slots=8)
+    release = asyncio.Event()
+    fired_at = []
+
+    async def stuck_send():
+        await release.wait()        # e.g. send_json to a client with a full socket buffer
+
+    start = asyncio.get_running_loop().time()
+    wheel.call_later(0.01, stuck_send)
+    wheel.call_later(0.05, lambda: fired_at.append(asyncio.get_running_loop().time() - start))
+    await asyncio.sleep(0.15)
+    assert fired_at and fired_at[0] < 0.12
+    assert wheel.stats()["inflight"] == 1
+    release.set()
+    await asyncio.sleep(0.02)
+    assert wheel.stats()["inflight"] == 0
+
+
+def test_build_timer_wheel_reads_env():
+    wheel = build_timer_wheel({"TIMER_WHEEL_TICK_SECONDS": "0.25", "TIMER_WHEEL_BURST": "50"})
+    assert wheel.tick == 0.25 and wheel.burst == 50
+    assert build_timer_wheel({}).tick == 0.5
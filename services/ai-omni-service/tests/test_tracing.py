@@ -0,0 +1,111 @@
+"""Tests for per-turn trace spans (app/tracing.py and WebSocketCallback turn tracing).
+
+  * child spans nest under the active span, inherit across spawned tasks, and
+    are no-ops outside a trace; marks run from the turn start
+  * traceparent headers round-trip; errors are recorded on the span
+  * finished spans export as OTLP/JSON lines and feed per-stage percentiles
+  * a callback opens one trace per turn and records each milestone once
+"""
+import asyncio
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(__file__))
+import _omni_stubs  # noqa: E402
+
+from app.tracing import Tracer, parse_traceparent  # noqa: E402
+
+_main = _omni_stubs.load_main()
+
+
+def test_spans_nest_and_noop_outside_trace():
+    tracer = Tracer("svc")
+    with tracer.span("orphan") as orphan:
+        assert orphan is None
+    assert tracer.headers() == {}
+
+    turn = tracer.start_trace("turn", trigger="text_message")
+    with tracer.use(turn):
+        with tracer.span("persist", role="user") as persist:
+            assert persist.trace_id == turn.trace_id and persist.parent_id == turn.span_id
+            assert tracer.headers() == {"traceparent": persist.traceparent}
+    first_text = turn.mark("first_text")
+    assert first_text.start_ns == turn.start_ns and first_text.parent_id == turn.span_id
+    turn.end()
+    assert [s["name"] for s in tracer.recent()] == ["persist", "first_text", "turn"]
+
+
+def test_traceparent_round_trip_and_errors():
+    tracer = Tracer("svc")
+    root = tracer.start_trace("turn")
+    assert parse_traceparent(root.traceparent) == (root.trace_id, root.span_id)
+    assert parse_traceparent("garbage") is None and parse_traceparent("00-xyz-abc-01") is None
+    remote = tracer.start("batch_eval.server", parent=root.traceparent)
+    assert remote.trace_id == root.trace_id and remote.parent_id == root.span_id
+    with pytest.raises(ValueError):
+        with tracer.span("upload", parent=root):
+            raise ValueError("boom")
+    assert tracer.recent()[-1]["error"] == "ValueError"
+
+
+@pytest.mark.asyncio
+async def test_spawned_tasks_inherit_active_span():
+    tracer = Tracer("svc")
+    turn = tracer.start_trace("turn")
+
+    async def upload():
+        with tracer.span("upload") as span:
+            return span
+
+    with tracer.use(turn):
+        task = asyncio.create_task(upload())
+    span = await task
+    assert span.parent_id == turn.span_id
+
+
+def test_export_otlp_json_lines_and_percentiles(tmp_path):
+    path = tmp_path / "traces" / "spans.jsonl"
+    tracer = Tracer("ai-omni-service", export_path=str(path), flush_interval=60)
+    turn = tracer.start_trace("turn", session_id="s-1", turns=3)
+    turn.mark("first_audio")
+    turn.end()
+    assert tracer.flush() == 2
+    line = json.loads(path.read_text().splitlines()[0])
+    resource = line["resourceSpans"][0]
+    assert resource["resource"]["attributes"][0] == {"key": "service.name", "value": {"stringValue": "ai-omni-service"}}
+    spans = resource["scopeSpans"][0]["spans"]
+    root = next(s for s in spans if s["name"] == "turn")
+    child = next(s for s in spans if s["name"] == "first_audio")
+    assert "parentSpanId" not in root and child["parentSpanId"] == root["spanId"]
+    assert len(root["traceId"]) == 32 and int(root["endTimeUnixNano"]) >= int(root["startTimeUnixNano"])
+    assert {"key": "turns", "value": {"intValue": "3"}} in root["attributes"]
+    stats = tracer.stats()
+    assert stats["exported"] == 2 and set(stats["spans_by_name"]) == {"turn", "first_audio"}
+    assert set(stats["spans_by_name"]["turn"]) == {"count", "p50_ms", "p95_ms", "p99_ms", "max_ms"}
+
+
+def test_disabled_tracer_creates_nothing():
+    tracer = Tracer("svc", enabled=False)
+    assert tracer.start_trace("turn") is None
+
+
+def test_callback_turn_trace(monkeypatch):
+    tracer = Tracer("ai-omni-service")
+    monkeypatch.setattr(_main, "_TRACER", tracer)
+    ctx = {"id": 1, "target_language": "English", "native_language": "Chinese", "active_goal": {}}
+    cb = _main.WebSocketCallback(None, None, ctx, "tok", "1", "s-1", [], scenario="Coffee shop")
+    cb._trace_mark("first_text")                        # no turn yet: nothing recorded
+    cb.start_turn_trace("user_audio_ended")
+    first = cb.turn_span
+    cb._trace_mark("commit")
+    cb._trace_mark("first_text")
+    cb._trace_mark("first_text")
+    cb.start_turn_trace("text_message")                 # next turn before the first finished
+    assert cb.turn_span.trace_id != first.trace_id
+    names = [s["name"] for s in tracer.recent()]
+    assert names == ["commit", "first_text", "turn"]
+    assert tracer.recent()[-1]["attributes"]["superseded"] is True
+    assert tracer.recent()[-1]["attributes"]["trigger"] == "user_audio_ended"
@@ -0,0 +1,216 @@
+"""Tests for the per-session DashScope command queue (app/upstream_queue.py).
+
+  * enqueueing never blocks, even while the connection's socket write is stuck
+  * commands are written in order, one writer per session
+  * a queued update_session is replaced by the next; back-to-back deletes merge
+  * close drops later commands for that connection, but not for a reconnect
+  * a failed write calls on_error and is counted; latency is recorded per kind
+  * past max_depth the oldest audio is shed; with none left the session is failed
+  * writes are bounded by the socket timeout; a timed-out write fails the session
+"""
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.upstream_queue import UpstreamCommandQueue, UpstreamStats, WebSocketTimeoutException
+
+
+class _FakeConversation:
+    def __init__(self, gate=None):
+        self.calls = []
+        self.gate = gate
+
+    def _record(self, name, *args, **kwargs):
+        if self.gate is not None:
+            self.gate.wait(5)
+        self.calls.append((name, args, kwargs))
+
+    def update_session(self, **kwargs):
+        self._record("update_session", **kwargs)
+
+    def send_raw(self, payload):
+        self._record("send_raw", json.loads(payload))
+
+    def append_audio(self, audio):
+        self._record("append_audio", audio)
+
+    def commit(self):
+        self._record("commit")
+
+    def create_response(self):
+        self._record("create_response")
+
+    def close(self):
+        self._record("close")
+
+
+@pytest.fixture
+def pool():
+    executor = ThreadPoolExecutor(max_workers=4)
+    yield executor
+    executor.shutdown(wait=True)
+
+
+def _queue(pool, conv, **kwargs):
+    holder = {"conv": conv}
+    return UpstreamCommandQueue(lambda: holder["conv"], pool, UpstreamStats(), **kwargs), holder
+
+
+def test_enqueue_does_not_block_on_stuck_write(pool):
+    gate = threading.Event()
+    q, _ = _queue(pool, _FakeConversation(gate))
+    start = time.monotonic()
+    for _ in range(50):
+        q.append_audio("AAAA")
+    q.commit()
+    assert time.monotonic() - start < 0.5
+    assert q.depth() >= 50
+    gate.set()
+    assert q.flush()
+    assert q.depth() == 0
+
+
+def test_commands_are_written_in_order(pool):
+    conv = _FakeConversation()
+    q, _ = _queue(pool, conv)
+    for i in range(20):
+        q.append_audio(str(i))
+    q.commit()
+    q.create_response()
+    assert q.flush()
+    names = [c[0] for c in conv.calls]
+    assert names == ["append_audio"] * 20 + ["commit", "create_response"]
+    assert [c[1][0] for c in conv.calls[:20]] == [str(i) for i in range(20)]
+
+
+def test_pending_update_session_is_replaced_and_deletes_merge(pool):
+    gate = threading.Event()
+    conv = _FakeConversation(gate)
+    q, _ = _queue(pool, conv)
+    q.commit()                                 # occupies the writer
+    time.sleep(0.05)
+    q.update_session(instructions="v1")
+    q.update_session(instructions="v2")
+    q.delete_items(["a", "b"])
+    q.delete_items(["b", "c"])
+    gate.set()
+    assert q.flush()
+    updates = [c[2]["instructions"] for c in conv.calls if c[0] == "update_session"]
+    deletes = [c[1][0]["item_id"] for c in conv.calls if c[0] == "send_raw"]
+    assert updates == ["v2"]
+    assert deletes == ["a", "b", "c"]
+    merged = q.stats.snapshot()["merged"]
+    assert merged == {"update_session": 1, "delete_items": 1}
+
+
+def test_close_drops_later_commands_until_reconnect(pool):
+    conv = _FakeConversation()
+    q, holder = _queue(pool, conv)
+    q.send_raw(json.dumps({"type": "response.create"}))
+    q.close()
+    q.commit()
+    assert q.flush()
+    assert [c[0] for c in conv.calls] == ["send_raw", "close"]
+    assert q.stats.snapshot()["dropped"] == {"commit": 1}
+
+    fresh = _FakeConversation()
+    holder["conv"] = fresh
+    q.commit()
+    assert q.flush()
+    assert [c[0] for c in fresh.calls] == ["commit"]
+
+
+def test_failed_write_calls_on_error_and_records_latency(pool):
+    class _Broken(_FakeConversation):
+        def update_session(self, **kwargs):
+            raise ConnectionError("socket closed")
+
+    errors = []
+    q, _ = _queue(pool, _Broken())
+    q.update_session(on_error=errors.append, instructions="x")
+    q.commit()
+    assert q.flush()
+    assert len(errors) == 1 and isinstance(errors[0], ConnectionError)
+    snap = q.stats.snapshot()
+    assert snap["errors"] == {"update_session": 1}
+    assert snap["sent"] == {"commit": 1}
+    assert set(snap["latency"]) == {"update_session", "commit"}
+
+
+def test_commands_without_connection_are_dropped(pool):
+    q, _ = _queue(pool, None)
+    q.commit()
+    assert q.depth() == 0
+    assert q.stats.snapshot()["dropped"] == {"commit": 1}
+
+
+def test_depth_cap_sheds_oldest_audio(pool):
+    gate = threading.Event()
+    conv = _FakeConversation(gate)
+    q, _ = _queue(pool, conv, max_depth=4)
+    q.commit()                                 # occupies the writer
+    time.sleep(0.05)
+    for i in range(6):
+        q.append_audio(str(i))
+    assert q.depth() == 4
+    gate.set()
+    assert q.flush()
+    assert [c[1][0] for c in conv.calls if c[0] == "append_audio"] == ["2", "3", "4", "5"]
+    assert q.stats.snapshot()["dropped"] == {"append_audio": 2}
+
+
+def test_depth_cap_without_audio_fails_the_session():
+    gate = threading.Event()
+    conv = _FakeConversation(gate)
+    pool = ThreadPoolExecutor(max_workers=1)   # one writer, so jobs finish in submit order
+    q, _ = _queue(pool, conv, max_depth=2)
+    q.commit()                                 # occupies the writer
+    time.sleep(0.05)
+    q.commit()
+    q.create_response()
+    q.commit()                                 # over the cap, nothing to shed
+    q.create_response()                        # the session is already failed
+    assert q.depth() == 0
+    gate.set()
+    assert q.flush()
+    pool.shutdown(wait=True)                   # the close job ran on the writer pool
+    assert [c[0] for c in conv.calls] == ["commit", "close"]
+    assert q.stats.snapshot()["dropped"] == {"commit": 2, "create_response": 2}
+
+
+def test_timed_out_write_frees_writer_and_fails_session(pool):
+    class _Sock:
+        timeout = None
+
+        def settimeout(self, timeout):
+            self.timeout = timeout
+
+    class _Stalled(_FakeConversation):
+        def __init__(self):
+            super().__init__()
+            self.ws = type("_WS", (), {"sock": _Sock()})()
+
+        def append_audio(self, audio):
+            raise WebSocketTimeoutException("send timed out")
+
+    conv = _Stalled()
+    errors = []
+    q, holder = _queue(pool, conv, write_timeout=2.5)
+    q.update_session(on_error=errors.append, instructions="x")
+    q.append_audio("AAAA")
+    q.commit()
+    q.create_response()
+    assert q.flush()
+    assert conv.ws.sock.timeout == 2.5
+    assert [c[0] for c in conv.calls] == ["update_session", "close"]
+    snap = q.stats.snapshot()
+    assert snap["errors"] == {"append_audio": 1}
+    assert snap["dropped"] == {"commit": 1, "create_response": 1}
+
+    holder["conv"] = _FakeConversation()       # a reconnect gets a working queue again
+    q.commit()
+    assert q.flush()
+    assert [c[0] for c in holder["conv"].calls] == ["commit"]
@@ -0,0 +1,364 @@
+"""
+Batch Scoring Engine for Workflow Service
+离线批量重评分：_SEM_LOW / _SEM_HIGH 或关键词规则调整后，重放历史 turn window 做校准
+
+- 输入：JSONL 文件，或 Postgres 表（服务端游标流式读取）
+- 按 chunk 分片到进程池，每个进程常驻一个 ProficiencyScoringWorkflow / BatchEvaluationWorkflow
+  与一个事件循环，跑逐轮规则打分（_calculate_scores）与批量评估规则降级（_rule_based_fallback）
+- 语义信号后端沿用 TASK_SEM_MODE（默认 local：离线、确定、随核数线性扩展）；
+  remote / fallback / hybrid 时复用 Redis 中已缓存的 gold embedding 与 goal 索引
+- 场景关键词只读 Redis 共享缓存（预计算产出），未命中走文本提取，从不调用 LLM：
+  同一批历史重评分两次得到相同关键词，标定 _SEM_LOW / _SEM_HIGH 才有意义
+- 结果按输入顺序写 JSONL，只读不写：不调用 _update_user_proficiency，不触碰 live proficiency
+- 内部接口的 job 整体跑在独立线程自己的事件循环里（进程池启停、写盘均不占服务事件循环），
+  postgres 源在该循环内单独建连接，不借用服务连接池
+
+记录格式（JSONL 每行 / Postgres 每行，turns 与 turn_window 至少给一个）：
+    {"id": ..., "user_id": ..., "goal_id": ..., "current_task": {..., "target_language": ...},
+     "turns": [{"role": "user|assistant", "content": ...}, ...],
+     "turn_window": [{"user_content": ..., "ai_response": ...}, ...]}
+
+CLI：
+    python src/batch_scoring.py --input windows.jsonl --output scored.jsonl --workers 8
+    python src/batch_scoring.py --pg-query "SELECT ... FROM ..." --output scored.jsonl
+"""
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import time
+import uuid
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+logger = logging.getLogger(__name__)
+
+# 每个进程任务处理的记录数；太小则进程间序列化开销占比高
+BATCH_SCORING_CHUNK_SIZE = int(os.getenv("BATCH_SCORING_CHUNK_SIZE", "64"))
+# 内部接口允许读写的目录（文件名之外的路径一律拒绝）
+BATCH_SCORING_DIR = os.getenv("BATCH_SCORING_DIR", "/tmp/batch-scoring")
+# 内部接口 source=postgres 时读取的表（列同记录格式，外加 created_at）
+BATCH_SCORING_TABLE = os.getenv("BATCH_SCORING_TABLE", "scoring_turn_windows")
+# 同时运行的内部 job 上限（每个 job 都会起一个满核进程池）
+BATCH_SCORING_MAX_JOBS = int(os.getenv("BATCH_SCORING_MAX_JOBS", "1"))
+# 已结束 job 的进度摘要保留条数，超出按启动顺序淘汰最旧的
+BATCH_SCORING_KEEP_FINISHED = int(os.getenv("BATCH_SCORING_KEEP_FINISHED", "20"))
+
+_SEM_MODES = ("none", "local", "remote", "fallback", "hybrid")
+
+# ---------- worker（子进程） ----------
+
+_worker: Dict[str, Any] = {}
+
+
+def _init_worker(sem_mode: str, sem_low: Optional[float], sem_high: Optional[float], quiet: bool) -> None:
+    """进程池 initializer：每个子进程建一次 workflow 与事件循环，按参数覆盖语义配置"""
+    from workflows import proficiency_scoring as ps
+    from workflows.batch_evaluation import BatchEvaluationWorkflow
+
+    if quiet:
+        # 逐轮打分的 [DEBUG] print 在批量下会淹没输出
+        sys.stdout = open(os.devnull, "w")
+    if sem_low is not None:
+        ps._SEM_LOW = sem_low
+    if sem_high is not None:
+        ps._SEM_HIGH = sem_high
+    workflow = ps.ProficiencyScoringWorkflow(sem_mode=sem_mode, ai_keywords=False)
+    # 关键词共享缓存各模式都要用；语义 remote / fallback / hybrid 另需 gold embedding 与 goal 索引
+    from cache import cache
+    cache.connect()
+    _worker["scoring"] = workflow
+    _worker["batch"] = BatchEvaluationWorkflow()
+    _worker["loop"] = asyncio.new_event_loop()
+
+
+def _score_record(record: Dict[str, Any]) -> Dict[str, Any]:
+    scoring = _worker["scoring"]
+    batch = _worker["batch"]
+    current_task = record.get("current_task") or {}
+    turn_window = record.get("turn_window") or []
+    turns = record.get("turns") or batch._turn_window_to_history(turn_window)
+
+    recent = scoring._extract_recent_turns(turns, limit=5)
+    scores = _worker["loop"].run_until_complete(
+        scoring._calculate_scores(recent, current_task, goal_id=record.get("goal_id"))
+    )
+    delta, feedback = scoring._calculate_proficiency_delta_with_feedback(scores)
+
+    batch_result = None
+    if turn_window:
+        fallback = batch._rule_based_fallback(turn_window, current_task)
+        batch_result = {
+            "delta": fallback["delta"],
+            "teaching_mode": fallback["teaching_mode"],
+            "keyword_coverage_detail": fallback["keyword_coverage_detail"],
+            "correction_detail": fallback["correction_detail"],
+        }
+
+    return {
+        "id": record.get("id"),
+        "user_id": record.get("user_id"),
+        "goal_id": record.get("goal_id"),
+        "task_id": current_task.get("id"),
+        "delta": delta,
+        "feedback": feedback,
+        "scores": scores,
+        "batch": batch_result,
+    }
+
+
+def _score_chunk(records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """子进程入口：逐条打分，单条失败只记录错误，不影响同 chunk 其它记录"""
+    results = []
+    for record in records:
+        try:
+            results.append(_score_record(record))
+        except Exception as e:
+            results.append({"id": record.get("id"), "error": f"{type(e).__name__}: {e}"})
+    return results
+
+
+# ---------- 数据源 ----------
+
+def _decode_record(raw: Dict[str, Any]) -> Dict[str, Any]:
+    """Postgres json/text 列可能是字符串，统一解码为对象"""
+    record = dict(raw)
+    for field in ("current_task", "turns", "turn_window"):
+        value = record.get(field)
+        if isinstance(value, str):
+            record[field] = json.loads(value) if value else None
+    return record
+
+
+async def iter_jsonl(path: str) -> AsyncIterator[Dict[str, Any]]:
+    with open(path, encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                logger.warning(f"[BatchScoring] {path}:{line_no} skipped: {e}")
+                continue
+            record.setdefault("id", line_no)
+            yield record
+
+
+async def iter_postgres(conn: Any, query: str, *args: Any, prefetch: int = 500) -> AsyncIterator[Dict[str, Any]]:
+    """服务端游标流式读取（需在事务内），内存占用与表大小无关"""
+    async with conn.transaction():
+        async for row in conn.cursor(query, *args, prefetch=prefetch):
+            yield _decode_record(dict(row))
+
+
+def table_query(since: Optional[str] = None, limit: Optional[int] = None) -> tuple:
+    """内部接口用：只按时间 / 条数筛选 BATCH_SCORING_TABLE，不接受任意 SQL"""
+    sql = f"SELECT id, user_id, goal_id, current_task, turns, turn_window FROM {BATCH_SCORING_TABLE}"
+    args: List[Any] = []
+    if since:
+        args.append(since)
+        sql += f" WHERE created_at >= ${len(args)}::timestamptz"
+    sql += " ORDER BY id"
+    if limit:
+        args.append(int(limit))
+        sql += f" LIMIT ${len(args)}"
+    return sql, args
+
+
+# ---------- 引擎 ----------
+
+async def score_stream(
+    source: AsyncIterator[Dict[str, Any]],
+    output_path: str,
+    workers: Optional[int] = None,
+    sem_mode: str = "local",
+    sem_low: Optional[float] = None,
+    sem_high: Optional[float] = None,
+    chunk_size: int = BATCH_SCORING_CHUNK_SIZE,
+    progress: Optional[Dict[str, Any]] = None,
+    quiet: bool = True,
+) -> Dict[str, Any]:
+    """把 source 分片到进程池打分，结果按输入顺序写入 output_path（JSONL）
+
+    在途 chunk 数上限为 2×workers：读源、打分、写盘流水并行，内存有界。
+    progress（若传入）实时更新 records / errors，供接口查询进度。
+    workers 上限为 CPU 核数（接口请求体可传任意值）。
+    进程池用 spawn 启动：服务进程里已有线程（job 线程、loop monitor 等），fork 可能继承被占用的锁而死锁。
+    """
+    if sem_mode not in _SEM_MODES:
+        raise ValueError(f"sem_mode must be one of {_SEM_MODES}")
+    cpus = os.cpu_count() or 1
+    workers = max(1, min(workers or cpus, cpus))
+    stats = progress if progress is not None else {}
+    stats.update({"records": 0, "errors": 0, "deltas": {}, "batch_deltas": {}, "status": "running"})
+    deltas: Counter = Counter()
+    batch_deltas: Counter = Counter()
+    loop = asyncio.get_running_loop()
+    started = time.perf_counter()
+
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                             initializer=_init_worker,
+                             initargs=(sem_mode, sem_low, sem_high, quiet)) as pool, \
+            open(output_path, "w", encoding="utf-8") as out:
+        in_flight: deque = deque()
+
+        def _drain(results: List[Dict[str, Any]]) -> None:
+            for result in results:
+                out.write(json.dumps(result, ensure_ascii=False, default=str) + "\n")
+                stats["records"] += 1
+                if "error" in result:
+                    stats["errors"] += 1
+                    continue
+                deltas[result["delta"]] += 1
+                if result.get("batch"):
+                    batch_deltas[result["batch"]["delta"]] += 1
+
+        chunk: List[Dict[str, Any]] = []
+        async for record in source:
+            chunk.append(record)
+            if len(chunk) >= chunk_size:
+                in_flight.append(loop.run_in_executor(pool, _score_chunk, chunk))
+                chunk = []
+                if len(in_flight) >= 2 * workers:
+                    _drain(await in_flight.popleft())
+        if chunk:
+            in_flight.append(loop.run_in_executor(pool, _score_chunk, chunk))
+        while in_flight:
+            _drain(await in_flight.popleft())
+
+    elapsed = time.perf_counter() - started
+    stats.update({
+        "status": "done",
+        "workers": workers,
+        "sem_mode": sem_mode,
+        "elapsed_s": round(elapsed, 3),
+        "records_per_s": round(stats["records"] / elapsed, 1) if elapsed > 0 else None,
+        "deltas": dict(sorted(deltas.items())),
+        "batch_deltas": dict(sorted(batch_deltas.items())),
+        "output": output_path,
+    })
+    logger.info(f"[BatchScoring] done: {stats}")
+    return stats
+
+
+# ---------- 内部接口的后台任务 ----------
+
+batch_scoring_jobs: Dict[str, Dict[str, Any]] = {}
+
+
+class BatchJobBusy(Exception):
+    pass
+
+
+def _evict_finished_jobs() -> None:
+    finished = [job_id for job_id, progress in batch_scoring_jobs.items()
+                if progress.get("status") in ("done", "failed")]
+    for job_id in finished[:max(0, len(finished) - BATCH_SCORING_KEEP_FINISHED)]:
+        del batch_scoring_jobs[job_id]
+
+
+def resolve_job_path(name: str) -> str:
+    """接口传入的文件名只能落在 BATCH_SCORING_DIR 下"""
+    base = os.path.abspath(BATCH_SCORING_DIR)
+    path = os.path.abspath(os.path.join(base, name))
+    if os.path.dirname(path) != base:
+        raise ValueError(f"file must be a plain name inside {BATCH_SCORING_DIR}")
+    return path
+
+
+def start_job(source_factory, output_path: str, **kwargs: Any) -> str:
+    """后台启动一次批量重评分，返回 job_id
+
+    整个 job（读源、进程池启停、写盘）在 asyncio.to_thread 的独立事件循环里运行，
+    source_factory 也在该循环内调用：其中的连接须在此循环内新建，不能复用服务的连接池。
+    已有 BATCH_SCORING_MAX_JOBS 个 job 在跑时抛 BatchJobBusy；output_path 已存在时拒绝覆盖。
+    """
+    if kwargs.get("sem_mode", "local") not in _SEM_MODES:
+        raise ValueError(f"sem_mode must be one of {_SEM_MODES}")
+    if os.path.exists(output_path):
+        raise ValueError(f"output_file already exists: {os.path.basename(output_path)}")
+    active = sum(1 for p in batch_scoring_jobs.values() if p.get("status") in ("pending", "running"))
+    if active >= BATCH_SCORING_MAX_JOBS:
+        raise BatchJobBusy(f"{active} batch re-score job(s) already running")
+    _evict_finished_jobs()
+    job_id = uuid.uuid4().hex[:12]
+    progress: Dict[str, Any] = {"status": "pending", "output": output_path}
+    batch_scoring_jobs[job_id] = progress
+
+    async def _job():
+        async with source_factory() as source:
+            await score_stream(source, output_path, progress=progress, **kwargs)
+
+    async def _run():
+        try:
+            await asyncio.to_thread(asyncio.run, _job())
+        except Exception as e:
+            logger.error(f"[BatchScoring] job {job_id} failed: {e}", exc_info=True)
+            progress.update({"status": "failed", "error": str(e)})
+
+    task = asyncio.get_running_loop().create_task(_run())
+    progress["_task"] = task
+    return job_id
+
+
+def job_status(job_id: str) -> Optional[Dict[str, Any]]:
+    progress = batch_scoring_jobs.get(job_id)
+    if progress is None:
+        return None
+    snapshot = dict(progress)  # job 线程仍在更新 progress，先整体拷贝再遍历
+    return {k: v for k, v in snapshot.items() if not k.startswith("_")}
+
+
+# ---------- CLI ----------
+
+def _parse_args(argv: Optional[Iterable[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Re-score stored turn windows offline (never writes proficiency)")
+    src = parser.add_mutually_exclusive_group(required=True)
+    src.add_argument("--input", help="JSONL file of turn-window records")
+    src.add_argument("--pg-query", help="SELECT returning id, user_id, goal_id, current_task, turns, turn_window")
+    parser.add_argument("--output", required=True, help="JSONL file for per-record results")
+    parser.add_argument("--workers", type=int, default=None, help="process count (default: CPU count)")
+    parser.add_argument("--chunk-size", type=int, default=BATCH_SCORING_CHUNK_SIZE)
+    parser.add_argument("--sem-mode", choices=_SEM_MODES, default="local",
+                        help="semantic signal backend (see TASK_SEM_MODE); none = keyword only")
+    parser.add_argument("--sem-low", type=float, default=None, help="override _SEM_LOW for this run")
+    parser.add_argument("--sem-high", type=float, default=None, help="override _SEM_HIGH for this run")
+    return parser.parse_args(argv)
+
+
+async def pg_connect() -> Any:
+    """按 POSTGRES_* 环境变量新建单条连接（CLI 与内部 job 各自的事件循环内使用）"""
+    import asyncpg
+    return await asyncpg.connect(
+        host=os.getenv("POSTGRES_HOST", "postgres"),
+        port=os.getenv("POSTGRES_PORT", "5432"),
+        user=os.getenv("POSTGRES_USER", "user"),
+        password=os.getenv("POSTGRES_PASSWORD", "password"),
+        database=os.getenv("POSTGRES_DB", "oral_app"),
+    )
+
+
+async def _main(args: argparse.Namespace) -> Dict[str, Any]:
+    kwargs = dict(workers=args.workers, sem_mode=args.sem_mode, sem_low=args.sem_low,
+                  sem_high=args.sem_high, chunk_size=args.chunk_size)
+    if args.input:
+        return await score_stream(iter_jsonl(args.input), args.output, **kwargs)
+
+    conn = await pg_connect()
+    try:
+        return await score_stream(iter_postgres(conn, args.pg_query), args.output, **kwargs)
+    finally:
+        await conn.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    print(json.dumps(asyncio.run(_main(_parse_args())), ensure_ascii=False, indent=2))
@@ -6,7 +6,7 @@ import redis
 import json
 import os
 import logging
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Tuple
 from functools import wraps
 import time
 
@@ -22,6 +22,8 @@ REDIS_PASSWORD = os.getenv('REDIS_PASSWORD', None)
 CACHE_TTL_USER_INFO = 3600  # 用户信息缓存1小时
 CACHE_TTL_USER_LANGUAGE = 7200  # 用户语言设置缓存2小时
 CACHE_TTL_TASK_EMBEDDING = 86400  # 任务 gold embedding 缓存24小时（task 文本稳定）
+CACHE_TTL_SCENE_KEYWORDS = 7 * 86400  # 场景关键词缓存7天（按 场景+任务+语言 寻址，内容稳定）
+CACHE_TTL_GOAL_EMBEDDING_INDEX = 30 * 86400  # goal 级 gold embedding 矩阵缓存30天（随 goal 周期）
 
 
 class RedisCache:
@@ -29,6 +31,7 @@ class RedisCache:
     
     def __init__(self):
         self._client = None
+        self._binary_client = None  # decode_responses=False，用于原始字节（embedding 矩阵）
         self._connected = False
     
     def connect(self):
@@ -64,6 +67,21 @@ class RedisCache:
             return self.connect()
         return self._client
     
+    def _get_binary_client(self):
+        """获取不解码响应的 Redis 客户端（与主客户端同库），仅在主连接可用时创建"""
+        if self._binary_client is None:
+            self._binary_client = redis.Redis(
+                host=REDIS_HOST,
+                port=REDIS_PORT,
+                db=REDIS_DB,
+                password=REDIS_PASSWORD,
+                decode_responses=False,
+                socket_connect_timeout=5,
+                socket_timeout=5,
+                health_check_interval=30
+            )
+        return self._binary_client
+
     def is_connected(self) -> bool:
         """检查Redis连接状态"""
         if self._client is None:
@@ -206,6 +224,99 @@ class RedisCache:
         except Exception as e:
             logger.warning(f"[Redis] Error setting task embedding cache: {e}")
 
+    def get_goal_embedding_index(self, goal_id) -> Optional[Tuple[Dict[str, Any], bytes]]:
+        """
+        从缓存获取 goal 的任务 gold embedding 矩阵
+
+        Args:
+            goal_id: 目标 ID
+
+        Returns:
+            (meta, blob)：meta 含 keys/dim/dtype，blob 为 float32 原始字节；不存在返回 None
+        """
+        if not self.is_connected():
+            return None
+
+        try:
+            key = f"task:embindex:{goal_id}"
+            meta_raw, blob = self._get_binary_client().hmget(key, "meta", "matrix")
+            if meta_raw and blob:
+                logger.debug(f"[Redis] Goal embedding index cache hit for goal {goal_id}")
+                return json.loads(meta_raw), blob
+            logger.debug(f"[Redis] Goal embedding index cache miss for goal {goal_id}")
+            return None
+        except Exception as e:
+            logger.warning(f"[Redis] Error getting goal embedding index from cache: {e}")
+            return None
+
+    def set_goal_embedding_index(self, goal_id, meta: Dict[str, Any], blob: bytes,
+                                 ttl: int = CACHE_TTL_GOAL_EMBEDDING_INDEX):
+        """
+        缓存 goal 的任务 gold embedding 矩阵（原始字节，避免 JSON float 列表的体积与解析开销）
+
+        Args:
+            goal_id: 目标 ID
+            meta: {"keys": [...], "dim": int, "dtype": "<f4"}
+            blob: matrix + norms 的原始字节
+            ttl: 过期时间（秒）
+        """
+        if not self.is_connected():
+            return
+
+        try:
+            key = f"task:embindex:{goal_id}"
+            pipe = self._get_binary_client().pipeline()
+            pipe.hset(key, mapping={"meta": json.dumps(meta), "matrix": blob})
+            pipe.expire(key, ttl)
+            pipe.execute()
+            logger.debug(f"[Redis] Cached goal embedding index for goal {goal_id}, bytes={len(blob)}, TTL={ttl}s")
+        except Exception as e:
+            logger.warning(f"[Redis] Error setting goal embedding index cache: {e}")
+
+    def get_scene_keywords(self, keyword_key: str) -> Optional[list]:
+        """
+        从缓存获取场景/任务关键词列表（跨 worker 共享层）
+
+        Args:
+            keyword_key: 关键词标识（场景+任务+语言的 hash）
+
+        Returns:
+            关键词列表，不存在返回 None
+        """
+        if not self.is_connected():
+            return None
+
+        try:
+            key = f"keywords:scene:{keyword_key}"
+            data = self._client.get(key)
+            if data:
+                logger.debug(f"[Redis] Scene keywords cache hit for {keyword_key}")
+                return json.loads(data)
+            logger.debug(f"[Redis] Scene keywords cache miss for {keyword_key}")
+            return None
+        except Exception as e:
+            logger.warning(f"[Redis] Error getting scene keywords from cache: {e}")
+            return None
+
+    def set_scene_keywords(self, keyword_key: str, keywords: list, ttl: int = CACHE_TTL_SCENE_KEYWORDS):
+        """
+        缓存场景/任务关键词列表
+
+        Args:
+            keyword_key: 关键词标识
+            keywords: 关键词列表
+            ttl: 过期时间（秒）
+        """
+        if not self.is_connected():
+            return
+
+        try:
+            key = f"keywords:scene:{keyword_key}"
+            self._client.setex(key, ttl, json.dumps(keywords, ensure_ascii=False))
+            logger.debug(f"[Redis] Cached scene keywords for {keyword_key}, n={len(keywords)}, TTL={ttl}s")
+        except Exception as e:
+            logger.warning(f"[Redis] Error setting scene keywords cache: {e}")
+
     def invalidate_user(self, user_id: str):
         """
         清除用户缓存（用于用户信息更新时）
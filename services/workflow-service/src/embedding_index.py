@@ -0,0 +1,179 @@
+"""
+Task Gold-Embedding Index for Workflow Service
+按 goal 预构建任务 gold 文本的 embedding 矩阵，打分时向量化计算余弦相似度
+
+- 矩阵为连续 float32（n_tasks × dim），行范数预先算好
+- Redis 中以原始字节存储（比逐任务 JSON float 列表小 ~5 倍）
+- 进程内以 NumPy 数组常驻（有界 LRU，按 goal_id）
+- 当前任务相似度 / 全部任务相似度（离题检测）都是一次点积
+"""
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# 进程内常驻的 goal 索引数量上限
+GOAL_INDEX_CACHE_MAX = int(os.getenv("GOAL_INDEX_CACHE_MAX", "256"))
+
+
+def gold_key(gold_text: str) -> str:
+    """任务 gold 文本的稳定标识（与逐任务 embedding 缓存 task:embedding:* 的 key 一致）"""
+    return hashlib.sha256(gold_text.strip().encode("utf-8")).hexdigest()[:16]
+
+
+class TaskEmbeddingIndex:
+    """一个 goal 下所有任务 gold 向量的矩阵索引"""
+
+    def __init__(self, keys: Sequence[str], matrix: np.ndarray, norms: Optional[np.ndarray] = None):
+        self.keys: List[str] = list(keys)
+        self.matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+        if self.matrix.ndim != 2 or self.matrix.shape[0] != len(self.keys):
+            raise ValueError(f"matrix shape {self.matrix.shape} does not match {len(self.keys)} keys")
+        if norms is None:
+            norms = np.linalg.norm(self.matrix, axis=1)
+        self.norms = np.ascontiguousarray(norms, dtype=np.float32)
+        self._rows: Dict[str, int] = {k: i for i, k in enumerate(self.keys)}
+
+    @classmethod
+    def from_vectors(cls, keys: Sequence[str], vectors: Sequence[Sequence[float]]) -> "TaskEmbeddingIndex":
+        return cls(keys, np.asarray(vectors, dtype=np.float32))
+
+    @property
+    def dim(self) -> int:
+        return int(self.matrix.shape[1])
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def row(self, key: str) -> Optional[int]:
+        return self._rows.get(key)
+
+    def similarities(self, vec: Sequence[float]) -> Optional[np.ndarray]:
+        """vec 与全部任务的余弦相似度（一次矩阵-向量点积）；维度不符或零向量返回 None"""
+        v = np.asarray(vec, dtype=np.float32)
+        if v.ndim != 1 or v.shape[0] != self.dim:
+            return None
+        v_norm = float(np.linalg.norm(v))
+        if v_norm == 0.0:
+            return None
+        denom = self.norms * v_norm
+        dots = self.matrix @ v
+        return np.divide(dots, denom, out=np.zeros_like(dots), where=denom > 0)
+
+    def similarity(self, vec: Sequence[float], key: str) -> Optional[float]:
+        """vec 与单个任务的余弦相似度；任务不在索引中返回 None"""
+        i = self._rows.get(key)
+        if i is None:
+            return None
+        v = np.asarray(vec, dtype=np.float32)
+        if v.ndim != 1 or v.shape[0] != self.dim:
+            return None
+        denom = float(self.norms[i]) * float(np.linalg.norm(v))
+        if denom == 0.0:
+            return 0.0
+        return float(self.matrix[i] @ v) / denom
+
+    def similarity_with_others(self, vec: Sequence[float], key: str) -> Optional[Tuple[float, Optional[float]]]:
+        """一次点积同时得到 (与当前任务的相似度, 与其它任务的最高相似度)，用于离题/串题检测"""
+        i = self._rows.get(key)
+        if i is None:
+            return None
+        sims = self.similarities(vec)
+        if sims is None:
+            return None
+        current = float(sims[i])
+        if len(sims) < 2:
+            return current, None
+        sims[i] = -np.inf
+        return current, float(sims.max())
+
+    def to_bytes(self) -> Tuple[Dict, bytes]:
+        """序列化为 (meta, blob)：blob = matrix 原始字节 + norms 原始字节（little-endian float32）"""
+        meta = {"keys": self.keys, "dim": self.dim, "dtype": "<f4"}
+        blob = self.matrix.astype("<f4", copy=False).tobytes() + self.norms.astype("<f4", copy=False).tobytes()
+        return meta, blob
+
+    @classmethod
+    def from_bytes(cls, meta: Dict, blob: bytes) -> "TaskEmbeddingIndex":
+        keys = meta["keys"]
+        n, dim = len(keys), int(meta["dim"])
+        flat = np.frombuffer(blob, dtype=meta.get("dtype", "<f4"))
+        if flat.size != n * dim + n:
+            raise ValueError(f"index blob size {flat.size} != {n}x{dim}+{n}")
+        matrix = flat[: n * dim].reshape(n, dim)
+        norms = flat[n * dim:]
+        return cls(keys, matrix, norms)
+
+
+class GoalIndexRegistry:
+    """goal_id → TaskEmbeddingIndex：进程内有界 LRU，未命中回源 Redis 原始字节
+
+    build 在 asyncio.to_thread 的工作线程里 put、打分在事件循环上 get，
+    本地层的读写均持 _lock（Redis 调用与反序列化不持锁）。
+    """
+
+    def __init__(self, maxsize: int = GOAL_INDEX_CACHE_MAX):
+        self._maxsize = maxsize
+        self._store: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _redis():
+        try:
+            from cache import cache as _cache
+        except Exception:
+            return None
+        return _cache
+
+    def _put_local(self, goal_id, index: TaskEmbeddingIndex) -> None:
+        with self._lock:
+            self._store[goal_id] = index
+            self._store.move_to_end(goal_id)
+            while len(self._store) > self._maxsize:
+                self._store.popitem(last=False)
+
+    def get(self, goal_id) -> Optional[TaskEmbeddingIndex]:
+        if goal_id is None:
+            return None
+        with self._lock:
+            local = self._store.get(goal_id)
+            if local is not None:
+                self._store.move_to_end(goal_id)
+                return local
+        _cache = self._redis()
+        if _cache is None:
+            return None
+        packed = _cache.get_goal_embedding_index(goal_id)
+        if not packed:
+            return None
+        try:
+            index = TaskEmbeddingIndex.from_bytes(*packed)
+        except Exception as e:
+            logger.warning(f"[EmbedIndex] corrupt index for goal={goal_id}: {e}")
+            return None
+        self._put_local(goal_id, index)
+        return index
+
+    def put(self, goal_id, index: TaskEmbeddingIndex) -> None:
+        self._put_local(goal_id, index)
+        _cache = self._redis()
+        if _cache is not None:
+            meta, blob = index.to_bytes()
+            _cache.set_goal_embedding_index(goal_id, meta, blob)
+
+    def __contains__(self, goal_id) -> bool:
+        with self._lock:
+            return goal_id in self._store
+
+    def clear(self) -> None:
+        with self._lock:
+            self._store.clear()
+
+
+goal_index_registry = GoalIndexRegistry()
@@ -0,0 +1,208 @@
+"""
+Local Embedding Backend for Workflow Service
+无网络依赖的任务相关性语义信号：字符 n-gram 哈希 + TF-IDF（NumPy）
+
+- 文本 → NFKC/小写/去标点 → 字符 n-gram → crc32 哈希分桶（dim 维）
+- TF 取 1+log(tf)，乘以按语言加载的 IDF 表（data/idf/<language>.json），再 L2 归一化
+- 余弦相似度经分段线性标定映射到 DashScope embedding 的相似度刻度，
+  使 _SEM_LOW / _SEM_HIGH 阈值对两种后端通用
+
+IDF 表由本文件 __main__ 从仓库内的任务/场景/关键词语料生成：
+    python src/local_embedding.py
+"""
+import json
+import logging
+import math
+import os
+import re
+import unicodedata
+import zlib
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+IDF_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "idf")
+
+LOCAL_EMBED_DIM = 4096
+# CJK 单字即有语义，取 1-3 字；拼音文字取 2-4 字符（含词边界空格）
+_CJK_NGRAM_RANGE = (1, 3)
+_ALPHA_NGRAM_RANGE = (2, 4)
+_CJK_LANGUAGES = {"chinese", "japanese", "korean", "mandarin", "cantonese"}
+
+# 标定锚点：(本地 n-gram 余弦, 对应的 DashScope embedding 余弦)
+# 本地余弦的噪声底接近 0，而 text-embedding-v3 的无关句基线在 0.44-0.46；
+# 以仓库 IDF 表实测（同任务改写 ≈0.16-0.47，原词复用 ≈0.8，同场景其它话题 ≈0.09，
+# 无关句 ≤0.04）把 raw 0.10 / 0.22 对齐到 _SEM_LOW=0.52 / _SEM_HIGH=0.62 两档。
+# 换阈值或重建 IDF 表后用 env 覆盖并重新取样。
+_LOCAL_SEM_LOW_RAW = float(os.getenv("TASK_LOCAL_SEM_LOW_RAW", "0.10"))
+_LOCAL_SEM_HIGH_RAW = float(os.getenv("TASK_LOCAL_SEM_HIGH_RAW", "0.22"))
+
+_PUNCT_RE = re.compile(r"[^\w\s]+", re.UNICODE)
+_SPACE_RE = re.compile(r"\s+")
+
+
+def _normalize(text: str) -> str:
+    text = unicodedata.normalize("NFKC", text or "").lower()
+    text = _PUNCT_RE.sub(" ", text)
+    return _SPACE_RE.sub(" ", text).strip()
+
+
+def _ngram_range(language: str) -> Tuple[int, int]:
+    return _CJK_NGRAM_RANGE if (language or "").lower() in _CJK_LANGUAGES else _ALPHA_NGRAM_RANGE
+
+
+def _char_ngrams(text: str, lo: int, hi: int) -> List[str]:
+    padded = f" {text} "
+    grams = []
+    for n in range(lo, hi + 1):
+        grams.extend(padded[i:i + n] for i in range(len(padded) - n + 1))
+    return [g for g in grams if g.strip()]
+
+
+def _bucket_ids(grams: Iterable[str], dim: int) -> np.ndarray:
+    return np.fromiter((zlib.crc32(g.encode("utf-8")) % dim for g in grams), dtype=np.int64)
+
+
+def calibrate(raw: float, sem_low: float, sem_high: float) -> float:
+    """把本地余弦映射到 embedding 余弦刻度（分段线性，单调）"""
+    xs = [0.0, _LOCAL_SEM_LOW_RAW, _LOCAL_SEM_HIGH_RAW, 1.0]
+    ys = [min(0.40, sem_low), sem_low, sem_high, 1.0]
+    return float(np.interp(raw, xs, ys))
+
+
+class LocalEmbedder:
+    """单语言的哈希 n-gram TF-IDF 向量器"""
+
+    def __init__(self, language: str, idf: np.ndarray, ngram_range: Tuple[int, int]):
+        self.language = language
+        self.idf = np.ascontiguousarray(idf, dtype=np.float32)
+        self.dim = int(self.idf.shape[0])
+        self.ngram_range = tuple(ngram_range)
+
+    @classmethod
+    def from_table(cls, table: Dict) -> "LocalEmbedder":
+        dim = int(table.get("dim", LOCAL_EMBED_DIM))
+        idf = np.full(dim, float(table.get("default_idf", 1.0)), dtype=np.float32)
+        for bucket, value in (table.get("idf") or {}).items():
+            idf[int(bucket)] = float(value)
+        return cls(table.get("language", "default"), idf, table.get("ngram_range", _ALPHA_NGRAM_RANGE))
+
+    def embed(self, text: str) -> Optional[np.ndarray]:
+        """返回 L2 归一化的 float32 向量；文本无有效 n-gram 时返回 None"""
+        grams = _char_ngrams(_normalize(text), *self.ngram_range)
+        if not grams:
+            return None
+        tf = np.bincount(_bucket_ids(grams, self.dim), minlength=self.dim).astype(np.float32)
+        vec = np.log1p(tf, out=tf) * self.idf
+        norm = float(np.linalg.norm(vec))
+        if norm == 0.0:
+            return None
+        return vec / norm
+
+    def similarity(self, a: str, b: str) -> Optional[float]:
+        va, vb = self.embed(a), self.embed(b)
+        if va is None or vb is None:
+            return None
+        return float(va @ vb)
+
+
+_embedders: Dict[str, LocalEmbedder] = {}
+
+
+def _load_table(language: str) -> Optional[Dict]:
+    path = os.path.join(IDF_DIR, f"{language}.json")
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except Exception as e:
+        logger.warning(f"[LocalEmbed] failed to load IDF table {path}: {e}")
+        return None
+
+
+def get_embedder(target_language: str) -> LocalEmbedder:
+    """按目标语言取向量器（进程内缓存）；无该语言 IDF 表时用 default 表 / 均匀 IDF"""
+    language = (target_language or "english").strip().lower()
+    embedder = _embedders.get(language)
+    if embedder is None:
+        table = _load_table(language) or _load_table("default")
+        if table is None:
+            embedder = LocalEmbedder(language, np.ones(LOCAL_EMBED_DIM, dtype=np.float32), _ngram_range(language))
+        else:
+            embedder = LocalEmbedder.from_table(table)
+            embedder.ngram_range = _ngram_range(language)
+        _embedders[language] = embedder
+    return embedder
+
+
+def local_similarity(text: str, gold_text: str, target_language: str,
+                     sem_low: float, sem_high: float) -> Optional[float]:
+    """本地语义相似度（已标定到 embedding 刻度）；任一文本为空返回 None"""
+    if not text or not text.strip() or not gold_text or not gold_text.strip():
+        return None
+    raw = get_embedder(target_language).similarity(text, gold_text)
+    if raw is None:
+        return None
+    return calibrate(raw, sem_low, sem_high)
+
+
+# ---------- IDF 表构建 ----------
+
+def build_idf_table(language: str, documents: Sequence[str], dim: int = LOCAL_EMBED_DIM) -> Dict:
+    """平滑 IDF：idf = ln((1+N)/(1+df)) + 1；未出现的桶取最大 IDF（视为稀有）"""
+    ngram_range = _ngram_range(language)
+    df = np.zeros(dim, dtype=np.int64)
+    n_docs = 0
+    for doc in documents:
+        grams = _char_ngrams(_normalize(doc), *ngram_range)
+        if not grams:
+            continue
+        n_docs += 1
+        df[np.unique(_bucket_ids(grams, dim))] += 1
+    default_idf = math.log((1 + n_docs) / 1) + 1
+    idf = {
+        str(int(b)): round(math.log((1 + n_docs) / (1 + int(df[b]))) + 1, 4)
+        for b in np.nonzero(df)[0]
+    }
+    return {
+        "language": language,
+        "dim": dim,
+        "ngram_range": list(ngram_range),
+        "n_docs": n_docs,
+        "default_idf": round(default_idf, 4),
+        "idf": idf,
+    }
+
+
+def _repo_corpus() -> Dict[str, List[str]]:
+    """仓库内的多语言任务语料：goal 模板任务、场景关键词、各语言关键词映射"""
+    import sys
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from workflows.goal_planning import GoalPlanningWorkflow
+    from workflows.proficiency_scoring import ProficiencyScoringWorkflow
+
+    corpus: Dict[str, List[str]] = {"english": []}
+    for template in GoalPlanningWorkflow().goal_templates.values():
+        corpus["english"].append(template.get("description", ""))
+        for scenario in template.get("scenarios", []):
+            corpus["english"].extend(f"{scenario['title']} {t}" for t in scenario.get("tasks", []))
+    scoring = ProficiencyScoringWorkflow()
+    for language in ("japanese", "chinese", "korean", "french", "spanish", "german", "portuguese", "russian"):
+        mapping = scoring._get_translation_map(language)
+        docs = [" ".join(words) for words in mapping.values()]
+        corpus.setdefault(language, []).extend(docs)
+        corpus["english"].extend(mapping.keys())
+    corpus["default"] = [doc for docs in corpus.values() for doc in docs]
+    return corpus
+
+
+if __name__ == "__main__":
+    os.makedirs(IDF_DIR, exist_ok=True)
+    for lang, docs in _repo_corpus().items():
+        table = build_idf_table(lang, docs)
+        with open(os.path.join(IDF_DIR, f"{lang}.json"), "w", encoding="utf-8") as f:
+            json.dump(table, f, ensure_ascii=False, separators=(",", ":"), sort_keys=True)
+        print(f"{lang}: docs={table['n_docs']} buckets={len(table['idf'])}")
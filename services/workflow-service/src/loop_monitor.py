@@ -0,0 +1,141 @@
+"""Event-loop lag watchdog (mirrors ai-omni-service/app/loop_monitor.py).
+
+A coroutine on the loop wakes every ``interval``; how late it actually runs is
+the loop's scheduling lag, kept as a histogram. A daemon thread watches those
+wake-ups: when the loop has missed one by ``threshold`` it grabs the loop
+thread's Python stack (once per stall) and charges the stall to the innermost
+frame under ``code_root`` — our own code, not the library it called into — so
+the report ranks the call sites that block the loop, with a sample stack each.
+"""
+
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+
+logger = logging.getLogger(__name__)
+
+_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+_STACK_DEPTH = 12
+_THIS_FILE = os.path.abspath(__file__)
+
+
+class LoopLagMonitor:
+    def __init__(self, interval: float = 0.1, threshold: float = 0.2, code_root: str = None, top: int = 10):
+        self.interval = interval
+        self.threshold = threshold
+        self.code_root = os.path.abspath(code_root or os.path.dirname(__file__))
+        self.top = top
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._loop_thread_id = None
+        self._task = None
+        self._thread = None
+        self._last_wake = 0.0
+        self._captured_for = None      # wake-up timestamp of the stall already captured
+        self._pending_site = None      # site captured for the stall in progress
+        self._histogram = [0] * (len(_BUCKETS_MS) + 1)
+        self._samples = 0
+        self._max_lag_ms = 0.0
+        self._stalls = 0
+        self._blocked_ms = 0.0
+        self._sites = {}               # site → {"stalls", "blocked_ms", "max_ms", "leaf", "stack"}
+
+    def start(self) -> None:
+        """Start watching the running loop (call from a coroutine on it)."""
+        if self._task is not None:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._last_wake = time.monotonic()
+        self._task = asyncio.get_running_loop().create_task(self._tick())
+        self._thread = threading.Thread(target=self._watch, name="loop-lag-watchdog", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+
+    # ── loop side ──
+    async def _tick(self) -> None:
+        while True:
+            self._last_wake = time.monotonic()
+            await asyncio.sleep(self.interval)
+            self._observe((time.monotonic() - self._last_wake - self.interval) * 1000)
+
+    def _observe(self, lag_ms: float) -> None:
+        lag_ms = max(0.0, lag_ms)
+        bucket = next((i for i, edge in enumerate(_BUCKETS_MS) if lag_ms <= edge), len(_BUCKETS_MS))
+        with self._lock:
+            self._histogram[bucket] += 1
+            self._samples += 1
+            self._max_lag_ms = max(self._max_lag_ms, lag_ms)
+            site, self._pending_site = self._pending_site, None
+            if lag_ms < self.threshold * 1000:
+                return
+            self._stalls += 1
+            self._blocked_ms += lag_ms
+            if site is not None:
+                entry = self._sites[site]
+                entry["stalls"] += 1
+                entry["blocked_ms"] += lag_ms
+                entry["max_ms"] = max(entry["max_ms"], lag_ms)
+
+    # ── watchdog thread ──
+    def _watch(self) -> None:
+        while not self._stop.wait(self.interval / 2):
+            wake = self._last_wake
+            if wake == self._captured_for:
+                continue
+            if time.monotonic() - wake - self.interval < self.threshold:
+                continue
+            self._captured_for = wake
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is not None:
+                self._capture(frame)
+
+    def _capture(self, frame) -> None:
+        stack = traceback.extract_stack(frame)
+        del frame
+        site_frame = next((f for f in reversed(stack)
+                           if f.filename.startswith(self.code_root) and f.filename != _THIS_FILE), stack[-1])
+        site = f"{os.path.relpath(site_frame.filename, self.code_root)}:{site_frame.lineno} {site_frame.name}"
+        leaf = stack[-1]
+        logger.warning(f"[LoopLag] event loop blocked >{self.threshold * 1000:.0f}ms at {site} "
+                       f"(in {os.path.basename(leaf.filename)}:{leaf.lineno} {leaf.name})")
+        with self._lock:
+            self._pending_site = site
+            if site not in self._sites:
+                self._sites[site] = {
+                    "stalls": 0, "blocked_ms": 0.0, "max_ms": 0.0,
+                    "leaf": f"{leaf.filename}:{leaf.lineno} {leaf.name}",
+                    "stack": "".join(traceback.format_list(stack[-_STACK_DEPTH:])),
+                }
+
+    def report(self) -> dict:
+        with self._lock:
+            labels = [f"<={edge}ms" for edge in _BUCKETS_MS] + [f">{_BUCKETS_MS[-1]}ms"]
+            top = sorted(self._sites.items(), key=lambda kv: kv[1]["blocked_ms"], reverse=True)[:self.top]
+            return {
+                "interval_ms": round(self.interval * 1000),
+                "threshold_ms": round(self.threshold * 1000),
+                "samples": self._samples,
+                "max_lag_ms": round(self._max_lag_ms, 1),
+                "histogram": dict(zip(labels, self._histogram)),
+                "stalls": self._stalls,
+                "blocked_ms": round(self._blocked_ms, 1),
+                "top_sites": [{"site": site, **entry,
+                               "blocked_ms": round(entry["blocked_ms"], 1),
+                               "max_ms": round(entry["max_ms"], 1)} for site, entry in top],
+            }
+
+
+def build_loop_monitor(env, code_root: str = None) -> LoopLagMonitor:
+    return LoopLagMonitor(
+        interval=float(env.get("LOOP_LAG_INTERVAL_MS") or 100) / 1000,
+        threshold=float(env.get("LOOP_LAG_THRESHOLD_MS") or 200) / 1000,
+        code_root=code_root,
+    )
@@ -2,7 +2,7 @@
 Workflow Service - Main Entry Point
 提供 4 个工作流的统一 API 接口
 """
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, HTTPException, Depends, Request
 from pydantic import BaseModel
 from typing import Dict, List, Any, Optional
 import asyncpg
@@ -13,6 +13,7 @@ import time
 from datetime import datetime
 from typing import List, Dict, Any, Optional
 import asyncio
+from contextlib import asynccontextmanager
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -20,10 +21,14 @@ logger = logging.getLogger(__name__)
 
 from workflows.oral_tutor import oral_tutor_workflow
 from workflows.proficiency_scoring import proficiency_scoring_workflow
-from workflows.scenario_review import scenario_review_workflow
+from workflows.scenario_review import scenario_review_workflow, prompt_budgets
 from workflows.goal_planning import goal_planning_workflow
-from workflows.batch_evaluation import batch_evaluation_workflow
+from workflows.batch_evaluation import batch_evaluation_workflow, tracer
 from cache import cache, get_user_language_with_cache
+import batch_scoring
+from loop_monitor import build_loop_monitor
+from profiler import ProfilerBusy, build_profiler
+from model_calls import TIER_HEADER, model_calls
 
 
 app = FastAPI(
@@ -35,11 +40,26 @@ app = FastAPI(
 # Database connection pool
 db_pool = None
 
+# Event-loop lag watchdog; LOOP_LAG_MONITOR=0 disables it
+loop_monitor = build_loop_monitor(os.environ)
+
+# On-demand sampling profiler; PROFILER_MAX_CONCURRENT / PROFILER_MAX_SECONDS
+profiler = build_profiler(os.environ)
+
+
+@app.middleware("http")
+async def bind_model_call_tier(request: Request, call_next):
+    """Attribute this request's model calls to the learner tier ai-omni-service forwards"""
+    model_calls.bind(request.headers.get(TIER_HEADER))
+    return await call_next(request)
+
 
 @app.on_event("startup")
 async def startup_db_pool():
     """Initialize database connection pool with retry logic"""
     global db_pool
+    if os.getenv("LOOP_LAG_MONITOR", "1") != "0":
+        loop_monitor.start()
     max_retries = 30
     retry_delay = 2
     
@@ -95,6 +115,8 @@ async def startup_db_pool():
 @app.on_event("shutdown")
 async def shutdown_db_pool():
     """Close database connection pool"""
+    loop_monitor.stop()
+    tracer.flush()
     if db_pool:
         await db_pool.close()
 
@@ -183,6 +205,23 @@ class MagicPassEvaluateRequest(BaseModel):
     target_language: Optional[str] = "en"
 
 
+class KeywordPrecomputeRequest(BaseModel):
+    target_language: str = "English"
+    scenarios: List[Dict[str, Any]]
+
+
+class BatchRescoreRequest(BaseModel):
+    source: str = "jsonl"  # jsonl | postgres (BATCH_SCORING_TABLE)
+    input_file: Optional[str] = None  # source=jsonl 时 BATCH_SCORING_DIR 下的文件名
+    since: Optional[str] = None  # source=postgres 时按 created_at 筛选
+    limit: Optional[int] = None
+    output_file: str
+    workers: Optional[int] = None
+    sem_mode: str = "local"
+    sem_low: Optional[float] = None
+    sem_high: Optional[float] = None
+
+
 class BatchEvaluateTurn(BaseModel):
     turn_index: int
     user_content: str
@@ -262,6 +301,7 @@ async def update_proficiency_score(request: ProficiencyUpdateRequest, conn = Dep
 @app.post("/api/workflows/proficiency-scoring/batch-evaluate")
 async def batch_evaluate_proficiency(
     request: BatchEvaluateRequest,
+    http_request: Request,
     conn = Depends(get_db_connection)
 ):
     """
@@ -276,14 +316,16 @@ async def batch_evaluate_proficiency(
             f"[BATCH_EVAL] user={request.user_id} goal={request.goal_id} "
             f"task={request.task_id} turns={len(request.turn_window)}"
         )
-        result = await batch_evaluation_workflow.evaluate_window(
-            user_id=request.user_id,
-            goal_id=request.goal_id,
-            turn_window=[t.dict() for t in request.turn_window],
-            current_task=request.current_task,
-            native_language=request.native_language,
-            db_connection=conn,
-        )
+        with tracer.span("batch_eval.server", parent=http_request.headers.get("traceparent"),
+                         turns=len(request.turn_window)):
+            result = await batch_evaluation_workflow.evaluate_window(
+                user_id=request.user_id,
+                goal_id=request.goal_id,
+                turn_window=[t.dict() for t in request.turn_window],
+                current_task=request.current_task,
+                native_language=request.native_language,
+                db_connection=conn,
+            )
         logger.info(
             f"[BATCH_EVAL] result: delta={result.get('delta')} "
             f"mode={result.get('teaching_mode')} "
@@ -295,6 +337,124 @@ async def batch_evaluate_proficiency(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/api/workflows/proficiency-scoring/precompute-keywords")
+async def precompute_scene_keywords(request: KeywordPrecomputeRequest):
+    """
+    Precompute scoring keywords for every scenario × task of a goal so the
+    first scored turn of each task is a cache hit. Called after scenarios
+    are generated (ai-omni-service /generate-scenarios).
+    """
+    try:
+        stats = await proficiency_scoring_workflow.precompute_scene_keywords(
+            scenarios=request.scenarios,
+            target_language=request.target_language,
+        )
+        return {"success": True, "data": stats}
+    except Exception as e:
+        logger.error(f"[KEYWORDS] Precompute error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/api/workflows/proficiency-scoring/batch-rescore")
+async def start_batch_rescore(request: BatchRescoreRequest, http_request: Request):
+    """
+    Internal: re-score stored turn windows offline on a process pool
+    (calibration after threshold / keyword-rule changes). Results go to a
+    JSONL file under BATCH_SCORING_DIR; live proficiency is never touched.
+    Returns a job id; poll GET .../batch-rescore/{job_id} for progress.
+    """
+    _require_internal_auth(http_request)
+    try:
+        output_path = batch_scoring.resolve_job_path(request.output_file)
+        if request.source == "jsonl":
+            if not request.input_file:
+                raise ValueError("input_file is required for source=jsonl")
+            input_path = batch_scoring.resolve_job_path(request.input_file)
+            if not os.path.exists(input_path):
+                raise ValueError(f"input_file not found: {request.input_file}")
+
+            @asynccontextmanager
+            async def source_factory():
+                yield batch_scoring.iter_jsonl(input_path)
+        elif request.source == "postgres":
+            sql, args = batch_scoring.table_query(request.since, request.limit)
+
+            @asynccontextmanager
+            async def source_factory():
+                # Runs on the job thread's own event loop, so it cannot borrow db_pool
+                conn = await batch_scoring.pg_connect()
+                try:
+                    yield batch_scoring.iter_postgres(conn, sql, *args)
+                finally:
+                    await conn.close()
+        else:
+            raise ValueError("source must be jsonl or postgres")
+
+        job_id = batch_scoring.start_job(
+            source_factory, output_path,
+            workers=request.workers, sem_mode=request.sem_mode,
+            sem_low=request.sem_low, sem_high=request.sem_high,
+        )
+        logger.info(f"[BATCH_RESCORE] job={job_id} source={request.source} output={output_path}")
+        return {"success": True, "data": {"job_id": job_id}}
+    except batch_scoring.BatchJobBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.get("/api/workflows/proficiency-scoring/batch-rescore/{job_id}")
+async def get_batch_rescore(job_id: str, request: Request):
+    """Progress / summary of a batch re-score job"""
+    _require_internal_auth(request)
+    status = batch_scoring.job_status(job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="job not found")
+    return {"success": True, "data": status}
+
+
+@app.get("/api/workflows/metrics/prompt-budget")
+async def get_prompt_budget_metrics():
+    """Prompt size distribution (estimated tokens) per LLM call class"""
+    return {"success": True, "data": prompt_budgets.stats()}
+
+
+@app.get("/api/workflows/metrics/loop-lag")
+async def get_loop_lag_metrics():
+    """Event-loop lag histogram and the call sites that blocked the loop"""
+    return {"success": True, "data": loop_monitor.report()}
+
+
+@app.get("/api/workflows/metrics/traces")
+async def get_trace_metrics(limit: int = 50):
+    """Span latency percentiles for traced batch evaluations, plus the most recent spans"""
+    return {"success": True, "data": {**tracer.stats(), "recent": tracer.recent(limit)}}
+
+
+@app.get("/api/workflows/metrics/model-calls")
+async def get_model_call_metrics():
+    """Tokens, latency, retries, fallbacks and cache hits per model call class and user tier"""
+    return {"success": True, "data": model_calls.stats()}
+
+
+def _require_internal_auth(request: Request) -> None:
+    import hmac
+    secret = os.getenv("INTERNAL_AUTH_SECRET", "")
+    supplied = request.headers.get("X-Guaji-Internal-Auth", "")
+    if not secret or not hmac.compare_digest(secret, supplied):
+        raise HTTPException(status_code=403, detail="forbidden")
+
+
+@app.post("/api/workflows/metrics/profile")
+async def sample_profile(request: Request, seconds: float = 10, interval_ms: float = 10, thread: Optional[str] = None):
+    """Sample all thread stacks for `seconds`; `data.collapsed` feeds flamegraph.pl / speedscope"""
+    _require_internal_auth(request)
+    try:
+        return {"success": True, "data": await profiler.capture(seconds, interval_ms / 1000, thread)}
+    except ProfilerBusy as e:
+        raise HTTPException(status_code=429, detail=str(e))
+
+
 @app.post("/api/workflows/scenario-review/generate")
 async def generate_scenario_review(request: ScenarioReviewRequest, conn = Depends(get_db_connection)):
     """
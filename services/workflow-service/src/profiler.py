@@ -0,0 +1,123 @@
+"""On-demand statistical CPU profiler for live pods (mirrors ai-omni-service/app/profiler.py).
+
+``capture`` starts a sampling thread for a bounded number of seconds. Every
+``interval`` it reads all thread stacks with ``sys._current_frames()`` and
+counts each stack as ``thread;file:function;...;leaf``. That output is the
+collapsed format flamegraph.pl and speedscope read. Only code objects are
+touched (no source lines, no tracing hooks), so the cost is one stack walk per
+thread per sample; the sampler's own CPU time is reported so it can be
+checked against live traffic. ``max_concurrent`` caps simultaneous captures.
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+_MAX_DEPTH = 64
+_TOP = 20
+
+
+class ProfilerBusy(Exception):
+    pass
+
+
+def _collapse(thread_name: str, frame) -> tuple:
+    parts = []
+    while frame is not None and len(parts) < _MAX_DEPTH:
+        code = frame.f_code
+        parts.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+        frame = frame.f_back
+    parts.append(thread_name)
+    parts.reverse()
+    return ";".join(parts), parts[-1]
+
+
+class SamplingProfiler:
+    def __init__(self, max_concurrent: int = 1, max_seconds: float = 60.0):
+        self.max_concurrent = max_concurrent
+        self.max_seconds = max_seconds
+        self._active = 0
+        self.counters = {"captures": 0, "rejected": 0}
+
+    async def capture(self, seconds: float, interval: float = 0.01, thread: str = None) -> dict:
+        """Sample every thread (or those whose name contains ``thread``) for ``seconds``."""
+        if self._active >= self.max_concurrent:
+            self.counters["rejected"] += 1
+            raise ProfilerBusy(f"{self._active} profile capture(s) already running")
+        seconds = min(max(seconds, 0.1), self.max_seconds)
+        interval = min(max(interval, 0.001), 1.0)
+        self._active += 1
+        self.counters["captures"] += 1
+        loop = asyncio.get_running_loop()
+        done = loop.create_future()
+
+        def _finish(result, error):
+            self._active -= 1             # the slot is held until sampling stops, even if the caller left
+            if done.done():
+                return
+            if error is not None:
+                done.set_exception(error)
+            else:
+                done.set_result(result)
+
+        def _run():
+            try:
+                result, error = self._sample(seconds, interval, thread), None
+            except Exception as e:
+                result, error = None, e
+            loop.call_soon_threadsafe(_finish, result, error)
+
+        threading.Thread(target=_run, name="sampling-profiler", daemon=True).start()
+        return await done
+
+    @staticmethod
+    def _sample(seconds: float, interval: float, thread_filter: str = None) -> dict:
+        me = threading.get_ident()
+        stacks = Counter()
+        leaves = Counter()
+        names = {}
+        samples = 0
+        cpu_start = time.thread_time()
+        start = next_at = time.monotonic()
+        deadline = start + seconds
+        while time.monotonic() < deadline:
+            if samples % 100 == 0:        # threads come and go; refresh names now and then
+                names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                name = names.get(ident, f"thread-{ident}")
+                if thread_filter and thread_filter not in name:
+                    continue
+                stack, leaf = _collapse(name, frame)
+                stacks[stack] += 1
+                leaves[leaf] += 1
+            frame = None              # don't keep the last sampled stack alive while sleeping
+            samples += 1
+            next_at += interval
+            time.sleep(max(0.0, next_at - time.monotonic()))
+        elapsed = time.monotonic() - start
+        sampler_cpu = time.thread_time() - cpu_start
+        return {
+            "seconds": round(elapsed, 2),
+            "interval_ms": round(interval * 1000, 1),
+            "samples": samples,
+            "sampler_cpu_ms": round(sampler_cpu * 1000, 1),
+            "overhead_pct": round(100 * sampler_cpu / elapsed, 2) if elapsed else 0.0,
+            "top_self": [{"frame": leaf, "samples": n} for leaf, n in leaves.most_common(_TOP)],
+            "collapsed": "\n".join(f"{stack} {n}" for stack, n in stacks.most_common()),
+        }
+
+    def stats(self) -> dict:
+        return {"active": self._active, "max_concurrent": self.max_concurrent,
+                "max_seconds": self.max_seconds, **self.counters}
+
+
+def build_profiler(env) -> SamplingProfiler:
+    return SamplingProfiler(
+        max_concurrent=int(env.get("PROFILER_MAX_CONCURRENT") or 1),
+        max_seconds=float(env.get("PROFILER_MAX_SECONDS") or 60),
+    )
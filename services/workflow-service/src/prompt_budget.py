@@ -0,0 +1,122 @@
+"""Per-call-class token budgets for LLM prompts (mirrors ai-omni-service/app/prompt_budget.py).
+
+A prompt is assembled from ``Section``s. Sections at ``REQUIRED`` priority are
+never touched; when the estimate exceeds the call class budget, the others are
+shrunk lowest priority first — whole lines are dropped from the far end (the
+``keep`` side survives) and replaced by a one-line "(N lines omitted)" note, and
+a section whose body is gone disappears with its header and footer. Final
+prompt sizes are recorded per class so prompt growth shows up in metrics next
+to the latency it causes.
+"""
+
+import math
+from collections import deque
+from dataclasses import dataclass
+
+REQUIRED = 100
+
+# call class → token budget; override with PROMPT_BUDGET_<CLASS>=tokens
+DEFAULT_BUDGETS = {
+    "scenario_deep_eval": 1400,  # full-scenario strict evaluation (up to 20 user turns)
+}
+
+_SAMPLES = 512
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap tokenizer-free estimate: one token per CJK/kana/hangul char, ~4 chars per token otherwise."""
+    if not text:
+        return 0
+    wide = sum(1 for ch in text if ord(ch) >= 0x2E80)
+    return wide + math.ceil((len(text) - wide) / 4)
+
+
+@dataclass
+class Section:
+    name: str
+    body: str
+    priority: int = 0
+    header: str = ""
+    footer: str = ""
+    keep: str = "end"           # "end": drop oldest lines first; "start": drop the last lines first
+
+    def render(self) -> str:
+        return f"{self.header}{self.body}{self.footer}" if self.body else ""
+
+
+def _with_note(lines: list, dropped: int, keep: str) -> str:
+    if not lines:
+        return ""
+    body = "".join(lines)
+    if keep == "end":
+        return f"({dropped} earlier lines omitted)\n{body}"
+    if not body.endswith("\n"):
+        body += "\n"
+    return f"{body}({dropped} more lines omitted)\n"
+
+
+def _shrink(section: Section, excess: int) -> int:
+    """Drop whole lines from ``section`` until ~``excess`` tokens are freed; returns tokens freed."""
+    before = estimate_tokens(section.render())
+    lines = section.body.splitlines(keepends=True)
+    dropped = 0
+    while lines and before - estimate_tokens(section.render()) < excess:
+        lines.pop(0 if section.keep == "end" else -1)
+        dropped += 1
+        section.body = _with_note(lines, dropped, section.keep)
+    return before - estimate_tokens(section.render())
+
+
+class PromptBudgeter:
+    def __init__(self, budgets: dict):
+        self.budgets = dict(budgets)
+        self._sizes = {}
+        self._counters = {}
+
+    def fit(self, call_class: str, sections: list) -> str:
+        budget = self.budgets.get(call_class)
+        sizes = [estimate_tokens(s.render()) for s in sections]
+        total = sum(sizes)
+        counters = self._counters.setdefault(
+            call_class, {"calls": 0, "trimmed": 0, "over_budget": 0, "tokens_dropped": 0, "sections_trimmed": {}})
+        counters["calls"] += 1
+        if budget is not None and total > budget:
+            counters["trimmed"] += 1
+            excess = total - budget
+            for section in sorted((s for s in sections if s.priority < REQUIRED), key=lambda s: s.priority):
+                freed = _shrink(section, excess)
+                if freed > 0:
+                    counters["sections_trimmed"][section.name] = counters["sections_trimmed"].get(section.name, 0) + 1
+                excess -= freed
+                if excess <= 0:
+                    break
+            new_total = sum(estimate_tokens(s.render()) for s in sections)
+            counters["tokens_dropped"] += total - new_total
+            total = new_total
+            if total > budget:
+                counters["over_budget"] += 1
+        self._sizes.setdefault(call_class, deque(maxlen=_SAMPLES)).append(total)
+        return "".join(s.render() for s in sections)
+
+    def stats(self) -> dict:
+        out = {}
+        for call_class, counters in self._counters.items():
+            sizes = sorted(self._sizes.get(call_class, ())) or [0]
+            out[call_class] = {
+                "budget_tokens": self.budgets.get(call_class),
+                **counters,
+                "sections_trimmed": dict(counters["sections_trimmed"]),
+                "tokens_p50": sizes[len(sizes) // 2],
+                "tokens_p95": sizes[min(len(sizes) - 1, int(0.95 * len(sizes)))],
+                "tokens_max": sizes[-1],
+            }
+        return out
+
+
+def build_prompt_budgeter(env, defaults: dict = None) -> PromptBudgeter:
+    budgets = dict(DEFAULT_BUDGETS if defaults is None else defaults)
+    for name in list(budgets):
+        override = env.get(f"PROMPT_BUDGET_{name.upper()}")
+        if override:
+            budgets[name] = int(override)
+    return PromptBudgeter(budgets)
@@ -0,0 +1,238 @@
+"""Trace spans for learner turns, W3C ``traceparent`` propagation (mirrors ai-omni-service/app/tracing.py).
+
+A turn starts a root span; stages become child spans, either timed around a
+block (``span``) or measured from the turn start to a milestone (``mark``).
+The active span lives in a ContextVar, so tasks spawned inside a span inherit
+it and helpers such as the upload or history write only need ``span(...)``,
+which is a no-op outside a trace. ``headers()`` carries the context over
+internal HTTP calls; the receiving service continues the same trace.
+
+Finished spans are kept per name for p50/p95/p99 and a small recent ring, and,
+when ``TRACE_EXPORT_PATH`` is set, appended by a background thread as OTLP/JSON
+lines (one ExportTraceServiceRequest per line), the format the OpenTelemetry
+Collector's ``otlpjsonfile`` receiver reads.
+"""
+
+import json
+import os
+import secrets
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+_SAMPLES = 512
+_current_span: ContextVar = ContextVar("current_span", default=None)
+
+
+class Span:
+    __slots__ = ("tracer", "name", "trace_id", "span_id", "parent_id", "start_ns", "end_ns", "attributes", "error")
+
+    def __init__(self, tracer, name, trace_id, parent_id, start_ns=None, attributes=None):
+        self.tracer = tracer
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.start_ns = start_ns or time.time_ns()
+        self.end_ns = None
+        self.attributes = dict(attributes or {})
+        self.error = None
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def set(self, **attributes) -> None:
+        self.attributes.update(attributes)
+
+    def end(self, error: str = None) -> None:
+        if self.end_ns is not None:
+            return
+        self.end_ns = time.time_ns()
+        if error:
+            self.error = error
+        self.tracer._finish(self)
+
+    def mark(self, name: str, **attributes) -> "Span":
+        """A finished child span from this span's start to now (time-to-milestone)."""
+        child = Span(self.tracer, name, self.trace_id, self.span_id, self.start_ns, attributes)
+        child.end()
+        return child
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e6
+
+
+def parse_traceparent(header: str):
+    """(trace_id, parent_span_id) from a W3C traceparent header, or None if malformed."""
+    parts = (header or "").strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    try:
+        int(parts[1], 16), int(parts[2], 16)
+    except ValueError:
+        return None
+    return parts[1], parts[2]
+
+
+class Tracer:
+    def __init__(self, service: str, export_path: str = None, enabled: bool = True, flush_interval: float = 2.0):
+        self.service = service
+        self.enabled = enabled
+        self.export_path = export_path
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._durations = {}              # span name → recent durations (ms)
+        self._recent = deque(maxlen=200)
+        self._pending = []                # spans waiting for the file exporter
+        self._flusher = None
+        self.counters = {"spans": 0, "exported": 0, "export_errors": 0}
+
+    # ── creating spans ──
+    def start_trace(self, name: str, **attributes):
+        """A new root span (a new trace); None when tracing is disabled."""
+        if not self.enabled:
+            return None
+        return Span(self, name, secrets.token_hex(16), None, attributes=attributes)
+
+    def start(self, name: str, parent=None, **attributes):
+        """A child of ``parent`` (Span or traceparent header) or of the active span; None outside a trace."""
+        if not self.enabled:
+            return None
+        parent = _current_span.get() if parent is None else parent
+        if isinstance(parent, Span):
+            return Span(self, name, parent.trace_id, parent.span_id, attributes=attributes)
+        ids = parse_traceparent(parent) if isinstance(parent, str) else None
+        if ids is None:
+            return None
+        return Span(self, name, ids[0], ids[1], attributes=attributes)
+
+    @contextmanager
+    def span(self, name: str, parent=None, **attributes):
+        """Time the block as a child span and make it the active span; yields None outside a trace."""
+        span = self.start(name, parent, **attributes)
+        if span is None:
+            yield None
+            return
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.end(error=type(e).__name__)
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end()
+
+    @contextmanager
+    def use(self, span):
+        """Make ``span`` the active span for the block (tasks created inside inherit it)."""
+        token = _current_span.set(span)
+        try:
+            yield span
+        finally:
+            _current_span.reset(token)
+
+    @staticmethod
+    def activate(span) -> None:
+        """Make ``span`` active for the rest of the current task."""
+        _current_span.set(span)
+
+    @staticmethod
+    def headers(span=None) -> dict:
+        span = span or _current_span.get()
+        return {"traceparent": span.traceparent} if span is not None else {}
+
+    # ── finished spans ──
+    def _finish(self, span: Span) -> None:
+        with self._lock:
+            self.counters["spans"] += 1
+            self._durations.setdefault(span.name, deque(maxlen=_SAMPLES)).append(span.duration_ms)
+            self._recent.append(span)
+            if self.export_path:
+                self._pending.append(span)
+                if self._flusher is None:
+                    self._flusher = threading.Thread(target=self._flush_loop, name="trace-exporter", daemon=True)
+                    self._flusher.start()
+
+    def _flush_loop(self) -> None:
+        while True:
+            time.sleep(self.flush_interval)
+            self.flush()
+
+    def flush(self) -> int:
+        """Append pending spans to the export file as one OTLP/JSON line; returns spans written."""
+        with self._lock:
+            spans, self._pending = self._pending, []
+        if not spans or not self.export_path:
+            return 0
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.export_path)), exist_ok=True)
+            with open(self.export_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(self.to_otlp(spans), separators=(",", ":")) + "\n")
+        except OSError:
+            self.counters["export_errors"] += 1
+            return 0
+        self.counters["exported"] += len(spans)
+        return len(spans)
+
+    def to_otlp(self, spans) -> dict:
+        return {"resourceSpans": [{
+            "resource": {"attributes": [_attr("service.name", self.service)]},
+            "scopeSpans": [{"scope": {"name": "turn-tracing"}, "spans": [_otlp_span(s) for s in spans]}],
+        }]}
+
+    def stats(self) -> dict:
+        with self._lock:
+            by_name = {}
+            for name, samples in self._durations.items():
+                ordered = sorted(samples)
+                pick = lambda q: round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 1)  # noqa: E731
+                by_name[name] = {"count": len(ordered), "p50_ms": pick(0.5), "p95_ms": pick(0.95),
+                                 "p99_ms": pick(0.99), "max_ms": round(ordered[-1], 1)}
+            return {"service": self.service, "enabled": self.enabled, "export_path": self.export_path,
+                    **self.counters, "spans_by_name": by_name}
+
+    def recent(self, limit: int = 50) -> list:
+        with self._lock:
+            spans = list(self._recent)[-limit:]
+        return [{"name": s.name, "trace_id": s.trace_id, "span_id": s.span_id, "parent_id": s.parent_id,
+                 "duration_ms": round(s.duration_ms, 1), "error": s.error, "attributes": s.attributes}
+                for s in spans]
+
+
+def _attr(key, value) -> dict:
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+
+def _otlp_span(span: Span) -> dict:
+    out = {
+        "traceId": span.trace_id,
+        "spanId": span.span_id,
+        "name": span.name,
+        "kind": 1,  # SPAN_KIND_INTERNAL
+        "startTimeUnixNano": str(span.start_ns),
+        "endTimeUnixNano": str(span.end_ns),
+        "attributes": [_attr(k, v) for k, v in span.attributes.items()],
+        "status": {"code": 2, "message": span.error} if span.error else {"code": 0},
+    }
+    if span.parent_id:
+        out["parentSpanId"] = span.parent_id
+    return out
+
+
+def build_tracer(service: str, env) -> Tracer:
+    return Tracer(
+        service,
+        export_path=env.get("TRACE_EXPORT_PATH") or None,
+        enabled=(env.get("TRACING_ENABLED") or "1") != "0",
+    )
@@ -31,21 +31,16 @@ except ImportError:
     Generation = None
     _DASHSCOPE_AVAILABLE = False
 
+from correction_markers import batch_correction_detector
+from model_calls import model_calls
+from tracing import build_tracer
 from workflows.proficiency_scoring import ProficiencyScoringWorkflow
 
 logger = logging.getLogger(__name__)
 
-
-# Hard-correction markers (partial match across common target languages)
-_HARD_CORRECTION_MARKERS = [
-    "说错了", "不对", "错误", "incorrect", "wrong",
-    "間違", "間違い", "全然違う", "틀렸",
-]
-# Soft-correction markers
-_SOFT_CORRECTION_MARKERS = [
-    "曖昧", "不够具体", "vague", "try again", "もう少し具体的",
-    "can be clearer", "不太清楚",
-]
+# Continues the turn trace started in ai-omni-service (traceparent header);
+# TRACE_EXPORT_PATH=<file> writes OTLP/JSON lines.
+tracer = build_tracer("workflow-service", os.environ)
 
 
 class BatchEvaluationWorkflow:
@@ -94,14 +89,16 @@ class BatchEvaluationWorkflow:
 
         # 1. LLM 评估（失败则走 fallback）
         try:
-            result = await self._call_llm(
-                turn_window=turn_window,
-                current_task=current_task,
-                native_language=native_language,
-                target_language=target_language,
-            )
+            with tracer.span("batch_eval.llm", model=self._model):
+                result = await self._call_llm(
+                    turn_window=turn_window,
+                    current_task=current_task,
+                    native_language=native_language,
+                    target_language=target_language,
+                )
         except Exception as e:
             logger.warning(f"[BATCH_EVAL] LLM failed, using rule-based fallback: {e}")
+            model_calls.fallback("batch_eval", "rule_based")
             result = self._rule_based_fallback(turn_window, current_task)
 
         # 2. 保底字段
@@ -130,18 +127,19 @@ class BatchEvaluationWorkflow:
                 if tips:
                     feedback_text = tips[0] if isinstance(tips[0], str) else ""
 
-                db_result = await self._update_user_proficiency(
-                    user_id=user_id,
-                    goal_id=goal_id,
-                    task_id=task_id,
-                    proficiency_delta=delta,
-                    scores=result.get("scores", {}),
-                    feedback=feedback_text,
-                    db_connection=db_connection,
-                    current_task=current_task,
-                    conversation_history=self._turn_window_to_history(turn_window),
-                    native_language=native_language,
-                )
+                with tracer.span("batch_eval.db", delta=delta):
+                    db_result = await self._update_user_proficiency(
+                        user_id=user_id,
+                        goal_id=goal_id,
+                        task_id=task_id,
+                        proficiency_delta=delta,
+                        scores=result.get("scores", {}),
+                        feedback=feedback_text,
+                        db_connection=db_connection,
+                        current_task=current_task,
+                        conversation_history=self._turn_window_to_history(turn_window),
+                        native_language=native_language,
+                    )
                 result["task_completed"] = bool(db_result.get("task_completed", False))
                 result["task_ready_to_complete"] = bool(db_result.get("task_ready_to_complete", False))
                 result["total_proficiency"] = db_result.get("total_proficiency", 0)
@@ -188,18 +186,19 @@ class BatchEvaluationWorkflow:
         # dashscope Generation.call is sync — wrap in executor to not block loop
         import asyncio
         loop = asyncio.get_event_loop()
-        response = await loop.run_in_executor(
-            None,
-            lambda: Generation.call(
-                model=self._model,
-                messages=[{"role": "user", "content": prompt}],
-                result_format="message",
-                api_key=self._api_key,
-            ),
-        )
-
-        if not response or not getattr(response, "output", None):
-            raise RuntimeError(f"Empty dashscope response: {response}")
+        with model_calls.call("batch_eval", self._model) as call:
+            response = await loop.run_in_executor(
+                None,
+                lambda: Generation.call(
+                    model=self._model,
+                    messages=[{"role": "user", "content": prompt}],
+                    result_format="message",
+                    api_key=self._api_key,
+                ),
+            )
+            call.usage(response)
+            if not response or not getattr(response, "output", None):
+                raise RuntimeError(f"Empty dashscope response: {response}")
 
         # Parse message content
         try:
@@ -429,17 +428,8 @@ If the student made a meaningful attempt in {target_language} (avg content lengt
         if avg_chars_per_turn >= 10 and has_target_lang_chars and delta < 1:
             delta = 1
 
-        # Correction detection
-        correction_penalty = 1.0
-        for marker in _HARD_CORRECTION_MARKERS:
-            if marker.lower() in combined_ai:
-                correction_penalty = 0.5
-                break
-        else:
-            for marker in _SOFT_CORRECTION_MARKERS:
-                if marker.lower() in combined_ai:
-                    correction_penalty = 0.7
-                    break
+        # Correction detection (shared registry, scope=batch — see correction_markers)
+        correction_penalty, correction_markers = batch_correction_detector.penalty(combined_ai)
 
         # Apply correction penalty to delta (floor at 0, ceil at 10).
         delta = max(0, min(10, int(delta * correction_penalty)))
@@ -513,6 +503,10 @@ If the student made a meaningful attempt in {target_language} (avg content lengt
                 "missed": missed,
                 "coverage_ratio": round(coverage_ratio, 3),
             },
+            "correction_detail": {
+                "penalty": correction_penalty,
+                "markers": correction_markers,
+            },
         }
 
     # ---------- helpers ----------
@@ -4,9 +4,15 @@ Workflow 4: Goal Planning (新目标规划)
 引导用户建立新的口语练习目标 (goal)
 """
 import json
+import asyncio
+import logging
 from typing import Dict, List, Any, Optional
 from datetime import datetime, timedelta
 
+from workflows.proficiency_scoring import proficiency_scoring_workflow, scenario_task_pairs
+
+logger = logging.getLogger(__name__)
+
 
 class GoalPlanningWorkflow:
     """
@@ -20,6 +26,7 @@ class GoalPlanningWorkflow:
     def __init__(self):
         self.goal_templates = self._build_goal_templates()
         self.default_scenarios = self._get_default_scenarios()
+        self._background_tasks = set()  # 持有后台预计算任务引用，防止被 GC
     
     def _build_goal_templates(self) -> Dict[str, Dict[str, Any]]:
         """构建目标模板"""
@@ -309,7 +316,10 @@ class GoalPlanningWorkflow:
                     task
                 )
                 created_tasks.append(task_result.get("id"))
-        
+
+        # 后台预计算所有 场景×任务 的打分关键词与 gold embedding 矩阵，首个打分轮即命中缓存
+        self._schedule_scoring_warmup(new_goal_id, scenarios, goal_template.get("target_language", "English"))
+
         return {
             "goal_id": new_goal_id,
             "goal_type": goal_template.get("type"),
@@ -317,6 +327,23 @@ class GoalPlanningWorkflow:
             "message": f"🎯 New goal created: {goal_template.get('title')}"
         }
     
+    def _schedule_scoring_warmup(self, goal_id: int, scenarios: List[Dict[str, Any]], target_language: str) -> None:
+        """不阻塞 goal 创建：非英语关键词需 LLM 生成、gold 文本需批量 embedding，均放后台"""
+        if not scenarios:
+            return
+        gold_texts = [f"{title} {task}".strip() for title, task in scenario_task_pairs(scenarios)]
+        proficiency_scoring_workflow.schedule_gold_index_build(goal_id, gold_texts)
+        try:
+            task = asyncio.get_running_loop().create_task(
+                proficiency_scoring_workflow.precompute_scene_keywords(scenarios, target_language)
+            )
+        except RuntimeError:
+            # 无事件循环（同步调用场景），跳过预计算，打分时按需生成
+            logger.info(f"[KEYWORDS] No running loop, skip keyword precompute for goal {goal_id}")
+            return
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+
     def generate_goal_completion_message(
         self,
         completed_goal: Dict[str, Any],
@@ -12,8 +12,12 @@ import json
 import re
 import os
 import math
+import asyncio
 import hashlib
 import logging
+import threading
+import time
+from collections import OrderedDict
 from typing import Dict, List, Any, Optional, Tuple
 from datetime import datetime
 
@@ -26,10 +30,31 @@ except ImportError:
     TextEmbedding = None
     _DASHSCOPE_AVAILABLE = False
 
+from correction_markers import turn_correction_detector
+from model_calls import model_calls
+
+try:
+    from embedding_index import TaskEmbeddingIndex, goal_index_registry, gold_key
+    _EMBED_INDEX_AVAILABLE = True
+except ImportError:
+    TaskEmbeddingIndex = None
+    goal_index_registry = None
+    gold_key = None
+    _EMBED_INDEX_AVAILABLE = False
+
+try:
+    from local_embedding import local_similarity
+    _LOCAL_EMBED_AVAILABLE = True
+except ImportError:
+    local_similarity = None
+    _LOCAL_EMBED_AVAILABLE = False
+
 logger = logging.getLogger(__name__)
 
 # 双信号门 Signal 1（语义）配置
 _EMBED_MODEL = os.getenv("TASK_EMBED_MODEL", "text-embedding-v3")
+# TextEmbedding 单次批量输入上限（text-embedding-v3 为 10 条）
+_EMBED_BATCH_SIZE = int(os.getenv("TASK_EMBED_BATCH_SIZE", "10"))
 # 语义相似度阈值（cosine）。低于 _SEM_LOW → 不提供语义信号；高于 _SEM_HIGH → 强语义信号
 #
 # 标定依据（text-embedding-v3，2026-06 容器内实测样本）：
@@ -40,6 +65,20 @@ _EMBED_MODEL = os.getenv("TASK_EMBED_MODEL", "text-embedding-v3")
 # 换 embedding 模型或语言对差异大时，用 env 覆盖并重新取样标定。
 _SEM_LOW = float(os.getenv("TASK_SEM_LOW", "0.52"))
 _SEM_HIGH = float(os.getenv("TASK_SEM_HIGH", "0.62"))
+# Signal 1 后端选择（local_embedding：离线字符 n-gram TF-IDF，已标定到上面的阈值刻度）
+#   remote   —— 只用 DashScope embedding（默认；不可用时降级纯关键词）
+#   fallback —— DashScope 不可用/超时/无 key 时改用本地向量，而非降级纯关键词
+#   hybrid   —— 低风险轮次（语义信号不可能改变 input_score）用本地，其余同 fallback
+#   local    —— 只用本地向量（离线部署 / 压测）
+#   none     —— 不算语义信号，纯关键词（仅经 ProficiencyScoringWorkflow(sem_mode=...) 指定，如离线重评分）
+_SEM_MODE = os.getenv("TASK_SEM_MODE", "remote").strip().lower()
+
+# 场景关键词缓存：进程内 LRU 上限（条目数）与批量预计算并发度
+_KEYWORD_CACHE_MAX = int(os.getenv("KEYWORD_CACHE_MAX", "2048"))
+_KEYWORD_PRECOMPUTE_CONCURRENCY = int(os.getenv("KEYWORD_PRECOMPUTE_CONCURRENCY", "4"))
+# goal 索引缺失时的补建退避（秒）：窗口内同一 goal 不再重复 Redis GET + DB SELECT
+_GOLD_INDEX_RETRY_SECONDS = float(os.getenv("GOLD_INDEX_RETRY_SECONDS", "60"))
+_GOLD_INDEX_RETRY_MAX = 4096
 
 
 def _cosine(a: List[float], b: List[float]) -> float:
@@ -54,6 +93,108 @@ def _cosine(a: List[float], b: List[float]) -> float:
     return dot / (na * nb)
 
 
+class _KeywordCache:
+    """场景关键词两级缓存：进程内有界 LRU + Redis 共享层。
+
+    key 为 f"{scenario}:{task}:{language}"（与 _get_scene_keywords 一致）。
+    本地未命中时回源 Redis，命中后回填本地；写入同时落两层，
+    使其它 worker 与预计算产出的关键词在首个打分轮即可命中。
+    Redis 不可用时退化为纯进程内 LRU。
+    预计算在 asyncio.to_thread 的工作线程里写入、打分在事件循环上读取，
+    本地层的读写均持 _lock（Redis 调用不持锁）。
+    """
+
+    def __init__(self, maxsize: int):
+        self._maxsize = maxsize
+        self._store: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _redis():
+        try:
+            from cache import cache as _cache
+        except Exception:
+            return None
+        return _cache
+
+    @staticmethod
+    def _shared_key(key: str) -> str:
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()[:24]
+
+    def _put_local(self, key: str, keywords: List[str]) -> None:
+        with self._lock:
+            self._store[key] = keywords
+            self._store.move_to_end(key)
+            while len(self._store) > self._maxsize:
+                self._store.popitem(last=False)
+
+    def get(self, key: str) -> Optional[List[str]]:
+        with self._lock:
+            local = self._store.get(key)
+            if local is not None:
+                self._store.move_to_end(key)
+                self.hits += 1
+                return local
+        _cache = self._redis()
+        if _cache is not None:
+            shared = _cache.get_scene_keywords(self._shared_key(key))
+            if shared:
+                self._put_local(key, shared)
+                with self._lock:
+                    self.hits += 1
+                return shared
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, key: str, keywords: List[str], shared: bool = True) -> None:
+        """写入本地 LRU；shared=False 时不落 Redis（降级结果只在本进程内复用）"""
+        self._put_local(key, keywords)
+        _cache = self._redis() if shared else None
+        if _cache is not None:
+            _cache.set_scene_keywords(self._shared_key(key), keywords)
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            return key in self._store
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._store)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._store.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"size": len(self._store), "maxsize": self._maxsize, "hits": self.hits, "misses": self.misses}
+
+
+# 进程内共享：proficiency / batch_evaluation 各自的 workflow 实例复用同一份缓存
+_scene_keyword_cache = _KeywordCache(maxsize=_KEYWORD_CACHE_MAX)
+
+
+def scenario_task_pairs(scenarios: List[Dict[str, Any]]) -> List[Tuple[str, str]]:
+    """[{"title", "tasks": [str | {"text"/"task_description"/"title": str}]}] → [(场景标题, 任务文本)]
+
+    关键词预计算与 gold 索引预建共用，保证两者覆盖同一批任务。
+    """
+    pairs = []
+    for scenario in scenarios or []:
+        if not isinstance(scenario, dict):
+            continue
+        title = scenario.get("title") or ""
+        for task in scenario.get("tasks") or []:
+            if isinstance(task, dict):
+                task = task.get("text") or task.get("task_description") or task.get("title") or ""
+            if isinstance(task, str) and task.strip():
+                pairs.append((title, task))
+    return pairs
+
+
 class ProficiencyScoringWorkflow:
     """
     熟练度打分工作流
@@ -63,14 +204,22 @@ class ProficiencyScoringWorkflow:
     - 累计 +3 分时推送任务完成标记
     """
 
-    def __init__(self):
+    def __init__(self, sem_mode: Optional[str] = None, ai_keywords: bool = True):
+        """sem_mode：本实例的 Signal 1 后端；None 时跟随 TASK_SEM_MODE
+        ai_keywords：False 时关键词缓存未命中直接走文本提取，不调用 LLM（离线批量重评分用）
+        """
+        self._sem_mode = sem_mode
+        self._ai_keywords = ai_keywords
         self.scoring_criteria = {
             "fluency": self._score_fluency,
             "vocabulary": self._score_vocabulary,
             "grammar": self._score_grammar,
             "task_relevance": self._score_task_relevance
         }
-        self._keyword_cache = {}  # 缓存已生成的场景关键词
+        self._keyword_cache = _scene_keyword_cache  # 场景关键词两级缓存（LRU + Redis）
+        self._index_pending = set()  # 正在后台构建 gold embedding 索引的 goal_id
+        self._index_retry_at: Dict[Any, float] = {}  # goal_id → 下次允许尝试补建的 monotonic 时间
+        self._background_tasks = set()
 
     async def analyze_conversation_and_update_score(
         self,
@@ -103,8 +252,11 @@ class ProficiencyScoringWorkflow:
         # 提取最近 3-5 轮对话
         recent_turns = self._extract_recent_turns(conversation_history, limit=5)
 
+        # goal 级 gold embedding 索引缺失时后台补建（本轮走逐任务路径）
+        await self._ensure_gold_index(goal_id, db_connection)
+
         # 分析各维度分数
-        scores = await self._calculate_scores(recent_turns, current_task)
+        scores = await self._calculate_scores(recent_turns, current_task, goal_id=goal_id)
 
         # 计算本轮熟练度增量（可正可负）
         proficiency_delta, feedback = self._calculate_proficiency_delta_with_feedback(scores)
@@ -143,7 +295,8 @@ class ProficiencyScoringWorkflow:
     async def _calculate_scores(
         self,
         recent_turns: List[Dict[str, Any]],
-        current_task: Dict[str, Any]
+        current_task: Dict[str, Any],
+        goal_id: Optional[int] = None
     ) -> Dict[str, Any]:
         """计算各维度分数 (0-10)
         
@@ -188,11 +341,13 @@ class ProficiencyScoringWorkflow:
         task_relevance_result = await self._score_task_relevance(
             recent_turns,
             current_task,
-            target_language
+            target_language,
+            goal_id=goal_id
         )
         scores["task_relevance"] = task_relevance_result["score"]
         scores["suggested_keywords"] = task_relevance_result.get("suggested_keywords", [])
         scores["matched_keywords"] = task_relevance_result.get("matched_keywords", [])
+        scores["task_relevance_signals"] = task_relevance_result.get("signals")
 
         return scores
 
@@ -438,45 +593,10 @@ class ProficiencyScoringWorkflow:
         - 强纠正（0.5）：明确表示用户说错/没听懂
         - 轻度纠正（0.7）：明确说表达模糊/不够清晰
         - 教学建议不触发 penalty（如鼓励扩展、建议词汇、鼓励尝试）
-        """
-        if not ai_response:
-            return 1.0
-        text = ai_response.lower()
-
-        # 强纠正：明确表示用户说错/没听懂
-        hard_correction_patterns = [
-            # 日语
-            '全然違う', '間違い', '意味不明', '何が言いたい', '分かりません', 'もう一度言って',
-            # 中文
-            '说错了', '不对', '听不懂', '什么意思',
-            # 英文
-            "that's wrong", 'incorrect', "i don't understand what you mean",
-            # 偏题重定向
-            '话题', '先完成', '回到', '专注于',
-            "let's focus on", "let's go back to", 'remember the task',
-            'については', 'に戻り', 'テーマ',
-        ]
-
-        # 轻度纠正：明确说表达模糊/不够清晰，或要求更具体
-        soft_correction_patterns = [
-            # 日语
-            '曖昧', 'あいまい', 'はっきり言って', 'もっとはっきり',
-            'もう少し具体的', 'もっと具体的',  # AI 要求补充细节，说明当前表达不足
-            # 中文
-            '太模糊', '不够具体', '说得更清楚', '更具体',
-            # 英文
-            'vague', 'unclear', 'not sure what you mean', 'be more specific', 'more specific',
-        ]
 
-        hard_count = sum(1 for p in hard_correction_patterns if p in text)
-        soft_count = sum(1 for p in soft_correction_patterns if p in text)
-
-        if hard_count > 0:
-            return 0.5
-        elif soft_count > 0:
-            return 0.7
-        else:
-            return 1.0
+        标记表见 correction_markers.MARKER_REGISTRY（scope=turn），与批量评估共用
+        """
+        return turn_correction_detector.penalty(ai_response)[0]
 
     def _embed_text(self, text: str) -> Optional[List[float]]:
         """同步调用 DashScope text-embedding，返回向量；失败返回 None（graceful degrade）"""
@@ -487,12 +607,15 @@ class ProficiencyScoringWorkflow:
             return None
         try:
             dashscope.api_key = api_key
-            resp = TextEmbedding.call(model=_EMBED_MODEL, input=text.strip())
-            # DashScope 成功返回 status_code 200，向量在 output.embeddings[0].embedding
-            if getattr(resp, "status_code", None) == 200:
-                embeddings = resp.output.get("embeddings") if isinstance(resp.output, dict) else None
-                if embeddings:
-                    return embeddings[0].get("embedding")
+            with model_calls.call("embedding", _EMBED_MODEL) as call:
+                resp = TextEmbedding.call(model=_EMBED_MODEL, input=text.strip())
+                call.usage(resp)
+                # DashScope 成功返回 status_code 200，向量在 output.embeddings[0].embedding
+                if getattr(resp, "status_code", None) == 200:
+                    embeddings = resp.output.get("embeddings") if isinstance(resp.output, dict) else None
+                    if embeddings:
+                        return embeddings[0].get("embedding")
+                call.error = f"http_{getattr(resp, 'status_code', 'n/a')}"
             logger.warning(f"[Embed] TextEmbedding non-200: {getattr(resp, 'status_code', 'n/a')}")
             return None
         except Exception as e:
@@ -511,14 +634,144 @@ class ProficiencyScoringWorkflow:
         if _cache is not None:
             cached = _cache.get_task_embedding(task_key)
             if cached:
+                model_calls.cache_hit("embedding")
                 return cached
         vec = self._embed_text(gold_text)
         if vec and _cache is not None:
             _cache.set_task_embedding(task_key, vec)
         return vec
 
-    def _semantic_similarity(self, user_content: str, gold_text: str) -> Optional[float]:
-        """Signal 1：用户回答与任务 gold 文本的语义余弦相似度。embedding 不可用时返回 None"""
+    def _embed_texts(self, texts: List[str]) -> Optional[List[List[float]]]:
+        """批量 embedding（每批 _EMBED_BATCH_SIZE 条），结果与输入顺序一致；任一批失败返回 None"""
+        if not _DASHSCOPE_AVAILABLE or not texts:
+            return None
+        api_key = os.getenv("QWEN3_OMNI_API_KEY")
+        if not api_key:
+            return None
+        dashscope.api_key = api_key
+        vectors: List[List[float]] = []
+        for start in range(0, len(texts), _EMBED_BATCH_SIZE):
+            batch = [t.strip() for t in texts[start:start + _EMBED_BATCH_SIZE]]
+            try:
+                with model_calls.call("embedding", _EMBED_MODEL) as call:
+                    resp = TextEmbedding.call(model=_EMBED_MODEL, input=batch)
+                    call.usage(resp)
+                    embeddings = resp.output.get("embeddings") if getattr(resp, "status_code", None) == 200 and isinstance(resp.output, dict) else None
+                    if not embeddings or len(embeddings) != len(batch):
+                        call.error = f"http_{getattr(resp, 'status_code', 'n/a')}"
+            except Exception as e:
+                logger.warning(f"[Embed] batch TextEmbedding call failed: {e}")
+                return None
+            if not embeddings or len(embeddings) != len(batch):
+                logger.warning(f"[Embed] batch TextEmbedding non-200 or short: {getattr(resp, 'status_code', 'n/a')}")
+                return None
+            embeddings = sorted(embeddings, key=lambda e: e.get("text_index", 0))
+            vectors.extend(e.get("embedding") for e in embeddings)
+        return vectors
+
+    def build_gold_index(self, goal_id: int, gold_texts: List[str]) -> Optional["TaskEmbeddingIndex"]:
+        """为 goal 的全部任务 gold 文本构建 embedding 矩阵索引（同步，含网络调用）
+
+        逐任务 Redis 缓存中已有的向量直接复用，其余一次批量 embedding。
+        Returns: 构建好的索引；embedding 不可用时返回 None
+        """
+        if not _EMBED_INDEX_AVAILABLE or goal_id is None:
+            return None
+        texts = list(dict.fromkeys(t.strip() for t in gold_texts if t and t.strip()))
+        if not texts:
+            return None
+        try:
+            from cache import cache as _cache
+        except Exception:
+            _cache = None
+        keys = [gold_key(t) for t in texts]
+        vectors: List[Optional[List[float]]] = [
+            _cache.get_task_embedding(k) if _cache is not None else None for k in keys
+        ]
+        missing = [i for i, v in enumerate(vectors) if not v]
+        if missing:
+            fresh = self._embed_texts([texts[i] for i in missing])
+            if not fresh:
+                return None
+            for i, vec in zip(missing, fresh):
+                vectors[i] = vec
+        try:
+            index = TaskEmbeddingIndex.from_vectors(keys, vectors)
+        except ValueError as e:
+            logger.warning(f"[EmbedIndex] build failed for goal={goal_id}: {e}")
+            return None
+        goal_index_registry.put(goal_id, index)
+        logger.info(f"[EmbedIndex] built goal={goal_id} tasks={len(index)} dim={index.dim} embedded={len(missing)}")
+        return index
+
+    def schedule_gold_index_build(self, goal_id: int, gold_texts: List[str]) -> None:
+        """后台构建 goal 索引（embedding 为同步网络调用，放线程池），同一 goal 不重复排队"""
+        if not _EMBED_INDEX_AVAILABLE or goal_id is None or goal_id in self._index_pending or not gold_texts:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._index_pending.add(goal_id)
+        task = loop.create_task(asyncio.to_thread(self.build_gold_index, goal_id, gold_texts))
+        self._background_tasks.add(task)
+
+        def _done(t, gid=goal_id):
+            self._background_tasks.discard(t)
+            self._index_pending.discard(gid)
+
+        task.add_done_callback(_done)
+
+    async def _ensure_gold_index(self, goal_id: Optional[int], db_connection: Any) -> None:
+        """goal 索引缺失（如 goal 由 user-service 创建）时，从 user_tasks 取 gold 文本后台补建"""
+        if not _EMBED_INDEX_AVAILABLE or not _DASHSCOPE_AVAILABLE or not os.getenv("QWEN3_OMNI_API_KEY"):
+            return
+        if goal_id is None or goal_id in self._index_pending or goal_id in goal_index_registry:
+            return
+        # 负缓存：索引缺失期间每轮都会走到这里，窗口内直接跳过 Redis GET 与 DB SELECT
+        now = time.monotonic()
+        if self._index_retry_at.get(goal_id, 0.0) > now:
+            return
+        if len(self._index_retry_at) >= _GOLD_INDEX_RETRY_MAX:
+            self._index_retry_at = {g: t for g, t in self._index_retry_at.items() if t > now}
+        self._index_retry_at[goal_id] = now + _GOLD_INDEX_RETRY_SECONDS
+        if goal_index_registry.get(goal_id) is not None:
+            return
+        try:
+            rows = await db_connection.fetch(
+                "SELECT scenario_title, task_description FROM user_tasks WHERE goal_id = $1",
+                goal_id
+            )
+        except Exception as e:
+            logger.warning(f"[EmbedIndex] load tasks failed for goal={goal_id}: {e}")
+            return
+        gold_texts = [
+            f"{r.get('scenario_title') or ''} {r.get('task_description') or ''}".strip()
+            for r in rows or []
+        ]
+        self.schedule_gold_index_build(goal_id, gold_texts)
+
+    def _semantic_similarity(self, user_content: str, gold_text: str, goal_id: Optional[int] = None,
+                             detail: Optional[Dict[str, Any]] = None) -> Optional[float]:
+        """Signal 1：用户回答与任务 gold 文本的语义余弦相似度。embedding 不可用时返回 None
+
+        goal 索引可用时：一次点积得到用户回答与该 goal 全部任务的相似度，
+        当前任务取对应行；detail（若传入）写入 other_max = 与其它任务的最高相似度（离题检测）。
+        索引缺失或不含该任务时，退回逐任务 gold 向量 + _cosine。
+        """
+        index = goal_index_registry.get(goal_id) if _EMBED_INDEX_AVAILABLE and goal_id is not None else None
+        if index is not None and gold_text and index.row(gold_key(gold_text)) is not None:
+            user_vec = self._embed_text(user_content)
+            if not user_vec:
+                return None
+            pair = index.similarity_with_others(user_vec, gold_key(gold_text))
+            if pair is None:
+                return None
+            current, other_max = pair
+            if detail is not None:
+                detail["other_max"] = other_max
+            return current
+
         gold_vec = self._gold_embedding(gold_text)
         if not gold_vec:
             return None
@@ -527,11 +780,41 @@ class ProficiencyScoringWorkflow:
             return None
         return _cosine(user_vec, gold_vec)
 
+    def _local_semantic_similarity(self, user_content: str, gold_text: str,
+                                   target_language: str = "English") -> Optional[float]:
+        """Signal 1 本地后端：离线 n-gram TF-IDF 相似度（已标定到 embedding 刻度）；不可用返回 None"""
+        if not _LOCAL_EMBED_AVAILABLE:
+            return None
+        try:
+            return local_similarity(user_content, gold_text, target_language, _SEM_LOW, _SEM_HIGH)
+        except Exception as e:
+            logger.warning(f"[LocalEmbed] similarity failed: {e}")
+            return None
+
+    def _select_semantic_similarity(self, user_content: str, gold_text: str, target_language: str,
+                                    goal_id: Optional[int], detail: Dict[str, Any],
+                                    low_stakes: bool) -> Tuple[Optional[float], Optional[str]]:
+        """按 sem_mode（默认 _SEM_MODE）选择 Signal 1 后端，返回 (相似度, 实际使用的后端)"""
+        mode = self._sem_mode or _SEM_MODE
+        if mode == "none":
+            return None, None
+        if mode == "local" or (mode == "hybrid" and low_stakes):
+            sim = self._local_semantic_similarity(user_content, gold_text, target_language)
+            return sim, ("local" if sim is not None else None)
+        sim = self._semantic_similarity(user_content, gold_text, goal_id=goal_id, detail=detail)
+        if sim is not None:
+            return sim, "remote"
+        if mode in ("fallback", "hybrid"):
+            sim = self._local_semantic_similarity(user_content, gold_text, target_language)
+            return sim, ("local" if sim is not None else None)
+        return None, None
+
     async def _score_task_relevance(
         self,
         turns: List[Dict[str, Any]],
         current_task: Dict[str, Any],
-        target_language: str = "English"
+        target_language: str = "English",
+        goal_id: Optional[int] = None
     ) -> Dict[str, Any]:
         """
         任务相关性评分 (0-10) - 双信号门（T-cell 共刺激）评分
@@ -541,6 +824,7 @@ class ProficiencyScoringWorkflow:
         input_score = max(Signal1_语义, Signal2_关键词)  —— 任一信号亮即救回真实回答：
           Signal 1（语义）: embedding cosine(user, task gold)
               >=_SEM_HIGH → 9 | >=_SEM_LOW → 7 | 否则 → 2 | embedding 不可用 → None（降级纯关键词）
+              后端由 TASK_SEM_MODE 选择：remote / fallback / hybrid / local（见 _select_semantic_similarity）
           Signal 2（关键词）: hit_count >=3→9 | 2→7 | 1→4 | 0→2
 
         共刺激门: AI hard correction（penalty=0.5，明确判错）→ input_score 封顶 ≤4，
@@ -610,9 +894,18 @@ class ProficiencyScoringWorkflow:
         else:
             kw_score = 2  # 未命中但保留基础分
 
+        # AI 纠错惩罚系数（Signal 2 verdict：hard correction = 判定回答错误），语义后端选择也要用
+        penalty, correction_markers = turn_correction_detector.penalty(last_ai_response)
+
         # Signal 1: 语义相似度（embedding 不可用时为 None → 降级纯关键词，不清零）
         gold_text = f"{scenario_title} {task_desc}".strip()
-        sem_sim = self._semantic_similarity(user_content, gold_text) if user_content else None
+        sem_detail: Dict[str, Any] = {}
+        # 低风险轮次：关键词已满档，或 hard correction 且关键词已达封顶值 4 → 语义信号不影响结果
+        # （kw_score=2 时语义信号仍能把 input_score 从 2 抬到封顶 4，不算低风险）
+        low_stakes = kw_score >= 9 or (penalty <= 0.5 and kw_score >= 4)
+        sem_sim, sem_backend = self._select_semantic_similarity(
+            user_content, gold_text, target_language, goal_id, sem_detail, low_stakes
+        ) if user_content else (None, None)
         sem_score = None
         if sem_sim is not None:
             if sem_sim >= _SEM_HIGH:
@@ -628,10 +921,7 @@ class ProficiencyScoringWorkflow:
         else:
             input_score = kw_score  # graceful degrade：embedding 不可用 → 退回原纯关键词行为
 
-        # 4. AI 纠错惩罚系数（Signal 2 verdict：hard correction = 判定回答错误）
-        penalty = self._get_correction_penalty(last_ai_response)
-
-        # 共刺激门：hard correction（penalty=0.5，AI 明确判错）压制 input_score，
+        # 4. 共刺激门：hard correction（penalty=0.5，AI 明确判错）压制 input_score，
         # 警语气≠正确——暖语气错答仍会因 penalty 扣分，明确判错则直接封顶 ≤4 不给 delta
         if penalty <= 0.5 and input_score > 4:
             input_score = 4
@@ -658,7 +948,7 @@ class ProficiencyScoringWorkflow:
         # 6. 最终 task_relevance
         final_score = max(1, min(10, round(input_score * penalty * sentence_quality_factor)))
         _sem_dbg = f"{sem_sim:.3f}" if sem_sim is not None else "n/a"
-        print(f"[DEBUG] task_relevance: hits={hit_count}, kw_score={kw_score}, sem_sim={_sem_dbg}, sem_score={sem_score}, input_score={input_score}, penalty={penalty}, quality={sentence_quality_factor}, final={final_score}")
+        print(f"[DEBUG] task_relevance: hits={hit_count}, kw_score={kw_score}, sem_sim={_sem_dbg}({sem_backend}), sem_score={sem_score}, input_score={input_score}, penalty={penalty}, quality={sentence_quality_factor}, final={final_score}")
 
         return {
             "score": final_score,
@@ -670,8 +960,12 @@ class ProficiencyScoringWorkflow:
                 "hit_count": hit_count,
                 "sem_sim": round(sem_sim, 4) if sem_sim is not None else None,
                 "sem_score": sem_score,
+                "sem_backend": sem_backend,  # remote | local | None（纯关键词）
+                # 与同 goal 其它任务的最高相似度（goal 索引可用时），高于当前任务即疑似串题
+                "sem_other_max": round(sem_detail["other_max"], 4) if sem_detail.get("other_max") is not None else None,
                 "input_score": input_score,
                 "penalty": penalty,
+                "correction_markers": correction_markers,  # 触发 penalty 的 AI 纠错标记
                 "quality": sentence_quality_factor,
             },
         }
@@ -1272,9 +1566,11 @@ class ProficiencyScoringWorkflow:
         # 创建缓存键（含语言，避免不同语言复用同一缓存）
         cache_key = f"{scenario_lower}:{task_lower}:{target_language.lower()}"
 
-        # 检查缓存
-        if cache_key in self._keyword_cache:
-            return self._keyword_cache[cache_key]
+        # 检查缓存（本地 LRU → Redis 共享层）
+        cached = self._keyword_cache.get(cache_key)
+        if cached is not None:
+            model_calls.cache_hit("keywords")
+            return cached
 
         # 任务描述关键词映射 - 用于从任务描述中提取具体场景
         # 键：任务描述中的关键词，值：对应的场景关键词列表
@@ -1359,7 +1655,7 @@ class ProficiencyScoringWorkflow:
                 if task_key in task_lower:
                     # 找到了任务描述中的具体场景关键词
                     unique_keywords = list(dict.fromkeys(keywords))
-                    self._keyword_cache[cache_key] = unique_keywords[:15]
+                    self._keyword_cache.set(cache_key, unique_keywords[:15])
                     return unique_keywords[:15]
 
             # 步骤1b: 尝试匹配场景关键词映射
@@ -1382,21 +1678,27 @@ class ProficiencyScoringWorkflow:
             # 优先使用任务描述匹配到的关键词（更具体）
             if task_specific_matched_keywords:
                 unique_keywords = list(dict.fromkeys(task_specific_matched_keywords))
-                self._keyword_cache[cache_key] = unique_keywords[:15]
+                self._keyword_cache.set(cache_key, unique_keywords[:15])
                 return unique_keywords[:15]
 
             # 如果任务描述没有匹配到，使用场景标题匹配的关键词
             if scenario_matched_keywords:
                 unique_keywords = list(dict.fromkeys(scenario_matched_keywords))
-                self._keyword_cache[cache_key] = unique_keywords[:15]
+                self._keyword_cache.set(cache_key, unique_keywords[:15])
                 return unique_keywords[:15]
 
             # 最后尝试组合匹配（兼容旧逻辑）
             if combined_matched_keywords:
                 unique_keywords = list(dict.fromkeys(combined_matched_keywords))
-                self._keyword_cache[cache_key] = unique_keywords[:15]
+                self._keyword_cache.set(cache_key, unique_keywords[:15])
                 return unique_keywords[:15]
 
+        # 离线批量模式：不发网络请求，结果确定、零成本（只回填本进程 LRU）
+        if not self._ai_keywords:
+            keywords = self._extract_keywords_from_text(f"{scenario_title} {task_desc}", target_language)
+            self._keyword_cache.set(cache_key, keywords, shared=False)
+            return keywords
+
         # 尝试 AI 动态生成
         try:
             import httpx
@@ -1420,13 +1722,17 @@ Return ONLY a JSON array of {target_language} keywords/phrases: ["keyword1", "ke
                     "input": {"messages": [{"role": "user", "content": prompt}]}
                 }
 
-                response = httpx.post(
-                    "https://dashscope.aliyuncs.com/api/v1/services/aigc/text-generation/generation",
-                    headers=headers, json=payload, timeout=30.0
-                )
+                with model_calls.call("keywords", "qwen-turbo") as call:
+                    response = httpx.post(
+                        "https://dashscope.aliyuncs.com/api/v1/services/aigc/text-generation/generation",
+                        headers=headers, json=payload, timeout=30.0
+                    )
+                    result = response.json() if response.status_code == 200 else None
+                    call.usage(result)
+                    if result is None:
+                        call.error = f"http_{response.status_code}"
 
-                if response.status_code == 200:
-                    result = response.json()
+                if result is not None:
                     content = result.get("output", {}).get("choices", [{}])[0].get("message", {}).get("content", "[]")
                     import json
                     json_match = re.search(r'\[.*\]', content, re.DOTALL)
@@ -1435,14 +1741,63 @@ Return ONLY a JSON array of {target_language} keywords/phrases: ["keyword1", "ke
                         keywords = [kw.strip().lower() for kw in keywords if isinstance(kw, str) and len(kw) > 1]
                         if keywords:
                             print(f"[DEBUG] AI keywords for lang='{target_language}': {keywords[:15]}")
-                            self._keyword_cache[cache_key] = keywords[:15]
+                            self._keyword_cache.set(cache_key, keywords[:15])
                             return keywords[:15]
         except Exception as e:
             print(f"[DEBUG] AI keyword generation failed: {e}")
             pass  # AI 调用失败，使用 fallback
 
-        # Fallback: 从文本提取关键词
-        return self._extract_keywords_from_text(f"{scenario_title} {task_desc}", target_language)
+        # Fallback: 从文本提取关键词。结果写入本地 LRU，避免同一任务每轮重复
+        # 走失败的 AI 调用；不写 Redis，AI 恢复后其它 worker 仍能拿到 AI 关键词
+        model_calls.fallback("keywords", "text_extraction")
+        keywords = self._extract_keywords_from_text(f"{scenario_title} {task_desc}", target_language)
+        self._keyword_cache.set(cache_key, keywords, shared=False)
+        return keywords
+
+    async def precompute_scene_keywords(
+        self,
+        scenarios: List[Dict[str, Any]],
+        target_language: str = "English",
+        concurrency: int = _KEYWORD_PRECOMPUTE_CONCURRENCY,
+    ) -> Dict[str, int]:
+        """批量预计算 goal 下所有 场景×任务 的关键词，写入两级缓存
+
+        在创建 goal / 生成场景时调用，把 AI 关键词生成的开销挪出打分路径，
+        使每个任务的首个打分轮即命中缓存。_get_scene_keywords 内部是同步 HTTP，
+        放到线程池执行，并发度受 concurrency 限制以免打满 LLM 限流。
+
+        Args:
+            scenarios: [{"title": str, "tasks": [str | {"text"/"task_description": str}]}]
+            target_language: 目标语言
+
+        Returns:
+            {"tasks": 总任务数, "cached": 已在缓存中的数量, "computed": 本次新写入缓存的数量}
+        """
+        pairs = scenario_task_pairs(scenarios)
+        stats = {"tasks": len(pairs), "cached": 0, "computed": 0}
+        language = target_language or "English"
+        sem = asyncio.Semaphore(max(1, concurrency))
+
+        async def _one(title: str, task: str) -> None:
+            cache_key = f"{title.lower()}:{task.lower()}:{language.lower()}"
+            if self._keyword_cache.get(cache_key) is not None:
+                stats["cached"] += 1
+                return
+            async with sem:
+                try:
+                    await asyncio.to_thread(self._get_scene_keywords, title, task, language)
+                except Exception as e:
+                    logger.warning(f"[Keywords] precompute failed for '{title}/{task}': {e}")
+                    return
+            if cache_key in self._keyword_cache:
+                stats["computed"] += 1
+
+        await asyncio.gather(*(_one(t, k) for t, k in pairs))
+        logger.info(
+            f"[Keywords] precomputed lang={language} tasks={stats['tasks']} "
+            f"cached={stats['cached']} computed={stats['computed']}"
+        )
+        return stats
 
     def _extract_keywords_from_text(self, text: str, target_language: str = "English") -> List[str]:
         """从任务文本提取关键词，当文本为英文但目标语言非英文时做语义映射"""
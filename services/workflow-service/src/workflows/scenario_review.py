@@ -11,8 +11,13 @@ import httpx
 from typing import Dict, List, Any, Optional, Tuple
 from datetime import datetime, timedelta
 
+from model_calls import model_calls
+from prompt_budget import REQUIRED, Section, build_prompt_budgeter
+
 logger = logging.getLogger(__name__)
 
+prompt_budgets = build_prompt_budgeter(os.environ)
+
 
 class ScenarioReviewWorkflow:
     """
@@ -372,16 +377,17 @@ class ScenarioReviewWorkflow:
         ) or "- (tasks completed)"
         convo_text = "\n".join(f"Turn {i+1}: {t}" for i, t in enumerate(user_turns[-20:]))
 
-        prompt = f"""You are a strict oral-language evaluator. Score a student's full-scenario conversation on 4 dimensions, each 0-100.
+        # Over budget, the oldest turns are dropped first, then the task list tail.
+        prompt = prompt_budgets.fit("scenario_deep_eval", [
+            Section("preamble", f"""You are a strict oral-language evaluator. Score a student's full-scenario conversation on 4 dimensions, each 0-100.
 
 Scenario: "{scenario_title}"
-Tasks the student was supposed to complete:
-{tasks_text}
-
-Student's actual turns (most recent, up to 20):
-{convo_text}
-
-## Dimensions (0-100 each)
+""", REQUIRED),
+            Section("tasks", tasks_text + "\n", 20, keep="start",
+                    header="Tasks the student was supposed to complete:\n", footer="\n"),
+            Section("turns", convo_text + "\n", 10, keep="end",
+                    header="Student's actual turns (most recent, up to 20):\n", footer="\n"),
+            Section("rubric", f"""## Dimensions (0-100 each)
 - pronunciation: clarity, accuracy of sounds (infer from fluency markers / self-corrections)
 - fluency: sentence completeness, connectors, avoidance of fragments
 - intonation: natural sentence flow, appropriate hedges/particles
@@ -403,10 +409,12 @@ Student's actual turns (most recent, up to 20):
   "overall_score": 0-100,
   "stars": 1-5,
   "reason": "<one-sentence justification in {native_language}>"
-}}"""
+}}""", REQUIRED),
+        ])
 
         try:
-            async with httpx.AsyncClient(timeout=25.0) as client:
+            async with model_calls.call("scenario_deep_eval", "qwen-turbo") as call, \
+                    httpx.AsyncClient(timeout=25.0) as client:
                 resp = await client.post(
                     "https://dashscope.aliyuncs.com/compatible-mode/v1/chat/completions",
                     headers={
@@ -424,8 +432,11 @@ Student's actual turns (most recent, up to 20):
                     logger.warning(
                         f"[SCENARIO_REVIEW] deep-eval LLM error {resp.status_code}: {resp.text[:200]}"
                     )
+                    call.error = f"http_{resp.status_code}"
                     return None
-                content = resp.json()["choices"][0]["message"]["content"].strip()
+                body = resp.json()
+                call.usage(body)
+                content = body["choices"][0]["message"]["content"].strip()
                 content = re.sub(r"^```json\s*|\s*```$", "", content, flags=re.DOTALL).strip()
                 parsed = json.loads(content)
             # Clamp and normalize
@@ -520,7 +531,8 @@ Write a short, personalized performance review in {native_language}. Requirement
 {{"summary": "...", "recommendation": "..."}}"""
 
         try:
-            async with httpx.AsyncClient(timeout=20.0) as client:
+            async with model_calls.call("scenario_feedback", "qwen-turbo") as call, \
+                    httpx.AsyncClient(timeout=20.0) as client:
                 resp = await client.post(
                     "https://dashscope.aliyuncs.com/compatible-mode/v1/chat/completions",
                     headers={
@@ -535,7 +547,9 @@ Write a short, personalized performance review in {native_language}. Requirement
                     },
                 )
                 if resp.status_code == 200:
-                    content = resp.json()["choices"][0]["message"]["content"].strip()
+                    body = resp.json()
+                    call.usage(body)
+                    content = body["choices"][0]["message"]["content"].strip()
                     # Strip markdown code fences if present
                     content = re.sub(r"^```json\s*|\s*```$", "", content, flags=re.DOTALL).strip()
                     parsed = json.loads(content)
@@ -546,6 +560,7 @@ Write a short, personalized performance review in {native_language}. Requirement
                         return {"summary": summary, "recommendation": recommendation}
                 else:
                     logger.warning(f"[SCENARIO_REVIEW] LLM API error {resp.status_code}: {resp.text[:200]}")
+                    call.error = f"http_{resp.status_code}"
         except Exception as e:
             logger.warning(f"[SCENARIO_REVIEW] AI feedback failed: {e}, falling back to template")
 
@@ -656,6 +671,7 @@ Write a short, personalized performance review in {native_language}. Requirement
         else:
             # Fallback: derive conservative scores from existing heuristics so the
             # payload always contains detail_scores (frontend depends on this shape).
+            model_calls.fallback("scenario_deep_eval", "heuristic")
             analysis["detail_scores"] = self._heuristic_detail_scores(analysis)
             analysis["overall_score"] = sum(analysis["detail_scores"].values()) // 4
             analysis["stars"] = max(1, min(5, round(analysis["overall_score"] / 20)))
@@ -676,6 +692,8 @@ Write a short, personalized performance review in {native_language}. Requirement
             # Replace template-generated summary and lead recommendation with AI output
             analysis["summary"] = ai_feedback["summary"]
             logger.info(f"[SCENARIO_REVIEW] Using AI-generated summary: {ai_feedback['summary'][:80]}...")
+        else:
+            model_calls.fallback("scenario_feedback", "template")
 
         # 生成复盘报告（根据用户母语）
         review_report = self._generate_review_report(
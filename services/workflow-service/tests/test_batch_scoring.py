@@ -0,0 +1,195 @@
+"""
+Tests for the offline batch scoring engine (batch_scoring)
+
+Covers:
+- worker scores a record with per-turn rules + batch rule fallback, never writes proficiency
+- per-record errors are isolated inside a chunk
+- score_stream keeps input order through the process pool and summarizes deltas
+- Postgres rows with JSON-as-text columns are decoded
+- internal job paths are confined to BATCH_SCORING_DIR
+- workers are capped at the CPU count; internal jobs run off the service event loop
+"""
+import json
+import threading
+import pytest
+from unittest.mock import AsyncMock, patch
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import batch_scoring
+from workflows import proficiency_scoring as ps
+
+
+TASK = {"id": 3, "scenario_title": "Restaurant Dining", "task_description": "Order local specialties",
+        "target_language": "English", "keywords": ["order", "menu"]}
+WINDOW = [
+    {"user_content": "I would like to order the local specialty from the menu", "ai_response": "Great choice!"},
+    {"user_content": "Could I also see the dessert menu please", "ai_response": "Of course, here it is."},
+]
+
+
+def _record(i):
+    return {"id": i, "user_id": "u1", "goal_id": 7, "current_task": TASK, "turn_window": WINDOW}
+
+
+@pytest.fixture
+def cache_connects(monkeypatch):
+    from cache import cache
+    calls = []
+    monkeypatch.setattr(cache, "connect", lambda: calls.append(1))
+    return calls
+
+
+@pytest.fixture
+def worker(monkeypatch, cache_connects):
+    monkeypatch.setattr(ps, "_SEM_MODE", ps._SEM_MODE)
+    batch_scoring._init_worker("none", None, None, quiet=False)
+    yield batch_scoring._worker
+    batch_scoring._worker["loop"].close()
+    batch_scoring._worker.clear()
+
+
+class TestWorker:
+    def test_scores_record_without_touching_proficiency(self, worker):
+        with patch.object(ps.ProficiencyScoringWorkflow, "_update_user_proficiency", new_callable=AsyncMock) as update:
+            [result] = batch_scoring._score_chunk([_record(1)])
+        update.assert_not_called()
+        assert result["id"] == 1 and result["task_id"] == 3
+        assert result["delta"] in (0, 1, 2)
+        assert result["scores"]["task_relevance_signals"]["sem_backend"] is None
+        assert result["batch"]["keyword_coverage_detail"]["matched"] == ["order", "menu"]
+
+    def test_sem_mode_none_is_passed_explicitly(self, worker):
+        before = ps._SEM_MODE
+        assert worker["scoring"]._sem_mode == "none"
+        assert "_semantic_similarity" not in vars(worker["scoring"])   # no instance monkeypatch
+        assert ps._SEM_MODE == before
+
+    def test_keywords_come_from_shared_cache_never_the_llm(self, worker, cache_connects, monkeypatch):
+        # Offline runs must be deterministic and free: a keyword cache miss is text extraction
+        monkeypatch.setenv("QWEN3_OMNI_API_KEY", "test-key")
+        assert cache_connects == [1]
+        with patch("httpx.post", side_effect=AssertionError("no LLM in batch scoring")):
+            first = worker["scoring"]._get_scene_keywords("Zorblax", "Quibble the frobnicator", "Japanese")
+            second = worker["scoring"]._get_scene_keywords("Zorblax", "Quibble the frobnicator", "Japanese")
+        assert first == second
+
+    def test_error_isolated_per_record(self, worker):
+        results = batch_scoring._score_chunk([{"id": "bad", "current_task": TASK, "turns": "oops"}, _record(2)])
+        assert "error" in results[0]
+        assert results[1]["id"] == 2 and "error" not in results[1]
+
+    def test_decode_text_columns(self):
+        record = batch_scoring._decode_record({"id": 1, "current_task": json.dumps(TASK), "turns": "", "turn_window": None})
+        assert record["current_task"]["id"] == 3
+        assert record["turns"] is None
+
+
+class TestScoreStream:
+    @pytest.mark.asyncio
+    async def test_preserves_order_and_summarizes(self, tmp_path):
+        src = tmp_path / "in.jsonl"
+        src.write_text("\n".join(json.dumps(_record(i)) for i in range(10)) + "\n", encoding="utf-8")
+        out = tmp_path / "out.jsonl"
+        stats = await batch_scoring.score_stream(batch_scoring.iter_jsonl(str(src)), str(out),
+                                                 workers=1, sem_mode="none", chunk_size=3)
+        ids = [json.loads(line)["id"] for line in out.read_text(encoding="utf-8").splitlines()]
+        assert ids == list(range(10))
+        assert stats["records"] == 10 and stats["errors"] == 0
+        assert sum(stats["deltas"].values()) == 10
+
+    @pytest.mark.asyncio
+    async def test_workers_capped_at_cpu_count(self, tmp_path):
+        src = tmp_path / "in.jsonl"
+        src.write_text(json.dumps(_record(1)) + "\n", encoding="utf-8")
+        stats = await batch_scoring.score_stream(batch_scoring.iter_jsonl(str(src)), str(tmp_path / "out.jsonl"),
+                                                 workers=10_000, sem_mode="none")
+        assert stats["workers"] == (os.cpu_count() or 1)
+
+    @pytest.mark.asyncio
+    async def test_pool_uses_spawn_not_fork(self, monkeypatch, tmp_path):
+        # The service process is threaded; a forked child can inherit a held lock
+        contexts = []
+        real_pool = batch_scoring.ProcessPoolExecutor
+
+        def spy_pool(*args, **kwargs):
+            contexts.append(kwargs.get("mp_context"))
+            return real_pool(*args, **kwargs)
+
+        monkeypatch.setattr(batch_scoring, "ProcessPoolExecutor", spy_pool)
+        src = tmp_path / "in.jsonl"
+        src.write_text(json.dumps(_record(1)) + "\n", encoding="utf-8")
+        await batch_scoring.score_stream(batch_scoring.iter_jsonl(str(src)), str(tmp_path / "out.jsonl"),
+                                         workers=1, sem_mode="none")
+        assert [c.get_start_method() for c in contexts] == ["spawn"]
+
+    @pytest.mark.asyncio
+    async def test_rejects_unknown_sem_mode(self, tmp_path):
+        with pytest.raises(ValueError):
+            await batch_scoring.score_stream(batch_scoring.iter_jsonl("missing"), str(tmp_path / "o"), sem_mode="gpu")
+
+
+class TestJobPaths:
+    def test_plain_name_allowed(self, monkeypatch, tmp_path):
+        monkeypatch.setattr(batch_scoring, "BATCH_SCORING_DIR", str(tmp_path))
+        assert batch_scoring.resolve_job_path("out.jsonl") == str(tmp_path / "out.jsonl")
+
+    def test_traversal_rejected(self, monkeypatch, tmp_path):
+        monkeypatch.setattr(batch_scoring, "BATCH_SCORING_DIR", str(tmp_path))
+        with pytest.raises(ValueError):
+            batch_scoring.resolve_job_path("../etc/passwd")
+
+
+class TestJobs:
+    @pytest.mark.asyncio
+    async def test_job_runs_off_the_service_loop(self, monkeypatch, tmp_path):
+        from contextlib import asynccontextmanager
+        threads = []
+
+        async def fake_score_stream(source, output_path, progress=None, **kwargs):
+            threads.append(threading.get_ident())
+            progress.update({"status": "done", "records": len([r async for r in source])})
+
+        @asynccontextmanager
+        async def source_factory():
+            threads.append(threading.get_ident())
+            yield batch_scoring.iter_jsonl(str(src))
+
+        src = tmp_path / "in.jsonl"
+        src.write_text("\n".join(json.dumps(_record(i)) for i in range(3)) + "\n", encoding="utf-8")
+        monkeypatch.setattr(batch_scoring, "score_stream", fake_score_stream)
+        job_id = batch_scoring.start_job(source_factory, str(tmp_path / "out.jsonl"), sem_mode="none")
+        await batch_scoring.batch_scoring_jobs[job_id]["_task"]
+        assert batch_scoring.job_status(job_id) == {"status": "done", "output": str(tmp_path / "out.jsonl"),
+                                                    "records": 3}
+        assert len(set(threads)) == 1 and threads[0] != threading.get_ident()
+
+    @pytest.mark.asyncio
+    async def test_second_job_rejected_while_one_runs(self, monkeypatch, tmp_path):
+        from contextlib import asynccontextmanager
+        monkeypatch.setattr(batch_scoring, "batch_scoring_jobs", {"busy": {"status": "running"}})
+
+        @asynccontextmanager
+        async def source_factory():
+            yield batch_scoring.iter_jsonl(str(tmp_path / "in.jsonl"))
+
+        with pytest.raises(batch_scoring.BatchJobBusy):
+            batch_scoring.start_job(source_factory, str(tmp_path / "out.jsonl"), sem_mode="none")
+
+    def test_existing_output_file_refused(self, monkeypatch, tmp_path):
+        monkeypatch.setattr(batch_scoring, "batch_scoring_jobs", {})
+        out = tmp_path / "out.jsonl"
+        out.write_text("keep me\n", encoding="utf-8")
+        with pytest.raises(ValueError):
+            batch_scoring.start_job(None, str(out), sem_mode="none")
+        assert out.read_text(encoding="utf-8") == "keep me\n"
+
+    def test_finished_jobs_evicted_oldest_first(self, monkeypatch):
+        jobs = {f"j{i}": {"status": "done" if i % 2 else "failed"} for i in range(5)}
+        jobs["live"] = {"status": "running"}
+        monkeypatch.setattr(batch_scoring, "batch_scoring_jobs", jobs)
+        monkeypatch.setattr(batch_scoring, "BATCH_SCORING_KEEP_FINISHED", 2)
+        batch_scoring._evict_finished_jobs()
+        assert list(jobs) == ["j3", "j4", "live"]
@@ -0,0 +1,53 @@
+"""
+Tests for the shared correction-marker registry (correction_markers)
+
+Covers:
+- severity tiers and hard-over-soft precedence in one scan
+- fired markers are reported for the signals receipt
+- turn / batch scopes keep their historical marker sets
+- registry validation rejects conflicting severities
+"""
+import pytest
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from correction_markers import (
+    CorrectionDetector, HARD, SOFT,
+    turn_correction_detector, batch_correction_detector,
+)
+
+
+class TestCorrectionDetector:
+    def test_no_text(self):
+        assert turn_correction_detector.scan(None) == (None, [])
+        assert turn_correction_detector.penalty("") == (1.0, [])
+
+    def test_hard_overrides_soft_and_reports_all(self):
+        penalty, fired = turn_correction_detector.penalty("That's wrong and vague")
+        assert penalty == 0.5
+        assert set(fired) == {"that's wrong", "vague"}
+
+    def test_soft_only(self):
+        severity, fired = turn_correction_detector.scan("Could you be more specific?")
+        assert severity == SOFT
+        assert "be more specific" in fired
+
+    def test_turn_scope_ignores_batch_only_markers(self):
+        # "wrong" / "try again" 只在批量评估的合并文本中算纠错
+        assert turn_correction_detector.penalty("Nothing wrong with that, try again later!")[0] == 1.0
+        assert batch_correction_detector.penalty("Nothing wrong with that")[0] == 0.5
+        assert batch_correction_detector.penalty("Let's try again")[0] == 0.7
+
+    def test_conflicting_severity_rejected(self):
+        with pytest.raises(ValueError):
+            CorrectionDetector([("vague", SOFT), ("Vague", HARD)])
+
+
+def test_rule_based_fallback_reports_markers():
+    from workflows.batch_evaluation import BatchEvaluationWorkflow
+    wf = BatchEvaluationWorkflow()
+    window = [{"user_content": "I want pasta", "ai_response": "Hmm, that's not quite right — 不对."}]
+    result = wf._rule_based_fallback(window, {"keywords": ["pasta"]})
+    assert result["correction_detail"] == {"penalty": 0.5, "markers": ["不对"]}
@@ -0,0 +1,155 @@
+"""
+Tests for TaskEmbeddingIndex / GoalIndexRegistry
+
+Covers:
+- vectorized cosine matches the pure-Python _cosine
+- raw-bytes round trip (Redis payload) preserves matrix and norms
+- similarity_with_others: current task + best other task in one dot product
+- _semantic_similarity uses the goal index when present, falls back otherwise
+- _embed_texts batches by _EMBED_BATCH_SIZE and restores input order
+- a missing goal index is looked up at most once per retry window
+- goal warmup builds the index from str and dict tasks alike
+"""
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import numpy as np
+
+from embedding_index import TaskEmbeddingIndex, GoalIndexRegistry, gold_key
+from workflows import proficiency_scoring as ps
+from workflows.proficiency_scoring import ProficiencyScoringWorkflow, _cosine
+
+
+GOLD = ["Restaurant Order food", "Restaurant Ask for the bill", "Weather Talk about rain"]
+VECS = [[1.0, 0.0, 0.0], [0.6, 0.8, 0.0], [0.0, 0.0, 2.0]]
+
+
+@pytest.fixture
+def index():
+    return TaskEmbeddingIndex.from_vectors([gold_key(t) for t in GOLD], VECS)
+
+
+class TestTaskEmbeddingIndex:
+    def test_matches_pure_python_cosine(self, index):
+        user = [0.3, 0.5, 0.1]
+        sims = index.similarities(user)
+        for i, vec in enumerate(VECS):
+            assert sims[i] == pytest.approx(_cosine(user, vec), abs=1e-6)
+
+    def test_matrix_is_contiguous_float32(self, index):
+        assert index.matrix.dtype == np.float32
+        assert index.matrix.flags["C_CONTIGUOUS"]
+        assert index.norms[2] == pytest.approx(2.0)
+
+    def test_bytes_round_trip(self, index):
+        meta, blob = index.to_bytes()
+        assert len(blob) == (3 * 3 + 3) * 4
+        restored = TaskEmbeddingIndex.from_bytes(meta, blob)
+        assert restored.keys == index.keys
+        np.testing.assert_array_equal(restored.matrix, index.matrix)
+        np.testing.assert_array_equal(restored.norms, index.norms)
+
+    def test_similarity_with_others(self, index):
+        current, other = index.similarity_with_others([0.0, 1.0, 0.0], gold_key(GOLD[0]))
+        assert current == pytest.approx(0.0)
+        assert other == pytest.approx(0.8)
+
+    def test_dimension_mismatch_returns_none(self, index):
+        assert index.similarities([1.0, 2.0]) is None
+        assert index.similarity([1.0, 2.0], gold_key(GOLD[0])) is None
+
+    def test_registry_reads_through_redis(self, index):
+        registry = GoalIndexRegistry(maxsize=4)
+        fake_redis = MagicMock()
+        fake_redis.get_goal_embedding_index.return_value = index.to_bytes()
+        with patch.object(GoalIndexRegistry, "_redis", staticmethod(lambda: fake_redis)):
+            loaded = registry.get(42)
+            assert loaded is not None and len(loaded) == 3
+            registry.get(42)
+        assert fake_redis.get_goal_embedding_index.call_count == 1
+
+
+class TestSemanticSimilarityWithIndex:
+    @pytest.fixture
+    def workflow(self):
+        return ProficiencyScoringWorkflow()
+
+    def test_uses_goal_index(self, workflow, index):
+        registry = GoalIndexRegistry(maxsize=4)
+        registry._put_local(7, index)
+        workflow._embed_text = MagicMock(return_value=[1.0, 0.0, 0.0])
+        workflow._gold_embedding = MagicMock()
+        detail = {}
+        with patch.object(ps, "goal_index_registry", registry):
+            sim = workflow._semantic_similarity("i want pasta", GOLD[0], goal_id=7, detail=detail)
+        assert sim == pytest.approx(1.0)
+        assert detail["other_max"] == pytest.approx(0.6)
+        workflow._gold_embedding.assert_not_called()
+
+    def test_falls_back_without_index(self, workflow):
+        workflow._embed_text = MagicMock(return_value=[1.0, 0.0])
+        workflow._gold_embedding = MagicMock(return_value=[1.0, 0.0])
+        with patch.object(ps, "goal_index_registry", GoalIndexRegistry(maxsize=4)):
+            sim = workflow._semantic_similarity("hello", "Greeting Say hi", goal_id=99)
+        assert sim == pytest.approx(1.0)
+        workflow._gold_embedding.assert_called_once()
+
+    def test_embed_texts_batches_and_orders(self, workflow, monkeypatch):
+        monkeypatch.setenv("QWEN3_OMNI_API_KEY", "test-key")
+        monkeypatch.setattr(ps, "_EMBED_BATCH_SIZE", 2)
+        calls = []
+
+        def fake_call(model, input):
+            calls.append(list(input))
+            resp = MagicMock()
+            resp.status_code = 200
+            # DashScope may return embeddings out of order; text_index restores it
+            resp.output = {"embeddings": [
+                {"text_index": i, "embedding": [float(len(t))]} for i, t in reversed(list(enumerate(input)))
+            ]}
+            return resp
+
+        with patch.object(ps, "_DASHSCOPE_AVAILABLE", True), \
+             patch.object(ps, "dashscope", MagicMock()), \
+             patch.object(ps, "TextEmbedding", MagicMock(call=fake_call)):
+            vectors = workflow._embed_texts(["a", "bb", "ccc"])
+        assert calls == [["a", "bb"], ["ccc"]]
+        assert vectors == [[1.0], [2.0], [3.0]]
+
+
+class TestGoldIndexWarmup:
+    @pytest.mark.asyncio
+    async def test_missing_index_lookup_backs_off(self, monkeypatch):
+        monkeypatch.setenv("QWEN3_OMNI_API_KEY", "test-key")
+        workflow = ProficiencyScoringWorkflow()
+        registry = GoalIndexRegistry(maxsize=4)
+        fake_redis = MagicMock()
+        fake_redis.get_goal_embedding_index.return_value = None
+        db = AsyncMock()
+        db.fetch.return_value = [{"scenario_title": "Cafe", "task_description": "Order a latte"}]
+        workflow.schedule_gold_index_build = MagicMock()
+        with patch.object(ps, "_DASHSCOPE_AVAILABLE", True), \
+             patch.object(ps, "goal_index_registry", registry), \
+             patch.object(GoalIndexRegistry, "_redis", staticmethod(lambda: fake_redis)):
+            for _ in range(5):
+                await workflow._ensure_gold_index(11, db)
+            assert fake_redis.get_goal_embedding_index.call_count == 1
+            assert db.fetch.await_count == 1
+            workflow.schedule_gold_index_build.assert_called_once_with(11, ["Cafe Order a latte"])
+
+            workflow._index_retry_at[11] = 0.0          # window elapsed
+            await workflow._ensure_gold_index(11, db)
+        assert db.fetch.await_count == 2
+
+    def test_warmup_normalizes_dict_tasks(self):
+        from workflows import goal_planning
+        planner = goal_planning.GoalPlanningWorkflow()
+        scenarios = [{"title": "Cafe", "tasks": ["Order a latte", {"text": "Ask for the wifi"},
+                                                 {"task_description": "Pay by card"}, {}]}]
+        with patch.object(goal_planning.proficiency_scoring_workflow, "schedule_gold_index_build") as build:
+            planner._schedule_scoring_warmup(3, scenarios, "English")
+        build.assert_called_once_with(3, ["Cafe Order a latte", "Cafe Ask for the wifi", "Cafe Pay by card"])
@@ -0,0 +1,126 @@
+"""
+Tests for the offline local embedding backend (local_embedding)
+
+Covers:
+- hashed n-gram TF-IDF vectors are L2-normalized; empty text → None
+- shipped IDF tables rank paraphrase > same-scene other topic > unrelated
+- calibration maps local cosine onto the _SEM_LOW / _SEM_HIGH scale
+- TASK_SEM_MODE: remote (default, unchanged), fallback, hybrid low-stakes, local
+"""
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import numpy as np
+
+import local_embedding as le
+from workflows import proficiency_scoring as ps
+from workflows.proficiency_scoring import ProficiencyScoringWorkflow, _SEM_LOW, _SEM_HIGH
+
+
+GOLD = "Restaurant Dining Order local specialties"
+TASK = {"id": 1, "scenario_title": "Restaurant Dining", "task_description": "Order local specialties"}
+
+
+class TestLocalEmbedder:
+    def test_vector_is_normalized(self):
+        vec = le.get_embedder("English").embed("I would like to order the local specialty")
+        assert vec.dtype == np.float32
+        assert float(np.linalg.norm(vec)) == pytest.approx(1.0, abs=1e-5)
+
+    def test_empty_text_returns_none(self):
+        assert le.get_embedder("English").embed("  !! ") is None
+        assert le.local_similarity("", GOLD, "English", _SEM_LOW, _SEM_HIGH) is None
+
+    def test_ranking_with_shipped_idf(self):
+        e = le.get_embedder("English")
+        paraphrase = e.similarity("can i get the famous local food", GOLD)
+        other_topic = e.similarity("i want pasta and a glass of wine", GOLD)
+        unrelated = e.similarity("the weather is nice today", GOLD)
+        assert paraphrase > other_topic > unrelated
+
+    def test_cjk_uses_unigrams(self):
+        j = le.get_embedder("Japanese")
+        assert j.ngram_range[0] == 1
+        assert j.similarity("料理を注文したいです", "レストラン 料理を注文する") > \
+            j.similarity("今日は天気がいいですね", "レストラン 料理を注文する")
+
+    def test_calibration_anchors(self):
+        assert le.calibrate(le._LOCAL_SEM_LOW_RAW, _SEM_LOW, _SEM_HIGH) == pytest.approx(_SEM_LOW)
+        assert le.calibrate(le._LOCAL_SEM_HIGH_RAW, _SEM_LOW, _SEM_HIGH) == pytest.approx(_SEM_HIGH)
+        assert le.calibrate(0.0, _SEM_LOW, _SEM_HIGH) < _SEM_LOW
+        assert le.calibrate(1.0, _SEM_LOW, _SEM_HIGH) == pytest.approx(1.0)
+
+    def test_build_idf_table_weights_rare_grams_higher(self):
+        table = le.build_idf_table("english", ["order food", "order drinks", "order dessert"], dim=256)
+        embedder = le.LocalEmbedder.from_table(table)
+        common = embedder.idf[le._bucket_ids(["ord"], 256)[0]]
+        rare = embedder.idf[le._bucket_ids(["foo"], 256)[0]]
+        assert rare > common
+
+
+class TestSemanticModes:
+    @pytest.fixture
+    def workflow(self):
+        wf = ProficiencyScoringWorkflow()
+        wf._semantic_similarity = MagicMock(return_value=None)
+        return wf
+
+    async def _score(self, workflow, user_text, ai_text="That sounds delicious!", keywords=None):
+        turns = [{"role": "assistant", "content": ai_text}, {"role": "user", "content": user_text}]
+        with patch.object(workflow, '_get_task_specific_keywords', new_callable=AsyncMock, return_value=keywords or []), \
+             patch.object(workflow, '_get_scene_keywords', return_value=[]):
+            return await workflow._score_task_relevance(turns, TASK, "English")
+
+    @pytest.mark.asyncio
+    async def test_remote_mode_keeps_keyword_degrade(self, workflow, monkeypatch):
+        monkeypatch.setattr(ps, "_SEM_MODE", "remote")
+        result = await self._score(workflow, "can i get the famous local food")
+        assert result["signals"]["sem_score"] is None
+        assert result["signals"]["sem_backend"] is None
+
+    @pytest.mark.asyncio
+    async def test_fallback_mode_rescues_paraphrase(self, workflow, monkeypatch):
+        monkeypatch.setattr(ps, "_SEM_MODE", "fallback")
+        result = await self._score(workflow, "can i get the famous local food")
+        assert result["signals"]["sem_backend"] == "local"
+        assert result["signals"]["sem_score"] >= 7
+        workflow._semantic_similarity.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_fallback_mode_unrelated_stays_low(self, workflow, monkeypatch):
+        monkeypatch.setattr(ps, "_SEM_MODE", "fallback")
+        result = await self._score(workflow, "the weather is nice today")
+        assert result["signals"]["sem_score"] == 2
+
+    @pytest.mark.asyncio
+    async def test_hybrid_low_stakes_skips_remote(self, workflow, monkeypatch):
+        monkeypatch.setattr(ps, "_SEM_MODE", "hybrid")
+        result = await self._score(workflow, "i want to order the local specialties please",
+                                   keywords=["order", "local", "specialties"])
+        assert result["signals"]["kw_score"] == 9
+        assert result["signals"]["sem_backend"] == "local"
+        workflow._semantic_similarity.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_hybrid_hard_correction_without_keywords_is_not_low_stakes(self, workflow, monkeypatch):
+        # kw_score=2: the cap is 4, so the semantic signal can still lift the score from 2 to 4
+        monkeypatch.setattr(ps, "_SEM_MODE", "hybrid")
+        workflow._semantic_similarity = MagicMock(return_value=0.7)
+        result = await self._score(workflow, "can i get the famous local food",
+                                   ai_text="That's wrong, try again.")
+        assert result["signals"]["kw_score"] == 2 and result["signals"]["penalty"] == 0.5
+        assert result["signals"]["sem_backend"] == "remote"
+        assert result["signals"]["input_score"] == 4
+        workflow._semantic_similarity.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_hybrid_high_stakes_tries_remote_first(self, workflow, monkeypatch):
+        monkeypatch.setattr(ps, "_SEM_MODE", "hybrid")
+        workflow._semantic_similarity = MagicMock(return_value=0.7)
+        result = await self._score(workflow, "can i get the famous local food")
+        assert result["signals"]["sem_backend"] == "remote"
+        assert result["signals"]["sem_score"] == 9
@@ -0,0 +1,32 @@
+"""Tests for the event-loop lag watchdog wired into workflow-service."""
+import asyncio
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from loop_monitor import LoopLagMonitor  # noqa: E402
+
+_HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def _sync_embedding_call():
+    time.sleep(0.25)          # stands in for TextEmbedding.call / redis-py on the loop
+
+
+@pytest.mark.asyncio
+async def test_sync_call_on_loop_shows_up_as_top_site():
+    monitor = LoopLagMonitor(interval=0.02, threshold=0.08, code_root=_HERE)
+    monitor.start()
+    try:
+        await asyncio.sleep(0.05)
+        _sync_embedding_call()
+        await asyncio.sleep(0.05)
+    finally:
+        monitor.stop()
+    report = monitor.report()
+    assert report["stalls"] == 1
+    assert report["top_sites"][0]["site"].endswith("_sync_embedding_call")
@@ -0,0 +1,70 @@
+"""Tests for model call accounting in workflow-service (src/model_calls.py)."""
+import json
+import os
+import sys
+import types
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from model_calls import TIER_HEADER, ModelCallMeter  # noqa: E402
+from workflows import batch_evaluation, proficiency_scoring  # noqa: E402
+
+
+def _row(meter, call_class, tier="unknown"):
+    return next(r for r in meter.stats()["classes"] if r["call_class"] == call_class and r["tier"] == tier)
+
+
+def _generation_response(body: dict, usage: dict):
+    message = types.SimpleNamespace(content=json.dumps(body))
+    return types.SimpleNamespace(output=types.SimpleNamespace(choices=[types.SimpleNamespace(message=message)]),
+                                 usage=usage)
+
+
+@pytest.mark.asyncio
+async def test_batch_eval_llm_usage_attributed_to_forwarded_tier(monkeypatch):
+    meter = ModelCallMeter()
+    monkeypatch.setattr(batch_evaluation, "model_calls", meter)
+    workflow = batch_evaluation.BatchEvaluationWorkflow()
+    workflow._api_key = "fake-key-for-test"
+    monkeypatch.setattr(workflow, "_update_user_proficiency", AsyncMock(return_value={"task_completed": False}))
+    meter.bind("pro")         # what the middleware does with TIER_HEADER
+    response = _generation_response({"delta": 1, "teaching_mode": "guide"}, {"input_tokens": 640, "output_tokens": 120})
+    with patch.object(batch_evaluation, "_DASHSCOPE_AVAILABLE", True), \
+            patch("workflows.batch_evaluation.Generation.call", return_value=response):
+        await workflow.evaluate_window(
+            user_id="u1", goal_id=5, turn_window=[], current_task={"id": 42},
+            native_language="Chinese", db_connection=AsyncMock(),
+        )
+    row = _row(meter, "batch_eval", "pro")
+    assert row["calls"] == 1 and row["errors"] == 0 and row["fallbacks"] == 0
+    assert row["prompt_tokens"] == 640 and row["completion_tokens"] == 120
+    assert meter.headers() == {TIER_HEADER: "pro"}
+
+
+@pytest.mark.asyncio
+async def test_batch_eval_failure_counts_error_and_fallback(monkeypatch):
+    meter = ModelCallMeter()
+    monkeypatch.setattr(batch_evaluation, "model_calls", meter)
+    workflow = batch_evaluation.BatchEvaluationWorkflow()
+    workflow._api_key = "fake-key-for-test"
+    monkeypatch.setattr(workflow, "_update_user_proficiency", AsyncMock(return_value={}))
+    with patch.object(batch_evaluation, "_DASHSCOPE_AVAILABLE", True), \
+            patch("workflows.batch_evaluation.Generation.call", side_effect=RuntimeError("boom")):
+        await workflow.evaluate_window(
+            user_id="u1", goal_id=5, turn_window=[], current_task={"id": 42},
+            native_language="Chinese", db_connection=AsyncMock(),
+        )
+    row = _row(meter, "batch_eval")
+    assert row["calls"] == 1 and row["errors"] == 1 and row["fallbacks"] == 1
+
+
+def test_keyword_cache_hits_are_counted(monkeypatch):
+    meter = ModelCallMeter()
+    monkeypatch.setattr(proficiency_scoring, "model_calls", meter)
+    workflow = proficiency_scoring.ProficiencyScoringWorkflow()
+    monkeypatch.setattr(workflow._keyword_cache, "get", lambda key: ["menu", "order"])
+    assert workflow._get_scene_keywords("Cafe", "Order a drink") == ["menu", "order"]
+    assert _row(meter, "keywords")["cache_hits"] == 1 and _row(meter, "keywords")["calls"] == 0
@@ -823,3 +823,94 @@ class TestDualSignalGate:
         # 3 关键词命中 → kw_score=9 → input_score=9（与改动前一致）
         assert result["signals"]["hit_count"] == 3
         assert result["signals"]["input_score"] == 9
+
+
+# ============================================================
+# 场景关键词两级缓存（LRU + Redis）与批量预计算
+# ============================================================
+
+class TestSceneKeywordCache:
+    @pytest.fixture
+    def kw_cache(self):
+        from workflows.proficiency_scoring import _KeywordCache
+        return _KeywordCache(maxsize=2)
+
+    def test_lru_evicts_least_recently_used(self, kw_cache):
+        kw_cache.set("a", ["x"])
+        kw_cache.set("b", ["y"])
+        kw_cache.get("a")          # a 变为最近使用
+        kw_cache.set("c", ["z"])   # 超出上限 → 淘汰 b
+        assert "a" in kw_cache and "c" in kw_cache
+        assert "b" not in kw_cache
+        assert len(kw_cache) == 2
+
+    def test_local_miss_reads_through_redis(self, kw_cache):
+        fake_redis = MagicMock()
+        fake_redis.get_scene_keywords.return_value = ["menu", "table"]
+        with patch.object(type(kw_cache), "_redis", staticmethod(lambda: fake_redis)):
+            assert kw_cache.get("dining:book:english") == ["menu", "table"]
+            # 回填本地后不再访问 Redis
+            assert kw_cache.get("dining:book:english") == ["menu", "table"]
+        assert fake_redis.get_scene_keywords.call_count == 1
+        assert kw_cache.stats()["hits"] == 2
+
+    def test_set_writes_both_tiers(self, kw_cache):
+        fake_redis = MagicMock()
+        with patch.object(type(kw_cache), "_redis", staticmethod(lambda: fake_redis)):
+            kw_cache.set("k", ["v"])
+        fake_redis.set_scene_keywords.assert_called_once()
+        assert kw_cache.get("k") == ["v"]
+
+    def test_concurrent_writers_and_readers_keep_lru_consistent(self):
+        import threading
+        from workflows.proficiency_scoring import _KeywordCache
+        kw_cache = _KeywordCache(maxsize=8)
+        errors = []
+
+        def _hammer(n):
+            try:
+                for i in range(2000):
+                    kw_cache.set(f"k{(n * 7 + i) % 32}", [str(i)], shared=False)
+                    kw_cache.get(f"k{i % 32}")
+            except Exception as e:  # OrderedDict mutated during move_to_end / popitem
+                errors.append(e)
+
+        with patch.object(_KeywordCache, "_redis", staticmethod(lambda: None)):
+            threads = [threading.Thread(target=_hammer, args=(n,)) for n in range(4)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+        assert errors == [] and len(kw_cache) == 8
+
+    def test_text_extraction_fallback_is_cached_locally_only(self, workflow):
+        from workflows.proficiency_scoring import _KeywordCache
+        workflow._keyword_cache = _KeywordCache(maxsize=16)
+        fake_redis = MagicMock()
+        fake_redis.get_scene_keywords.return_value = None
+        with patch.object(_KeywordCache, "_redis", staticmethod(lambda: fake_redis)), \
+                patch.object(workflow, "_extract_keywords_from_text", wraps=workflow._extract_keywords_from_text) as extract:
+            first = workflow._get_scene_keywords("Zorblax", "Quibble the frobnicator", "English")
+            second = workflow._get_scene_keywords("Zorblax", "Quibble the frobnicator", "English")
+        assert first == second
+        assert extract.call_count == 1
+        fake_redis.set_scene_keywords.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_precompute_makes_first_turn_a_cache_hit(self, workflow):
+        from workflows.proficiency_scoring import _KeywordCache
+        workflow._keyword_cache = _KeywordCache(maxsize=16)
+        scenarios = [
+            {"title": "Restaurant", "tasks": ["Order food", {"text": "Ask for the bill"}]},
+            {"title": "Weather", "tasks": ["Talk about the weather"]},
+        ]
+        stats = await workflow.precompute_scene_keywords(scenarios, "English")
+        assert stats == {"tasks": 3, "cached": 0, "computed": 3}
+
+        with patch("httpx.post") as mock_post:
+            kws = workflow._get_scene_keywords("Restaurant", "Order food", "English")
+        mock_post.assert_not_called()
+        assert "menu" in kws
+
+        again = await workflow.precompute_scene_keywords(scenarios, "English")
+        assert again["cached"] == 3
@@ -0,0 +1,29 @@
+"""Tests for the sampling profiler wired into workflow-service."""
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from profiler import SamplingProfiler  # noqa: E402
+
+
+def _fuzzy_busy(stop):
+    while not stop.is_set():
+        sum(range(100))
+
+
+@pytest.mark.asyncio
+async def test_collapsed_stacks_name_the_busy_function():
+    stop = threading.Event()
+    worker = threading.Thread(target=_fuzzy_busy, args=(stop,), name="scoring", daemon=True)
+    worker.start()
+    try:
+        result = await SamplingProfiler().capture(0.2, interval=0.005, thread="scoring")
+    finally:
+        stop.set()
+        worker.join()
+    assert "test_profiler.py:_fuzzy_busy" in result["collapsed"]
+    assert result["samples"] >= 10
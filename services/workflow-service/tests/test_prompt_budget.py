@@ -0,0 +1,75 @@
+"""Tests for the per-call-class prompt budgeter and its use in the scenario deep-eval."""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from prompt_budget import REQUIRED, PromptBudgeter, Section, estimate_tokens  # noqa: E402
+from workflows import scenario_review as sr  # noqa: E402
+
+
+def test_estimate_counts_cjk_per_char():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("abcd" * 10) == 10
+    assert estimate_tokens("你好世界") == 4
+
+
+def test_under_budget_is_unchanged():
+    budgeter = PromptBudgeter({"c": 1000})
+    sections = [Section("a", "intro\n", REQUIRED), Section("b", "x\ny\n", 10, header="H:\n", footer="\n")]
+    assert budgeter.fit("c", sections) == "intro\nH:\nx\ny\n\n"
+    assert budgeter.stats()["c"]["trimmed"] == 0
+
+
+def test_oldest_turns_dropped_first_and_required_kept():
+    budgeter = PromptBudgeter({"c": 60})
+    turns = "".join(f"Turn {i}: " + "word " * 10 + "\n" for i in range(10))
+    out = budgeter.fit("c", [
+        Section("rubric", "RUBRIC " * 20, REQUIRED),
+        Section("turns", turns, 10, header="Turns:\n"),
+    ])
+    assert out.startswith("RUBRIC")
+    assert "Turn 9:" in out and "Turn 0:" not in out
+    assert "earlier lines omitted" in out
+    stats = budgeter.stats()["c"]
+    assert stats["trimmed"] == 1 and stats["tokens_dropped"] > 0
+    assert stats["sections_trimmed"] == {"turns": 1}
+    assert stats["tokens_max"] <= 60
+
+
+@pytest.mark.asyncio
+async def test_deep_eval_prompt_fits_budget(monkeypatch):
+    captured = {}
+
+    class _Resp:
+        status_code = 200
+
+        def json(self):
+            return {"choices": [{"message": {"content": "{}"}}]}
+
+    class _Client:
+        def __init__(self, *a, **kw):
+            pass
+
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *exc):
+            return False
+
+        async def post(self, url, headers=None, json=None):
+            captured["prompt"] = json["messages"][0]["content"]
+            return _Resp()
+
+    monkeypatch.setenv("QWEN3_OMNI_API_KEY", "k")
+    monkeypatch.setattr(sr.httpx, "AsyncClient", _Client)
+    monkeypatch.setattr(sr, "prompt_budgets", PromptBudgeter({"scenario_deep_eval": 700}))
+    history = [{"role": "user", "content": f"turn {i} " + "I would like a large latte please " * 6} for i in range(20)]
+    await sr.scenario_review_workflow._llm_deep_evaluate("Coffee", [{"text": "Order"}], history)
+
+    prompt = captured["prompt"]
+    assert "turn 19 " in prompt and "turn 0 " not in prompt
+    assert '"overall_score": 0-100' in prompt
+    assert sr.prompt_budgets.stats()["scenario_deep_eval"]["tokens_max"] <= 700
@@ -0,0 +1,49 @@
+"""Tests for batch-evaluation trace spans continuing the ai-omni turn trace."""
+import os
+import sys
+from unittest.mock import AsyncMock
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from tracing import Tracer  # noqa: E402
+from workflows import batch_evaluation  # noqa: E402
+
+_TRACEPARENT = "00-" + "a" * 32 + "-" + "b" * 16 + "-01"
+
+
+@pytest.mark.asyncio
+async def test_llm_and_db_spans_join_the_incoming_trace(monkeypatch):
+    tracer = Tracer("workflow-service")
+    monkeypatch.setattr(batch_evaluation, "tracer", tracer)
+    workflow = batch_evaluation.BatchEvaluationWorkflow()
+    monkeypatch.setattr(workflow, "_call_llm", AsyncMock(return_value={"delta": 1}))
+    monkeypatch.setattr(workflow, "_update_user_proficiency", AsyncMock(return_value={"task_completed": False}))
+
+    with tracer.span("batch_eval.server", parent=_TRACEPARENT, turns=4) as server:
+        await workflow.evaluate_window(
+            user_id="u1", goal_id=5, turn_window=[], current_task={"id": 42},
+            native_language="Chinese", db_connection=AsyncMock(),
+        )
+
+    spans = {s["name"]: s for s in tracer.recent()}
+    assert set(spans) == {"batch_eval.llm", "batch_eval.db", "batch_eval.server"}
+    assert {s["trace_id"] for s in spans.values()} == {"a" * 32}
+    assert spans["batch_eval.server"]["parent_id"] == "b" * 16
+    assert spans["batch_eval.llm"]["parent_id"] == server.span_id
+    assert spans["batch_eval.db"]["parent_id"] == server.span_id
+
+
+@pytest.mark.asyncio
+async def test_no_spans_without_incoming_trace(monkeypatch):
+    tracer = Tracer("workflow-service")
+    monkeypatch.setattr(batch_evaluation, "tracer", tracer)
+    workflow = batch_evaluation.BatchEvaluationWorkflow()
+    monkeypatch.setattr(workflow, "_call_llm", AsyncMock(return_value={"delta": 0}))
+    with tracer.span("batch_eval.server", parent=None):
+        await workflow.evaluate_window(
+            user_id="u1", goal_id=5, turn_window=[], current_task={"id": 42},
+            native_language="Chinese", db_connection=AsyncMock(),
+        )
+    assert tracer.recent() == []